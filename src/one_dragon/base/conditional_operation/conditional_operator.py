@@ -1,11 +1,12 @@
-import time
-from concurrent.futures import ThreadPoolExecutor, Future
+from collections import deque
+from concurrent.futures import Future
 
-from threading import Lock
-from typing import Optional, Callable, List
+from threading import RLock
+from typing import Optional, Callable, List, Tuple
 
 from one_dragon.base.conditional_operation.atomic_op import AtomicOp
 from one_dragon.base.conditional_operation.operation_def import OperationDef
+from one_dragon.base.conditional_operation.operation_latency import OperationLatency, OperationLatencyRecorder
 from one_dragon.base.conditional_operation.operation_task import OperationTask
 from one_dragon.base.conditional_operation.operation_template import OperationTemplate
 from one_dragon.base.conditional_operation.scene_handler import SceneHandler
@@ -14,10 +15,13 @@ from one_dragon.base.conditional_operation.state_recorder import StateRecorder,
 from one_dragon.base.conditional_operation.utils import construct_scene_handler
 from one_dragon.base.config.yaml_config import YamlConfig
 from one_dragon.thread.atomic_int import AtomicInt
-from one_dragon.utils import thread_utils
+from one_dragon.thread.deadline_scheduler import DeadlineScheduler, ScheduledJob
 from one_dragon.utils.log_utils import log
 
-_od_conditional_op_executor = ThreadPoolExecutor(thread_name_prefix='od_conditional_op', max_workers=32)
+# 主循环无法得知结果什么时候改变时 重新判断的间隔
+_NORMAL_SCENE_CHECK_INTERVAL: float = 0.02
+# 主循环两次判断的最小间隔 有效期会提前一点结束 在这段时间内重新判断 结果和有效期都不会变
+_NORMAL_SCENE_MIN_CHECK_INTERVAL: float = 1e-3
 
 
 class ConditionalOperator(YamlConfig):
@@ -37,12 +41,22 @@ class ConditionalOperator(YamlConfig):
         self.trigger_scene_handler: dict[str, SceneHandler] = {}  # 需要状态触发的场景处理
         self.last_trigger_time: dict[int, float] = {}  # 各handler最后一次的触发时间
         self.normal_scene_handler: Optional[SceneHandler] = None  # 不需要状态触发的场景处理
+        self._recorder_2_scene_handlers: dict[int, List[SceneHandler]] = {}  # key=状态记录器id value=依赖这个状态的场景处理
         self.is_running: bool = False  # 整体是否正在运行
 
-        self._task_lock: Lock = Lock()
+        self._task_lock: RLock = RLock()  # 任务可能在添加回调前就完成 回调会在持有锁的线程里马上执行 因此需要可重入
         self.running_task: Optional[OperationTask] = None  # 正在运行的任务
         self.running_task_cnt: AtomicInt = AtomicInt()
 
+        # 调度 状态更新、任务结束、到达下一次判断时间时 唤醒对应的任务 判断使用的时间也以调度器的时钟为准
+        self.scheduler: DeadlineScheduler = DeadlineScheduler(f'od_conditional_op_{template_name}')
+        self._trigger_job: Optional[ScheduledJob] = None  # 处理触发场景
+        self._normal_scene_job: Optional[ScheduledJob] = None  # 处理主循环
+        self._pending_trigger_list: deque[Tuple[str, float]] = deque()  # 等待处理的触发 (状态, 状态更新时间)
+
+        self.scene_latency: dict[str, OperationLatencyRecorder] = {}  # 各场景 从触发到第一个指令执行的延迟
+        self.state_record_listener: Optional[Callable[[List[StateRecord]], None]] = None  # 收到状态更新时回调 调试用
+
     def init(
             self,
             op_getter: Callable[[OperationDef], AtomicOp],
@@ -58,6 +72,8 @@ class ConditionalOperator(YamlConfig):
         self.trigger_scene_handler: dict[str, SceneHandler] = {}
         self.normal_scene_handler = None
         self.last_trigger_time = {}
+        self._recorder_2_scene_handlers = {}
+        self.scene_latency = {}
 
         scenes = self.get('scenes', [])
 
@@ -78,8 +94,42 @@ class ConditionalOperator(YamlConfig):
             else:
                 self.normal_scene_handler = handler
 
+        self._init_state_index()
         self._inited = True
 
+    def _init_state_index(self) -> None:
+        """
+        按依赖的状态 建立场景处理的索引
+        状态更新时 只让依赖这个状态的场景处理重新计算
+        :return:
+        """
+        self._recorder_2_scene_handlers = {}
+        handler_list: List[SceneHandler] = []
+        for handler in self.trigger_scene_handler.values():
+            if handler not in handler_list:  # 同一个场景可能有多个触发状态
+                handler_list.append(handler)
+        if self.normal_scene_handler is not None:
+            handler_list.append(self.normal_scene_handler)
+
+        for handler in handler_list:
+            handler.init_state_index()
+            for recorder in handler.get_usage_state_recorders():
+                recorder_id = id(recorder)
+                if recorder_id not in self._recorder_2_scene_handlers:
+                    self._recorder_2_scene_handlers[recorder_id] = []
+                self._recorder_2_scene_handlers[recorder_id].append(handler)
+
+    def _on_state_recorder_updated(self, recorder: StateRecorder) -> None:
+        """
+        状态记录器更新后 通知依赖这个状态的场景处理
+        :param recorder: 更新了的状态记录器
+        :return:
+        """
+        for handler in self._recorder_2_scene_handlers.get(id(recorder), []):
+            handler.on_state_updated(recorder)
+            if handler is self.normal_scene_handler:
+                self.scheduler.wake(self._normal_scene_job)
+
     def dispose(self) -> None:
         """
         销毁 要对子模块进行完全销毁
@@ -105,58 +155,87 @@ class ConditionalOperator(YamlConfig):
 
         self.is_running = True
         self.running_task_cnt.set(0)  # 每次重置计数器 防止有bug导致无法正常运行
+        self._pending_trigger_list.clear()
 
+        self.scheduler.start()
+        self._trigger_job = self.scheduler.add_job('触发场景', self._run_trigger_scene)
         if self.normal_scene_handler is not None:
-            future: Future = _od_conditional_op_executor.submit(self._normal_scene_loop)
-            future.add_done_callback(thread_utils.handle_future_result)
+            self._normal_scene_job = self.scheduler.add_job('主循环', self._run_normal_scene, self.scheduler.now())
+        else:
+            self._normal_scene_job = None
 
         return True
 
-    def _normal_scene_loop(self) -> None:
+    def _run_normal_scene(self, now: float) -> Optional[float]:
         """
-        主循环
-        :return:
+        主循环 由调度器执行
+        :param now: 当前时间
+        :return: 下一次执行的时间 None代表等待状态更新或者任务结束后唤醒
         """
+        if self.running_task_cnt.get() > 0:
+            # 有其它场景在运行 等任务结束后唤醒
+            return None
+
         normal_handler_id = id(self.normal_scene_handler)
-        while self.is_running:
-            if self.running_task_cnt.get() > 0:
-                # 有其它场景在运行 等待
-                time.sleep(0.02)
+        # 上锁后确保运行状态不会被篡改
+        with self._task_lock:
+            if not self.is_running:
+                # 已经被stop_running中断了 不继续
+                return None
+
+            trigger_time = self.scheduler.now()
+            # 与返回的时间使用同一个表达式比较 避免浮点误差导致到点后仍判断为冷却中
+            next_trigger_time = self.last_trigger_time.get(normal_handler_id, 0) + self.normal_scene_handler.interval_seconds
+            if trigger_time < next_trigger_time:
+                return next_trigger_time
+
+            new_task = self.normal_scene_handler.get_operations(trigger_time)
+            if new_task is not None:
+                log.debug(f'当前场景 主循环 当前条件 {new_task.expr_display}')
+                new_task.event_time = trigger_time
+                self.running_task = new_task
+                self.last_trigger_time[normal_handler_id] = trigger_time
+                self.running_task_cnt.inc()
+                self._run_task(new_task)
+                return None
+
+            # 没有命中的状态 在结果可能改变时再判断 状态更新时也会唤醒
+            next_check_time = self.normal_scene_handler.get_next_check_time()
+            if next_check_time is None:
+                return trigger_time + _NORMAL_SCENE_CHECK_INTERVAL
+            elif next_check_time == float('inf'):
+                return None
             else:
-                # log.debug('开始等待新的主循环')
-                to_sleep: Optional[float] = None
-
-                # 上锁后确保运行状态不会被篡改
-                with self._task_lock:
-                    if not self.is_running:
-                        # 已经被stop_running中断了 不继续
-                        break
-
-                    trigger_time = time.time()
-                    last_trigger_time = self.last_trigger_time.get(normal_handler_id, 0)
-                    past_time = trigger_time - last_trigger_time
-                    if past_time < self.normal_scene_handler.interval_seconds:
-                        to_sleep = self.normal_scene_handler.interval_seconds - past_time
-                    else:
-                        new_task = self.normal_scene_handler.get_operations(trigger_time)
-                        if new_task is not None:
-                            log.debug(f'当前场景 主循环 当前条件 {new_task.expr_display}')
-                            self.running_task = new_task
-                            self.last_trigger_time[normal_handler_id] = trigger_time
-                            self.running_task_cnt.inc()
-                            future = self.running_task.run_async()
-                            future.add_done_callback(self._on_task_done)
-
-                if to_sleep is not None:
-                    # 等待时间不能写在锁里 要尽快释放锁
-                    time.sleep(to_sleep)
-                else:  # 没有命中的状态 或者 提交执行了 那就自旋等待
-                    time.sleep(0.02)
-
-    def _trigger_scene(self, state_name: str) -> None:
+                return max(next_check_time, trigger_time + _NORMAL_SCENE_MIN_CHECK_INTERVAL)
+
+    def _add_trigger(self, state_name: str, event_time: float) -> None:
+        """
+        添加一个等待处理的触发 唤醒调度器处理
+        :param state_name: 触发的状态
+        :param event_time: 状态更新的时间
+        :return:
+        """
+        if not self.is_running or state_name not in self.trigger_scene_handler:
+            return
+        self._pending_trigger_list.append((state_name, event_time))
+        self.scheduler.wake(self._trigger_job)
+
+    def _run_trigger_scene(self, now: float) -> Optional[float]:
+        """
+        按顺序处理等待中的触发 由调度器执行
+        :param now: 当前时间
+        :return: None 等待下一次触发时唤醒
+        """
+        while len(self._pending_trigger_list) > 0:
+            state_name, event_time = self._pending_trigger_list.popleft()
+            self._trigger_scene(state_name, event_time)
+        return None
+
+    def _trigger_scene(self, state_name: str, event_time: Optional[float] = None) -> None:
         """
         触发对应的场景
         :param state_name: 触发的状态
+        :param event_time: 状态更新的时间 用于统计延迟
         :return:
         """
         if state_name not in self.trigger_scene_handler:
@@ -170,9 +249,9 @@ class ConditionalOperator(YamlConfig):
                 # 已经被stop_running中断了 不继续
                 return
 
-            trigger_time: float = time.time()  # 这里不应该使用事件发生时间 而是应该使用当前的实际操作时间
+            trigger_time: float = self.scheduler.now()  # 这里不应该使用事件发生时间 而是应该使用当前的实际操作时间
             last_trigger_time = self.last_trigger_time.get(trigger_handler_id, 0)
-            if trigger_time - last_trigger_time < handler.interval_seconds:  # 冷却时间没过 不触发
+            if trigger_time < last_trigger_time + handler.interval_seconds:  # 冷却时间没过 不触发
                 return
 
             new_task = handler.get_operations(trigger_time)
@@ -202,10 +281,20 @@ class ConditionalOperator(YamlConfig):
             log.debug(f'当前场景 {state_name} 当前条件 {new_task.expr_display}')
 
             new_task.set_trigger(state_name)
+            new_task.event_time = trigger_time if event_time is None else event_time
             self.running_task = new_task
             self.last_trigger_time[trigger_handler_id] = trigger_time
-            future = self.running_task.run_async()
-            future.add_done_callback(self._on_task_done)
+            self._run_task(new_task)
+
+    def _run_task(self, task: OperationTask) -> None:
+        """
+        开始执行任务 调用这个函数的地方都使用了 self._task_lock 锁
+        :param task: 任务
+        :return:
+        """
+        future = task.run_async()
+        future.add_done_callback(self._on_task_done)
+        future.add_done_callback(lambda _: self._record_latency(task))
 
     def stop_running(self) -> None:
         """
@@ -216,6 +305,10 @@ class ConditionalOperator(YamlConfig):
         with self._task_lock:
             self.is_running = False
             self._stop_running_task()
+        self.scheduler.stop()
+        self._pending_trigger_list.clear()
+        for scene, latency in self.get_scene_latency().items():
+            log.debug(f'场景 {scene} 调度延迟 {latency}')
 
     def _stop_running_task(self) -> None:
         """
@@ -229,6 +322,7 @@ class ConditionalOperator(YamlConfig):
                 # 如果 finish=True 则计数器已经在 _on_task_done 减少了 这里就不减了
                 # 如果 finish=False 则代表还有操作在继续。在这里要减少计数器而不是等_on_task_done 让无触发器场景尽早运行
                 self.running_task_cnt.dec()
+                self.scheduler.wake(self._normal_scene_job)
 
     def _on_task_done(self, future: Future) -> None:
         """
@@ -240,9 +334,38 @@ class ConditionalOperator(YamlConfig):
                 if result:  # 顺利执行完毕
                     self.running_task_cnt.dec()
                     self.running_task.priority = None
+                    self.scheduler.wake(self._normal_scene_job)
             except Exception:  # run_async里有callback打印日志
                 pass
 
+    def _record_latency(self, task: OperationTask) -> None:
+        """
+        任务结束后 记录场景从触发到第一个指令执行的延迟
+        :param task: 任务
+        :return:
+        """
+        latency = task.latency
+        if latency is None:  # 第一个指令执行前就被打断了
+            return
+        scene = task.trigger_display
+        recorder = self.scene_latency.get(scene)
+        if recorder is None:
+            recorder = OperationLatencyRecorder()
+            self.scene_latency[scene] = recorder
+        recorder.record(latency)
+
+    def get_scene_latency(self) -> dict[str, OperationLatency]:
+        """
+        获取各场景的延迟统计
+        :return: key=场景 触发状态或主循环
+        """
+        result: dict[str, OperationLatency] = {}
+        for scene, recorder in list(self.scene_latency.items()):
+            latency = recorder.get_latency()
+            if latency is not None:
+                result[scene] = latency
+        return result
+
     def get_usage_states(self) -> set[str]:
         """
         获取使用的状态 需要init之后使用
@@ -270,15 +393,17 @@ class ConditionalOperator(YamlConfig):
         :param state_record: 状态记录
         :return:
         """
+        if self.state_record_listener is not None:
+            self.state_record_listener([state_record])
+
         # 先统一更新状态值
         state_recorder = self._update_state_recorder(state_record)
         if state_recorder is None:
             return
 
-        # 再去触发具体的场景 由自己的线程处理
+        # 再去触发具体的场景 由调度线程处理
         if not state_record.is_clear:
-            future: Future = _od_conditional_op_executor.submit(self._trigger_scene, state_recorder.state_name)
-            future.add_done_callback(thread_utils.handle_future_result)
+            self._add_trigger(state_recorder.state_name, self.scheduler.now())
 
     def batch_update_states(self, state_records: List[StateRecord]) -> None:
         """
@@ -290,6 +415,10 @@ class ConditionalOperator(YamlConfig):
         :param state_records: 状态记录列表
         :return:
         """
+        if self.state_record_listener is not None:
+            self.state_record_listener(state_records)
+
+        event_time = self.scheduler.now()
         top_priority_handler: Optional[SceneHandler] = None
         top_priority_state: Optional[str] = None
 
@@ -320,17 +449,16 @@ class ConditionalOperator(YamlConfig):
                 top_priority_handler = handler
                 top_priority_state = state_name
 
-        # 触发具体的场景 由自己的线程处理
+        # 触发具体的场景 由调度线程处理
         if top_priority_state is not None:
-            future: Future = _od_conditional_op_executor.submit(self._trigger_scene, top_priority_state)
-            future.add_done_callback(thread_utils.handle_future_result)
+            self._add_trigger(top_priority_state, event_time)
         else:
             # 没有场景需要触发 看是否需要打断当前操作
             with self._task_lock:
                 interrupt: bool = False
                 if (self.running_task is not None and self.running_task.running
                         and self.running_task.interrupt_cal_tree is not None):
-                    now = time.time()
+                    now = self.scheduler.now()
                     if self.running_task.interrupt_cal_tree.in_time_range(now):
                         interrupt = True
                         log.debug('复合中断条件满足，执行中断')
@@ -349,13 +477,16 @@ class ConditionalOperator(YamlConfig):
 
         if new_record.is_clear:
             recorder.clear_state_record()
+            self._on_state_recorder_updated(recorder)
         else:
             recorder.update_state_record(new_record)
+            self._on_state_recorder_updated(recorder)
             if recorder.mutex_list is not None:
                 for mutex_state in recorder.mutex_list:
                     mutex_recorder = self.get_state_recorder(mutex_state)
                     if mutex_recorder is None:
                         continue
                     mutex_recorder.clear_state_record()
+                    self._on_state_recorder_updated(mutex_recorder)
 
         return recorder
@@ -0,0 +1,54 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass
+class OperationLatency:
+    """延迟统计 单位毫秒 如场景从触发到第一个指令开始执行的延迟"""
+    times: int  # 累计次数
+    mean: float
+    p50: float
+    p95: float
+    max: float
+
+    def __str__(self) -> str:
+        return f'次数 {self.times} 平均 {self.mean:.1f}ms p50 {self.p50:.1f}ms p95 {self.p95:.1f}ms 最大 {self.max:.1f}ms'
+
+
+class OperationLatencyRecorder:
+
+    def __init__(self, max_size: int = 200):
+        """
+        记录一个场景最近的调度延迟
+        :param max_size: 保留最近多少次 用于计算分位数
+        """
+        self.times: int = 0
+        self._latency_list: deque[float] = deque(maxlen=max_size)
+
+    def record(self, latency: float) -> None:
+        """
+        记录一次延迟
+        :param latency: 延迟 秒
+        :return:
+        """
+        self.times += 1
+        self._latency_list.append(latency)
+
+    def get_latency(self) -> Optional[OperationLatency]:
+        """
+        :return: 最近的延迟统计 没有记录时返回None
+        """
+        latency_list = list(self._latency_list)
+        if len(latency_list) == 0:
+            return None
+        arr = np.array(latency_list, dtype=np.float64) * 1000
+        return OperationLatency(
+            times=self.times,
+            mean=float(arr.mean()),
+            p50=float(np.percentile(arr, 50)),
+            p95=float(np.percentile(arr, 95)),
+            max=float(arr.max()),
+        )
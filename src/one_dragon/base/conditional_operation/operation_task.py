@@ -1,3 +1,4 @@
+import time
 from concurrent.futures import ThreadPoolExecutor, Future
 
 from threading import Lock
@@ -32,6 +33,18 @@ class OperationTask:
         self.expr_list: List[str] = []  # 用于界面显示
         self.debug_name_list: List[str] = []  # 用于调试显示，存储yml中的debug_name
 
+        self.event_time: Optional[float] = None  # 触发这个任务的时间 用于统计延迟
+        self.first_op_time: Optional[float] = None  # 第一个指令开始执行的时间
+
+    @property
+    def latency(self) -> Optional[float]:
+        """
+        :return: 从触发到第一个指令开始执行的延迟 秒 未执行时返回None
+        """
+        if self.event_time is None or self.first_op_time is None:
+            return None
+        return self.first_op_time - self.event_time
+
     @property
     def debug_name_display(self) -> str:
         # 创建一个新的列表，处理空元素
@@ -51,6 +64,7 @@ class OperationTask:
     def _run(self) -> bool:
         """
         执行
+        指令直接在当前线程执行 不再额外提交到线程池等待
         :return: 是否完成所有指令了
         """
         for idx in range(len(self.op_list)):
@@ -58,14 +72,15 @@ class OperationTask:
                 if not self.running:
                     # 被stop中断了 不继续后续的操作
                     break
-                self._current_op = self.op_list[idx]
-                if self._current_op.async_op:
-                    self._async_ops.append(self._current_op)
-                future: Future = _od_op_task_executor.submit(self._current_op.execute)
-                future.add_done_callback(thread_utils.handle_future_result)
+                op = self.op_list[idx]
+                self._current_op = op
+                if op.async_op:
+                    self._async_ops.append(op)
 
+            if self.first_op_time is None:
+                self.first_op_time = time.time()
             try:
-                future.result()
+                op.execute()
             except Exception:
                 log.error('指令执行出错', exc_info=True)
 
@@ -1,7 +1,9 @@
-from typing import List, Optional
+import math
+from typing import List, Optional, Tuple
 
 from one_dragon.base.conditional_operation.operation_task import OperationTask
 from one_dragon.base.conditional_operation.state_handler import StateHandler
+from one_dragon.base.conditional_operation.state_recorder import StateRecorder
 
 
 class SceneHandler:
@@ -11,19 +13,103 @@ class SceneHandler:
         self.state_handlers: List[StateHandler] = state_handlers
         self.priority: Optional[int] = priority  # 优先级 只能被高等级的打断；为None时可以被随意打断
 
+        # 状态依赖索引 调用 init_state_index 后启用
+        self._recorder_2_handler_idx: Optional[dict[int, List[int]]] = None  # key=状态记录器id value=依赖这个状态的处理器下标
+        self._handler_version: List[int] = []  # 各处理器依赖的状态 累计更新次数
+        self._handler_unmatched_cache: List[Optional[Tuple[int, float, float]]] = []  # 各处理器不满足条件的缓存 (更新次数, 计算时间, 有效期)
+        self._next_check_time: Optional[float] = None  # 上一次没有符合条件的指令时 结果可能改变的最早时间
+
+    def init_state_index(self) -> None:
+        """
+        按状态处理器依赖的状态建立索引
+        启用后 状态有更新时需要调用 on_state_updated
+        判断不满足条件的状态处理器 在依赖的状态更新前、结果有效期内 不再重新计算
+        :return:
+        """
+        self._recorder_2_handler_idx = {}
+        for idx, sh in enumerate(self.state_handlers):
+            for recorder in sh.state_cal_tree.get_usage_state_recorders():
+                recorder_id = id(recorder)
+                if recorder_id not in self._recorder_2_handler_idx:
+                    self._recorder_2_handler_idx[recorder_id] = []
+                self._recorder_2_handler_idx[recorder_id].append(idx)
+
+        self._handler_version = [0] * len(self.state_handlers)
+        self._handler_unmatched_cache = [None] * len(self.state_handlers)
+
+    def on_state_updated(self, recorder: StateRecorder) -> None:
+        """
+        状态更新后 让依赖这个状态的处理器缓存失效
+        需要在状态记录器更新之后调用
+        :param recorder: 更新了的状态记录器
+        :return:
+        """
+        if self._recorder_2_handler_idx is None:
+            return
+        for idx in self._recorder_2_handler_idx.get(id(recorder), []):
+            self._handler_version[idx] += 1
+
+    def _is_handler_matched(self, idx: int, trigger_time: float) -> bool:
+        """
+        使用状态依赖索引 判断状态处理器的条件是否满足
+        :param idx: 处理器下标
+        :param trigger_time: 触发时间
+        :return:
+        """
+        version = self._handler_version[idx]
+        cache = self._handler_unmatched_cache[idx]
+        if cache is not None and cache[0] == version and cache[1] <= trigger_time < cache[2]:
+            return False
+
+        matched, expire = self.state_handlers[idx].state_cal_tree.in_time_range_with_expire(trigger_time)
+        if matched:
+            return True
+
+        # 记录计算前的更新次数 计算期间有状态更新时 缓存会直接失效
+        self._handler_unmatched_cache[idx] = (version, trigger_time, expire)
+        return False
+
     def get_operations(self, trigger_time: float) -> Optional[OperationTask]:
         """
         根据触发时间 和优先级 获取符合条件的场景下的指令
         :param trigger_time: 触发时间
         :return:
         """
-        for sh in self.state_handlers:
+        use_index = self._recorder_2_handler_idx is not None
+        next_check_time: Optional[float] = math.inf if use_index else None
+        for idx, sh in enumerate(self.state_handlers):
+            if use_index and not self._is_handler_matched(idx, trigger_time):
+                if next_check_time is not None:
+                    next_check_time = min(next_check_time, self._handler_unmatched_cache[idx][2])
+                continue
             task = sh.get_operations(trigger_time)
             if task is not None:
                 task.set_priority(self.priority)
                 return task
+            next_check_time = None  # 条件满足但子处理器都不满足 无法知道结果什么时候改变
+        self._next_check_time = next_check_time
         return None
 
+    def get_next_check_time(self) -> Optional[float]:
+        """
+        需要在 get_operations 没有返回指令后使用
+        在依赖的状态没有更新的情况下 结果可能改变的最早时间
+        :return: 最早时间 inf代表只有状态更新才会改变 None代表无法得知
+        """
+        return self._next_check_time
+
+    def get_usage_state_recorders(self) -> List[StateRecorder]:
+        """
+        获取各状态处理器判断条件中 使用的状态记录器 不重复
+        :return:
+        """
+        recorders: List[StateRecorder] = []
+        for sh in self.state_handlers:
+            for recorder in sh.state_cal_tree.get_usage_state_recorders():
+                if all(i is not recorder for i in recorders):
+                    recorders.append(recorder)
+        return recorders
+
     def get_usage_states(self) -> set[str]:
         """
         获取使用的状态
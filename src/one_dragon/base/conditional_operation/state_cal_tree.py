@@ -1,5 +1,6 @@
+import math
 from enum import Enum
-from typing import Optional, Callable
+from typing import Optional, Callable, Tuple, List
 
 from one_dragon.base.conditional_operation.state_recorder import StateRecorder
 from one_dragon.utils.log_utils import log
@@ -19,6 +20,10 @@ class StateCalOpType(Enum):
     NOT: int = 2
 
 
+# 计算结果的有效期 提前这么多秒失效 避免浮点误差导致有效期内的结果与实际计算不一致
+_EXPIRE_MARGIN: float = 1e-3
+
+
 class StateCalNode:
 
     def __init__(self, node_type: StateCalNodeType,
@@ -57,44 +62,30 @@ class StateCalNode:
         self.state_value_range_min: int = state_value_range_min
         self.state_value_range_max: int = state_value_range_max
 
+        self._cal_func: Optional[Callable[[float], bool]] = None  # 编译后的判断函数
+        self._cal_expire_func: Optional[Callable[[float], Tuple[bool, float]]] = None  # 编译后的带有效期判断函数
+
     def in_time_range(self, now: float) -> bool:
         """
         根据当前时间 判断是否在状态的生效时间范围内
+        第一次调用时 将整棵树编译成闭包 之后直接调用
         :param now: 当前时间
         :return:
         """
-        if self.node_type == StateCalNodeType.OP:
-            if self.op_type == StateCalOpType.AND:
-                return self.left_child.in_time_range(now) and self.right_child.in_time_range(now)
-            elif self.op_type == StateCalOpType.OR:
-                return self.left_child.in_time_range(now) or self.right_child.in_time_range(now)
-            elif self.op_type == StateCalOpType.NOT:
-                return not self.left_child.in_time_range(now)
-        elif self.node_type == StateCalNodeType.STATE:
-            diff = now - self.state_recorder.last_record_time
-            # log.debug('状态 [ %s ] 距离上次 %.2f, 要求区间 [%.2f, %.2f]' % (
-            #     self.state_recorder.state_name,
-            #     999 if diff > 999 else diff,
-            #     self.state_time_range_min,
-            #     self.state_time_range_max
-            # ))
-            time_valid = self.state_time_range_min <= diff <= self.state_time_range_max
-            value_valid = True
-            if self.state_value_range_min is not None and self.state_value_range_max is not None:
-                # log.debug('状态 [ %s ] 当前值 %s, 值要求区间 [%d, %d]' % (
-                #     self.state_recorder.state_name,
-                #     self.state_recorder.last_value,
-                #     self.state_value_range_min,
-                #     self.state_value_range_max
-                # ))
-                if self.state_recorder.last_value is None:
-                    value_valid = False
-                else:
-                    value_valid = self.state_value_range_min <= self.state_recorder.last_value <= self.state_value_range_max
-
-            return time_valid and value_valid
-        elif self.node_type == StateCalNodeType.TRUE:
-            return True
+        if self._cal_func is None:
+            self._cal_func = _compile_cal_func(self)
+        return self._cal_func(now)
+
+    def in_time_range_with_expire(self, now: float) -> Tuple[bool, float]:
+        """
+        根据当前时间 判断是否在状态的生效时间范围内 同时返回结果的有效期
+        在有效期前 只要使用的状态没有更新 结果就不会改变
+        :param now: 当前时间
+        :return: (是否在范围内, 有效期)
+        """
+        if self._cal_expire_func is None:
+            self._cal_expire_func = _compile_cal_expire_func(self)
+        return self._cal_expire_func(now)
 
     def get_usage_states(self) -> set[str]:
         """
@@ -110,6 +101,23 @@ class StateCalNode:
             states = states.union(self.right_child.get_usage_states())
         return states
 
+    def get_usage_state_recorders(self) -> List[StateRecorder]:
+        """
+        获取使用的状态记录器 不重复
+        :return:
+        """
+        recorders: List[StateRecorder] = []
+        stack: List[StateCalNode] = [self]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.state_recorder is not None and all(i is not node.state_recorder for i in recorders):
+                recorders.append(node.state_recorder)
+            if node.right_child is not None:
+                stack.append(node.right_child)
+            if node.left_child is not None:
+                stack.append(node.left_child)
+        return recorders
+
     def dispose(self) -> None:
         """
         销毁时 将子节点都销毁了
@@ -125,6 +133,151 @@ class StateCalNode:
             self.state_recorder.dispose()
 
 
+def _get_op_operands(node: StateCalNode, op_type: StateCalOpType) -> List[StateCalNode]:
+    """
+    将连续的同类运算符展开 例如 a & (b & c) 展开为 [a, b, c] 保持从左到右的计算顺序
+    :param node: 节点
+    :param op_type: 运算符 只能是AND或OR
+    :return:
+    """
+    if node.node_type == StateCalNodeType.OP and node.op_type == op_type:
+        return _get_op_operands(node.left_child, op_type) + _get_op_operands(node.right_child, op_type)
+    else:
+        return [node]
+
+
+def _compile_cal_func(node: StateCalNode) -> Callable[[float], bool]:
+    """
+    将状态判断树编译成闭包 计算时不再需要判断节点类型
+    连续的同类运算符会展开成一层 并保留短路计算
+    :param node: 根节点
+    :return: 判断函数 入参为当前时间
+    """
+    if node.node_type == StateCalNodeType.OP:
+        if node.op_type == StateCalOpType.NOT:
+            child_func = _compile_cal_func(node.left_child)
+            return lambda now: not child_func(now)
+
+        func_list = tuple(_compile_cal_func(i) for i in _get_op_operands(node, node.op_type))
+        if node.op_type == StateCalOpType.AND:
+            if len(func_list) == 2:
+                left_func, right_func = func_list
+                return lambda now: left_func(now) and right_func(now)
+
+            def _cal_and(now: float) -> bool:
+                for func in func_list:
+                    if not func(now):
+                        return False
+                return True
+
+            return _cal_and
+        else:
+            if len(func_list) == 2:
+                left_func, right_func = func_list
+                return lambda now: left_func(now) or right_func(now)
+
+            def _cal_or(now: float) -> bool:
+                for func in func_list:
+                    if func(now):
+                        return True
+                return False
+
+            return _cal_or
+    elif node.node_type == StateCalNodeType.STATE:
+        recorder = node.state_recorder
+        time_min = node.state_time_range_min
+        time_max = node.state_time_range_max
+        if node.state_value_range_min is None or node.state_value_range_max is None:
+            return lambda now: time_min <= now - recorder.last_record_time <= time_max
+
+        value_min = node.state_value_range_min
+        value_max = node.state_value_range_max
+
+        def _cal_state(now: float) -> bool:
+            if not time_min <= now - recorder.last_record_time <= time_max:
+                return False
+            value = recorder.last_value
+            return value is not None and value_min <= value <= value_max
+
+        return _cal_state
+    else:
+        return lambda now: True
+
+
+def _compile_cal_expire_func(node: StateCalNode) -> Callable[[float], Tuple[bool, float]]:
+    """
+    将状态判断树编译成闭包 计算结果的同时 计算结果的有效期
+    状态没有更新时 只有时间会变化 时间区间的边界就是结果可能改变的时间点
+    :param node: 根节点
+    :return: 判断函数 入参为当前时间 返回 (是否在范围内, 有效期)
+    """
+    if node.node_type == StateCalNodeType.OP:
+        if node.op_type == StateCalOpType.NOT:
+            child_func = _compile_cal_expire_func(node.left_child)
+
+            def _cal_not(now: float) -> Tuple[bool, float]:
+                result, expire = child_func(now)
+                return not result, expire
+
+            return _cal_not
+
+        func_list = tuple(_compile_cal_expire_func(i) for i in _get_op_operands(node, node.op_type))
+        if node.op_type == StateCalOpType.AND:
+            def _cal_and(now: float) -> Tuple[bool, float]:
+                expire = math.inf
+                for func in func_list:
+                    result, func_expire = func(now)
+                    if not result:  # 这个条件不满足期间 结果都不满足
+                        return False, func_expire
+                    if func_expire < expire:
+                        expire = func_expire
+                return True, expire
+
+            return _cal_and
+        else:
+            def _cal_or(now: float) -> Tuple[bool, float]:
+                expire = math.inf
+                for func in func_list:
+                    result, func_expire = func(now)
+                    if result:  # 这个条件满足期间 结果都满足
+                        return True, func_expire
+                    if func_expire < expire:
+                        expire = func_expire
+                return False, expire
+
+            return _cal_or
+    elif node.node_type == StateCalNodeType.STATE:
+        recorder = node.state_recorder
+        time_min = node.state_time_range_min
+        time_max = node.state_time_range_max
+        check_value = node.state_value_range_min is not None and node.state_value_range_max is not None
+        value_min = node.state_value_range_min
+        value_max = node.state_value_range_max
+
+        def _cal_state(now: float) -> Tuple[bool, float]:
+            last_record_time = recorder.last_record_time
+            diff = now - last_record_time
+            if diff < time_min:  # 还没到区间 到区间开始时改变
+                time_valid = False
+                expire = last_record_time + time_min - _EXPIRE_MARGIN
+            elif diff <= time_max:  # 在区间内 超过区间结束时改变
+                time_valid = True
+                expire = last_record_time + time_max - _EXPIRE_MARGIN
+            else:  # 已经超过区间 不会再改变
+                return False, math.inf
+
+            if check_value:
+                value = recorder.last_value
+                if value is None or not value_min <= value <= value_max:
+                    return False, math.inf
+
+            return time_valid, expire
+
+        return _cal_state
+    else:
+        return lambda now: (True, math.inf)
+
+
 def construct_state_cal_tree(expr_str: str, state_getter: Callable[[str], StateRecorder], debugname: Optional[str] = None) -> StateCalNode:
     """
     根据表达式 构造出状态判断树
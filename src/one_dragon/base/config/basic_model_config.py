@@ -3,6 +3,7 @@ from one_dragon.base.config.yaml_config import YamlConfig
 from one_dragon.base.matcher.ocr.onnx_ocr_matcher import DEFAULT_OCR_MODEL_NAME, get_ocr_model_dir, \
     get_ocr_download_url_github, get_ocr_download_url_gitee, get_final_file_list
 from one_dragon.base.web.common_downloader import CommonDownloaderParam
+from one_dragon.yolo.onnx_model_loader import OnnxSessionConfig
 
 
 class BasicModelConfig(YamlConfig):
@@ -26,6 +27,51 @@ class BasicModelConfig(YamlConfig):
     def ocr_gpu(self, new_value: bool) -> None:
         self.update('ocr_gpu', new_value)
 
+    @property
+    def onnx_intra_op_num_threads(self) -> int:
+        return self.get('onnx_intra_op_num_threads', 0)
+
+    @onnx_intra_op_num_threads.setter
+    def onnx_intra_op_num_threads(self, new_value: int) -> None:
+        self.update('onnx_intra_op_num_threads', new_value)
+
+    @property
+    def onnx_inter_op_num_threads(self) -> int:
+        return self.get('onnx_inter_op_num_threads', 0)
+
+    @onnx_inter_op_num_threads.setter
+    def onnx_inter_op_num_threads(self, new_value: int) -> None:
+        self.update('onnx_inter_op_num_threads', new_value)
+
+    @property
+    def onnx_graph_optimization_level(self) -> str:
+        return self.get('onnx_graph_optimization_level', 'all')
+
+    @onnx_graph_optimization_level.setter
+    def onnx_graph_optimization_level(self, new_value: str) -> None:
+        self.update('onnx_graph_optimization_level', new_value)
+
+    @property
+    def onnx_use_io_binding(self) -> bool:
+        return self.get('onnx_use_io_binding', True)
+
+    @onnx_use_io_binding.setter
+    def onnx_use_io_binding(self, new_value: bool) -> None:
+        self.update('onnx_use_io_binding', new_value)
+
+    @property
+    def onnx_session_config(self) -> OnnxSessionConfig:
+        """
+        YOLO模型使用的 onnxruntime 会话配置 重新加载模型时生效
+        :return:
+        """
+        return OnnxSessionConfig(
+            intra_op_num_threads=self.onnx_intra_op_num_threads,
+            inter_op_num_threads=self.onnx_inter_op_num_threads,
+            graph_optimization_level=self.onnx_graph_optimization_level,
+            use_io_binding=self.onnx_use_io_binding,
+        )
+
     def using_old_model(self) -> bool:
         """
         是否在使用旧模型
@@ -1,12 +1,34 @@
+import atexit
+import hashlib
 import os
+import pickle
 import sys
-from typing import Optional
+import threading
+from typing import Any, Optional, Tuple
 
 import yaml
 
 from one_dragon.utils.log_utils import log
 
-cached_yaml_data: dict[str, tuple[float, dict]] = {}
+# 有 libyaml 时使用C实现 解析和输出的结果与纯Python实现一致
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_YAML_DUMPER = getattr(yaml, 'CDumper', yaml.Dumper)
+
+# key=文件路径 value=(文件版本, 数据)
+cached_yaml_data: dict[str, tuple[Tuple[int, int], dict]] = {}
+
+# 解析结果的磁盘缓存目录 None 时不使用
+_disk_cache_dir: Optional[str] = None
+_DISK_CACHE_VERSION: int = 1  # 缓存格式的版本 格式变化时修改
+
+# 延迟保存 update 时只标记需要保存 由定时器或 flush_all 统一写入 None 时立即保存
+_write_behind_delay: Optional[float] = None
+_dirty_operator_map: dict[int, 'YamlOperator'] = {}  # key=id(operator) 等待保存的配置
+_dirty_lock = threading.Lock()
+_flush_timer: Optional[threading.Timer] = None
+
+# 修改数据和写入文件时使用 同一份数据可能被多个配置对象共用 保证写入的是完整的数据
+_save_lock = threading.RLock()
 
 
 def get_temp_config_path(file_path: str) -> str:
@@ -20,25 +42,187 @@ def get_temp_config_path(file_path: str) -> str:
             return mei_path
     return file_path
 
+
+def enable_disk_cache(cache_dir: Optional[str]) -> None:
+    """
+    开启yml解析结果的磁盘缓存 文件没有变化时直接读取上次解析的结果 减少启动时的解析耗时
+    :param cache_dir: 缓存目录 None 时关闭
+    """
+    global _disk_cache_dir
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    _disk_cache_dir = cache_dir
+
+
+def _get_file_version(file_path: str) -> Tuple[int, int]:
+    """
+    文件的版本 修改时间和大小
+    """
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _get_disk_cache_path(file_path: str) -> str:
+    key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+    return os.path.join(_disk_cache_dir, f'{key}.pkl')
+
+
+def _read_disk_cache(file_path: str, version: Tuple[int, int]) -> Tuple[bool, Any]:
+    """
+    读取磁盘缓存
+    :param file_path: yml文件路径
+    :param version: yml文件的版本
+    :return: 是否命中 缓存的数据
+    """
+    if _disk_cache_dir is None:
+        return False, None
+    cache_path = _get_disk_cache_path(file_path)
+    if not os.path.exists(cache_path):
+        return False, None
+    try:
+        with open(cache_path, 'rb') as file:
+            cache_version, cache_file_path, cache_file_version, data = pickle.load(file)
+    except Exception:
+        log.debug(f'yml缓存读取失败 {cache_path}', exc_info=True)
+        return False, None
+
+    if (cache_version != _DISK_CACHE_VERSION
+            or cache_file_path != os.path.abspath(file_path)
+            or tuple(cache_file_version) != version):
+        return False, None
+    return True, data
+
+
+def _write_disk_cache(file_path: str, version: Tuple[int, int], data: Any) -> None:
+    """
+    写入磁盘缓存 先写临时文件再替换 避免写入一半的缓存被读取
+    :param file_path: yml文件路径
+    :param version: yml文件的版本
+    :param data: 解析后的数据
+    """
+    if _disk_cache_dir is None:
+        return
+    cache_path = _get_disk_cache_path(file_path)
+    temp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'wb') as file:
+            pickle.dump((_DISK_CACHE_VERSION, os.path.abspath(file_path), version, data),
+                        file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except Exception:
+        log.debug(f'yml缓存写入失败 {cache_path}', exc_info=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def enable_write_behind(delay: Optional[float]) -> None:
+    """
+    开启延迟保存 update 后等待一段时间再写入文件 期间的多次修改合并为一次写入
+    :param delay: 等待的秒数 None 时关闭 并立刻保存等待中的配置
+    """
+    global _write_behind_delay
+    _write_behind_delay = delay
+    if delay is None:
+        flush_all()
+
+
+def _mark_dirty(operator: 'YamlOperator') -> None:
+    """
+    标记配置需要保存 没有等待中的定时器时启动一个
+    """
+    global _flush_timer
+    with _dirty_lock:
+        _dirty_operator_map[id(operator)] = operator
+        if _flush_timer is None:
+            _flush_timer = threading.Timer(_write_behind_delay, flush_all)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+
+def _discard_dirty(operator: 'YamlOperator') -> None:
+    with _dirty_lock:
+        _dirty_operator_map.pop(id(operator), None)
+
+
+def _flush_file(file_path: str) -> None:
+    """
+    保存同一个文件等待中的配置 读取文件前调用 避免读到旧内容后覆盖等待中的修改
+    :param file_path: 文件路径
+    """
+    with _dirty_lock:
+        operator_list = [i for i in _dirty_operator_map.values() if i.file_path == file_path]
+    for operator in operator_list:
+        try:
+            operator.save()
+        except Exception:
+            log.error(f'保存配置失败 {operator.file_path}', exc_info=True)
+
+
+def flush_all() -> None:
+    """
+    保存所有等待中的配置 在操作结束和程序退出时调用
+    """
+    global _flush_timer
+    with _dirty_lock:
+        operator_list = list(_dirty_operator_map.values())
+        _dirty_operator_map.clear()
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+
+    for operator in operator_list:
+        try:
+            operator.save()
+        except Exception:
+            log.error(f'保存配置失败 {operator.file_path}', exc_info=True)
+
+
+atexit.register(flush_all)
+
+
+def _write_file_atomic(file_path: str, text: str) -> None:
+    """
+    先写入同目录下的临时文件 再替换原文件 避免程序中断时留下写了一半的文件
+    :param file_path: 文件路径
+    :param text: 文件内容
+    """
+    temp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, file_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
 def read_cache_or_load(file_path: str):
+    version = _get_file_version(file_path)
     cached = cached_yaml_data.get(file_path)
-    last_modify = os.path.getmtime(file_path)
-    if cached is not None and cached[0] == last_modify:
+    if cached is not None and cached[0] == version:
         return cached[1]
 
-    with open(file_path, 'r', encoding='utf-8') as file:
-        log.debug(f"加载yaml: {file_path}")
-        data = yaml.safe_load(file)
-        cached_yaml_data[file_path] = (last_modify, data)
-        return data
+    hit, data = _read_disk_cache(file_path, version)
+    if not hit:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            log.debug(f"加载yaml: {file_path}")
+            data = yaml.load(file, Loader=_YAML_LOADER)
+        _write_disk_cache(file_path, version, data)
+
+    cached_yaml_data[file_path] = (version, data)
+    return data
 
 
 class YamlOperator:
 
-    def __init__(self, file_path: Optional[str] = None):
+    def __init__(self, file_path: Optional[str] = None, data: Optional[dict] = None):
         """
         yml文件的操作器
         :param file_path: yml文件的路径。不传入时认为是mock，用于测试。
+        :param data: 已经读取好的数据 传入时不再读取文件
         """
 
         self.file_path: str = get_temp_config_path(file_path) if file_path else None
@@ -47,7 +231,10 @@ class YamlOperator:
         self.data: dict = {}
         """存放数据的地方"""
 
-        self.__read_from_file()
+        if data is None:
+            self.__read_from_file()
+        else:
+            self.data = data
 
     def __read_from_file(self) -> None:
         """
@@ -56,6 +243,7 @@ class YamlOperator:
         """
         if self.file_path is None:
             return
+        _flush_file(self.file_path)
         if not os.path.exists(self.file_path):
             return
 
@@ -72,8 +260,10 @@ class YamlOperator:
         if self.file_path is None:
             return
 
-        with open(self.file_path, 'w', encoding='utf-8') as file:
-            yaml.dump(self.data, file, allow_unicode=True, sort_keys=False)
+        _discard_dirty(self)
+        with _save_lock:
+            text = yaml.dump(self.data, allow_unicode=True, sort_keys=False, Dumper=_YAML_DUMPER)
+            _write_file_atomic(self.file_path, text)
 
     def save_diy(self, text: str):
         """
@@ -84,26 +274,38 @@ class YamlOperator:
         if self.file_path is None:
             return
 
-        with open(self.file_path, "w", encoding="utf-8") as file:
-            file.write(text)
+        _discard_dirty(self)
+        with _save_lock:
+            _write_file_atomic(self.file_path, text)
 
     def get(self, prop: str, value=None):
         return self.data.get(prop, value)
 
     def update(self, key: str, value, save: bool = True):
-        if self.data is None:
-            self.data = {}
-        if key in self.data and not isinstance(value, list) and self.data[key] == value:
-            return
-        self.data[key] = value
+        """
+        更新一个值
+        :param key: 键
+        :param value: 值
+        :param save: 是否保存 开启延迟保存时只标记 稍后统一写入
+        """
+        with _save_lock:
+            if self.data is None:
+                self.data = {}
+            if key in self.data and not isinstance(value, list) and self.data[key] == value:
+                return
+            self.data[key] = value
         if save:
-            self.save()
+            if _write_behind_delay is None or self.file_path is None:
+                self.save()
+            else:
+                _mark_dirty(self)
 
     def delete(self):
         """
         删除配置文件
         :return:
         """
+        _discard_dirty(self)
         if os.path.exists(self.file_path):
             os.remove(self.file_path)
 
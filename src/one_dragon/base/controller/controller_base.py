@@ -1,8 +1,10 @@
 import time
 
+import numpy as np
 from cv2.typing import MatLike
-from typing import List
+from typing import List, Optional
 
+from one_dragon.base.controller.frame_change_detector import FrameChangeDetector
 from one_dragon.base.geometry.point import Point
 
 
@@ -24,6 +26,7 @@ class ControllerBase:
         self.screenshot_history: List[ScreenshotWithTime] = []
         self.screenshot_alive_seconds: float = screenshot_alive_seconds  # 截图在内存的存活时间
         self.max_screenshot_cnt: int = max_screenshot_cnt  # 内存中最多保持的截图数量
+        self.frame_change_detector: FrameChangeDetector = FrameChangeDetector()  # 截图变化检测
 
     def init_before_context_run(self) -> bool:
         """
@@ -60,6 +63,7 @@ class ControllerBase:
         if screen is None:
             return screenshot_time, None
         fix_screen = self.fill_uid_black(screen)
+        self.frame_change_detector.update(fix_screen)
 
         if self.max_screenshot_cnt > 0:
             self.screenshot_history.append(ScreenshotWithTime(fix_screen, screenshot_time))
@@ -72,6 +76,20 @@ class ControllerBase:
 
         return screenshot_time, fix_screen
 
+    @property
+    def frame_changed(self) -> bool:
+        """
+        最新一次截图相比上一次是否有变化
+        """
+        return self.frame_change_detector.frame_changed
+
+    @property
+    def frame_dirty_mask(self) -> Optional[np.ndarray]:
+        """
+        最新一次截图中 每一块画面是否有变化
+        """
+        return self.frame_change_detector.dirty_mask
+
     def before_screenshot(self) -> None:
         """
         截图前的操作 由子类实现
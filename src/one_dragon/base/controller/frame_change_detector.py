@@ -0,0 +1,134 @@
+import itertools
+import threading
+from typing import Optional
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.base.geometry.rectangle import Rect
+
+# 所有检测器共用的版本号 更换控制器后旧版本号也不会和新的重复
+_frame_version_counter = itertools.count()
+
+
+class FrameChangeDetector:
+
+    def __init__(self, tile_rows: int = 18, tile_cols: int = 32, diff_threshold: int = 0):
+        """
+        截图变化检测
+        将画面划分为若干块 对比相邻两次截图 记录每一块最后一次发生变化时的画面版本
+        只有画面发生变化时版本号才会增加 因此版本号相同的两张截图内容一致
+        :param tile_rows: 纵向划分的块数
+        :param tile_cols: 横向划分的块数
+        :param diff_threshold: 像素差值超过这个值才认为有变化 默认0=任何变化 用于复用识别结果时需要保持为0
+        """
+        self.tile_rows: int = tile_rows
+        self.tile_cols: int = tile_cols
+        self.diff_threshold: int = diff_threshold
+
+        self.last_frame: Optional[MatLike] = None  # 最新一次的截图
+        self.last_version: int = -1  # 最新一次截图的版本
+        self.frame_changed: bool = True  # 最新一次截图相比上一次是否有变化
+        self.dirty_mask: Optional[np.ndarray] = None  # 最新一次截图中 每一块是否有变化
+
+        self._previous_frame: Optional[MatLike] = None  # 上一次的截图
+        self._previous_version: int = -1  # 上一次截图的版本
+        self._tile_version: Optional[np.ndarray] = None  # 每一块最后一次变化时的版本
+        self._lock = threading.Lock()
+
+    def update(self, frame: MatLike) -> bool:
+        """
+        记录一张新的截图
+        :param frame: 截图
+        :return: 是否有变化
+        """
+        with self._lock:
+            prev = self.last_frame
+            if prev is None or prev.shape != frame.shape or prev.dtype != frame.dtype:
+                version = next(_frame_version_counter)
+                dirty_mask = np.ones((self.tile_rows, self.tile_cols), dtype=bool)
+                self._tile_version = np.full((self.tile_rows, self.tile_cols), version, dtype=np.int64)
+            else:
+                diff = cv2.absdiff(prev, frame)
+                if diff.ndim == 3:
+                    diff = diff.reshape(diff.shape[0], -1)
+                if self.diff_threshold > 0:
+                    _, diff = cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_TOZERO)
+
+                if cv2.countNonZero(diff) == 0:
+                    version = self.last_version
+                    dirty_mask = np.zeros((self.tile_rows, self.tile_cols), dtype=bool)
+                else:
+                    version = next(_frame_version_counter)
+                    dirty_mask = self._cal_tile_max(diff, frame.shape[1]) > 0
+                    self._tile_version[dirty_mask] = version
+
+            self._previous_frame = prev
+            self._previous_version = self.last_version
+            self.last_frame = frame
+            self.last_version = version
+            self.frame_changed = bool(dirty_mask.any())
+            self.dirty_mask = dirty_mask
+            return self.frame_changed
+
+    def _cal_tile_max(self, diff: np.ndarray, width: int) -> np.ndarray:
+        """
+        计算每一块中的最大差值 不能整除的部分归入最后一行/列
+        :param diff: 差值图 多通道时已展开为 (h, w*c)
+        :param width: 原图的宽度
+        :return: (tile_rows, tile_cols) 的最大差值
+        """
+        channel = diff.shape[1] // width
+        tile_h = diff.shape[0] // self.tile_rows
+        tile_w = (width // self.tile_cols) * channel
+        main_h = tile_h * self.tile_rows
+        main_w = tile_w * self.tile_cols
+
+        tile_max = diff[:main_h, :main_w].reshape(self.tile_rows, tile_h, self.tile_cols, tile_w).max(axis=(1, 3))
+        if main_h < diff.shape[0]:
+            extra = diff[main_h:, :main_w].reshape(-1, self.tile_cols, tile_w).max(axis=(0, 2))
+            tile_max[-1, :] = np.maximum(tile_max[-1, :], extra)
+        if main_w < diff.shape[1]:
+            extra = diff[:main_h, main_w:].reshape(self.tile_rows, tile_h, -1).max(axis=(1, 2))
+            tile_max[:, -1] = np.maximum(tile_max[:, -1], extra)
+            if main_h < diff.shape[0]:
+                tile_max[-1, -1] = max(tile_max[-1, -1], diff[main_h:, main_w:].max())
+        return tile_max
+
+    def get_version(self, frame: MatLike) -> Optional[int]:
+        """
+        获取截图的版本
+        :param frame: 截图
+        :return: 只有最近两次的截图能获取到版本 其他图片返回None
+        """
+        with self._lock:
+            if frame is self.last_frame:
+                return self.last_version
+            if frame is self._previous_frame:
+                return self._previous_version
+            return None
+
+    def is_rect_unchanged(self, rect: Optional[Rect], since_version: int) -> bool:
+        """
+        区域内的画面 从某个版本之后是否没有变化
+        :param rect: 区域 None 时为整个画面
+        :param since_version: 版本
+        :return: 是否没有变化
+        """
+        with self._lock:
+            if self._tile_version is None or self.last_frame is None:
+                return False
+            if rect is None:
+                return bool((self._tile_version <= since_version).all())
+
+            height, width = self.last_frame.shape[:2]
+            tile_h = height // self.tile_rows
+            tile_w = width // self.tile_cols
+            if tile_h == 0 or tile_w == 0:
+                return False
+            r1 = min(max(rect.y1, 0) // tile_h, self.tile_rows - 1)
+            r2 = min(max(rect.y2 - 1, 0) // tile_h, self.tile_rows - 1)
+            c1 = min(max(rect.x1, 0) // tile_w, self.tile_cols - 1)
+            c2 = min(max(rect.x2 - 1, 0) // tile_w, self.tile_cols - 1)
+            return bool((self._tile_version[r1:r2 + 1, c1:c2 + 1] <= since_version).all())
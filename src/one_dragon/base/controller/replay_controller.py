@@ -0,0 +1,260 @@
+import os
+import re
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.base.controller.controller_base import ControllerBase
+from one_dragon.base.controller.pc_button.pc_button_controller import PcButtonController
+from one_dragon.base.geometry.point import Point
+from one_dragon.utils.log_utils import log
+
+# 调试截图的文件名为 前缀_毫秒时间戳 例如 switch_1700000000000.png
+_FRAME_TIME_PATTERN = re.compile(r'(\d{13})(?=\.\w+$)')
+_IMAGE_SUFFIX = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+
+
+@dataclass
+class ReplayFrame:
+    """回放的一帧截图"""
+    file_name: str  # 目录或压缩包内的文件名
+    record_time: float  # 录制时的时间戳 秒
+
+
+@dataclass
+class ReplayAction:
+    """回放过程中记录下来的操作"""
+    action_time: float  # 操作时间 与截图时间使用同一个时钟
+    frame_idx: int  # 操作时正在使用的截图下标
+    action_name: str  # 操作名称 例如 click tap dodge
+    params: dict[str, Any] = field(default_factory=dict)  # 操作参数
+
+
+class ReplayButtonController(PcButtonController):
+
+    def __init__(self, controller: 'ReplayController'):
+        """
+        回放时使用的按键控制器 只记录按键 不真正发送
+        """
+        PcButtonController.__init__(self)
+        self.controller: ReplayController = controller
+
+    def tap(self, key: str) -> None:
+        self.controller.record_action('tap', key=key)
+
+    def press(self, key: str, press_time: Optional[float] = None) -> None:
+        self.controller.record_action('press', key=key, press_time=press_time)
+
+    def release(self, key: str) -> None:
+        self.controller.record_action('release', key=key)
+
+
+class ReplayController(ControllerBase):
+
+    def __init__(self,
+                 frame_path: str,
+                 real_time: bool = False,
+                 frame_interval: float = 0.1,
+                 standard_width: int = 1920,
+                 standard_height: int = 1080):
+        """
+        回放控制器 使用录制好的截图代替游戏窗口 点击和按键只做记录
+        用于在没有游戏的环境下 测试识别流程的速度和结果
+
+        截图的录制时间从文件名末尾的毫秒时间戳获取 与 debug_utils.save_debug_image 保存的格式一致
+        文件名中没有时间戳时 按文件名排序 使用 frame_interval 作为间隔
+
+        :param frame_path: 截图所在的文件夹 或 zip 压缩包
+        :param real_time: True=按录制时的节奏播放 False=每次截图都取下一帧 尽可能快地播放
+        :param frame_interval: 文件名没有时间戳时 每帧之间的间隔 秒
+        :param standard_width: 截图的标准宽度 尺寸不一致的截图会被缩放
+        :param standard_height: 截图的标准高度
+        """
+        ControllerBase.__init__(self)
+        self.frame_path: str = frame_path
+        self.real_time: bool = real_time
+        self.frame_interval: float = frame_interval
+        self.standard_width: int = standard_width
+        self.standard_height: int = standard_height
+
+        self.game_win = None
+        self.btn_controller: PcButtonController = ReplayButtonController(self)
+
+        self._zip_file: Optional[zipfile.ZipFile] = None
+        self.frame_list: List[ReplayFrame] = self._load_frame_list()
+
+        self.frame_idx: int = -1  # 当前使用的截图下标
+        self.action_list: List[ReplayAction] = []  # 记录下来的操作
+        self._start_time: float = 0  # 开始播放时的真实时间
+        self._action_lock = threading.Lock()
+        self.reset()
+
+    def _load_frame_list(self) -> List[ReplayFrame]:
+        """
+        读取所有截图的文件名和录制时间
+        """
+        if os.path.isdir(self.frame_path):
+            name_list = os.listdir(self.frame_path)
+        elif zipfile.is_zipfile(self.frame_path):
+            self._zip_file = zipfile.ZipFile(self.frame_path)
+            name_list = self._zip_file.namelist()
+        else:
+            log.error('回放截图路径不存在 %s', self.frame_path)
+            return []
+
+        name_list = sorted(i for i in name_list if i.lower().endswith(_IMAGE_SUFFIX))
+        frame_list: List[ReplayFrame] = []
+        for idx, name in enumerate(name_list):
+            match = _FRAME_TIME_PATTERN.search(os.path.basename(name))
+            if match is not None:
+                record_time = int(match.group(1)) / 1000.0
+            else:
+                record_time = idx * self.frame_interval
+            frame_list.append(ReplayFrame(file_name=name, record_time=record_time))
+
+        frame_list.sort(key=lambda i: (i.record_time, i.file_name))
+        return frame_list
+
+    def reset(self) -> None:
+        """
+        回到第一帧 并清空已记录的操作
+        """
+        self.frame_idx = -1
+        self._start_time = time.time()
+        with self._action_lock:
+            self.action_list = []
+
+    def init_before_context_run(self) -> bool:
+        self.reset()
+        return len(self.frame_list) > 0
+
+    @property
+    def is_game_window_ready(self) -> bool:
+        return len(self.frame_list) > 0
+
+    @property
+    def is_finished(self) -> bool:
+        """
+        是否已经播放到最后一帧
+        """
+        return self.frame_idx >= len(self.frame_list) - 1
+
+    @property
+    def current_frame_time(self) -> float:
+        """
+        当前截图在回放时钟下的时间 = 开始播放的时间 + 录制时相对第一帧的偏移
+        """
+        if len(self.frame_list) == 0 or self.frame_idx < 0:
+            return self._start_time
+        return self._start_time + self.frame_list[self.frame_idx].record_time - self.frame_list[0].record_time
+
+    def screenshot(self, independent: bool = False) -> tuple[float, MatLike | None]:
+        """
+        截图 返回的时间是截图在回放时钟下的时间 保持录制时的帧间隔
+        """
+        _, screen = ControllerBase.screenshot(self, independent)
+        return self.current_frame_time, screen
+
+    def get_screenshot(self, independent: bool = False) -> MatLike | None:
+        """
+        获取下一帧截图
+        - 实时模式下 取录制时间不晚于当前播放进度的最后一帧
+        - 极速模式下 每次调用都取下一帧
+        播放完毕后一直返回最后一帧
+        """
+        if len(self.frame_list) == 0:
+            return None
+
+        if self.real_time:
+            elapsed = time.time() - self._start_time
+            first_time = self.frame_list[0].record_time
+            idx = max(self.frame_idx, 0)
+            while idx + 1 < len(self.frame_list) and self.frame_list[idx + 1].record_time - first_time <= elapsed:
+                idx += 1
+            self.frame_idx = idx
+        elif self.frame_idx + 1 < len(self.frame_list):
+            self.frame_idx += 1
+
+        return self._read_frame(self.frame_list[self.frame_idx])
+
+    def _read_frame(self, frame: ReplayFrame) -> Optional[MatLike]:
+        """
+        读取一帧截图 转为RGB并缩放到标准分辨率
+        """
+        if self._zip_file is not None:
+            data = np.frombuffer(self._zip_file.read(frame.file_name), dtype=np.uint8)
+            image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        else:
+            image = cv2.imread(os.path.join(self.frame_path, frame.file_name), cv2.IMREAD_COLOR)
+
+        if image is None:
+            log.error('回放截图读取失败 %s', frame.file_name)
+            return None
+
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        if image.shape[1] != self.standard_width or image.shape[0] != self.standard_height:
+            image = cv2.resize(image, (self.standard_width, self.standard_height))
+        return image
+
+    def record_action(self, action_name: str, **params) -> None:
+        """
+        记录一个操作
+        :param action_name: 操作名称
+        :param params: 操作参数
+        """
+        action = ReplayAction(
+            action_time=self.current_frame_time if not self.real_time else time.time(),
+            frame_idx=self.frame_idx,
+            action_name=action_name,
+            params=params,
+        )
+        with self._action_lock:
+            self.action_list.append(action)
+
+    def click(self, pos: Point = None, press_time: float = 0, pc_alt: bool = False) -> bool:
+        self.record_action('click', pos=pos, press_time=press_time, pc_alt=pc_alt)
+        return True
+
+    def scroll(self, down: int, pos: Point = None):
+        self.record_action('scroll', down=down, pos=pos)
+
+    def drag_to(self, end: Point, start: Point = None, duration: float = 0.5):
+        self.record_action('drag_to', end=end, start=start, duration=duration)
+
+    def mouse_move(self, game_pos: Point):
+        self.record_action('mouse_move', pos=game_pos)
+
+    def input_str(self, to_input: str, interval: float = 0.1):
+        self.record_action('input_str', to_input=to_input)
+
+    def delete_all_input(self):
+        self.record_action('delete_all_input')
+
+    def close_game(self):
+        self.record_action('close_game')
+
+    def active_window(self) -> None:
+        pass
+
+    def enable_keyboard(self):
+        pass
+
+    def enable_xbox(self):
+        pass
+
+    def enable_ds4(self):
+        pass
+
+    def close(self) -> None:
+        """
+        关闭打开的压缩包
+        """
+        if self._zip_file is not None:
+            self._zip_file.close()
+            self._zip_file = None
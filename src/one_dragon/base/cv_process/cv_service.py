@@ -1,6 +1,7 @@
 # coding: utf-8
 import os
-from typing import List, Dict, Type
+import threading
+from typing import TYPE_CHECKING, List, Dict, Type, Optional, Tuple
 
 import cv2
 import numpy as np
@@ -15,9 +16,11 @@ from one_dragon.base.cv_process.steps import (
     CvStepFilterByCentroidDistance, CvStepOcr, CvStepGrayscale, CvStepHistogramEqualization, CvStepThreshold,
     CvStepCropByArea, CvStepCropToAnnulus, CvTemplateMatchingStep
 )
-from one_dragon.base.operation.one_dragon_context import OneDragonContext
 from one_dragon.utils import os_utils
 
+if TYPE_CHECKING:
+    from one_dragon.base.operation.one_dragon_context import OneDragonContext
+
 
 class CvService:
     """
@@ -27,12 +30,12 @@ class CvService:
     PIPELINE_DIR: str = os_utils.get_path_under_work_dir('assets', 'image_analysis_pipelines')
     TEMPLATE_DIR: str = os_utils.get_path_under_work_dir('assets', 'image_analysis_templates')
 
-    def __init__(self, od_ctx: OneDragonContext):
+    def __init__(self, od_ctx: 'OneDragonContext'):
         """
         服务初始化
         :param od_ctx: 总上下文
         """
-        self.od_ctx: OneDragonContext = od_ctx
+        self.od_ctx: 'OneDragonContext' = od_ctx
         self.ocr = od_ctx.ocr
         self.template_loader = od_ctx.template_loader
 
@@ -61,6 +64,12 @@ class CvService:
             'OCR识别': CvStepOcr,
         }
 
+        # 编译好的流水线 key=流水线名称 value=(文件版本, 流水线) 文件修改后自动重新加载
+        self._pipeline_cache: Dict[str, Tuple[Tuple[int, int], CvPipeline]] = {}
+        # 模板轮廓 key=模板名称 value=(文件版本, 轮廓)
+        self._template_contour_cache: Dict[str, Tuple[Tuple[int, int], np.ndarray]] = {}
+        self._cache_lock = threading.Lock()
+
         if not os.path.exists(self.PIPELINE_DIR):
             os.makedirs(self.PIPELINE_DIR)
         if not os.path.exists(self.TEMPLATE_DIR):
@@ -69,12 +78,13 @@ class CvService:
     def run_pipeline(self, pipeline_name: str, image: np.ndarray, debug_mode: bool = False) -> CvPipelineContext:
         """
         加载并运行指定的流水线
+        非调试模式下不复制原图 也不生成分析文本 适合每帧运行
         :param pipeline_name: 流水线名称
         :param image: RGB图像
         :param debug_mode: 是否为调试模式
         :return: 包含所有结果的上下文
         """
-        pipeline = self.load_pipeline(pipeline_name)
+        pipeline = self.get_pipeline(pipeline_name)
         if pipeline is None:
             ctx = CvPipelineContext(image, service=self, debug_mode=debug_mode)
             ctx.error_str = f"流水线 {pipeline_name} 加载失败"
@@ -82,6 +92,54 @@ class CvService:
 
         return pipeline.execute(image, service=self, debug_mode=debug_mode)
 
+    def get_pipeline(self, name: str) -> Optional[CvPipeline]:
+        """
+        获取编译好的流水线 文件没有修改时复用之前的结果
+        返回的流水线是共用的 不能修改 需要编辑时使用 load_pipeline
+        :param name: 流水线名称
+        :return:
+        """
+        file_path = os.path.join(self.PIPELINE_DIR, f"{name}.yml")
+        file_version = self._get_file_version(file_path)
+        if file_version is None:
+            with self._cache_lock:
+                self._pipeline_cache.pop(name, None)
+            return None
+
+        with self._cache_lock:
+            cache = self._pipeline_cache.get(name)
+        if cache is not None and cache[0] == file_version:
+            return cache[1]
+
+        pipeline = self.load_pipeline(name)
+        with self._cache_lock:
+            if pipeline is None:
+                self._pipeline_cache.pop(name, None)
+            else:
+                self._pipeline_cache[name] = (file_version, pipeline)
+        return pipeline
+
+    @staticmethod
+    def _get_file_version(file_path: str) -> Optional[Tuple[int, int]]:
+        """
+        文件的版本 用修改时间和大小判断文件是否有变化
+        :param file_path: 文件路径
+        :return: 文件不存在时返回None
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def clear_cache(self) -> None:
+        """
+        清除缓存的流水线和模板轮廓
+        """
+        with self._cache_lock:
+            self._pipeline_cache.clear()
+            self._template_contour_cache.clear()
+
     def get_pipeline_names(self) -> List[str]:
         """
         获取所有已保存流水线的名称
@@ -187,17 +245,27 @@ class CvService:
 
     def load_template_contour(self, template_name: str) -> np.ndarray:
         """
-        加载模板轮廓
+        加载模板轮廓 文件没有修改时复用之前的结果
         :param template_name: 模板名称
         :return:
         """
         file_path = os.path.join(self.TEMPLATE_DIR, f"{template_name}.npy")
-        if not os.path.exists(file_path):
+        file_version = self._get_file_version(file_path)
+        if file_version is None:
             return None
+
+        with self._cache_lock:
+            cache = self._template_contour_cache.get(template_name)
+        if cache is not None and cache[0] == file_version:
+            return cache[1]
+
         try:
-            return np.load(file_path)
+            contour = np.load(file_path)
         except Exception:
             return None
+        with self._cache_lock:
+            self._template_contour_cache[template_name] = (file_version, contour)
+        return contour
 
     def delete_template_contour(self, template_name: str):
         """
@@ -14,7 +14,9 @@ class CvPipelineContext:
         self.source_image: np.ndarray = source_image  # 原始输入图像 (只读)
         self.service: 'CvService' = service
         self.debug_mode: bool = debug_mode  # 是否为调试模式
-        self.display_image: np.ndarray = source_image.copy()  # 用于UI显示的主图像，可被修改
+        # 用于UI显示的主图像，可被修改
+        # 非调试模式下不复制 直接使用原图 (裁剪时也是视图) 步骤不能在上面原地绘制
+        self.display_image: np.ndarray = source_image.copy() if debug_mode else source_image
         self.crop_offset: tuple[int, int] = (0, 0)  # display_image 左上角相对于 source_image 的坐标偏移
         self.mask_image: np.ndarray = None  # 二值掩码图像
         self.contours: List[np.ndarray] = []  # 检测到的轮廓列表
@@ -214,5 +216,6 @@ class CvStep:
         # 累加偏移量
         context.crop_offset = (context.crop_offset[0] + rect.x1, context.crop_offset[1] + rect.y1)
 
-        context.analysis_results.append(f"已执行 {operation_name}，区域: {rect}，当前总偏移: {context.crop_offset}")
+        if context.debug_mode:
+            context.analysis_results.append(f"已执行 {operation_name}，区域: {rect}，当前总偏移: {context.crop_offset}")
 
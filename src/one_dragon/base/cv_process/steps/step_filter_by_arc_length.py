@@ -30,8 +30,9 @@ class CvStepFilterByArcLength(CvStep):
             length = cv2.arcLength(contour, closed)
             if min_length <= length <= max_length:
                 filtered_contours.append(contour)
-                context.analysis_results.append(f"轮廓 {i} 周长: {length:.2f} (保留)")
-            else:
+                if context.debug_mode:
+                    context.analysis_results.append(f"轮廓 {i} 周长: {length:.2f} (保留)")
+            elif context.debug_mode:
                 context.analysis_results.append(f"轮廓 {i} 周长: {length:.2f} (过滤)")
 
         context.contours = filtered_contours
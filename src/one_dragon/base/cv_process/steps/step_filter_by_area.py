@@ -29,8 +29,9 @@ class CvStepFilterByArea(CvStep):
             area = cv2.contourArea(contour)
             if min_area <= area <= max_area:
                 filtered_contours.append(contour)
-                context.analysis_results.append(f"轮廓 {i} 面积: {area} (保留)")
-            else:
+                if context.debug_mode:
+                    context.analysis_results.append(f"轮廓 {i} 面积: {area} (保留)")
+            elif context.debug_mode:
                 context.analysis_results.append(f"轮廓 {i} 面积: {area} (过滤)")
         
         context.contours = filtered_contours
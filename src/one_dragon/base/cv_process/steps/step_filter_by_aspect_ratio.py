@@ -30,8 +30,9 @@ class CvStepFilterByAspectRatio(CvStep):
             aspect_ratio = w / h if h > 0 else 0
             if min_ratio <= aspect_ratio <= max_ratio:
                 filtered_contours.append(contour)
-                context.analysis_results.append(f"轮廓 {i} 长宽比: {aspect_ratio:.2f} (保留)")
-            else:
+                if context.debug_mode:
+                    context.analysis_results.append(f"轮廓 {i} 长宽比: {aspect_ratio:.2f} (保留)")
+            elif context.debug_mode:
                 context.analysis_results.append(f"轮廓 {i} 长宽比: {aspect_ratio:.2f} (过滤)")
 
         context.contours = filtered_contours
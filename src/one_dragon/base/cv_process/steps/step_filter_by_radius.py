@@ -30,10 +30,11 @@ class CvStepFilterByRadius(CvStep):
             (x, y), radius = cv2.minEnclosingCircle(contour)
             if min_radius <= radius <= max_radius:
                 filtered_contours.append(contour)
-                context.analysis_results.append(f"轮廓 {i} 半径: {radius:.2f} (保留)")
+                if context.debug_mode:
+                    context.analysis_results.append(f"轮廓 {i} 半径: {radius:.2f} (保留)")
                 if context.debug_mode and draw_circle:
                     circles_to_draw.append(((int(x), int(y)), int(radius)))
-            else:
+            elif context.debug_mode:
                 context.analysis_results.append(f"轮廓 {i} 半径: {radius:.2f} (过滤)")
 
         context.contours = filtered_contours
@@ -39,8 +39,9 @@ class CvMatchShapesStep(CvStep):
             dissimilarity = cv2.matchShapes(template_contour, contour, cv2.CONTOURS_MATCH_I1, 0.0)
             if dissimilarity <= max_dissimilarity:
                 filtered_contours.append(contour)
-                context.analysis_results.append(f"轮廓 {i} 相似度: {dissimilarity:.4f} (保留)")
-            else:
+                if context.debug_mode:
+                    context.analysis_results.append(f"轮廓 {i} 相似度: {dissimilarity:.4f} (保留)")
+            elif context.debug_mode:
                 context.analysis_results.append(f"轮廓 {i} 相似度: {dissimilarity:.4f} (过滤)")
 
         context.contours = filtered_contours
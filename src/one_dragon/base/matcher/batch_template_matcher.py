@@ -0,0 +1,121 @@
+import numpy as np
+import cv2
+from cv2.typing import MatLike
+from typing import Optional
+
+
+def _to_3d(img: np.ndarray) -> np.ndarray:
+    """
+    统一转为 (h, w, c) 的形状 方便单通道和多通道使用同一套计算
+    """
+    return img[:, :, None] if img.ndim == 2 else img
+
+
+def _to_binary_mask(mask: Optional[MatLike], shape: tuple[int, int]) -> np.ndarray:
+    """
+    转为 0/1 的浮点掩码 与 cv2.matchTemplate 对 uint8 掩码的处理一致
+    """
+    if mask is None:
+        return np.ones(shape, dtype=np.float64)
+    if mask.ndim == 3:
+        mask = mask[:, :, 0]
+    return (mask > 0).astype(np.float64)
+
+
+class SourceSpectrum:
+
+    def __init__(self, source: MatLike):
+        """
+        原图在频域上的预计算结果 同一张原图匹配多组模板时共享
+        - 各通道的傅里叶变换 用于计算分子
+        - 各掩码下的窗口均值和方差 相当于带掩码的积分图
+        :param source: 原图
+        """
+        self.source: np.ndarray = _to_3d(source).astype(np.float64)
+        self.height: int = self.source.shape[0]
+        self.width: int = self.source.shape[1]
+        self.fft_shape: tuple[int, int] = (cv2.getOptimalDFTSize(self.height), cv2.getOptimalDFTSize(self.width))
+
+        self._fft: Optional[np.ndarray] = None
+        self._fft_square: Optional[np.ndarray] = None
+        self._window_var: dict[bytes, np.ndarray] = {}  # key=掩码摘要
+
+    @property
+    def fft(self) -> np.ndarray:
+        if self._fft is None:
+            self._fft = np.fft.rfft2(self.source, s=self.fft_shape, axes=(0, 1))
+        return self._fft
+
+    @property
+    def fft_square(self) -> np.ndarray:
+        if self._fft_square is None:
+            self._fft_square = np.fft.rfft2(self.source * self.source, s=self.fft_shape, axes=(0, 1))
+        return self._fft_square
+
+    def get_window_var(self, group: 'TemplateGroup') -> np.ndarray:
+        """
+        计算每个匹配位置上 掩码内原图的 sum(I'^2) 各通道求和
+        :param group: 模板组
+        :return: 形状为匹配结果的大小
+        """
+        var = self._window_var.get(group.mask_key)
+        if var is not None:
+            return var
+
+        rh = self.height - group.height + 1
+        rw = self.width - group.width + 1
+        mask_fft = group.mask_fft[:, :, None]
+        window_sum = np.fft.irfft2(self.fft * mask_fft, s=self.fft_shape, axes=(0, 1))[:rh, :rw]
+        window_square_sum = np.fft.irfft2(self.fft_square * mask_fft, s=self.fft_shape, axes=(0, 1))[:rh, :rw]
+        var = (window_square_sum - window_sum * window_sum / group.mask_sum).sum(axis=2)
+        var = np.maximum(var, 0)
+        self._window_var[group.mask_key] = var
+        return var
+
+
+class TemplateGroup:
+
+    def __init__(self, key_list: list, image_list: list[MatLike], mask: Optional[MatLike],
+                 fft_shape: tuple[int, int]):
+        """
+        一组尺寸和掩码都相同的模板 预先计算零均值模板的频域结果
+        匹配时一次乘法加一次逆变换即可得到组内所有模板的 TM_CCOEFF_NORMED 结果
+        :param key_list: 模板的标识 与 image_list 一一对应
+        :param image_list: 模板图片
+        :param mask: 共用的掩码 None 时不使用掩码
+        :param fft_shape: 变换的尺寸 需要与原图的 SourceSpectrum 一致
+        """
+        self.key_list: list = key_list
+        self.key_idx: dict = {key: idx for idx, key in enumerate(key_list)}
+        self.height: int = image_list[0].shape[0]
+        self.width: int = image_list[0].shape[1]
+        self.fft_shape: tuple[int, int] = fft_shape
+
+        binary_mask = _to_binary_mask(mask, (self.height, self.width))
+        self.mask_key: bytes = np.packbits(binary_mask.astype(np.uint8)).tobytes() + bytes(str(binary_mask.shape), 'utf-8')
+        self.mask_sum: float = float(binary_mask.sum())
+        self.mask_fft: np.ndarray = np.conj(np.fft.rfft2(binary_mask, s=fft_shape))
+
+        templates = np.stack([_to_3d(i).astype(np.float64) for i in image_list])  # (k, h, w, c)
+        weight = binary_mask[None, :, :, None]
+        mean = (templates * weight).sum(axis=(1, 2), keepdims=True) / max(self.mask_sum, 1)
+        zero_mean = (templates - mean) * weight
+        self.template_norm: np.ndarray = (zero_mean * zero_mean).sum(axis=(1, 2, 3))
+        # 结果只用于相乘 使用 complex64 减少内存
+        self.template_fft: np.ndarray = np.conj(np.fft.rfft2(zero_mean, s=fft_shape, axes=(1, 2))).astype(np.complex64)
+
+    def match(self, source: SourceSpectrum) -> np.ndarray:
+        """
+        对组内所有模板进行匹配
+        :param source: 原图的预计算结果
+        :return: 形状 (k, rh, rw) 的匹配结果 无法计算的位置为 nan
+        """
+        rh = source.height - self.height + 1
+        rw = source.width - self.width + 1
+        product = np.einsum('kabc,abc->kab', self.template_fft, source.fft)
+        numerator = np.fft.irfft2(product, s=self.fft_shape, axes=(1, 2))[:, :rh, :rw]
+        denominator = np.sqrt(source.get_window_var(self)[None, :, :] * self.template_norm[:, None, None])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = numerator / denominator
+        result[denominator <= 1e-6] = np.nan
+        return result
@@ -1,5 +1,9 @@
+import sys
+import threading
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
+from typing import Callable
 
 import cv2
 import numpy as np
@@ -9,7 +13,7 @@ from one_dragon.base.geometry.rectangle import Rect
 from one_dragon.base.matcher.match_result import MatchResultList
 from one_dragon.base.matcher.ocr.ocr_match_result import OcrMatchResult
 from one_dragon.base.matcher.ocr.ocr_matcher import OcrMatcher
-from one_dragon.utils import cal_utils
+from one_dragon.utils import cal_utils, cv2_utils
 from one_dragon.utils import str_utils
 from one_dragon.utils.i18_utils import gt
 from one_dragon.utils.log_utils import log
@@ -18,55 +22,150 @@ from one_dragon.utils.log_utils import log
 @dataclass(frozen=True)
 class OcrCacheEntry:
     """OCR缓存条目"""
-    image_id: int  # 图片在内存中的ID
+    cache_key: tuple  # 缓存键 (图片内容摘要, 识别区域, 颜色范围, 阈值, 行合并距离)
     ocr_result_list: list[OcrMatchResult]  # OCR识别结果
     create_time: float  # 创建时间
     color_range: list[list[int]] | None  # 颜色范围
+    memory_size: int  # 估算占用的内存 字节
+
+
+@dataclass(frozen=True)
+class OcrCacheStats:
+    """OCR缓存统计"""
+    hit_count: int  # 命中次数
+    miss_count: int  # 未命中次数
+    entry_count: int  # 当前条目数
+    memory_size: int  # 当前估算占用内存 字节
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hit_count + self.miss_count
+        return self.hit_count / total if total > 0 else 0
 
 
 class OcrService:
     """
     OCR服务
-    - 提供缓存
+    - 提供缓存 按图片内容摘要作为键 内容一致的新截图也能命中
     - 提存并发识别 (未实现)
     """
-    
-    def __init__(self, ocr_matcher: OcrMatcher, max_cache_size: int = 5):
+
+    def __init__(
+            self,
+            ocr_matcher: OcrMatcher,
+            max_cache_size: int = 32,
+            max_cache_memory: int = 8 * 1024 * 1024,
+            frame_version_getter: Callable[[MatLike], int | None] | None = None,
+    ):
         """
         初始化OCR服务
-        
+
         Args:
             ocr_matcher: OCR匹配器实例
             max_cache_size: 最大缓存条目数
+            max_cache_memory: 最大缓存内存 字节 按识别结果估算
+            frame_version_getter: 获取截图版本的方法 版本相同的截图内容一致 可以跳过摘要计算
         """
         self.ocr_matcher = ocr_matcher
         self.max_cache_size = max_cache_size
-        
-        # 缓存存储：key=图片ID，value为缓存条目
-        self._cache: dict[int, list[OcrCacheEntry]] = {}
-        self._cache_list: list[OcrCacheEntry] = []
+        self.max_cache_memory = max_cache_memory
+        self.frame_version_getter = frame_version_getter
+
+        # 缓存存储：key=缓存键，value为缓存条目 按最近使用排序
+        self._cache: OrderedDict[tuple, OcrCacheEntry] = OrderedDict()
+        self._cache_memory: int = 0
+        self._cache_lock = threading.Lock()
+
+        # 最近一次计算摘要的图片 持有引用保证同一个对象不会被回收后复用id
+        self._last_image: MatLike | None = None
+        self._last_image_digest: tuple | None = None
+        self._last_image_version: int | None = None
+
+        self.hit_count: int = 0
+        self.miss_count: int = 0
+
+    def _get_image_digest(self, image: MatLike) -> tuple:
+        """
+        获取图片的内容摘要 同一张图片多次查询时只计算一次
+        截图没有变化时 直接使用上一张截图的摘要
+
+        Args:
+            image: 输入图片
+
+        Returns:
+            图片内容摘要
+        """
+        version = self.frame_version_getter(image) if self.frame_version_getter is not None else None
+        with self._cache_lock:
+            if image is self._last_image:
+                return self._last_image_digest
+            if version is not None and version == self._last_image_version:
+                self._last_image = image
+                return self._last_image_digest
+
+        digest = cv2_utils.image_digest(image)
+        with self._cache_lock:
+            self._last_image = image
+            self._last_image_digest = digest
+            self._last_image_version = version
+        return digest
+
+    @staticmethod
+    def _get_cache_key(
+            image_digest: tuple,
+            color_range: list[list[int]] | None,
+            threshold: float,
+            merge_line_distance: float,
+            rect: Rect | None = None,
+    ) -> tuple:
+        """
+        生成缓存键
+
+        Args:
+            image_digest: 图片内容摘要 区域模式下为裁剪区域的内容摘要
+            color_range: 颜色范围过滤 [[lower], [upper]]
+            threshold: OCR阈值
+            merge_line_distance: 行合并距离
+            rect: 识别的区域 None为全图
+
+        Returns:
+            缓存键
+        """
+        color_key = None if color_range is None else tuple(tuple(int(i) for i in c) for c in color_range)
+        rect_key = None if rect is None else (rect.x1, rect.y1, rect.x2, rect.y2)
+        return image_digest, rect_key, color_key, threshold, merge_line_distance
+
+    @staticmethod
+    def _estimate_memory_size(ocr_result_list: list[OcrMatchResult]) -> int:
+        """
+        估算识别结果占用的内存
+
+        Args:
+            ocr_result_list: OCR识别结果
+
+        Returns:
+            字节数
+        """
+        total = sys.getsizeof(ocr_result_list)
+        for mr in ocr_result_list:
+            total += sys.getsizeof(mr) + sys.getsizeof(mr.__dict__)
+            if mr.data is not None:
+                total += sys.getsizeof(mr.data)
+        return total
 
     def _clean_expired_cache(self) -> None:
         """
-        清除过期缓存
+        按条目数和内存淘汰最久未使用的缓存 调用时需持有锁
         Returns:
 
         """
-        while len(self._cache_list) > self.max_cache_size:
-            oldest_entry = self._cache_list.pop(0)
-            image_id = oldest_entry.image_id
-
-            if image_id in self._cache:
-                # 从与 image_id 关联的列表中移除特定的条目
-                try:
-                    self._cache[image_id].remove(oldest_entry)
-                    # 如果这个 image_id 的列表现在为空，则从字典中移除该键
-                    if not self._cache[image_id]:
-                        self._cache.pop(image_id)
-                except ValueError:
-                    # 在罕见的并发场景下，如果条目已经被移除，可能会发生这种情况，但可以安全地忽略。
-                    pass
-    
+        while len(self._cache) > 0 and (
+                len(self._cache) > self.max_cache_size
+                or self._cache_memory > self.max_cache_memory
+        ):
+            _, oldest_entry = self._cache.popitem(last=False)
+            self._cache_memory -= oldest_entry.memory_size
+
     def _apply_color_filter(self, image: MatLike, color_range: list[list[int]]) -> MatLike:
         """
         应用颜色过滤，最后返回黑白图。
@@ -86,31 +185,52 @@ class OcrService:
         mask = cv2.inRange(image, np.array(color_range[0]), np.array(color_range[1]))
         return cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
 
-    def _get_ocr_result_list_from_cache(
-            self,
-            image: MatLike,
-            color_range: list[list[int]] | None = None,
-    ) -> OcrCacheEntry | None:
+    def _get_ocr_result_list_from_cache(self, cache_key: tuple) -> OcrCacheEntry | None:
         """
-        从缓存中获取OCR结果
+        从缓存中获取OCR结果 命中时更新为最近使用
         Args:
-            image: 输入图片
-            color_range: 颜色范围过滤 [[lower], [upper]]
+            cache_key: 缓存键
 
         Returns:
             缓存条目
         """
-        image_id = id(image)
-        cache_list = self._cache.get(image_id)
-        if cache_list is None:
-            return None
+        with self._cache_lock:
+            cache_entry = self._cache.get(cache_key)
+            if cache_entry is None:
+                self.miss_count += 1
+                return None
 
-        for cache_entry in cache_list:
-            # Python 的列表 == 操作符会自动处理嵌套结构和值的比较 包括None
-            if cache_entry.color_range == color_range:
-                return cache_entry
+            self._cache.move_to_end(cache_key)
+            self.hit_count += 1
+            return cache_entry
 
-        return None
+    def _put_ocr_result_list_to_cache(
+            self,
+            cache_key: tuple,
+            ocr_result_list: list[OcrMatchResult],
+            color_range: list[list[int]] | None,
+    ) -> None:
+        """
+        存储OCR结果到缓存
+        Args:
+            cache_key: 缓存键
+            ocr_result_list: OCR识别结果
+            color_range: 颜色范围过滤 [[lower], [upper]]
+        """
+        cache_entry = OcrCacheEntry(
+            cache_key=cache_key,
+            ocr_result_list=ocr_result_list,
+            create_time=time.time(),
+            color_range=color_range,
+            memory_size=self._estimate_memory_size(ocr_result_list),
+        )
+        with self._cache_lock:
+            old_entry = self._cache.pop(cache_key, None)
+            if old_entry is not None:
+                self._cache_memory -= old_entry.memory_size
+            self._cache[cache_key] = cache_entry
+            self._cache_memory += cache_entry.memory_size
+            self._clean_expired_cache()
 
     def get_ocr_result_list(
             self,
@@ -119,6 +239,7 @@ class OcrService:
             rect: Rect | None = None,
             threshold: float = 0,
             merge_line_distance: float = -1,
+            crop_first: bool = False,
     ) -> list[OcrMatchResult]:
         """
         获取全图OCR结果，优先从缓存获取
@@ -129,18 +250,30 @@ class OcrService:
             rect: 识别特定的区域
             threshold: OCR阈值
             merge_line_distance: 行合并距离
+            crop_first: 区域模式 传入rect时只对该区域进行识别 而不是识别全图后过滤
 
         Returns:
             ocr_result_list: OCR识别结果列表
         """
-        # 生成缓存键
-        image_id = id(image)
+        if crop_first and rect is not None:
+            return self.get_area_ocr_result_list(
+                image=image,
+                rect=rect,
+                color_range=color_range,
+                threshold=threshold,
+                merge_line_distance=merge_line_distance,
+            )
 
-        cache_entity = self._get_ocr_result_list_from_cache(
-            image=image,
+        # 生成缓存键
+        cache_key = self._get_cache_key(
+            image_digest=self._get_image_digest(image),
             color_range=color_range,
+            threshold=threshold,
+            merge_line_distance=merge_line_distance,
         )
 
+        cache_entity = self._get_ocr_result_list_from_cache(cache_key)
+
         # 检查缓存
         if cache_entity is not None:
             ocr_result_list = cache_entity.ocr_result_list
@@ -152,38 +285,217 @@ class OcrService:
             ocr_result_list = self.ocr_matcher.ocr(processed_image, threshold, merge_line_distance)
 
             # 存储到缓存
-            cache_entry = OcrCacheEntry(
-                ocr_result_list=ocr_result_list,
-                create_time=time.time(),
-                color_range=color_range,
-                image_id=image_id,
-            )
-            if image_id not in self._cache:
-                self._cache[image_id] = []
-            self._cache[image_id].append(cache_entry)
-            self._cache_list.append(cache_entry)
-            self._clean_expired_cache()
+            self._put_ocr_result_list_to_cache(cache_key, ocr_result_list, color_range)
 
         if rect is not None:
-            # 过滤出指定区域内的结果
-            area_result_list: list[OcrMatchResult] = []
-
-            for ocr_result in ocr_result_list:
-                # 检查匹配结果是否和指定区域重叠
-                if cal_utils.cal_overlap_percent(ocr_result.rect, rect, base=ocr_result.rect) > 0.7:
-                    area_result_list.append(ocr_result)
-
-            return area_result_list
+            return self._filter_by_rect(ocr_result_list, rect)
         else:
             return ocr_result_list
 
+    @staticmethod
+    def _filter_by_rect(ocr_result_list: list[OcrMatchResult], rect: Rect) -> list[OcrMatchResult]:
+        """
+        过滤出指定区域内的结果
+
+        Args:
+            ocr_result_list: OCR识别结果列表
+            rect: 指定区域
+
+        Returns:
+            区域内的识别结果
+        """
+        area_result_list: list[OcrMatchResult] = []
+
+        for ocr_result in ocr_result_list:
+            # 检查匹配结果是否和指定区域重叠
+            if cal_utils.cal_overlap_percent(ocr_result.rect, rect, base=ocr_result.rect) > 0.7:
+                area_result_list.append(ocr_result)
+
+        return area_result_list
+
+    def _get_area_cache_key(
+            self,
+            image: MatLike,
+            rect: Rect,
+            color_range: list[list[int]] | None,
+            threshold: float,
+            merge_line_distance: float,
+    ) -> tuple:
+        """
+        生成区域模式的缓存键 只使用区域内的图片内容计算摘要 区域外画面变化不影响命中
+
+        Args:
+            image: 输入图片
+            rect: 识别的区域
+            color_range: 颜色范围过滤 [[lower], [upper]]
+            threshold: OCR阈值
+            merge_line_distance: 行合并距离
+
+        Returns:
+            缓存键
+        """
+        part = cv2_utils.crop_image_only(image, rect)
+        return self._get_cache_key(
+            image_digest=cv2_utils.image_digest(part),
+            color_range=color_range,
+            threshold=threshold,
+            merge_line_distance=merge_line_distance,
+            rect=rect,
+        )
+
+    def _ocr_in_rect(
+            self,
+            image: MatLike,
+            rect: Rect,
+            color_range: list[list[int]] | None,
+            threshold: float,
+            merge_line_distance: float,
+    ) -> list[OcrMatchResult]:
+        """
+        只对指定区域进行OCR 结果坐标转换为全图坐标
+
+        Args:
+            image: 输入图片
+            rect: 识别的区域
+            color_range: 颜色范围过滤 [[lower], [upper]]
+            threshold: OCR阈值
+            merge_line_distance: 行合并距离
+
+        Returns:
+            ocr_result_list: OCR识别结果列表
+        """
+        part, actual_rect = cv2_utils.crop_image(image, rect)
+        if part.shape[0] == 0 or part.shape[1] == 0:
+            return []
+
+        processed_image = self._apply_color_filter(part, color_range)
+        ocr_result_list = self.ocr_matcher.ocr(processed_image, threshold, merge_line_distance)
+        for ocr_result in ocr_result_list:
+            ocr_result.add_offset(actual_rect.left_top)
+
+        return ocr_result_list
+
+    def get_area_ocr_result_list(
+            self,
+            image: MatLike,
+            rect: Rect,
+            color_range: list[list[int]] | None = None,
+            threshold: float = 0,
+            merge_line_distance: float = -1,
+    ) -> list[OcrMatchResult]:
+        """
+        区域模式 只对指定区域进行OCR 优先从缓存获取
+        缓存按 (区域内容, 区域, 颜色范围) 存储 同一张截图的多次区域判断可共享结果
+
+        Args:
+            image: 输入图片
+            rect: 识别的区域
+            color_range: 颜色范围过滤 [[lower], [upper]]
+            threshold: OCR阈值
+            merge_line_distance: 行合并距离
+
+        Returns:
+            ocr_result_list: OCR识别结果列表 坐标为全图坐标
+        """
+        cache_key = self._get_area_cache_key(image, rect, color_range, threshold, merge_line_distance)
+        cache_entity = self._get_ocr_result_list_from_cache(cache_key)
+        if cache_entity is not None:
+            return cache_entity.ocr_result_list
+
+        ocr_result_list = self._ocr_in_rect(image, rect, color_range, threshold, merge_line_distance)
+        self._put_ocr_result_list_to_cache(cache_key, ocr_result_list, color_range)
+        return ocr_result_list
+
+    def prefetch_area_ocr_result(
+            self,
+            image: MatLike,
+            rect_list: list[Rect],
+            color_range: list[list[int]] | None = None,
+            threshold: float = 0,
+            merge_line_distance: float = -1,
+    ) -> None:
+        """
+        区域模式 预先识别多个区域
+        相交的区域会合并后只识别一次 每个区域的结果分别写入缓存
+        之后对这些区域调用 get_area_ocr_result_list 可以直接命中缓存
+
+        Args:
+            image: 输入图片
+            rect_list: 需要识别的区域列表
+            color_range: 颜色范围过滤 [[lower], [upper]]
+            threshold: OCR阈值
+            merge_line_distance: 行合并距离
+        """
+        to_ocr_list: list[tuple[Rect, tuple]] = []
+        with self._cache_lock:
+            for rect in rect_list:
+                cache_key = self._get_area_cache_key(image, rect, color_range, threshold, merge_line_distance)
+                if cache_key not in self._cache:
+                    to_ocr_list.append((rect, cache_key))
+
+        if len(to_ocr_list) == 0:
+            return
+
+        for union_rect, member_list in self._merge_rects(to_ocr_list):
+            if len(member_list) == 1:
+                rect, cache_key = member_list[0]
+                ocr_result_list = self._ocr_in_rect(image, rect, color_range, threshold, merge_line_distance)
+                self._put_ocr_result_list_to_cache(cache_key, ocr_result_list, color_range)
+                continue
+
+            union_result_list = self._ocr_in_rect(image, union_rect, color_range, threshold, merge_line_distance)
+            for rect, cache_key in member_list:
+                self._put_ocr_result_list_to_cache(
+                    cache_key,
+                    self._filter_by_rect(union_result_list, rect),
+                    color_range,
+                )
+
+    @staticmethod
+    def _merge_rects(rect_list: list[tuple[Rect, tuple]]) -> list[tuple[Rect, list[tuple[Rect, tuple]]]]:
+        """
+        合并相交的区域
+
+        Args:
+            rect_list: 区域列表 (区域, 缓存键)
+
+        Returns:
+            合并后的列表 (合并区域, 包含的原区域列表)
+        """
+        group_list: list[tuple[Rect, list[tuple[Rect, tuple]]]] = []
+        for item in rect_list:
+            rect = item[0]
+            union = Rect(rect.x1, rect.y1, rect.x2, rect.y2)
+            members = [item]
+
+            # 与已有分组相交时合并 合并后区域变大 需要重新检查剩余分组
+            merged = True
+            while merged:
+                merged = False
+                for idx, (group_rect, group_members) in enumerate(group_list):
+                    if (union.x1 < group_rect.x2 and group_rect.x1 < union.x2
+                            and union.y1 < group_rect.y2 and group_rect.y1 < union.y2):
+                        union = Rect(
+                            min(union.x1, group_rect.x1), min(union.y1, group_rect.y1),
+                            max(union.x2, group_rect.x2), max(union.y2, group_rect.y2),
+                        )
+                        members = group_members + members
+                        group_list.pop(idx)
+                        merged = True
+                        break
+
+            group_list.append((union, members))
+
+        return group_list
+
     def get_ocr_result_map(
             self,
             image: MatLike,
             color_range: list[list[int]] | None = None,
             rect: Rect | None = None,
             threshold: float = 0,
-            merge_line_distance: float = -1
+            merge_line_distance: float = -1,
+            crop_first: bool = False,
     ) -> dict[str, MatchResultList]:
         """"
         获取全图OCR结果，优先从缓存获取
@@ -194,6 +506,7 @@ class OcrService:
             rect: 识别特定的区域
             threshold: OCR阈值
             merge_line_distance: 行合并距离
+            crop_first: 区域模式 传入rect时只对该区域进行识别 而不是识别全图后过滤
 
         Returns:
             ocr_result_map: key=识别文本 value=识别结果列表
@@ -203,7 +516,8 @@ class OcrService:
             color_range=color_range,
             rect=rect,
             threshold=threshold,
-            merge_line_distance=merge_line_distance
+            merge_line_distance=merge_line_distance,
+            crop_first=crop_first,
         )
         return self.convert_list_to_map(ocr_result_list)
 
@@ -230,7 +544,8 @@ class OcrService:
             rect: Rect,
             target_text: str,
             color_range: list[list[int]] = None,
-            threshold: float = 0.6
+            threshold: float = 0.6,
+            crop_first: bool = False,
     ) -> bool:
         """
         在指定区域内查找目标文本
@@ -241,6 +556,7 @@ class OcrService:
             target_text: 要查找的文本
             color_range: 颜色范围过滤
             threshold: 文本匹配阈值
+            crop_first: 区域模式 只对该区域进行识别
 
         Returns:
             是否找到目标文本
@@ -249,6 +565,7 @@ class OcrService:
             image=image,
             rect=rect,
             color_range=color_range,
+            crop_first=crop_first,
         )
         ocr_word_list: list[str] = [i.data for i in ocr_result_list]
 
@@ -256,7 +573,27 @@ class OcrService:
         target_idx = str_utils.find_best_match_by_difflib(target_word, ocr_word_list, cutoff=threshold)
         return target_idx is not None and target_idx >= 0
 
+    def get_cache_stats(self) -> OcrCacheStats:
+        """
+        获取缓存统计
+
+        Returns:
+            缓存统计
+        """
+        with self._cache_lock:
+            return OcrCacheStats(
+                hit_count=self.hit_count,
+                miss_count=self.miss_count,
+                entry_count=len(self._cache),
+                memory_size=self._cache_memory,
+            )
+
     def clear_cache(self) -> None:
         """清空所有缓存"""
-        self._cache.clear()
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_memory = 0
+            self._last_image = None
+            self._last_image_digest = None
+            self._last_image_version = None
         log.debug("OCR缓存已清空")
@@ -70,6 +70,10 @@ class OnnxOcrParam:
             use_gpu: bool = False,
             use_angle_cls: bool = False,
             det_limit_side_len: float = 960.0,
+            intra_op_num_threads: int = 0,
+            inter_op_num_threads: int = 0,
+            graph_optimization_level: str = 'all',
+            enable_cpu_mem_arena: bool = True,
     ):
         self.ocr_model_name: str = ocr_model_name
         self.models_dir: str = get_ocr_model_dir(ocr_model_name)
@@ -77,6 +81,10 @@ class OnnxOcrParam:
         # I. 设备与性能 (Device & Performance)
         # ===================================================================
         self.use_gpu = use_gpu  # 是否使用GPU进行计算
+        self.intra_op_num_threads = intra_op_num_threads  # 单个算子内的并行线程数 0=onnxruntime默认值
+        self.inter_op_num_threads = inter_op_num_threads  # 算子间的并行线程数 0=不并行执行算子
+        self.graph_optimization_level = graph_optimization_level  # 图优化级别 disable/basic/extended/all
+        self.enable_cpu_mem_arena = enable_cpu_mem_arena  # 是否使用内存池 关闭可减少内存占用
 
         # ===================================================================
         # II. 模型路径 (Model Paths)
@@ -108,6 +116,10 @@ class OnnxOcrParam:
             'vis_font_path': self.vis_font_path,
             'use_angle_cls': self.use_angle_cls,
             'det_limit_side_len': self.det_limit_side_len,
+            'intra_op_num_threads': self.intra_op_num_threads,
+            'inter_op_num_threads': self.inter_op_num_threads,
+            'graph_optimization_level': self.graph_optimization_level,
+            'enable_cpu_mem_arena': self.enable_cpu_mem_arena,
         }
 
 
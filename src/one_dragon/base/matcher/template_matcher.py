@@ -1,7 +1,12 @@
+import threading
+from collections import OrderedDict
+
 import cv2
+import numpy as np
 from cv2.typing import MatLike
 from typing import Optional
 
+from one_dragon.base.matcher.batch_template_matcher import SourceSpectrum, TemplateGroup
 from one_dragon.base.matcher.match_result import MatchResultList, MatchResult
 from one_dragon.base.screen.template_info import TemplateInfo
 from one_dragon.base.screen.template_loader import TemplateLoader
@@ -11,9 +16,15 @@ from one_dragon.utils.log_utils import log
 
 class TemplateMatcher:
 
-    def __init__(self, template_loader: TemplateLoader):
+    def __init__(self, template_loader: TemplateLoader, max_group_cache_size: int = 32):
         self.template_loader: TemplateLoader = template_loader
 
+        # 批量匹配时 模板组的预计算结果
+        # key=(模板类型, 是否忽略掩码, 变换尺寸, 模板列表) value=(模板信息列表, 模板组)
+        self.max_group_cache_size: int = max_group_cache_size
+        self._group_cache: OrderedDict[tuple, tuple[list[TemplateInfo], TemplateGroup]] = OrderedDict()
+        self._group_cache_lock = threading.Lock()
+
     def match_template(self, source: MatLike,
                        template_sub_dir: str,
                        template_id: str,
@@ -22,7 +33,8 @@ class TemplateMatcher:
                        mask: MatLike = None,
                        ignore_template_mask: bool = False,
                        only_best: bool = True,
-                       ignore_inf: bool = True) -> MatchResultList:
+                       ignore_inf: bool = True,
+                       pyramid_level: int = 0) -> MatchResultList:
         """
         在原图中 匹配模板 如果模板图中有掩码图 会自动使用
         :param source: 原图
@@ -34,6 +46,7 @@ class TemplateMatcher:
         :param ignore_template_mask: 是否忽略模板自身的掩码
         :param only_best: 只返回最好的结果
         :param ignore_inf: 是否忽略无限大的结果
+        :param pyramid_level: 金字塔层数 大区域匹配时可先在缩小的图上找候选位置 0=不使用
         :return: 所有匹配结果
         """
         template: TemplateInfo = self.template_loader.get_template(template_sub_dir, template_id)
@@ -47,7 +60,157 @@ class TemplateMatcher:
         if mask is not None:
             mask_usage = cv2.bitwise_or(mask_usage, mask) if mask_usage is not None else mask
         return cv2_utils.match_template(source, template.get_image(template_type), threshold, mask=mask_usage,
-                                        only_best=only_best, ignore_inf=ignore_inf)
+                                        only_best=only_best, ignore_inf=ignore_inf,
+                                        pyramid_level=pyramid_level)
+
+    def match_templates(
+            self,
+            source: MatLike,
+            template_list: list[tuple[str, str]],
+            template_type: str = 'raw',
+            threshold: float = 0.5,
+            early_exit_threshold: Optional[float] = None,
+            ignore_template_mask: bool = False,
+    ) -> Optional[MatchResult]:
+        """
+        在原图中 匹配多个模板 返回最好的一个
+        原图只预计算一次 尺寸和掩码相同的模板分为一组 在频域上批量计算
+
+        :param source: 原图
+        :param template_list: 模板列表 [(模板的子文件夹, 模板id)] 顺序即为优先级
+        :param template_type: 模板类型
+        :param threshold: 匹配阈值
+        :param early_exit_threshold: 按列表顺序 有模板达到这个置信度时直接返回 不再比较后续模板
+        :param ignore_template_mask: 是否忽略模板自身的掩码
+        :return: 最好的匹配结果 data 为 (模板的子文件夹, 模板id) 没有满足阈值的模板时返回None
+        """
+        template_info_list: list[TemplateInfo] = []
+        for sub_dir, template_id in template_list:
+            template: TemplateInfo = self.template_loader.get_template(sub_dir, template_id)
+            if template is None:
+                log.error('未加载模板 %s' % template_id)
+            template_info_list.append(template)
+
+        source_spectrum = SourceSpectrum(source)
+        group_list = self._get_template_group_list(source_spectrum, template_info_list,
+                                                   template_type, ignore_template_mask)
+
+        best: Optional[MatchResult] = None
+        group_result: dict[int, np.ndarray] = {}  # 按需计算 提前退出时后续的组不需要计算
+        for idx, template in enumerate(template_info_list):
+            if template is None:
+                continue
+
+            group_idx, group = group_list[idx]
+            if group is None:
+                template_image = template.get_image(template_type)
+                if (template_image is None
+                        or template_image.shape[0] > source.shape[0] or template_image.shape[1] > source.shape[1]):
+                    continue
+                mr = self.match_template(source, template.sub_dir, template.template_id,
+                                         template_type=template_type, threshold=threshold,
+                                         ignore_template_mask=ignore_template_mask).max
+            else:
+                if group_idx not in group_result:
+                    group_result[group_idx] = group.match(source_spectrum)
+                result = group_result[group_idx][group.key_idx[(template.sub_dir, template.template_id)]]
+                mr = None
+                if np.any(np.isfinite(result)):
+                    y, x = np.unravel_index(np.nanargmax(result), result.shape)
+                    confidence = result[y, x]
+                    if confidence >= threshold:
+                        mr = MatchResult(confidence, x, y, group.width, group.height)
+
+            if mr is None:
+                continue
+
+            mr.data = (template.sub_dir, template.template_id)
+            if best is None or mr.confidence > best.confidence:
+                best = mr
+            if early_exit_threshold is not None and mr.confidence >= early_exit_threshold:
+                return mr
+
+        return best
+
+    def _get_template_group_list(
+            self,
+            source: SourceSpectrum,
+            template_info_list: list[Optional[TemplateInfo]],
+            template_type: str,
+            ignore_template_mask: bool,
+    ) -> list[tuple[int, Optional[TemplateGroup]]]:
+        """
+        将模板按尺寸和掩码分组 只有一个模板的组使用普通匹配
+        :return: 与模板列表一一对应 (组下标, 模板组) 不分组的模板为 (-1, None)
+        """
+        group_members: dict[tuple, list[TemplateInfo]] = {}
+        grouped_id_set: set[int] = set()
+        for template in template_info_list:
+            if template is None or id(template) in grouped_id_set:
+                continue
+            grouped_id_set.add(id(template))
+            image = template.get_image(template_type)
+            if image is None or image.shape[0] > source.height or image.shape[1] > source.width:
+                continue
+            mask = None if ignore_template_mask else template.mask
+            channel = 1 if image.ndim == 2 else image.shape[2]
+            if channel != source.source.shape[2]:
+                continue
+            mask_key = None if mask is None else (mask.shape, mask.tobytes())
+            group_key = (image.shape, mask_key)
+            if group_key not in group_members:
+                group_members[group_key] = []
+            group_members[group_key].append(template)
+
+        template_group: dict[int, tuple[int, TemplateGroup]] = {}
+        for group_idx, member_list in enumerate(group_members.values()):
+            if len(member_list) < 2:
+                continue
+            group = self._get_template_group(source, member_list, template_type, ignore_template_mask)
+            for template in member_list:
+                template_group[id(template)] = (group_idx, group)
+
+        return [
+            template_group.get(id(template), (-1, None))
+            for template in template_info_list
+        ]
+
+    def _get_template_group(
+            self,
+            source: SourceSpectrum,
+            member_list: list[TemplateInfo],
+            template_type: str,
+            ignore_template_mask: bool,
+    ) -> TemplateGroup:
+        """
+        获取模板组 优先使用缓存 模板重新加载后缓存失效
+        """
+        member_list = sorted(member_list, key=lambda i: (i.sub_dir, i.template_id))
+        key = (
+            template_type, ignore_template_mask, source.fft_shape,
+            tuple((i.sub_dir, i.template_id) for i in member_list),
+        )
+
+        with self._group_cache_lock:
+            cache = self._group_cache.get(key)
+            if cache is not None and all(a is b for a, b in zip(cache[0], member_list)):
+                self._group_cache.move_to_end(key)
+                return cache[1]
+
+        group = TemplateGroup(
+            key_list=[(i.sub_dir, i.template_id) for i in member_list],
+            image_list=[i.get_image(template_type) for i in member_list],
+            mask=None if ignore_template_mask else member_list[0].mask,
+            fft_shape=source.fft_shape,
+        )
+
+        with self._group_cache_lock:
+            self._group_cache[key] = (member_list, group)
+            self._group_cache.move_to_end(key)
+            while len(self._group_cache) > self.max_group_cache_size:
+                self._group_cache.popitem(last=False)
+
+        return group
 
     def match_one_by_feature(self, source: MatLike,
                              template_sub_dir: str,
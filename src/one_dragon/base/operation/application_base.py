@@ -1,9 +1,10 @@
 from concurrent.futures import ThreadPoolExecutor
 
 from enum import Enum
-from typing import Optional, Callable
+from typing import Optional, Callable, List
 from io import BytesIO
 
+from one_dragon.base.config import yaml_operator
 from one_dragon.base.notify.push import Push
 from one_dragon.base.operation.application_run_record import AppRunRecord
 from one_dragon.base.operation.one_dragon_context import OneDragonContext
@@ -35,7 +36,8 @@ class Application(Operation):
                  run_record: Optional[AppRunRecord] = None,
                  need_ocr: bool = True,
                  retry_in_od: bool = False,
-                 need_notify: bool = False
+                 need_notify: bool = False,
+                 prewarm_template_sub_dirs: Optional[List[str]] = None,
                  ):
         super().__init__(ctx, node_max_retry_times=node_max_retry_times, op_name=op_name,
                          timeout_seconds=timeout_seconds,
@@ -64,6 +66,9 @@ class Application(Operation):
 
         self.notify_screenshot: Optional[BytesIO] = None  # 发送通知的截图
 
+        self.prewarm_template_sub_dirs: Optional[List[str]] = prewarm_template_sub_dirs
+        """运行前在后台预先加载的模板分类"""
+
     def _init_before_execute(self) -> None:
         Operation._init_before_execute(self)
         if self.run_record is not None:
@@ -89,6 +94,7 @@ class Application(Operation):
         """
         Operation.after_operation_done(self, result)
         self._update_record_after_stop(result)
+        yaml_operator.flush_all()  # 应用结束时 把运行记录等配置写入文件
         if self.stop_context_after_stop:
             self.ctx.stop_running()  # TODO 后续将这个调用移入 ApplicationRunContext
         self.ctx.dispatch_event(ApplicationEventId.APPLICATION_STOP.value, self.app_id)
@@ -167,6 +173,8 @@ class Application(Operation):
         """
         初始化
         """
+        if self.prewarm_template_sub_dirs:
+            self.ctx.template_loader.prewarm(self.prewarm_template_sub_dirs)
         if self.need_ocr:  # TODO 后续删除这个参数 OCR作为基础服务统一在ctx做初始化
             self.ctx.init_ocr()
         return True
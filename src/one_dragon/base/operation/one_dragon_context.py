@@ -1,8 +1,10 @@
 import logging
 from enum import Enum
 from pynput import keyboard, mouse
+from cv2.typing import MatLike
 from typing import Optional
 
+from one_dragon.base.config import yaml_operator
 from one_dragon.base.config.custom_config import CustomConfig, UILanguageEnum
 from one_dragon.base.config.game_account_config import GameAccountConfig
 from one_dragon.base.config.one_dragon_app_config import OneDragonAppConfig
@@ -17,9 +19,10 @@ from one_dragon.base.matcher.ocr.ocr_service import OcrService
 from one_dragon.base.matcher.template_matcher import TemplateMatcher
 from one_dragon.base.operation.context_event_bus import ContextEventBus
 from one_dragon.base.operation.one_dragon_env_context import OneDragonEnvContext, ONE_DRAGON_CONTEXT_EXECUTOR
+from one_dragon.base.screen import template_atlas
 from one_dragon.base.screen.screen_loader import ScreenContext
 from one_dragon.base.screen.template_loader import TemplateLoader
-from one_dragon.utils import debug_utils, i18_utils, log_utils
+from one_dragon.utils import debug_utils, i18_utils, log_utils, os_utils
 from one_dragon.utils import thread_utils
 from one_dragon.utils.i18_utils import gt
 from one_dragon.utils.log_utils import log
@@ -56,6 +59,8 @@ class ContextInstanceEventEnum(Enum):
 class OneDragonContext(ContextEventBus, OneDragonEnvContext):
 
     def __init__(self, controller: Optional[ControllerBase] = None):
+        yaml_operator.enable_disk_cache(os_utils.get_path_under_work_dir('.cache', 'yaml'))
+        yaml_operator.enable_write_behind(1)
         ContextEventBus.__init__(self)
         OneDragonEnvContext.__init__(self)
 
@@ -70,7 +75,7 @@ class OneDragonContext(ContextEventBus, OneDragonEnvContext):
         self.context_running_state: ContextRunStateEnum = ContextRunStateEnum.STOP
 
         self.screen_loader: ScreenContext = ScreenContext()
-        self.template_loader: TemplateLoader = TemplateLoader()
+        self.template_loader: TemplateLoader = TemplateLoader(atlas_path=template_atlas.get_template_atlas_path())
         self.tm: TemplateMatcher = TemplateMatcher(self.template_loader)
         self.ocr: OcrMatcher = OnnxOcrMatcher(
             OnnxOcrParam(
@@ -239,10 +244,20 @@ class OneDragonContext(ContextEventBus, OneDragonEnvContext):
 
         # 初始化OCR缓存服务
         if self.ocr_service is None:
-            self.ocr_service = OcrService(ocr_matcher=self.ocr)
+            self.ocr_service = OcrService(ocr_matcher=self.ocr, frame_version_getter=self.get_frame_version)
         else:
             self.ocr_service.ocr_matcher = self.ocr
 
+    def get_frame_version(self, image: MatLike) -> int | None:
+        """
+        获取截图的版本 版本相同的截图内容一致
+        :param image: 截图
+        :return: 不是控制器最近的截图时返回None
+        """
+        if self.controller is None:
+            return None
+        return self.controller.frame_change_detector.get_version(image)
+
     def after_app_shutdown(self) -> None:
         """
         App关闭后进行的操作 关闭一切可能资源操作
@@ -251,5 +266,6 @@ class OneDragonContext(ContextEventBus, OneDragonEnvContext):
         self.btn_listener.stop()
         self.one_dragon_config.clear_temp_instance_indices()
         self.one_dragon_app_config.clear_temp_app_run_list()
+        yaml_operator.flush_all()
         ContextEventBus.after_app_shutdown(self)
         OneDragonEnvContext.after_app_shutdown(self)
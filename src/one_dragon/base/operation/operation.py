@@ -938,7 +938,8 @@ class Operation(OperationBase):
             ocr_result_map = self.ctx.ocr_service.get_ocr_result_map(
                 image=screen,
                 color_range=color_range,
-                rect=area.rect if area is not None else None
+                rect=area.rect if area is not None else None,
+                crop_first=self.ctx.env_config.ocr_area_mode,
             )
         else:
             # 回退到原有方法
@@ -976,7 +977,7 @@ class Operation(OperationBase):
         if to_click is None:
             return self.round_retry(f'找不到 {target_cn}', wait=retry_wait, wait_round_time=retry_wait_round)
 
-        if area is not None:
+        if area is not None and not self.ctx.env_config.ocr_cache:  # OCR缓存服务的结果已经是全图坐标
             to_click = to_click + area.left_top
 
         if offset is not None:
@@ -1024,7 +1025,8 @@ class Operation(OperationBase):
             ocr_result_map = self.ctx.ocr_service.get_ocr_result_map(
                 image=screen,
                 color_range=color_range,
-                rect=area.rect if area is not None else None
+                rect=area.rect if area is not None else None,
+                crop_first=self.ctx.env_config.ocr_area_mode,
             )
         else:
             # 回退到原有方法
@@ -1045,7 +1047,7 @@ class Operation(OperationBase):
         if match_word is not None and match_word_mrl is not None and match_word_mrl.max is not None:
             to_click = match_word_mrl.max.center
 
-            if area is not None:
+            if area is not None and not self.ctx.env_config.ocr_cache:  # OCR缓存服务的结果已经是全图坐标
                 to_click = to_click + area.left_top
 
             if offset is not None:
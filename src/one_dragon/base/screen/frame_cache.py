@@ -0,0 +1,183 @@
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.utils import cv2_utils
+
+
+@dataclass
+class FrameCacheStats:
+    """单帧缓存的统计信息"""
+    hit_count: int  # 命中次数
+    miss_count: int  # 计算次数
+    compute_time: float  # 计算总耗时 秒
+
+
+class FrameCache:
+
+    def __init__(self, screen: MatLike, screenshot_time: float = 0):
+        """
+        一张截图的预处理结果缓存 在同一帧的多个识别中共享
+        灰度图、HSV、裁剪、颜色掩码等按 操作+区域 作为key 每个key只计算一次
+        多个线程同时请求同一个key时 只有一个线程计算 其余等待结果
+
+        缓存的结果是共享的 使用方不能修改 计算出来的图片会设置为只读
+        :param screen: 游戏截图
+        :param screenshot_time: 截图时间
+        """
+        self.screen: MatLike = screen
+        self.screenshot_time: float = screenshot_time
+
+        self._cache: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        self.hit_count: int = 0
+        self.miss_count: int = 0
+        self.compute_time: float = 0
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        获取缓存结果 不存在时计算
+        :param key: 操作+参数 需要能唯一确定结果
+        :param compute: 计算方法
+        :return: 计算结果
+        """
+        with self._lock:
+            future = self._cache.get(key)
+            if future is None:
+                future = Future()
+                self._cache[key] = future
+                self.miss_count += 1
+                owner = True
+            else:
+                self.hit_count += 1
+                owner = False
+
+        if not owner:
+            return future.result()
+
+        start_time = time.perf_counter()
+        try:
+            result = compute()
+        except Exception as e:
+            future.set_exception(e)
+            with self._lock:
+                self._cache.pop(key, None)  # 出错时不缓存 下次重新计算
+            raise
+
+        if isinstance(result, np.ndarray) and result.base is None:
+            result.flags.writeable = False
+        future.set_result(result)
+
+        with self._lock:
+            self.compute_time += time.perf_counter() - start_time
+        return result
+
+    @staticmethod
+    def get_rect_key(rect: Optional[Rect]) -> Optional[tuple[int, int, int, int]]:
+        """
+        区域在缓存key中的表示
+        :param rect: 区域
+        :return:
+        """
+        return None if rect is None else (rect.x1, rect.y1, rect.x2, rect.y2)
+
+    def crop(self, rect: Optional[Rect]) -> MatLike:
+        """
+        裁剪区域 返回的是截图的视图
+        :param rect: 区域 None 时为整张截图
+        :return:
+        """
+        if rect is None:
+            return self.screen
+        return self.get(('crop', self.get_rect_key(rect)),
+                        lambda: cv2_utils.crop_image_only(self.screen, rect))
+
+    def crop_with_mask(self, rect: Optional[Rect], mask: MatLike, mask_key: Hashable) -> MatLike:
+        """
+        裁剪区域后 只保留掩码部分
+        :param rect: 区域
+        :param mask: 掩码 需要与区域大小一致
+        :param mask_key: 掩码的标识 例如模板的 (sub_dir, template_id)
+        :return:
+        """
+        def _compute():
+            part = self.crop(rect)
+            return cv2.bitwise_and(part, part, mask=mask)
+
+        return self.get(('crop_with_mask', self.get_rect_key(rect), mask_key), _compute)
+
+    def gray(self, rect: Optional[Rect] = None) -> MatLike:
+        """
+        区域的灰度图
+        :param rect: 区域 None 时为整张截图
+        :return:
+        """
+        return self.get(('gray', self.get_rect_key(rect)),
+                        lambda: cv2.cvtColor(self.crop(rect), cv2.COLOR_RGB2GRAY))
+
+    def hsv(self, rect: Optional[Rect] = None) -> MatLike:
+        """
+        区域的HSV图
+        :param rect: 区域 None 时为整张截图
+        :return:
+        """
+        return self.get(('hsv', self.get_rect_key(rect)),
+                        lambda: cv2.cvtColor(self.crop(rect), cv2.COLOR_RGB2HSV))
+
+    def color_mask(self, rect: Optional[Rect], mode: str,
+                   lower_rgb=None, upper_rgb=None,
+                   hsv_color=None, hsv_diff=None,
+                   mask: Optional[MatLike] = None, mask_key: Hashable = None) -> MatLike:
+        """
+        区域的颜色过滤结果 参数与 cv2_utils.filter_by_color 一致
+        :param rect: 区域 None 时为整张截图
+        :param mode: 颜色模式 'rgb' 或 'hsv'
+        :param lower_rgb: RGB下限
+        :param upper_rgb: RGB上限
+        :param hsv_color: HSV基准颜色
+        :param hsv_diff: HSV颜色容差
+        :param mask: 先使用掩码保留部分区域
+        :param mask_key: 掩码的标识
+        :return: 二值化的掩码
+        """
+        def _to_key(color) -> Optional[tuple]:
+            if color is None:
+                return None
+            return tuple(int(i) for i in np.atleast_1d(color))
+
+        key = ('color_mask', self.get_rect_key(rect), mode,
+               _to_key(lower_rgb), _to_key(upper_rgb), _to_key(hsv_color), _to_key(hsv_diff),
+               mask_key if mask is not None else None)
+
+        def _compute():
+            if mask is not None:
+                image = self.crop_with_mask(rect, mask, mask_key)
+                hsv_image = None
+            else:
+                image = self.crop(rect)
+                hsv_image = self.hsv(rect) if mode == 'hsv' else None
+            return cv2_utils.filter_by_color(image, mode=mode,
+                                             lower_rgb=lower_rgb, upper_rgb=upper_rgb,
+                                             hsv_color=hsv_color, hsv_diff=hsv_diff,
+                                             hsv_image=hsv_image)
+
+        return self.get(key, _compute)
+
+    def get_stats(self) -> FrameCacheStats:
+        """
+        :return: 统计信息
+        """
+        with self._lock:
+            return FrameCacheStats(
+                hit_count=self.hit_count,
+                miss_count=self.miss_count,
+                compute_time=self.compute_time,
+            )
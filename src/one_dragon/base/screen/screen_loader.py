@@ -1,9 +1,12 @@
+import heapq
 import os
+import threading
 from cv2.typing import MatLike
 from typing import Optional
 
 from one_dragon.base.screen.screen_area import ScreenArea
 from one_dragon.base.screen.screen_info import ScreenInfo
+from one_dragon.base.screen.screen_match_index import ScreenMatchIndex, ScreenAreaResultMemo
 from one_dragon.utils.log_utils import log
 
 
@@ -47,7 +50,20 @@ class ScreenContext:
         self.screen_info_list: list[ScreenInfo] = []
         self.screen_info_map: dict[str, ScreenInfo] = {}
         self._screen_area_map: dict[str, ScreenArea] = {}
-        self.screen_route_map: dict[str, dict[str, ScreenRoute]] = {}
+        # 画面的跳转关系 key=画面名称 value=[(点击区域, 目标画面)]
+        self._screen_edge_map: dict[str, list[tuple[str, str]]] = {}
+        # 跳转的耗时 key=(出发画面, 点击区域, 目标画面) 没有设置的默认为1
+        self._screen_edge_weight: dict[tuple[str, str, str], float] = {}
+        # 已计算的路径 key=出发画面 value=到各个画面的路径
+        self._screen_route_cache: dict[str, dict[str, ScreenRoute]] = {}
+        # 计算路径时用到的画面 key=出发画面 这些画面的跳转关系变化时需要重新计算
+        self._screen_route_depend: dict[str, set[str]] = {}
+        self._screen_route_lock = threading.Lock()
+        # 画面判断结果 key=画面名称 value=(截图版本, 是否目标画面) 画面区域没有变化时复用
+        self.screen_match_cache: dict[str, tuple[int, bool]] = {}
+        # 画面识别的索引 和 同一张截图内的区域识别结果
+        self.screen_match_index: ScreenMatchIndex = ScreenMatchIndex([])
+        self.area_result_memo: ScreenAreaResultMemo = ScreenAreaResultMemo()
 
         self.load_all()
         self.last_screen_name: Optional[str] = None  # 上一个画面名字
@@ -61,6 +77,8 @@ class ScreenContext:
         self.screen_info_list.clear()
         self.screen_info_map.clear()
         self._screen_area_map.clear()
+        self.screen_match_cache.clear()
+        self.area_result_memo.clear()
 
         dir_path = ScreenInfo.get_dir_path()
         for file_name in os.listdir(dir_path):
@@ -73,6 +91,7 @@ class ScreenContext:
                 for screen_area in screen_info.area_list:
                     self._screen_area_map[f'{screen_info.screen_name}.{screen_area.area_name}'] = screen_area
 
+        self.screen_match_index = ScreenMatchIndex(self.screen_info_list)
         self.init_screen_route()
 
     def get_screen(self, screen_name: str) -> ScreenInfo:
@@ -94,83 +113,135 @@ class ScreenContext:
 
     def init_screen_route(self) -> None:
         """
-        初始化画面间的跳转路径
+        初始化画面间的跳转关系 具体路径在使用时才计算
+        只有跳转关系发生变化的画面 才会清除相关的路径缓存
         :return:
         """
-        # 先对任意两个画面之间做初始化
-        for screen_1 in self.screen_info_list:
-            self.screen_route_map[screen_1.screen_name] = {}
-            for screen_2 in self.screen_info_list:
-                self.screen_route_map[screen_1.screen_name][screen_2.screen_name] = ScreenRoute(
-                    from_screen=screen_1.screen_name,
-                    to_screen=screen_2.screen_name
-                )
-
-        # 根据画面的goto_list来初始化边
+        edge_map: dict[str, list[tuple[str, str]]] = {}
         for screen_info in self.screen_info_list:
+            edge_list: list[tuple[str, str]] = []
             for area in screen_info.area_list:
                 if area.goto_list is None or len(area.goto_list) == 0:
                     continue
-                from_screen_route = self.screen_route_map[screen_info.screen_name]
-                if from_screen_route is None:
-                    log.error('画面路径没有初始化 %s', screen_info.screen_name)
-                    continue
                 for goto_screen_name in area.goto_list:
-                    if goto_screen_name not in from_screen_route:
+                    if goto_screen_name not in self.screen_info_map:
                         log.error('画面路径 %s -> %s 无法找到目标画面', screen_info.screen_name, goto_screen_name)
-                        continue
-                    from_screen_route[goto_screen_name].node_list.append(
-                        ScreenRouteNode(
-                            from_screen=screen_info.screen_name,
-                            from_area=area.area_name,
-                            to_screen=goto_screen_name
-                        )
-                    )
-
-        # Floyd算出任意两个画面之间的路径
-        screen_len = len(self.screen_info_list)
-        for k in range(screen_len):
-            screen_k = self.screen_info_list[k]
-            for i in range(screen_len):
-                if i == k:
-                    continue
-                screen_i = self.screen_info_list[i]
+                    edge_list.append((area.area_name, goto_screen_name))
+            edge_map[screen_info.screen_name] = edge_list
 
-                route_ik: ScreenRoute = self.screen_route_map[screen_i.screen_name][screen_k.screen_name]
-                if not route_ik.can_go:  # 无法从 i 到 k
-                    continue
+        # 新增、删除、跳转关系有变化的画面
+        changed_screen_set: set[str] = set()
+        for screen_name in edge_map.keys() | self._screen_edge_map.keys():
+            if edge_map.get(screen_name) != self._screen_edge_map.get(screen_name):
+                changed_screen_set.add(screen_name)
 
-                for j in range(screen_len):
-                    if k == j or i == j:
-                        continue
-                    screen_j = self.screen_info_list[j]
+        with self._screen_route_lock:
+            self._screen_edge_map = edge_map
+            self._invalidate_screen_route(changed_screen_set)
 
-                    route_kj: ScreenRoute = self.screen_route_map[screen_k.screen_name][screen_j.screen_name]
-                    if not route_kj.can_go:  # 无法从 k 到 j
-                        continue
-
-                    route_ij: ScreenRoute = self.screen_route_map[screen_i.screen_name][screen_j.screen_name]
-
-                    if (not route_ij.can_go  # 当前无法从 i 到 j
-                        or len(route_ik.node_list) + len(route_kj.node_list) < len(route_ij.node_list)  # 新的更短
-                    ):
-                        route_ij.node_list = []
-                        for node_ik in route_ik.node_list:
-                            route_ij.node_list.append(node_ik)
-                        for node_kj in route_kj.node_list:
-                            route_ij.node_list.append(node_kj)
+    def _invalidate_screen_route(self, changed_screen_set: set[str]) -> None:
+        """
+        清除受影响的路径缓存 需要在锁内调用
+        :param changed_screen_set: 跳转关系有变化的画面
+        :return:
+        """
+        if len(changed_screen_set) == 0:
+            return
+        for from_screen in list(self._screen_route_cache.keys()):
+            if self._screen_route_depend.get(from_screen, set()) & changed_screen_set:
+                self._screen_route_cache.pop(from_screen, None)
+                self._screen_route_depend.pop(from_screen, None)
+
+    def set_screen_route_weight(self, from_screen: str, from_area: str, to_screen: str,
+                                weight: Optional[float]) -> None:
+        """
+        设置一次跳转的耗时 例如实际测量的跳转时间 计算路径时优先选择总耗时最少的
+        :param from_screen: 出发画面
+        :param from_area: 点击区域
+        :param to_screen: 目标画面
+        :param weight: 耗时 传入None时恢复默认值
+        :return:
+        """
+        key = (from_screen, from_area, to_screen)
+        with self._screen_route_lock:
+            if weight is None:
+                self._screen_edge_weight.pop(key, None)
+            elif weight < 0:
+                log.error('画面路径 %s -> %s 耗时不能为负数 %s', from_screen, to_screen, weight)
+                return
+            else:
+                self._screen_edge_weight[key] = weight
+            self._invalidate_screen_route({from_screen})
+
+    def _cal_screen_route(self, from_screen: str) -> dict[str, ScreenRoute]:
+        """
+        使用 Dijkstra 计算从一个画面出发 到其它所有画面的路径 需要在锁内调用
+        耗时相同时 优先使用区域列表中靠前的区域
+        :param from_screen: 出发画面
+        :return: key=目标画面 value=路径 只包含可以到达的画面
+        """
+        dist: dict[str, float] = {from_screen: 0}
+        prev: dict[str, ScreenRouteNode] = {}
+        visited: set[str] = set()
+        depend: set[str] = {from_screen}
+
+        seq = 0
+        queue: list[tuple[float, int, str]] = [(0, seq, from_screen)]
+        while len(queue) > 0:
+            current_dist, _, current_screen = heapq.heappop(queue)
+            if current_screen in visited:
+                continue
+            visited.add(current_screen)
+
+            for area_name, to_screen in self._screen_edge_map.get(current_screen, []):
+                depend.add(to_screen)
+                if to_screen not in self.screen_info_map:
+                    continue
+                weight = self._screen_edge_weight.get((current_screen, area_name, to_screen), 1)
+                new_dist = current_dist + weight
+                if to_screen in dist and new_dist >= dist[to_screen]:
+                    continue
+                dist[to_screen] = new_dist
+                prev[to_screen] = ScreenRouteNode(
+                    from_screen=current_screen,
+                    from_area=area_name,
+                    to_screen=to_screen
+                )
+                seq += 1
+                heapq.heappush(queue, (new_dist, seq, to_screen))
+
+        route_map: dict[str, ScreenRoute] = {}
+        for to_screen, node in prev.items():
+            route = ScreenRoute(from_screen=from_screen, to_screen=to_screen)
+            while True:
+                route.node_list.append(node)
+                if node.from_screen == from_screen:
+                    break
+                node = prev[node.from_screen]
+            route.node_list.reverse()
+            route_map[to_screen] = route
+
+        self._screen_route_depend[from_screen] = depend
+        return route_map
 
     def get_screen_route(self, from_screen: str, to_screen: str) -> Optional[ScreenRoute]:
         """
-        获取两个画面之间的
-        :param from_screen:
-        :param to_screen:
-        :return:
+        获取两个画面之间的路径 第一次获取时计算出发画面到所有画面的路径并缓存
+        :param from_screen: 出发画面
+        :param to_screen: 目标画面
+        :return: 画面不存在时返回None
         """
-        from_route = self.screen_route_map.get(from_screen, None)
-        if from_route is None:
+        if from_screen not in self.screen_info_map or to_screen not in self.screen_info_map:
             return None
-        return from_route.get(to_screen, None)
+        with self._screen_route_lock:
+            route_map = self._screen_route_cache.get(from_screen)
+            if route_map is None:
+                route_map = self._cal_screen_route(from_screen)
+                self._screen_route_cache[from_screen] = route_map
+        route = route_map.get(to_screen, None)
+        if route is None:  # 无法到达
+            route = ScreenRoute(from_screen=from_screen, to_screen=to_screen)
+        return route
 
     def update_current_screen_name(self, screen_name: str) -> None:
         """
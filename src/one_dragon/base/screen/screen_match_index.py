@@ -0,0 +1,170 @@
+import threading
+from typing import Callable, Optional
+
+from cv2.typing import MatLike
+
+from one_dragon.base.screen.screen_area import ScreenArea
+from one_dragon.base.screen.screen_info import ScreenInfo
+
+
+def get_area_match_key(area: ScreenArea) -> tuple:
+    """
+    区域识别的唯一标识 识别方式和参数一致的区域 在同一张截图上的结果也一致
+    不同画面中配置相同的区域 可以共用识别结果
+    :param area: 区域
+    :return:
+    """
+    rect = area.rect
+    return (
+        rect.x1, rect.y1, rect.x2, rect.y2,
+        area.text if area.is_text_area else None,
+        area.lcs_percent if area.is_text_area else None,
+        str(area.color_range) if area.is_text_area else None,
+        area.template_sub_dir if area.is_template_area else None,
+        area.template_id if area.is_template_area else None,
+        area.template_match_threshold if area.is_template_area else None,
+    )
+
+
+def get_area_match_cost(area: ScreenArea) -> tuple:
+    """
+    区域识别的大致耗时 用于排序
+    模板匹配远快于OCR 同类型的按区域面积比较
+    :param area: 区域
+    :return:
+    """
+    return 0 if area.is_template_area else 1, area.rect.area
+
+
+class ScreenMatchIndex:
+
+    def __init__(self, screen_info_list: list[ScreenInfo]):
+        """
+        画面识别的索引
+        预先整理每个画面的标识区域 按识别耗时从低到高排列
+        判断单个画面时 标识区域只要有一个不满足就可以提前结束 先判断便宜的区域能更快地排除
+        在多个画面中查找时 不同画面中相同的区域使用同一个标识 见 match_screen
+        :param screen_info_list: 画面列表
+        """
+        # key=画面名称 value=[(区域标识, 区域)] 按识别耗时排序
+        self._screen_area_map: dict[str, list[tuple[tuple, ScreenArea]]] = {}
+        self._screen_info_map: dict[str, ScreenInfo] = {}
+
+        for screen_info in screen_info_list:
+            self._screen_area_map[screen_info.screen_name] = self._build_id_mark_area_list(screen_info)
+            self._screen_info_map[screen_info.screen_name] = screen_info
+
+    @staticmethod
+    def _build_id_mark_area_list(screen_info: ScreenInfo) -> list[tuple[tuple, ScreenArea]]:
+        """
+        整理画面的标识区域 相同的区域只保留一个
+        """
+        area_map: dict[tuple, ScreenArea] = {}
+        for area in screen_info.area_list:
+            if not area.id_mark:
+                continue
+            key = get_area_match_key(area)
+            if key not in area_map:
+                area_map[key] = area
+
+        return sorted(area_map.items(), key=lambda i: get_area_match_cost(i[1]))
+
+    def get_id_mark_area_list(self, screen_info: ScreenInfo) -> list[tuple[tuple, ScreenArea]]:
+        """
+        获取画面的标识区域 按识别耗时排序
+        开发工具中编辑过的画面不在索引中 会重新整理
+        :param screen_info: 画面
+        :return: [(区域标识, 区域)]
+        """
+        if self._screen_info_map.get(screen_info.screen_name) is screen_info:
+            return self._screen_area_map[screen_info.screen_name]
+        return self._build_id_mark_area_list(screen_info)
+
+    def match_screen(
+            self,
+            screen_info_list: list[ScreenInfo],
+            area_result_map: dict[tuple, bool],
+            find_area: Callable[[ScreenArea], bool],
+    ) -> Optional[ScreenInfo]:
+        """
+        在多个画面中 找到第一个标识区域全部满足的画面 结果与按顺序逐个判断一致
+        不再逐个画面识别 而是在剩余的候选画面中 每次选择识别耗时最低、且需要它的画面数量最接近一半的区域
+        区域不满足时 排除所有需要这个区域的画面 区域满足时 需要它的画面都少了一个待识别区域
+        候选画面每次调用都不同 (按上次画面排序、只判断部分画面) 所以不预先构建固定的决策树 而是每次按剩余画面选择
+        :param screen_info_list: 候选画面 按优先级排列
+        :param area_result_map: 同一张截图内已有的区域识别结果 新的识别结果也会写入
+        :param find_area: 识别单个区域的方法
+        :return: 匹配的画面
+        """
+        area_map: dict[tuple, ScreenArea] = {}
+        # [(画面, 未识别的区域标识)] 保持优先级顺序
+        candidate_list: list[tuple[ScreenInfo, set[tuple]]] = []
+        for screen_info in screen_info_list:
+            id_mark_area_list = self.get_id_mark_area_list(screen_info)
+            if len(id_mark_area_list) == 0:  # 没有标识区域的画面 不会被匹配
+                continue
+            if any(area_result_map.get(key) is False for key, _ in id_mark_area_list):
+                continue
+            pending_key_set: set[tuple] = set()
+            for key, area in id_mark_area_list:
+                if key not in area_result_map:
+                    pending_key_set.add(key)
+                    area_map[key] = area
+            candidate_list.append((screen_info, pending_key_set))
+
+        while len(candidate_list) > 0:
+            if len(candidate_list[0][1]) == 0:  # 优先级最高的画面已经全部满足
+                return candidate_list[0][0]
+
+            # 统计每个区域被多少个剩余画面需要
+            count_map: dict[tuple, int] = {}
+            for _, pending_key_set in candidate_list:
+                for key in pending_key_set:
+                    count_map[key] = count_map.get(key, 0) + 1
+
+            total = len(candidate_list)
+
+            def split_cost(k: tuple) -> tuple:
+                cost_type, cost_area = get_area_match_cost(area_map[k])
+                return cost_type, abs(count_map[k] * 2 - total), cost_area
+
+            key = min(count_map.keys(), key=split_cost)
+            find = find_area(area_map[key])
+            area_result_map[key] = find
+
+            if find:
+                for _, pending_key_set in candidate_list:
+                    pending_key_set.discard(key)
+            else:
+                candidate_list = [i for i in candidate_list if key not in i[1]]
+
+        return None
+
+
+class ScreenAreaResultMemo:
+
+    def __init__(self):
+        """
+        同一张截图内 区域识别结果的记录
+        多次判断画面时 相同的区域只识别一次
+        """
+        self._screen: Optional[MatLike] = None  # 持有引用 保证不会被回收后复用id
+        self._result_map: dict[tuple, bool] = {}
+        self._lock = threading.Lock()
+
+    def get_result_map(self, screen: MatLike) -> dict[tuple, bool]:
+        """
+        获取截图对应的识别结果 截图更换后清空
+        :param screen: 截图
+        :return: key=区域标识 value=是否找到
+        """
+        with self._lock:
+            if screen is not self._screen:
+                self._screen = screen
+                self._result_map = {}
+            return self._result_map
+
+    def clear(self) -> None:
+        with self._lock:
+            self._screen = None
+            self._result_map = {}
@@ -57,7 +57,8 @@ def find_area_in_screen(ctx: OneDragonContext, screen: MatLike, area: ScreenArea
             ocr_result_map = ctx.ocr_service.get_ocr_result_map(
                 image=screen,
                 color_range=area.color_range,
-                rect=area.rect
+                rect=area.rect,
+                crop_first=ctx.env_config.ocr_area_mode,
             )
         else:
             rect = area.rect
@@ -102,18 +103,30 @@ def find_and_click_area(ctx: OneDragonContext, screen: MatLike, screen_name: str
     if area is None:
         return OcrClickResultEnum.AREA_NO_CONFIG
     if area.is_text_area:
-        rect = area.rect
-        to_ocr_part = cv2_utils.crop_image_only(screen, rect)
-        if area.color_range is not None:
-            mask = cv2.inRange(to_ocr_part, area.color_range_lower, area.color_range_upper)
-            mask = cv2_utils.dilate(mask, 5)
-            to_ocr_part = cv2.bitwise_and(to_ocr_part, to_ocr_part, mask=mask)
-        # cv2_utils.show_image(to_ocr_part, win_name='debug', wait=1)
-
-        ocr_result_map = ctx.ocr.run_ocr(to_ocr_part)
+        if ctx.env_config.ocr_cache and ctx.env_config.ocr_area_mode:
+            # 区域模式的结果已经是全图坐标
+            ocr_result_map = ctx.ocr_service.get_ocr_result_map(
+                image=screen,
+                color_range=area.color_range,
+                rect=area.rect,
+                crop_first=True,
+            )
+            offset = Point(0, 0)
+        else:
+            rect = area.rect
+            to_ocr_part = cv2_utils.crop_image_only(screen, rect)
+            if area.color_range is not None:
+                mask = cv2.inRange(to_ocr_part, area.color_range_lower, area.color_range_upper)
+                mask = cv2_utils.dilate(mask, 5)
+                to_ocr_part = cv2.bitwise_and(to_ocr_part, to_ocr_part, mask=mask)
+            # cv2_utils.show_image(to_ocr_part, win_name='debug', wait=1)
+
+            ocr_result_map = ctx.ocr.run_ocr(to_ocr_part)
+            offset = area.left_top
+
         for ocr_result, mrl in ocr_result_map.items():
             if str_utils.find_by_lcs(gt(area.text, 'game'), ocr_result, percent=area.lcs_percent):
-                to_click = mrl.max.center + area.left_top
+                to_click = mrl.max.center + offset
                 if ctx.controller.click(to_click, pc_alt=area.pc_alt):
                     return OcrClickResultEnum.OCR_CLICK_SUCCESS
                 else:
@@ -146,24 +159,22 @@ def get_match_screen_name(ctx: OneDragonContext, screen: MatLike, screen_name_li
     :return: 画面名字
     """
     if screen_name_list is not None:
-        for screen_info in ctx.screen_loader.screen_info_list:
-            if screen_info.screen_name not in screen_name_list:
-                continue
-            if is_target_screen(ctx, screen, screen_info=screen_info):
-                return screen_info.screen_name
+        return match_screen_in_list(ctx, screen, [
+            screen_info
+            for screen_info in ctx.screen_loader.screen_info_list
+            if screen_info.screen_name in screen_name_list
+        ])
     elif ctx.screen_loader.current_screen_name is not None or ctx.screen_loader.last_screen_name is not None:
         return get_match_screen_name_from_last(ctx, screen)
     else:
-        for screen_info in ctx.screen_loader.screen_info_list:
-            if is_target_screen(ctx, screen, screen_info=screen_info):
-                return screen_info.screen_name
-
-    return None
+        return match_screen_in_list(ctx, screen, ctx.screen_loader.screen_info_list)
 
 
 def get_match_screen_name_from_last(ctx: OneDragonContext, screen: MatLike) -> str | None:
     """
     根据游戏截图 从上次记录的画面开始 匹配一个最合适的画面
+    上次的画面大概率不变 先单独判断 画面没变化时可以直接使用缓存
+    其余画面按跳转关系的广度优先顺序排列 再一起判断
     :param ctx: 上下文
     :param screen: 游戏截图
     :return: 画面名字
@@ -172,21 +183,19 @@ def get_match_screen_name_from_last(ctx: OneDragonContext, screen: MatLike) -> s
 
     if ctx.screen_loader.current_screen_name is not None:  # 如果有记录上次所在画面 则从这个画面开始搜索
         bfs_list.append(ctx.screen_loader.current_screen_name)
-    if ctx.screen_loader.last_screen_name is not None:
+    if ctx.screen_loader.last_screen_name is not None and ctx.screen_loader.last_screen_name not in bfs_list:
         bfs_list.append(ctx.screen_loader.last_screen_name)
 
     if len(bfs_list) == 0:
         return None
 
+    if is_target_screen(ctx, screen, screen_name=bfs_list[0]):
+        return bfs_list[0]
+
     bfs_idx = 0
     while bfs_idx < len(bfs_list):
-        current_screen_name = bfs_list[bfs_idx]
+        screen_info = ctx.screen_loader.get_screen(bfs_list[bfs_idx])
         bfs_idx += 1
-
-        if is_target_screen(ctx, screen, screen_name=current_screen_name):
-            return current_screen_name
-
-        screen_info = ctx.screen_loader.get_screen(current_screen_name)
         if screen_info is None:
             continue
         for area in screen_info.area_list:
@@ -196,14 +205,79 @@ def get_match_screen_name_from_last(ctx: OneDragonContext, screen: MatLike) -> s
                 if goto_screen not in bfs_list:
                     bfs_list.append(goto_screen)
 
-    # 最后 尝试搜索中没有出现的画面
+    # 最后 加上搜索中没有出现的画面
+    screen_info_list = []
+    for screen_name in bfs_list[1:]:
+        screen_info = ctx.screen_loader.get_screen(screen_name)
+        if screen_info is not None:
+            screen_info_list.append(screen_info)
     for screen_info in ctx.screen_loader.screen_info_list:
-        if screen_info.screen_name in bfs_list:
+        if screen_info.screen_name not in bfs_list:
+            screen_info_list.append(screen_info)
+
+    return match_screen_in_list(ctx, screen, screen_info_list)
+
+
+def match_screen_in_list(ctx: OneDragonContext, screen: MatLike, screen_info_list: List[ScreenInfo]) -> Optional[str]:
+    """
+    根据游戏截图 在多个画面中找到第一个匹配的画面
+    不同画面共用的区域只识别一次 识别顺序由 ScreenMatchIndex.match_screen 跨画面安排
+    :param ctx: 上下文
+    :param screen: 游戏截图
+    :param screen_info_list: 候选画面 按优先级排列
+    :return: 画面名字
+    """
+    match_index = ctx.screen_loader.screen_match_index
+    area_result_map = ctx.screen_loader.area_result_memo.get_result_map(screen)
+
+    candidate_list: List[ScreenInfo] = []
+    version: Optional[int] = None
+    for screen_info in screen_info_list:
+        id_mark_area_list = match_index.get_id_mark_area_list(screen_info)
+        version, cache_result = _get_screen_match_cache(ctx, screen, screen_info, id_mark_area_list)
+        if cache_result is False:
             continue
-        if is_target_screen(ctx, screen, screen_info=screen_info):
-            return screen_info.screen_name
+        if cache_result is True:  # 区域没有变化 上次全部满足
+            for key, _ in id_mark_area_list:
+                area_result_map.setdefault(key, True)
+        candidate_list.append(screen_info)
+
+    matched = match_index.match_screen(
+        candidate_list,
+        area_result_map,
+        lambda area: find_area_in_screen(ctx, screen, area) == FindAreaResultEnum.TRUE,
+    )
+    if matched is None:
+        return None
+
+    if version is not None:
+        ctx.screen_loader.screen_match_cache[matched.screen_name] = (version, True)
+    return matched.screen_name
+
+
+def _get_screen_match_cache(ctx: OneDragonContext, screen: MatLike, screen_info: ScreenInfo,
+                            id_mark_area_list: List[tuple[tuple, ScreenArea]]) -> tuple[Optional[int], Optional[bool]]:
+    """
+    截图的标识区域和上次判断时一致 返回上次的结果
+    :param ctx: 上下文
+    :param screen: 游戏截图
+    :param screen_info: 目标画面信息
+    :param id_mark_area_list: 目标画面的标识区域
+    :return: (截图版本, 上次的结果) 没有可用的结果时为None
+    """
+    detector = ctx.controller.frame_change_detector if ctx.controller is not None else None
+    version = detector.get_version(screen) if detector is not None else None
+    if version is None:
+        return None, None
+
+    cache = ctx.screen_loader.screen_match_cache.get(screen_info.screen_name)
+    if cache is not None and all(
+            detector.is_rect_unchanged(area.rect, min(cache[0], version))
+            for _, area in id_mark_area_list
+    ):
+        return version, cache[1]
+    return version, None
 
-    return None
 
 def is_target_screen(ctx: OneDragonContext, screen: MatLike,
                      screen_name: Optional[str] = None,
@@ -223,18 +297,71 @@ def is_target_screen(ctx: OneDragonContext, screen: MatLike,
         if screen_info is None:
             return False
 
+    # 标识区域已按识别耗时排序 模板匹配在前 OCR在后
+    id_mark_area_list = ctx.screen_loader.screen_match_index.get_id_mark_area_list(screen_info)
+
+    # 截图的标识区域和上次判断时一致 直接复用上次的结果
+    version, cache_result = _get_screen_match_cache(ctx, screen, screen_info, id_mark_area_list)
+    if cache_result is not None:
+        return cache_result
+
+    # 同一张截图内 其它画面已经识别过的相同区域 直接使用结果
+    area_result_map = ctx.screen_loader.area_result_memo.get_result_map(screen)
+    if any(area_result_map.get(key) is False for key, _ in id_mark_area_list):
+        result = False
+        if version is not None:
+            ctx.screen_loader.screen_match_cache[screen_info.screen_name] = (version, result)
+        return result
+
+    if ctx.env_config.ocr_cache and ctx.env_config.ocr_area_mode:
+        prefetch_text_area(ctx, screen, [area for key, area in id_mark_area_list if key not in area_result_map])
+
     existed_id_mark: bool = False
     fit_id_mark: bool = True
-    for screen_area in screen_info.area_list:
-        if not screen_area.id_mark:
-            continue
+    for key, screen_area in id_mark_area_list:
         existed_id_mark = True
 
-        if find_area_in_screen(ctx, screen, screen_area) != FindAreaResultEnum.TRUE:
+        find = area_result_map.get(key)
+        if find is None:
+            find = find_area_in_screen(ctx, screen, screen_area) == FindAreaResultEnum.TRUE
+            area_result_map[key] = find
+        if not find:
             fit_id_mark = False
             break
 
-    return existed_id_mark and fit_id_mark
+    result = existed_id_mark and fit_id_mark
+    if version is not None:
+        ctx.screen_loader.screen_match_cache[screen_info.screen_name] = (version, result)
+
+    return result
+
+
+def prefetch_text_area(ctx: OneDragonContext, screen: MatLike, area_list: List[ScreenArea]) -> None:
+    """
+    OCR区域模式下 预先识别多个文本区域
+    颜色范围相同的区域一起处理 相交的区域只识别一次 之后的区域判断可直接使用缓存
+    :param ctx: 上下文
+    :param screen: 游戏截图
+    :param area_list: 区域列表 非文本区域会被忽略
+    :return:
+    """
+    color_group: dict[str, tuple[Optional[List], List]] = {}
+    for area in area_list:
+        if not area.is_text_area:
+            continue
+        color_key = str(area.color_range)
+        if color_key not in color_group:
+            color_group[color_key] = (area.color_range, [])
+        color_group[color_key][1].append(area.rect)
+
+    for color_range, rect_list in color_group.values():
+        if len(rect_list) < 2:  # 单个区域在判断时识别即可
+            continue
+        ctx.ocr_service.prefetch_area_ocr_result(
+            image=screen,
+            rect_list=rect_list,
+            color_range=color_range,
+        )
 
 
 def find_by_ocr(ctx: OneDragonContext, screen: MatLike, target_cn: str,
@@ -261,6 +388,7 @@ def find_by_ocr(ctx: OneDragonContext, screen: MatLike, target_cn: str,
             color_range=color_range,
             target_text=target_cn,
             threshold=lcs_percent,
+            crop_first=ctx.env_config.ocr_area_mode,
         )
 
     # 回退到原有方法
@@ -0,0 +1,213 @@
+import os
+import pickle
+import struct
+from typing import Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.base.config.yaml_operator import YamlOperator
+from one_dragon.base.screen.template_info import (
+    TemplateInfo,
+    get_template_config_path,
+    get_template_mask_path,
+    get_template_raw_path,
+    get_template_root_dir_path,
+)
+from one_dragon.utils import cv2_utils, os_utils
+from one_dragon.utils.log_utils import log
+
+TEMPLATE_ATLAS_FILE_NAME = 'template_atlas.bin'
+
+_ATLAS_MAGIC: bytes = b'ODTATLAS'
+_ATLAS_VERSION: int = 1  # 图集格式的版本 格式变化时修改
+_ATLAS_ALIGN: int = 64  # 每张图片的起始位置对齐 方便按行读取
+
+# 文件的版本 (修改时间, 大小) 文件不存在时为None
+FileVersion = Optional[Tuple[int, int]]
+# 图片在数据区的位置 (偏移量, 尺寸, 数据类型) 图片不存在时为None
+ImageSlot = Optional[Tuple[int, Tuple[int, ...], str]]
+
+
+def get_template_atlas_path() -> str:
+    """
+    默认的模板图集路径 放在缓存目录中 不提交
+    :return:
+    """
+    return os.path.join(os_utils.get_path_under_work_dir('.cache'), TEMPLATE_ATLAS_FILE_NAME)
+
+
+def _get_file_version(file_path: str) -> FileVersion:
+    """
+    文件的版本 修改时间和大小
+    """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _get_template_file_versions(sub_dir: str, template_id: str) -> Tuple[FileVersion, FileVersion, FileVersion]:
+    """
+    模板源文件的版本
+    :return: (原图, 掩码, 配置)
+    """
+    return (
+        _get_file_version(get_template_raw_path(sub_dir, template_id)),
+        _get_file_version(get_template_mask_path(sub_dir, template_id)),
+        _get_file_version(get_template_config_path(sub_dir, template_id)),
+    )
+
+
+def _align(offset: int) -> int:
+    return (offset + _ATLAS_ALIGN - 1) // _ATLAS_ALIGN * _ATLAS_ALIGN
+
+
+class TemplateAtlas:
+
+    def __init__(self, file_path: str, index: dict[str, Any], data: Optional[np.ndarray]):
+        """
+        模板图集
+        将所有模板的原图、掩码、灰度图和配置打包到一个文件中 图片数据使用内存映射读取
+        避免第一次使用模板时 逐个解析yml和解码png
+        源文件的修改时间或大小改变后 对应的模板不再从图集读取
+        :param file_path: 图集文件路径
+        :param index: 索引 key=sub_dir:template_id value=(源文件版本, 配置, 各图片位置)
+        :param data: 图片数据
+        """
+        self.file_path: str = file_path
+        self._index: dict[str, Any] = index
+        self._data: Optional[np.ndarray] = data
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @staticmethod
+    def load(file_path: str) -> Optional['TemplateAtlas']:
+        """
+        读取图集 只读取索引 图片数据使用内存映射 用到时才读取
+        :param file_path: 图集文件路径
+        :return: 图集 文件不存在或格式不一致时返回None
+        """
+        if not os.path.exists(file_path):
+            return None
+        try:
+            with open(file_path, 'rb') as file:
+                magic = file.read(len(_ATLAS_MAGIC))
+                version, index_size, data_size = struct.unpack('<IQQ', file.read(20))
+                if magic != _ATLAS_MAGIC or version != _ATLAS_VERSION:
+                    log.info(f'模板图集版本不一致 请重新生成 {file_path}')
+                    return None
+                index = pickle.loads(file.read(index_size))
+            data_offset = _align(len(_ATLAS_MAGIC) + 20 + index_size)
+            data = None
+            if data_size > 0:
+                # 写时复制 修改图片不会影响文件 与从硬盘读取的图片一样可写
+                data = np.memmap(file_path, dtype=np.uint8, mode='c', offset=data_offset, shape=(data_size,))
+        except Exception:
+            log.error(f'模板图集读取失败 {file_path}', exc_info=True)
+            return None
+
+        return TemplateAtlas(file_path, index, data)
+
+    def get_template(self, sub_dir: str, template_id: str) -> Optional[TemplateInfo]:
+        """
+        从图集中获取模板
+        :param sub_dir: 模板分类
+        :param template_id: 模板id
+        :return: 模板 不在图集中或者源文件已经改变时返回None
+        """
+        entry = self._index.get('%s:%s' % (sub_dir, template_id))
+        if entry is None:
+            return None
+        file_versions, config_data, image_slots = entry
+        if tuple(file_versions) != _get_template_file_versions(sub_dir, template_id):
+            log.debug(f'模板源文件已改变 不使用图集 {sub_dir}:{template_id}')
+            return None
+
+        return TemplateInfo(
+            sub_dir, template_id,
+            config_data=config_data,
+            images=tuple(self._get_image(slot) for slot in image_slots),
+        )
+
+    def _get_image(self, slot: ImageSlot) -> Optional[MatLike]:
+        if slot is None:
+            return None
+        offset, shape, dtype = slot
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        return self._data[offset:offset + size].view(dtype).reshape(shape)
+
+
+def build_template_atlas(file_path: str, sub_dirs: Optional[List[str]] = None) -> int:
+    """
+    将模板打包成图集 先写入临时文件再替换 避免写入一半的图集被读取
+    :param file_path: 图集文件路径
+    :param sub_dirs: 需要打包的模板分类 默认全部
+    :return: 打包的模板数量
+    """
+    template_dir = get_template_root_dir_path()
+    if sub_dirs is None:
+        sub_dirs = sorted(i for i in os.listdir(template_dir) if os.path.isdir(os.path.join(template_dir, i)))
+
+    index: dict[str, Any] = {}
+    image_list: List[Tuple[int, np.ndarray]] = []  # (偏移量, 图片)
+    data_size: int = 0
+    for sub_dir in sub_dirs:
+        sub_dir_path = os.path.join(template_dir, sub_dir)
+        if not os.path.isdir(sub_dir_path):
+            continue
+        for template_id in sorted(os.listdir(sub_dir_path)):
+            if not os.path.isdir(os.path.join(sub_dir_path, template_id)):
+                continue
+
+            # 先记录版本再读取 读取期间被修改的话 下次使用时版本不一致 不会用到旧内容
+            file_versions = _get_template_file_versions(sub_dir, template_id)
+            config_path = get_template_config_path(sub_dir, template_id)
+            config_data = YamlOperator(config_path).data if file_versions[2] is not None else None
+            raw = cv2_utils.read_image(get_template_raw_path(sub_dir, template_id))
+            mask = cv2_utils.read_image(get_template_mask_path(sub_dir, template_id))
+            gray = cv2.cvtColor(raw, cv2.COLOR_RGB2GRAY) if raw is not None and raw.ndim == 3 else None
+
+            image_slots: List[ImageSlot] = []
+            for image in (raw, mask, gray):
+                if image is None:
+                    image_slots.append(None)
+                    continue
+                image = np.ascontiguousarray(image)
+                offset = _align(data_size)
+                image_slots.append((offset, tuple(image.shape), image.dtype.str))
+                image_list.append((offset, image))
+                data_size = offset + image.nbytes
+
+            index['%s:%s' % (sub_dir, template_id)] = (file_versions, config_data, tuple(image_slots))
+
+    index_bytes = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+    header = _ATLAS_MAGIC + struct.pack('<IQQ', _ATLAS_VERSION, len(index_bytes), data_size)
+    data_offset = _align(len(header) + len(index_bytes))
+
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    temp_path = f'{file_path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(header)
+            file.write(index_bytes)
+            for offset, image in image_list:
+                file.seek(data_offset + offset)
+                file.write(image.tobytes())
+            file.truncate(data_offset + data_size)
+        os.replace(temp_path, file_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    log.info(f'模板图集生成完毕 模板数量 {len(index)} 图片大小 {data_size / 1024 / 1024:.1f}MB {file_path}')
+    return len(index)
+
+
+if __name__ == '__main__':
+    build_template_atlas(get_template_atlas_path())
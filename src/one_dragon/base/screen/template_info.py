@@ -30,7 +30,16 @@ class TemplateShapeEnum(Enum):
 
 class TemplateInfo(YamlOperator):
 
-    def __init__(self, sub_dir: str, template_id: str):
+    def __init__(self, sub_dir: str, template_id: str,
+                 config_data: Optional[dict] = None,
+                 images: Optional[Tuple[Optional[MatLike], Optional[MatLike], Optional[MatLike]]] = None):
+        """
+        模板信息
+        :param sub_dir: 模板分类
+        :param template_id: 模板id
+        :param config_data: 已经读取好的配置 传入时不再读取配置文件
+        :param images: 已经读取好的 (原图, 掩码, 灰度图) 传入时不再读取图片
+        """
         # 旧的模板ID 在开发工具中使用 方便更改后迁移文件
         self.old_sub_dir: str = sub_dir
         self.old_template_id: str = template_id
@@ -40,7 +49,7 @@ class TemplateInfo(YamlOperator):
 
         self.screen_image: Optional[MatLike] = None
 
-        YamlOperator.__init__(self, file_path=self.get_yml_file_path())
+        YamlOperator.__init__(self, file_path=self.get_yml_file_path(), data=config_data)
 
         self.template_name: str = self.get('template_name', '')
         self.template_shape: str = self.get('template_shape', TemplateShapeEnum.RECTANGLE.value.value)
@@ -52,11 +61,17 @@ class TemplateInfo(YamlOperator):
         self.auto_mask: bool = self.get('auto_mask', True)
         self.point_updated: bool = False  # 点位是否更改过 开发工具中用
 
-        self.raw: MatLike = cv2_utils.read_image(get_template_raw_path(self.sub_dir, self.template_id))  # 原图
-        self.mask: MatLike = cv2_utils.read_image(get_template_mask_path(self.sub_dir, self.template_id))  # 掩码
+        if images is None:
+            images = (
+                cv2_utils.read_image(get_template_raw_path(self.sub_dir, self.template_id)),
+                cv2_utils.read_image(get_template_mask_path(self.sub_dir, self.template_id)),
+                None,
+            )
+        self.raw: MatLike = images[0]  # 原图
+        self.mask: MatLike = images[1]  # 掩码
 
         # 运算后保存在内存的
-        self._gray: MatLike = None  # 灰度图
+        self._gray: MatLike = images[2]  # 灰度图
         self._kps: List[cv2.KeyPoint] = None  # 关键点
         self._desc: MatLike = None  # 描述
 
@@ -1,15 +1,30 @@
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from cv2.typing import MatLike
 from typing import List, Optional
 
-from one_dragon.base.screen.template_info import TemplateInfo, is_template_existed
-from one_dragon.utils import os_utils
+from one_dragon.base.screen.template_atlas import TemplateAtlas
+from one_dragon.base.screen.template_info import TemplateInfo, is_template_existed, get_template_sub_dir_path
+from one_dragon.utils import os_utils, thread_utils
+from one_dragon.utils.log_utils import log
+
+_template_prewarm_executor = ThreadPoolExecutor(thread_name_prefix='od_template_prewarm', max_workers=1)
 
 
 class TemplateLoader:
 
-    def __init__(self):
+    def __init__(self, atlas_path: Optional[str] = None):
+        """
+        模板加载
+        :param atlas_path: 模板图集路径 图集存在时优先从图集读取
+        """
         self.template: dict[str, TemplateInfo] = {}
+        self._load_lock = threading.Lock()  # 预热线程和使用方可能同时加载同一个模板
+
+        self.atlas: Optional[TemplateAtlas] = None
+        if atlas_path is not None:
+            self.atlas = TemplateAtlas.load(atlas_path)
 
     def get_all_template_info_from_disk(self, need_raw: bool = True, need_config: bool = False) -> List[TemplateInfo]:
         """
@@ -52,7 +67,12 @@ class TemplateLoader:
         """
         if not is_template_existed(sub_dir, template_id, need_raw=not only_mask):
             return None
-        template: TemplateInfo = TemplateInfo(sub_dir, template_id)
+
+        template: Optional[TemplateInfo] = None
+        if self.atlas is not None:
+            template = self.atlas.get_template(sub_dir, template_id)
+        if template is None:
+            template = TemplateInfo(sub_dir, template_id)
 
         key = '%s:%s' % (sub_dir, template_id)
         self.template[key] = template
@@ -66,11 +86,42 @@ class TemplateLoader:
         :return: 模板图片
         """
         key = '%s:%s' % (sub_dir, template_id)
-        if key in self.template:
-            return self.template[key]
-        else:
+        template = self.template.get(key)
+        if template is not None:
+            return template
+        with self._load_lock:
+            if key in self.template:  # 等待期间被其它线程加载了
+                return self.template[key]
             return self.load_template(sub_dir, template_id)
 
+    def prewarm(self, sub_dirs: List[str]) -> Future[int]:
+        """
+        在后台线程加载分类下的所有模板
+        在应用开始前调用 避免第一次使用模板时才读取硬盘
+        :param sub_dirs: 模板分类
+        :return: 加载的模板数量
+        """
+        future = _template_prewarm_executor.submit(self._prewarm, sub_dirs)
+        future.add_done_callback(thread_utils.handle_future_result)
+        return future
+
+    def _prewarm(self, sub_dirs: List[str]) -> int:
+        """
+        加载分类下的所有模板
+        :param sub_dirs: 模板分类
+        :return: 加载的模板数量
+        """
+        cnt: int = 0
+        for sub_dir in sub_dirs:
+            sub_dir_path = get_template_sub_dir_path(sub_dir)
+            if not os.path.isdir(sub_dir_path):
+                continue
+            for template_id in os.listdir(sub_dir_path):
+                if self.get_template(sub_dir, template_id) is not None:
+                    cnt += 1
+        log.debug(f'模板预热完成 {sub_dirs} 数量 {cnt}')
+        return cnt
+
     def get_template_mask(self, sub_dir: str, template_id: str) -> MatLike:
         """
         获取某个模板的掩码
@@ -494,4 +494,16 @@ class EnvConfig(YamlConfig):
 
     @ocr_cache.setter
     def ocr_cache(self, new_value: bool) -> None:
-        self.update('ocr_cache', new_value, save=True)
\ No newline at end of file
+        self.update('ocr_cache', new_value, save=True)
+
+    @property
+    def ocr_area_mode(self) -> bool:
+        """
+        Returns:
+            OCR缓存模式下 是否只识别需要的区域
+        """
+        return self.get('ocr_area_mode', False)
+
+    @ocr_area_mode.setter
+    def ocr_area_mode(self, new_value: bool) -> None:
+        self.update('ocr_area_mode', new_value, save=True)
\ No newline at end of file
@@ -0,0 +1,285 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from one_dragon.utils.log_utils import log
+
+
+class ScheduledJob:
+
+    def __init__(self, name: str, callback: Callable[[float], Optional[float]]):
+        """
+        调度器中的一个任务
+        :param name: 任务名称 用于日志
+        :param callback: 执行方法 入参为当前时间 返回下一次执行的时间；返回None时 等待被唤醒
+        """
+        self.name: str = name
+        self.callback: Callable[[float], Optional[float]] = callback
+
+        self.next_run_time: Optional[float] = None  # 下一次执行的时间 None代表等待被唤醒
+        self.running: bool = False  # 是否正在执行
+        self.wake_pending: bool = False  # 执行期间被唤醒了 执行完需要马上再执行
+        self.cancelled: bool = False  # 是否已经取消
+        self.version: int = 0  # 每次安排执行时间都增加 用于识别优先队列里过时的记录
+
+
+class DeadlineScheduler:
+
+    def __init__(self, name: str):
+        """
+        单线程的调度器
+        使用优先队列保存各个任务下一次执行的时间
+        线程在条件变量上等待 直到最早的任务到期 或者有任务被唤醒
+        不需要固定间隔的轮询
+        :param name: 线程名称
+        """
+        self.name: str = name
+        self._condition: threading.Condition = threading.Condition()
+        self._heap: List[Tuple[float, int, int, ScheduledJob]] = []  # (执行时间, 序号, 任务版本, 任务)
+        self._job_list: List[ScheduledJob] = []  # 所有未取消的任务
+        self._seq = itertools.count()
+        self._running: bool = False
+        self._generation: int = 0  # 每次启动都增加 让上一次启动的线程退出
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def now(self) -> float:
+        """
+        调度使用的时钟
+        :return: 当前时间
+        """
+        return time.time()
+
+    def start(self) -> bool:
+        """
+        启动调度线程
+        :return: 是否启动成功 已经在运行时返回False
+        """
+        with self._condition:
+            if self._running:
+                return False
+            self._running = True
+            self._generation += 1
+            self._thread = threading.Thread(target=self._loop, args=(self._generation,),
+                                            name=self.name, daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> None:
+        """
+        停止调度 清空所有任务
+        正在执行的任务会执行完 但不会再安排下一次执行
+        :return:
+        """
+        with self._condition:
+            self._running = False
+            for job in self._job_list:
+                job.cancelled = True
+            self._job_list.clear()
+            self._heap.clear()
+            self._condition.notify_all()
+
+    def add_job(self, name: str,
+                callback: Callable[[float], Optional[float]],
+                run_time: Optional[float] = None) -> ScheduledJob:
+        """
+        添加一个任务
+        :param name: 任务名称
+        :param callback: 执行方法 入参为当前时间 返回下一次执行的时间；返回None时 等待被唤醒
+        :param run_time: 第一次执行的时间 None代表等待被唤醒
+        :return: 任务
+        """
+        job = ScheduledJob(name, callback)
+        with self._condition:
+            self._job_list.append(job)
+            if run_time is not None:
+                self._schedule(job, run_time)
+        return job
+
+    def wake(self, job: Optional[ScheduledJob], run_time: Optional[float] = None) -> None:
+        """
+        唤醒一个任务 已经安排了更早的执行时间时 不改变
+        :param job: 任务
+        :param run_time: 执行时间 默认马上执行
+        :return:
+        """
+        if job is None:
+            return
+        with self._condition:
+            if job.cancelled or not self._running:
+                return
+            if job.running:  # 执行完之后马上再执行 避免执行期间的唤醒被返回值覆盖
+                job.wake_pending = True
+                return
+            self._schedule(job, self.now() if run_time is None else run_time)
+
+    def cancel(self, job: Optional[ScheduledJob]) -> None:
+        """
+        取消一个任务
+        :param job: 任务
+        :return:
+        """
+        if job is None:
+            return
+        with self._condition:
+            job.cancelled = True
+            job.next_run_time = None
+            if job in self._job_list:
+                self._job_list.remove(job)
+
+    def _schedule(self, job: ScheduledJob, run_time: float) -> None:
+        """
+        安排任务的执行时间 调用前需要持有锁
+        :param job: 任务
+        :param run_time: 执行时间
+        :return:
+        """
+        if job.next_run_time is not None and job.next_run_time <= run_time:
+            return
+        job.next_run_time = run_time
+        job.version += 1
+        heapq.heappush(self._heap, (run_time, next(self._seq), job.version, job))
+        self._condition.notify()
+
+    def _is_alive(self, generation: int) -> bool:
+        return self._running and self._generation == generation
+
+    def _peek_next_run_time(self) -> Optional[float]:
+        """
+        丢弃已经过时的记录后 获取最早的执行时间 调用前需要持有锁
+        :return: 最早的执行时间 没有任务时返回None
+        """
+        while len(self._heap) > 0 and (self._heap[0][3].cancelled or self._heap[0][2] != self._heap[0][3].version):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if len(self._heap) > 0 else None
+
+    def _pop_next_job(self) -> ScheduledJob:
+        """
+        取出最早的任务 调用前需要持有锁 并且已经确认有任务
+        :return: 任务
+        """
+        _, _, _, job = heapq.heappop(self._heap)
+        job.next_run_time = None
+        job.running = True
+        job.wake_pending = False
+        return job
+
+    def _take_next_job(self, generation: int) -> Optional[ScheduledJob]:
+        """
+        等待直到有任务到期
+        :param generation: 线程对应的启动次数
+        :return: 到期的任务 调度停止时返回None
+        """
+        with self._condition:
+            while self._is_alive(generation):
+                next_run_time = self._peek_next_run_time()
+                if next_run_time is None:
+                    self._condition.wait()
+                    continue
+
+                wait_seconds = next_run_time - self.now()
+                if wait_seconds > 0:
+                    self._condition.wait(wait_seconds)
+                    continue
+
+                return self._pop_next_job()
+
+        return None
+
+    def _run_job(self, job: ScheduledJob, generation: int) -> None:
+        """
+        执行一个任务 并按返回值安排下一次执行
+        :param job: 任务
+        :param generation: 调度对应的启动次数
+        :return:
+        """
+        try:
+            next_run_time = job.callback(self.now())
+        except Exception:
+            log.error('调度任务 [ %s ] 执行出错', job.name, exc_info=True)
+            next_run_time = None
+
+        with self._condition:
+            job.running = False
+            if job.cancelled or not self._is_alive(generation):
+                return
+            if job.wake_pending:
+                job.wake_pending = False
+                next_run_time = self.now()
+            if next_run_time is not None:
+                self._schedule(job, next_run_time)
+
+    def _loop(self, generation: int) -> None:
+        """
+        调度线程
+        :param generation: 线程对应的启动次数
+        :return:
+        """
+        while True:
+            job = self._take_next_job(generation)
+            if job is None:
+                break
+            self._run_job(job, generation)
+
+
+class VirtualDeadlineScheduler(DeadlineScheduler):
+
+    def __init__(self, name: str, start_time: float = 0, max_jobs_per_instant: int = 10000):
+        """
+        使用虚拟时钟的调度器 不启动线程
+        由 run_until 在调用线程里按时间顺序执行任务 时钟直接跳到下一个任务的执行时间
+        用于离线回放 结果是确定的 并且比实际时间快
+        :param name: 名称
+        :param start_time: 虚拟时钟的开始时间
+        :param max_jobs_per_instant: 同一时刻最多执行的任务数 超过时认为任务在互相唤醒 避免死循环
+        """
+        DeadlineScheduler.__init__(self, name)
+        self._now_time: float = start_time
+        self.max_jobs_per_instant: int = max_jobs_per_instant
+
+    def now(self) -> float:
+        return self._now_time
+
+    def start(self) -> bool:
+        """
+        开始调度 不启动线程 需要调用 run_until 推进时间
+        :return: 是否启动成功 已经在运行时返回False
+        """
+        with self._condition:
+            if self._running:
+                return False
+            self._running = True
+            self._generation += 1
+            return True
+
+    def run_until(self, end_time: float) -> None:
+        """
+        按时间顺序执行不晚于结束时间的任务 最后把时钟推进到结束时间
+        :param end_time: 结束时间
+        :return:
+        """
+        generation = self._generation
+        instant_jobs: int = 0
+        while True:
+            with self._condition:
+                if not self._is_alive(generation):
+                    break
+                next_run_time = self._peek_next_run_time()
+                if next_run_time is None or next_run_time > end_time:
+                    break
+                if next_run_time > self._now_time:
+                    self._now_time = next_run_time
+                    instant_jobs = 0
+                instant_jobs += 1
+                if instant_jobs > self.max_jobs_per_instant:
+                    raise RuntimeError(f'调度器 {self.name} 在 {self._now_time:.3f} 执行了过多的任务')
+                job = self._pop_next_job()
+
+            self._run_job(job, generation)
+
+        self._now_time = max(self._now_time, end_time)
@@ -1,6 +1,7 @@
 import base64
 import math
 import os
+import zlib
 from typing import Union, List, Optional, Tuple
 
 import cv2
@@ -177,7 +178,9 @@ def mark_area_as_color(image: MatLike, pos: List, color, new_image: bool = False
 
 def match_template(source: MatLike, template: MatLike, threshold,
                    mask: np.ndarray = None, only_best: bool = True,
-                   ignore_inf: bool = False) -> MatchResultList:
+                   ignore_inf: bool = False,
+                   pyramid_level: int = 0,
+                   merge_distance: float = 10) -> MatchResultList:
     """
     在原图中匹配模板 注意无法从负偏移量开始匹配 即需要保证目标模板不会在原图边缘位置导致匹配不到
     :param source: 原图
@@ -186,6 +189,8 @@ def match_template(source: MatLike, template: MatLike, threshold,
     :param mask: 掩码
     :param only_best: 只返回最好的结果
     :param ignore_inf: 是否忽略无限大的结果
+    :param pyramid_level: 金字塔层数 0=不使用 1=先在1/2尺寸匹配 2=先在1/4尺寸匹配 之后只在候选位置附近进行全尺寸匹配
+    :param merge_distance: only_best=False 时 多少距离内的结果只保留置信度最高的一个
     :return: 所有匹配结果
     """
     tx, ty = template.shape[1], template.shape[0]
@@ -193,22 +198,133 @@ def match_template(source: MatLike, template: MatLike, threshold,
     # show_image(source, win_name='source')
     # show_image(template, win_name='template')
     # show_image(mask, win_name='mask', wait=1)
-    result = cv2.matchTemplate(source, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+    if pyramid_level > 0:
+        peak_list = _match_template_by_pyramid(source, template, threshold, mask, only_best,
+                                               ignore_inf, pyramid_level, merge_distance)
+    else:
+        result = cv2.matchTemplate(source, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+        peak_list = _find_template_peaks(result, threshold, only_best, ignore_inf, merge_distance)
 
     match_result_list = MatchResultList(only_best=only_best)
-    filtered_locations = np.where(np.logical_and(
-        result >= threshold,
-        np.isfinite(result) if ignore_inf else np.ones_like(result))
-    )  # 过滤低置信度的匹配结果
-
-    # 遍历所有匹配结果，并输出位置和置信度
-    for pt in zip(*filtered_locations[::-1]):
-        confidence = result[pt[1], pt[0]]  # 获取置信度
-        match_result_list.append(MatchResult(confidence, pt[0], pt[1], tx, ty))
+    for x, y, confidence in peak_list:
+        match_result_list.append(MatchResult(confidence, x, y, tx, ty), auto_merge=False)
 
     return match_result_list
 
 
+def _find_template_peaks(result: np.ndarray, threshold: float, only_best: bool,
+                         ignore_inf: bool, merge_distance: float) -> List[Tuple[int, int, float]]:
+    """
+    从模板匹配结果中提取峰值
+    :param result: cv2.matchTemplate 的结果
+    :param threshold: 阈值
+    :param only_best: 只返回最好的结果
+    :param ignore_inf: 是否忽略无限大的结果
+    :param merge_distance: 多少距离内的结果只保留置信度最高的一个
+    :return: [(x, y, 置信度)] 按从上到下 从左到右排序
+    """
+    if result.size == 0:
+        return []
+
+    # nan 无法通过阈值 统一变成 -inf 方便比较
+    valid = np.isfinite(result) if ignore_inf else ~np.isnan(result)
+    scores = np.where(valid, result, -np.inf).astype(np.float32)
+
+    if only_best:
+        idx = int(np.argmax(scores))
+        y, x = divmod(idx, scores.shape[1])
+        confidence = float(scores[y, x])
+        return [(x, y, confidence)] if confidence >= threshold else []
+
+    # 先用膨胀找出局部最大值 大幅减少候选点 再进行非极大值抑制
+    radius = max(int(merge_distance), 0)
+    if radius > 0:
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * radius + 1, 2 * radius + 1))
+        local_max = cv2.dilate(scores, kernel)
+        candidate = np.logical_and(scores >= threshold, scores >= local_max)
+    else:
+        candidate = scores >= threshold
+    ys, xs = np.nonzero(candidate)
+    if len(ys) == 0:
+        return []
+    confidences = scores[ys, xs]
+
+    order = np.argsort(-confidences, kind='stable')
+    xs, ys, confidences = xs[order], ys[order], confidences[order]
+    keep = np.ones(len(order), dtype=bool)
+    if radius > 0:
+        merge_distance_2 = merge_distance ** 2
+        for i in range(len(order)):
+            if not keep[i]:
+                continue
+            dist_2 = (xs[i + 1:] - xs[i]) ** 2 + (ys[i + 1:] - ys[i]) ** 2
+            keep[i + 1:] &= dist_2 > merge_distance_2
+
+    peak_list = [(int(x), int(y), float(c)) for x, y, c in zip(xs[keep], ys[keep], confidences[keep])]
+    peak_list.sort(key=lambda p: (p[1], p[0]))
+    return peak_list
+
+
+def _match_template_by_pyramid(source: MatLike, template: MatLike, threshold: float,
+                               mask: Optional[np.ndarray], only_best: bool, ignore_inf: bool,
+                               pyramid_level: int, merge_distance: float) -> List[Tuple[int, int, float]]:
+    """
+    金字塔模板匹配 先在缩小的图上找候选位置 再在候选位置附近进行全尺寸匹配
+    缩小后模板过小时 直接使用全尺寸匹配
+    :return: [(x, y, 置信度)] 按从上到下 从左到右排序
+    """
+    scale = 2 ** pyramid_level
+    tw, th = template.shape[1], template.shape[0]
+    sw, sh = source.shape[1], source.shape[0]
+    if tw // scale < 8 or th // scale < 8:
+        result = cv2.matchTemplate(source, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+        return _find_template_peaks(result, threshold, only_best, ignore_inf, merge_distance)
+
+    def _down(img: np.ndarray, interpolation: int) -> np.ndarray:
+        return cv2.resize(img, (max(img.shape[1] // scale, 1), max(img.shape[0] // scale, 1)),
+                          interpolation=interpolation)
+
+    small_source = _down(source, cv2.INTER_AREA)
+    small_template = _down(template, cv2.INTER_AREA)
+    small_mask = None if mask is None else _down(mask, cv2.INTER_NEAREST)
+    small_result = cv2.matchTemplate(small_source, small_template, cv2.TM_CCOEFF_NORMED, mask=small_mask)
+
+    # 缩小后细节丢失 置信度会偏低 放宽阈值来挑选候选位置
+    coarse_threshold = threshold * 0.8
+    coarse_peak_list = _find_template_peaks(small_result, coarse_threshold, False, True,
+                                            max(merge_distance / scale, 1))
+    coarse_peak_list.sort(key=lambda p: -p[2])
+    coarse_peak_list = coarse_peak_list[:3 if only_best else 64]
+
+    peak_list: List[Tuple[int, int, float]] = []
+    pad = scale * 2
+    for cx, cy, _ in coarse_peak_list:
+        # 全尺寸下 候选位置附近的一个小窗口
+        x1 = max(cx * scale - pad, 0)
+        y1 = max(cy * scale - pad, 0)
+        x2 = min(cx * scale + pad + tw, sw)
+        y2 = min(cy * scale + pad + th, sh)
+        if x2 - x1 < tw or y2 - y1 < th:
+            continue
+        window_result = cv2.matchTemplate(source[y1:y2, x1:x2], template, cv2.TM_CCOEFF_NORMED, mask=mask)
+        for x, y, confidence in _find_template_peaks(window_result, threshold, only_best, ignore_inf, merge_distance):
+            peak_list.append((x + x1, y + y1, confidence))
+
+    if only_best:
+        if len(peak_list) == 0:
+            return []
+        return [max(peak_list, key=lambda p: p[2])]
+
+    # 相邻窗口可能有重复的结果 再合并一次
+    peak_list.sort(key=lambda p: -p[2])
+    merged_list: List[Tuple[int, int, float]] = []
+    for peak in peak_list:
+        if all((peak[0] - p[0]) ** 2 + (peak[1] - p[1]) ** 2 > merge_distance ** 2 for p in merged_list):
+            merged_list.append(peak)
+    merged_list.sort(key=lambda p: (p[1], p[0]))
+    return merged_list
+
+
 def concat_vertically(img: MatLike, next_img: MatLike, decision_height: int = 150):
     """
     垂直拼接图片。
@@ -302,6 +418,18 @@ def is_same_image(i1: MatLike, i2: MatLike, threshold: float = 1) -> bool:
     return np.mean((i1 - i2) ** 2) < threshold
 
 
+def image_digest(img: MatLike) -> tuple:
+    """
+    计算图片内容摘要 内容完全一致的图片得到相同结果 与图片对象本身无关
+    使用crc32 对1080p截图耗时约3ms 远小于一次OCR
+    :param img: 图片
+    :return: (形状, 数据类型, crc32)
+    """
+    if not img.flags.c_contiguous:
+        img = np.ascontiguousarray(img)
+    return img.shape, img.dtype.str, zlib.crc32(img.data)
+
+
 def color_similarity_2d(image, color):
     """
     PhotoShop 魔棒功能的容差是一样的，颜色差值 = abs(max(RGB差值)) + abs(min(RGB差值))
@@ -957,7 +1085,8 @@ def filter_by_color(
     lower_rgb: Optional[Union[List[int], Tuple[int, int, int], np.ndarray]] = None,
     upper_rgb: Optional[Union[List[int], Tuple[int, int, int], np.ndarray]] = None,
     hsv_color: Optional[Union[List[int], Tuple[int, int, int], np.ndarray]] = None,
-    hsv_diff: Optional[Union[List[int], Tuple[int, int, int], np.ndarray]] = None
+    hsv_diff: Optional[Union[List[int], Tuple[int, int, int], np.ndarray]] = None,
+    hsv_image: Optional[MatLike] = None
 ) -> MatLike:
     """
     根据指定的模式和颜色范围，对图像进行颜色过滤。
@@ -968,13 +1097,15 @@ def filter_by_color(
     :param upper_rgb:   RGB上限
     :param hsv_color:   HSV基准颜色
     :param hsv_diff:    HSV颜色容差
+    :param hsv_image:   已经转换好的HSV图像 传入时不再重复转换
     :return:            二值化的 mask 图像。白色为符合条件，黑色为不符合。
     """
     if mode == 'hsv':
         if hsv_color is None or hsv_diff is None:
             return np.full((image.shape[0], image.shape[1]), 0, dtype=np.uint8)
 
-        hsv_image = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+        if hsv_image is None:
+            hsv_image = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
 
         _hsv_color = np.array(hsv_color, dtype=np.int32)
         _hsv_diff = np.array(hsv_diff, dtype=np.int32)
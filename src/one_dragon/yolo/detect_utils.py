@@ -105,7 +105,7 @@ class DetectObjectResult:
 class DetectFrameResult:
 
     def __init__(self,
-                 raw_image: MatLike,
+                 raw_image: Optional[MatLike],
                  results: List[DetectObjectResult],
                  run_time: Optional[float] = None,
                  ):
@@ -115,49 +115,88 @@ class DetectFrameResult:
         self.run_time: float = time.time() if run_time is None else run_time
         """识别时间"""
 
-        self.raw_image: MatLike = raw_image
-        """识别的原始图片"""
+        self.raw_image: Optional[MatLike] = raw_image
+        """识别的原始图片 历史记录中默认不保留"""
 
         self.results: List[DetectObjectResult] = results
         """识别的结果"""
 
+    def without_image(self) -> 'DetectFrameResult':
+        """
+        :return: 不带原始图片的结果 用于保存历史记录
+        """
+        return DetectFrameResult(raw_image=None, results=self.results, run_time=self.run_time)
+
 
 def nms(boxes, scores, iou_threshold):
+    """
+    非极大值抑制
+    一次性计算所有框之间的IoU 再按得分从高到低 去掉与已保留的框IoU不低于阈值的框
+    :param boxes: 框 xyxy
+    :param scores: 得分
+    :param iou_threshold: IoU阈值
+    :return: 保留的框下标 按得分从高到低
+    """
     # Sort by score
     sorted_indices = np.argsort(scores)[::-1]
+    if sorted_indices.size == 0:
+        return []
+
+    ious = compute_iou_matrix(boxes[sorted_indices])
+    suppressed = np.zeros(sorted_indices.size, dtype=bool)
 
     keep_boxes = []
-    while sorted_indices.size > 0:
-        # Pick the last box
-        box_id = sorted_indices[0]
-        keep_boxes.append(box_id)
+    for i in range(sorted_indices.size):
+        if suppressed[i]:
+            continue
+        keep_boxes.append(sorted_indices[i])
+        # 只影响得分更低的框
+        suppressed[i + 1:] |= ious[i, i + 1:] >= iou_threshold
 
-        # Compute IoU of the picked box with the rest
-        ious = compute_iou(boxes[box_id, :], boxes[sorted_indices[1:], :])
+    return keep_boxes
 
-        # Remove boxes with IoU over the threshold
-        keep_indices = np.where(ious < iou_threshold)[0]
 
-        # print(keep_indices.shape, sorted_indices.shape)
-        sorted_indices = sorted_indices[keep_indices + 1]
+def multiclass_nms(boxes, scores, class_ids, iou_threshold):
+    """
+    按类别分别进行非极大值抑制
+    每个类别的框平移到互不重叠的位置后 只需要进行一次NMS
+    :param boxes: 框 xyxy
+    :param scores: 得分
+    :param class_ids: 类别
+    :param iou_threshold: IoU阈值
+    :return: 保留的框下标 按类别排列 同一类别内按得分从高到低
+    """
+    if len(boxes) == 0:
+        return []
 
-    return keep_boxes
+    class_ids = np.asarray(class_ids)
+    max_coordinate = float(np.max(np.abs(boxes))) + 1
+    offset_boxes = boxes.astype(np.float64) + (class_ids * max_coordinate * 2)[:, np.newaxis]
 
+    keep_boxes = np.array(nms(offset_boxes, scores, iou_threshold), dtype=np.int64)
 
-def multiclass_nms(boxes, scores, class_ids, iou_threshold):
+    # 与逐个类别处理时的顺序保持一致
+    order = np.lexsort((np.arange(len(keep_boxes)), class_ids[keep_boxes]))
+    return keep_boxes[order].tolist()
 
-    unique_class_ids = np.unique(class_ids)
 
-    keep_boxes = []
-    for class_id in unique_class_ids:
-        class_indices = np.where(class_ids == class_id)[0]
-        class_boxes = boxes[class_indices,:]
-        class_scores = scores[class_indices]
+def compute_iou_matrix(boxes):
+    """
+    计算所有框两两之间的IoU
+    :param boxes: 框 xyxy
+    :return: (n, n) 的IoU矩阵
+    """
+    xmin = np.maximum(boxes[:, np.newaxis, 0], boxes[np.newaxis, :, 0])
+    ymin = np.maximum(boxes[:, np.newaxis, 1], boxes[np.newaxis, :, 1])
+    xmax = np.minimum(boxes[:, np.newaxis, 2], boxes[np.newaxis, :, 2])
+    ymax = np.minimum(boxes[:, np.newaxis, 3], boxes[np.newaxis, :, 3])
 
-        class_keep_boxes = nms(class_boxes, class_scores, iou_threshold)
-        keep_boxes.extend(class_indices[class_keep_boxes])
+    intersection_area = np.maximum(0, xmax - xmin) * np.maximum(0, ymax - ymin)
 
-    return keep_boxes
+    boxes_area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    union_area = boxes_area[:, np.newaxis] + boxes_area[np.newaxis, :] - intersection_area
+
+    return intersection_area / union_area
 
 
 def compute_iou(box, boxes):
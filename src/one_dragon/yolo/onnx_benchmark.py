@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from typing import List, Protocol, Optional
+
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.yolo.log_utils import log
+
+
+class BenchmarkModel(Protocol):
+
+    model_name: str
+    last_run_cost: Optional[tuple[float, float, float]]
+
+    def run(self, image: MatLike, *args, **kwargs): ...
+
+
+@dataclass
+class StageCost:
+    """一个阶段的耗时统计 单位毫秒"""
+    mean: float
+    p50: float
+    p95: float
+
+    def __str__(self) -> str:
+        return f'平均 {self.mean:.2f}ms p50 {self.p50:.2f}ms p95 {self.p95:.2f}ms'
+
+
+@dataclass
+class BenchmarkResult:
+    """模型的耗时测试结果"""
+    model_name: str
+    times: int  # 测试次数
+    pre: StageCost  # 预处理
+    infer: StageCost  # 推理
+    post: StageCost  # 后处理
+
+
+def _cal_stage_cost(cost_list: List[float]) -> StageCost:
+    arr = np.array(cost_list, dtype=np.float64) * 1000
+    return StageCost(mean=float(arr.mean()),
+                     p50=float(np.percentile(arr, 50)),
+                     p95=float(np.percentile(arr, 95)))
+
+
+def benchmark(model: BenchmarkModel, image: MatLike, times: int = 100, warmup: int = 5) -> BenchmarkResult:
+    """
+    测试模型每次识别中 预处理、推理、后处理的耗时
+    :param model: 模型 Yolov8Classifier 或 Yolov8Detector
+    :param image: 用于识别的图片 RGB通道
+    :param times: 测试次数
+    :param warmup: 预热次数 不计入统计
+    :return: 测试结果
+    """
+    for _ in range(warmup):
+        model.run(image)
+
+    pre_list: List[float] = []
+    infer_list: List[float] = []
+    post_list: List[float] = []
+    for _ in range(times):
+        model.run(image)
+        pre, infer, post = model.last_run_cost
+        pre_list.append(pre)
+        infer_list.append(infer)
+        post_list.append(post)
+
+    result = BenchmarkResult(
+        model_name=model.model_name,
+        times=times,
+        pre=_cal_stage_cost(pre_list),
+        infer=_cal_stage_cost(infer_list),
+        post=_cal_stage_cost(post_list),
+    )
+    log.info(f'模型 {result.model_name} 测试 {times} 次')
+    log.info(f'预处理 {result.pre}')
+    log.info(f'推理 {result.infer}')
+    log.info(f'后处理 {result.post}')
+    return result
+
+
+def __debug():
+    from one_dragon.utils import debug_utils, os_utils
+    from zzz_od.yolo.flash_classifier import FlashClassifier
+    flash_classifier = FlashClassifier(
+        model_parent_dir_path=os_utils.get_path_under_work_dir('assets', 'models', 'flash_classifier')
+    )
+    benchmark(flash_classifier, debug_utils.get_debug_image('_1750517690304'))
+
+
+if __name__ == '__main__':
+    __debug()
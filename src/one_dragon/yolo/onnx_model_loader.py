@@ -1,5 +1,8 @@
+import threading
 import time
+from dataclasses import dataclass
 
+import numpy as np
 import onnxruntime as ort
 import os
 import urllib.request
@@ -7,9 +10,28 @@ import zipfile
 from typing import Optional, List
 
 from one_dragon.yolo.log_utils import log
+from one_dragon.yolo.onnx_utils import InputImageBuffer
 
 _GH_PROXY_URL = 'https://ghfast.top'
 
+GRAPH_OPTIMIZATION_LEVEL = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+@dataclass
+class OnnxSessionConfig:
+    """onnxruntime 会话的配置"""
+    intra_op_num_threads: int = 0  # 单个算子内的线程数 0=由onnxruntime决定
+    inter_op_num_threads: int = 0  # 算子间并行的线程数 大于0时使用并行执行模式
+    graph_optimization_level: str = 'all'  # 图优化等级 disable/basic/extended/all
+    enable_mem_pattern: bool = True  # 是否预先规划内存 DirectML下不可用 会自动关闭
+    enable_cpu_mem_arena: bool = True  # 是否使用CPU内存池
+    use_io_binding: bool = True  # 是否使用IO绑定 输出写入预先分配的内存
+
 
 class OnnxModelLoader:
 
@@ -22,6 +44,7 @@ class OnnxModelLoader:
                  personal_proxy: Optional[str] = '',
                  gpu: bool = False,
                  backup_model_name: Optional[str] = None,
+                 session_config: Optional[OnnxSessionConfig] = None,
                  ):
         self.model_name: str = model_name
         self.backup_model_name: str = backup_model_name  # 备用模型 默认在本地一定有的模型 在新模型无法下载使用时使用
@@ -32,6 +55,7 @@ class OnnxModelLoader:
         self.gh_proxy_url: str = gh_proxy_url
         self.personal_proxy: Optional[str] = personal_proxy
         self.gpu: bool = gpu  # 是否使用GPU加速
+        self.session_config: OnnxSessionConfig = OnnxSessionConfig() if session_config is None else session_config
 
         # 从模型中读取到的输入输出信息
         self.session: ort.InferenceSession = None
@@ -40,6 +64,12 @@ class OnnxModelLoader:
         self.onnx_input_height: int = 0
         self.output_names: List[str] = []
 
+        # 每个线程使用自己的输入缓冲区和IO绑定
+        self._thread_local = threading.local()
+        self._io_binding_available: bool = self.session_config.use_io_binding
+
+        self.last_run_cost: Optional[tuple[float, float, float]] = None  # 最后一次识别的耗时 预处理、推理、后处理
+
         if not self.check_and_download_model():  # 新模型不ok
             log.error(f'模型 {self.model_name} 未下载成功 请尝试更换代理下载')
             log.info(f'尝试使用备用模型 {self.backup_model_name}')
@@ -136,10 +166,98 @@ class OnnxModelLoader:
         log.info('加载模型 %s', onnx_path)
         self.session = ort.InferenceSession(
             onnx_path,
+            sess_options=self.get_session_options(providers[0] == 'DmlExecutionProvider'),
             providers=providers
         )
         self.get_input_details()
         self.get_output_details()
+        self._thread_local = threading.local()
+        self._io_binding_available = self.session_config.use_io_binding
+
+    def get_session_options(self, use_dml: bool) -> ort.SessionOptions:
+        """
+        根据配置生成会话选项
+        :param use_dml: 是否使用DirectML
+        :return:
+        """
+        config = self.session_config
+        options = ort.SessionOptions()
+        if config.intra_op_num_threads > 0:
+            options.intra_op_num_threads = config.intra_op_num_threads
+        if config.inter_op_num_threads > 0:
+            options.inter_op_num_threads = config.inter_op_num_threads
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVEL.get(
+            config.graph_optimization_level, ort.GraphOptimizationLevel.ORT_ENABLE_ALL)
+        options.enable_cpu_mem_arena = config.enable_cpu_mem_arena
+        if use_dml:  # DirectML 不支持内存规划和并行执行
+            options.enable_mem_pattern = False
+            options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        else:
+            options.enable_mem_pattern = config.enable_mem_pattern
+        return options
+
+    def get_input_buffer(self) -> InputImageBuffer:
+        """
+        获取当前线程的输入缓冲区
+        :return:
+        """
+        input_buffer = getattr(self._thread_local, 'input_buffer', None)
+        if input_buffer is None or input_buffer.onnx_input_width != self.onnx_input_width \
+                or input_buffer.onnx_input_height != self.onnx_input_height:
+            input_buffer = InputImageBuffer(self.onnx_input_width, self.onnx_input_height)
+            self._thread_local.input_buffer = input_buffer
+        return input_buffer
+
+    def run_session(self, input_tensor: np.ndarray) -> List[np.ndarray]:
+        """
+        使用模型进行推理
+        开启IO绑定时 输出形状固定的话会写入预先分配的内存 下次推理时会被覆盖 使用方不能长期持有
+        :param input_tensor: 模型输入
+        :return: 模型输出
+        """
+        if self._io_binding_available:
+            try:
+                return self._run_with_io_binding(input_tensor)
+            except Exception:
+                log.error('模型 %s 使用IO绑定推理失败 改为普通推理', self.model_name, exc_info=True)
+                self._io_binding_available = False
+
+        return self.session.run(self.output_names, {self.input_names[0]: input_tensor})
+
+    def _run_with_io_binding(self, input_tensor: np.ndarray) -> List[np.ndarray]:
+        """
+        使用IO绑定推理
+        :param input_tensor: 模型输入
+        :return: 模型输出
+        """
+        io_binding = getattr(self._thread_local, 'io_binding', None)
+        if io_binding is None:
+            io_binding = self.session.io_binding()
+            output_list: Optional[List[np.ndarray]] = []
+            for output in self.session.get_outputs():
+                if output.type != 'tensor(float)' or not all(isinstance(i, int) for i in output.shape):
+                    output_list = None  # 输出形状不固定 由onnxruntime分配
+                    break
+                output_list.append(np.empty(output.shape, dtype=np.float32))
+
+            for idx, name in enumerate(self.output_names):
+                if output_list is None:
+                    io_binding.bind_output(name, 'cpu')
+                else:
+                    arr = output_list[idx]
+                    io_binding.bind_output(name, 'cpu', 0, np.float32, list(arr.shape), arr.ctypes.data)
+
+            self._thread_local.io_binding = io_binding
+            self._thread_local.output_list = output_list
+
+        io_binding.bind_cpu_input(self.input_names[0], np.ascontiguousarray(input_tensor))
+        self.session.run_with_iobinding(io_binding)
+
+        output_list = self._thread_local.output_list
+        if output_list is not None:
+            return output_list
+        return io_binding.copy_outputs_to_cpu()
 
     def get_input_details(self):
         model_inputs = self.session.get_inputs()
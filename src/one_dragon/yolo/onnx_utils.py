@@ -1,4 +1,4 @@
-from typing import Tuple
+from typing import Optional, Tuple
 
 import cv2
 import numpy as np
@@ -38,3 +38,57 @@ def scale_input_image_u(image: MatLike, onnx_input_width: int, onnx_input_height
     input_tensor = input_img[np.newaxis, :, :, :].astype(np.float32)
 
     return input_tensor, scale_height, scale_width
+
+
+class InputImageBuffer:
+
+    def __init__(self, onnx_input_width: int, onnx_input_height: int):
+        """
+        模型输入的缓冲区 与 scale_input_image_u 结果一致
+        预处理直接写入同一个 float32 张量 不需要每帧重新分配内存
+        缩放后的图片也会复用 归一化和通道转换在一次运算中完成
+        同一个缓冲区不能在多个线程中同时使用
+        :param onnx_input_width: 模型需要的图片宽度
+        :param onnx_input_height: 模型需要的图片高度
+        """
+        self.onnx_input_width: int = onnx_input_width
+        self.onnx_input_height: int = onnx_input_height
+
+        # 模型输入 NCHW
+        self.tensor: np.ndarray = np.full((1, 3, onnx_input_height, onnx_input_width),
+                                          np.float32(114 / 255.0), dtype=np.float32)
+        self._scale_img: Optional[np.ndarray] = None  # 缩放后的图片
+        self._last_scale_shape: Optional[Tuple[int, int]] = None  # 上一次写入的区域大小
+
+    def fill(self, image: MatLike) -> Tuple[np.ndarray, int, int]:
+        """
+        将图片缩放后写入缓冲区
+        :param image: 输入的图片 RBG通道
+        :return: 模型输入 缩放后的高度 缩放后的宽度
+        """
+        img_height, img_width = image.shape[:2]
+
+        # 将图像缩放到模型的输入尺寸中较短的一边
+        min_scale = min(self.onnx_input_height / img_height, self.onnx_input_width / img_width)
+
+        # 未进行padding之前的尺寸
+        scale_height = int(round(img_height * min_scale))
+        scale_width = int(round(img_width * min_scale))
+
+        if self.onnx_input_height != img_height or self.onnx_input_width != img_width:  # 需要缩放
+            if self._scale_img is None or self._scale_img.shape[:2] != (scale_height, scale_width):
+                self._scale_img = np.empty((scale_height, scale_width, 3), dtype=np.uint8)
+            cv2.resize(image, (scale_width, scale_height), dst=self._scale_img, interpolation=cv2.INTER_LINEAR)
+            scale_img = self._scale_img
+        else:
+            scale_img = image
+
+        # 写入区域变化时 之前写入的部分需要恢复成填充色
+        if self._last_scale_shape != (scale_height, scale_width):
+            self.tensor.fill(np.float32(114 / 255.0))
+            self._last_scale_shape = (scale_height, scale_width)
+
+        np.divide(scale_img.transpose(2, 0, 1), np.float32(255.0),
+                  out=self.tensor[0, :, :scale_height, :scale_width], casting='unsafe')
+
+        return self.tensor, scale_height, scale_width
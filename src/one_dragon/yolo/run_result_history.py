@@ -0,0 +1,89 @@
+import threading
+from collections import deque
+from typing import Generic, Iterator, List, Optional, Protocol, TypeVar
+
+
+class RunResult(Protocol):
+
+    run_time: float
+
+
+T = TypeVar('T', bound=RunResult)
+
+
+class RunResultHistory(Generic[T]):
+
+    def __init__(self, keep_seconds: float, max_size: int = 256):
+        """
+        识别结果的历史记录
+        只保留最近 keep_seconds 秒内的结果 同时最多保留 max_size 个 超出时丢弃最早的
+        结果需要按识别时间顺序加入
+        :param keep_seconds: 保留多长时间的识别结果
+        :param max_size: 最多保留的结果数量
+        """
+        self.keep_seconds: float = keep_seconds
+        self.max_size: int = max_size
+        self._history: deque[T] = deque(maxlen=max_size)
+        self._lock = threading.Lock()
+
+    def append(self, result: T) -> None:
+        """
+        加入一个识别结果 并移除超出时间范围的结果
+        :param result: 识别结果
+        """
+        with self._lock:
+            self._history.append(result)
+            expire_time = result.run_time - self.keep_seconds
+            while self._history[0].run_time < expire_time:
+                self._history.popleft()
+
+    @property
+    def last(self) -> Optional[T]:
+        """
+        :return: 最后一个识别结果
+        """
+        with self._lock:
+            return self._history[-1] if len(self._history) > 0 else None
+
+    def get_since(self, start_time: float, end_time: Optional[float] = None) -> List[T]:
+        """
+        获取某个时间之后的识别结果 从最新的结果往前找 只遍历范围内的结果
+        :param start_time: 开始时间 包含
+        :param end_time: 结束时间 包含 不传入时不限制
+        :return: 按识别时间顺序排列的结果
+        """
+        result_list: List[T] = []
+        with self._lock:
+            for result in reversed(self._history):
+                if result.run_time < start_time:
+                    break
+                if end_time is not None and result.run_time > end_time:
+                    continue
+                result_list.append(result)
+        result_list.reverse()
+        return result_list
+
+    def get_in_window(self, seconds: float, now: Optional[float] = None) -> List[T]:
+        """
+        获取最近一段时间内的识别结果
+        :param seconds: 时间范围
+        :param now: 当前时间 不传入时使用最后一个结果的识别时间
+        :return: 按识别时间顺序排列的结果
+        """
+        if now is None:
+            last = self.last
+            if last is None:
+                return []
+            now = last.run_time
+        return self.get_since(now - seconds, now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._history.clear()
+
+    def __len__(self) -> int:
+        return len(self._history)
+
+    def __iter__(self) -> Iterator[T]:
+        with self._lock:
+            return iter(list(self._history))
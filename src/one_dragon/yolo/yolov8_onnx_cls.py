@@ -2,10 +2,10 @@ import time
 
 import numpy as np
 from cv2.typing import MatLike
-from typing import Optional, List
+from typing import Optional
 
-from one_dragon.yolo import onnx_utils
-from one_dragon.yolo.onnx_model_loader import OnnxModelLoader
+from one_dragon.yolo.onnx_model_loader import OnnxModelLoader, OnnxSessionConfig
+from one_dragon.yolo.run_result_history import RunResultHistory
 
 
 class RunContext:
@@ -40,12 +40,21 @@ class RunContext:
 class ClassificationResult:
 
     def __init__(self,
-                 raw_image: MatLike,
+                 raw_image: Optional[MatLike],
                  class_idx: int,
-                 run_time: Optional[float] = None,):
+                 run_time: Optional[float] = None,
+                 score: float = 0):
         self.run_time: float = time.time() if run_time is None else run_time  # 识别时间
-        self.raw_image: MatLike = raw_image  # 识别的原始图片
+        self.raw_image: Optional[MatLike] = raw_image  # 识别的原始图片 历史记录中默认不保留
         self.class_idx: int = class_idx  # 分类的下标 -1代表无法识别（不满足阈值）
+        self.score: float = score  # 最高分类的得分
+
+    def without_image(self) -> 'ClassificationResult':
+        """
+        :return: 不带原始图片的结果 用于保存历史记录
+        """
+        return ClassificationResult(raw_image=None, class_idx=self.class_idx,
+                                    run_time=self.run_time, score=self.score)
 
 
 class Yolov8Classifier(OnnxModelLoader):
@@ -60,12 +69,18 @@ class Yolov8Classifier(OnnxModelLoader):
                  gpu: bool = False,
                  backup_model_name: Optional[str] = None,
                  keep_result_seconds: float = 2,
+                 keep_result_image: bool = False,
+                 max_result_size: int = 256,
+                 session_config: Optional[OnnxSessionConfig] = None,
                  ):
         """
         :param model_name: 模型名称 在根目录下会有一个以模型名称创建的子文件夹
         :param model_parent_dir_path: 放置所有模型的根目录
         :param gpu: 是否启用GPU加速
         :param keep_result_seconds: 保留多长时间的识别结果
+        :param keep_result_image: 历史记录中是否保留原始图片
+        :param max_result_size: 历史记录最多保留的结果数量
+        :param session_config: onnxruntime 会话的配置 不传入时使用默认配置
         """
         OnnxModelLoader.__init__(
             self,
@@ -76,11 +91,14 @@ class Yolov8Classifier(OnnxModelLoader):
             gh_proxy_url=gh_proxy_url,
             personal_proxy=personal_proxy,
             gpu=gpu,
-            backup_model_name=backup_model_name
+            backup_model_name=backup_model_name,
+            session_config=session_config
         )
 
         self.keep_result_seconds: float = keep_result_seconds  # 保留识别结果的秒数
-        self.run_result_history: List[ClassificationResult] = []  # 历史识别结果
+        self.keep_result_image: bool = keep_result_image  # 历史记录中是否保留原始图片
+        self.run_result_history: RunResultHistory[ClassificationResult] = RunResultHistory(
+            keep_seconds=keep_result_seconds, max_size=max_result_size)  # 历史识别结果
 
     def run(self, image: MatLike, conf: float = 0.9, run_time: Optional[float] = None) -> ClassificationResult:
         """
@@ -103,6 +121,7 @@ class Yolov8Classifier(OnnxModelLoader):
         t4 = time.time()
 
         # log.info(f'识别完毕 预处理耗时 {t2 - t1:.3f}s, 推理耗时 {t3 - t2:.3f}s, 后处理耗时 {t4 - t3:.3f}s')
+        self.last_run_cost = (t2 - t1, t3 - t2, t4 - t3)
 
         self.record_result(context, result)
         return result
@@ -111,7 +130,7 @@ class Yolov8Classifier(OnnxModelLoader):
         """
         推理前的预处理
         """
-        input_tensor, scale_height, scale_width = onnx_utils.scale_input_image_u(context.img, self.onnx_input_width, self.onnx_input_height)
+        input_tensor, scale_height, scale_width = self.get_input_buffer().fill(context.img)
         context.scale_height = scale_height
         context.scale_width = scale_width
         return input_tensor
@@ -120,9 +139,9 @@ class Yolov8Classifier(OnnxModelLoader):
         """
         图片输入到模型中进行推理
         :param input_tensor: 输入模型的图片 RGB通道
-        :return: onnx模型推理得到的结果
+        :return: onnx模型推理得到的结果 使用IO绑定时为复用的内存 下次推理时会被覆盖
         """
-        outputs = self.session.run(self.output_names, {self.input_names[0]: input_tensor})
+        outputs = self.run_session(input_tensor)
         return outputs
 
     def process_output(self, output, context: RunContext) -> ClassificationResult:
@@ -137,7 +156,8 @@ class Yolov8Classifier(OnnxModelLoader):
         result = ClassificationResult(
             raw_image=context.img,
             run_time=context.run_time,
-            class_idx=idx if conf >= context.conf else -1
+            class_idx=int(idx) if conf >= context.conf else -1,
+            score=float(conf)
         )
         return result
 
@@ -148,13 +168,11 @@ class Yolov8Classifier(OnnxModelLoader):
         :param result: 识别结果
         :return: 组合结果
         """
-        self.run_result_history.append(result)
-        self.run_result_history = [i for i in self.run_result_history
-                                   if context.run_time - i.run_time > self.keep_result_seconds]
+        self.run_result_history.append(result if self.keep_result_image else result.without_image())
 
     @property
     def last_run_result(self) -> Optional[ClassificationResult]:
-        if len(self.run_result_history) > 0:
-            return self.run_result_history[len(self.run_result_history) - 1]
-        else:
-            return None
+        """
+        :return: 最后一次的识别结果 不保留原始图片时 raw_image 为 None
+        """
+        return self.run_result_history.last
@@ -4,12 +4,12 @@ import csv
 import numpy as np
 import os
 from cv2.typing import MatLike
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
-from one_dragon.yolo import onnx_utils
 from one_dragon.yolo.detect_utils import DetectFrameResult, DetectClass, DetectContext, DetectObjectResult, xywh2xyxy, \
     multiclass_nms
-from one_dragon.yolo.onnx_model_loader import OnnxModelLoader
+from one_dragon.yolo.onnx_model_loader import OnnxModelLoader, OnnxSessionConfig
+from one_dragon.yolo.run_result_history import RunResultHistory
 
 
 class Yolov8Detector(OnnxModelLoader):
@@ -23,7 +23,10 @@ class Yolov8Detector(OnnxModelLoader):
                  personal_proxy: Optional[str] = None,
                  gpu: bool = False,
                  backup_model_name: Optional[str] = None,
-                 keep_result_seconds: float = 2
+                 keep_result_seconds: float = 2,
+                 keep_result_image: bool = False,
+                 max_result_size: int = 256,
+                 session_config: Optional[OnnxSessionConfig] = None
                  ):
         """
         yolov8 detect 导出 onnx 后使用
@@ -33,6 +36,9 @@ class Yolov8Detector(OnnxModelLoader):
         :param model_parent_dir_path: 放置所有模型的根目录
         :param gpu: 是否启用GPU运算
         :param keep_result_seconds: 保留多长时间的识别结果
+        :param keep_result_image: 历史记录中是否保留原始图片
+        :param max_result_size: 历史记录最多保留的结果数量
+        :param session_config: onnxruntime 会话的配置 不传入时使用默认配置
         """
         OnnxModelLoader.__init__(
             self,
@@ -43,17 +49,23 @@ class Yolov8Detector(OnnxModelLoader):
             gh_proxy_url=gh_proxy_url,
             personal_proxy=personal_proxy,
             gpu=gpu,
-            backup_model_name=backup_model_name
+            backup_model_name=backup_model_name,
+            session_config=session_config
         )
 
         self.keep_result_seconds: float = keep_result_seconds  # 保留识别结果的秒数
-        self.run_result_history: List[DetectFrameResult] = []  # 历史识别结果
+        self.keep_result_image: bool = keep_result_image  # 历史记录中是否保留原始图片
+        self.run_result_history: RunResultHistory[DetectFrameResult] = RunResultHistory(
+            keep_seconds=keep_result_seconds, max_size=max_result_size)  # 历史识别结果
 
         self.idx_2_class: dict[int, DetectClass] = {}  # 分类
         self.class_2_idx: dict[str, int] = {}
         self.category_2_idx: dict[str, List[int]] = {}
         self._load_detect_classes(self.model_dir_path)
 
+        # 只检测部分类别时 需要保留的类别下标 key=(label_list, category_list)
+        self._class_filter_cache: dict[Tuple[Optional[Tuple[str, ...]], Optional[Tuple[str, ...]]], np.ndarray] = {}
+
     def run(self, image: MatLike, conf: float = 0.6, iou: float = 0.5, run_time: Optional[float] = None,
             label_list: Optional[List[str]] = None,
             category_list: Optional[List[str]] = None) -> DetectFrameResult:
@@ -81,6 +93,7 @@ class Yolov8Detector(OnnxModelLoader):
         t4 = time.time()
 
         # log.info(f'识别完毕 得到结果 {len(results)}个。预处理耗时 {t2 - t1:.3f}s, 推理耗时 {t3 - t2:.3f}s, 后处理耗时 {t4 - t3:.3f}s')
+        self.last_run_cost = (t2 - t1, t3 - t2, t4 - t3)
 
         return self.record_result(context, results)
 
@@ -88,7 +101,7 @@ class Yolov8Detector(OnnxModelLoader):
         """
         推理前的预处理
         """
-        input_tensor, scale_height, scale_width = onnx_utils.scale_input_image_u(context.img, self.onnx_input_width, self.onnx_input_height)
+        input_tensor, scale_height, scale_width = self.get_input_buffer().fill(context.img)
         context.scale_height = scale_height
         context.scale_width = scale_width
         return input_tensor
@@ -97,9 +110,9 @@ class Yolov8Detector(OnnxModelLoader):
         """
         图片输入到模型中进行推理
         :param input_tensor: 输入模型的图片 RGB通道
-        :return: onnx模型推理得到的结果
+        :return: onnx模型推理得到的结果 使用IO绑定时为复用的内存 下次推理时会被覆盖
         """
-        outputs = self.session.run(self.output_names, {self.input_names[0]: input_tensor})
+        outputs = self.run_session(input_tensor)
         return outputs
 
     def process_output(self, output, context: DetectContext) -> List[DetectObjectResult]:
@@ -108,39 +121,33 @@ class Yolov8Detector(OnnxModelLoader):
         :param context: 上下文
         :return: 最终得到的识别结果
         """
-        predictions = np.squeeze(output[0]).T
-
-        keep = np.ones(shape=(predictions.shape[1]), dtype=bool)
-
-        if context.label_list is not None or context.category_list is not None:
-            keep[4:] = False  # 前4位是坐标 先把所有标签都设置为False
-            if context.label_list is not None:
-                for label in context.label_list:
-                    idx = self.class_2_idx.get(label)
-                    if idx is not None:
-                        keep[idx + 4] = True
-
-            if context.category_list is not None:
-                for category in context.category_list:
-                    for idx in self.category_2_idx.get(category, []):
-                        keep[idx + 4] = True
-
-        predictions[:, keep == False] = 0
+        # 模型输出为 (4+类别数, 候选框数) 先按阈值过滤 只对保留下来的候选框转置复制
+        predictions = np.squeeze(output[0])
+
+        class_idx = self.get_class_filter(context.label_list, context.category_list)
+        if class_idx is None:
+            class_scores = predictions[4:]
+        elif len(class_idx) == 0:
+            return []
+        else:
+            class_scores = predictions[4 + class_idx]
 
         # 按置信度阈值进行基本的过滤
-        scores = np.max(predictions[:, 4:], axis=1)
-        predictions = predictions[scores > context.conf, :]
-        scores = scores[scores > context.conf]
+        scores = np.max(class_scores, axis=0)
+        keep = scores > context.conf
+        scores = scores[keep]
 
         results: List[DetectObjectResult] = []
         if len(scores) == 0:
             return results
 
         # 选择置信度最高的类别
-        class_ids = np.argmax(predictions[:, 4:], axis=1)
+        class_ids = np.argmax(class_scores[:, keep], axis=0)
+        if class_idx is not None:
+            class_ids = class_idx[class_ids]
 
         # 提取Bounding box
-        boxes = predictions[:, :4]  # 原始推理结果 xywh
+        boxes = predictions[:4, keep].T  # 原始推理结果 xywh
         scale_shape = np.array([context.scale_width, context.scale_height, context.scale_width, context.scale_height])  # 缩放后图片的大小
         boxes = np.divide(boxes, scale_shape, dtype=np.float32)  # 转化到 0~1
         boxes *= np.array([context.img_width, context.img_height, context.img_width, context.img_height])  # 恢复到原图的坐标
@@ -158,6 +165,38 @@ class Yolov8Detector(OnnxModelLoader):
 
         return results
 
+    def get_class_filter(self, label_list: Optional[List[str]],
+                         category_list: Optional[List[str]]) -> Optional[np.ndarray]:
+        """
+        获取需要保留的类别下标 相同的筛选条件只计算一次
+        :param label_list: 只检测特定的标签
+        :param category_list: 只检测特定分类的标签
+        :return: 升序排列的类别下标 None 时代表保留所有类别
+        """
+        if label_list is None and category_list is None:
+            return None
+
+        key = (None if label_list is None else tuple(label_list),
+               None if category_list is None else tuple(category_list))
+        class_idx = self._class_filter_cache.get(key)
+        if class_idx is not None:
+            return class_idx
+
+        idx_set: set[int] = set()
+        if label_list is not None:
+            for label in label_list:
+                idx = self.class_2_idx.get(label)
+                if idx is not None:
+                    idx_set.add(idx)
+
+        if category_list is not None:
+            for category in category_list:
+                idx_set.update(self.category_2_idx.get(category, []))
+
+        class_idx = np.array(sorted(idx_set), dtype=np.int64)
+        self._class_filter_cache[key] = class_idx
+        return class_idx
+
     def record_result(self, context: DetectContext, results: List[DetectObjectResult]) -> DetectFrameResult:
         """
         记录本帧识别结果
@@ -170,18 +209,16 @@ class Yolov8Detector(OnnxModelLoader):
             results=results,
             run_time=context.run_time
         )
-        self.run_result_history.append(new_frame)
-        self.run_result_history = [i for i in self.run_result_history
-                                   if context.run_time - i.run_time <= self.keep_result_seconds]
+        self.run_result_history.append(new_frame if self.keep_result_image else new_frame.without_image())
 
         return new_frame
 
     @property
     def last_run_result(self) -> Optional[DetectFrameResult]:
-        if len(self.run_result_history) > 0:
-            return self.run_result_history[len(self.run_result_history) - 1]
-        else:
-            return None
+        """
+        :return: 最后一次的识别结果 不保留原始图片时 raw_image 为 None
+        """
+        return self.run_result_history.last
 
     def _load_detect_classes(self, model_dir_path: str):
         """
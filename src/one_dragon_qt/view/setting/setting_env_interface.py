@@ -59,6 +59,11 @@ class SettingEnvInterface(VerticalScrollInterface):
         )
         basic_group.addSettingCard(self.ocr_cache_opt)
 
+        self.ocr_area_mode_opt = SwitchSettingCard(
+            icon=FluentIcon.ZOOM, title='OCR区域模式', content='开启OCR缓存时 只识别需要的区域(测试中)'
+        )
+        basic_group.addSettingCard(self.ocr_area_mode_opt)
+
         return basic_group
 
     def _init_code_group(self) -> SettingCardGroup:
@@ -182,6 +187,7 @@ class SettingEnvInterface(VerticalScrollInterface):
         self.debug_opt.init_with_adapter(self.ctx.env_config.get_prop_adapter('is_debug'))
         self.copy_screenshot_opt.init_with_adapter(self.ctx.env_config.get_prop_adapter('copy_screenshot'))
         self.ocr_cache_opt.init_with_adapter(self.ctx.env_config.get_prop_adapter('ocr_cache'))
+        self.ocr_area_mode_opt.init_with_adapter(self.ctx.env_config.get_prop_adapter('ocr_area_mode'))
 
         self.key_start_running_input.init_with_adapter(self.ctx.env_config.get_prop_adapter('key_start_running'))
         self.key_stop_running_input.init_with_adapter(self.ctx.env_config.get_prop_adapter('key_stop_running'))
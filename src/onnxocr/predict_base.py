@@ -1,17 +1,56 @@
 import onnxruntime
 
+# 图优化级别的名称
+GRAPH_OPTIMIZATION_LEVEL = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
 class PredictBase(object):
     def __init__(self):
         pass
 
-    def get_onnx_session(self, model_dir, use_gpu):
+    def get_session_options(self, args=None):
+        """
+        根据参数创建会话配置 没有传入的参数使用onnxruntime的默认值
+        :param args: 包含 intra_op_num_threads, inter_op_num_threads, graph_optimization_level, enable_cpu_mem_arena
+        :return:
+        """
+        sess_options = onnxruntime.SessionOptions()
+        if args is None:
+            return sess_options
+
+        intra_op_num_threads = getattr(args, "intra_op_num_threads", 0)
+        if intra_op_num_threads is not None and intra_op_num_threads > 0:
+            sess_options.intra_op_num_threads = intra_op_num_threads
+
+        inter_op_num_threads = getattr(args, "inter_op_num_threads", 0)
+        if inter_op_num_threads is not None and inter_op_num_threads > 0:
+            sess_options.inter_op_num_threads = inter_op_num_threads
+            # 并行执行多个算子时 inter_op 线程数才有效
+            sess_options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+
+        graph_optimization_level = getattr(args, "graph_optimization_level", None)
+        if graph_optimization_level in GRAPH_OPTIMIZATION_LEVEL:
+            sess_options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVEL[graph_optimization_level]
+
+        enable_cpu_mem_arena = getattr(args, "enable_cpu_mem_arena", None)
+        if enable_cpu_mem_arena is not None:
+            sess_options.enable_cpu_mem_arena = enable_cpu_mem_arena
+
+        return sess_options
+
+    def get_onnx_session(self, model_dir, use_gpu, args=None):
         # 使用gpu
         if use_gpu:
             providers =[('CUDAExecutionProvider',{"cudnn_conv_algo_search": "DEFAULT"}),'CPUExecutionProvider']
         else:
             providers =['CPUExecutionProvider']
 
-        onnx_session = onnxruntime.InferenceSession(model_dir, None,providers=providers)
+        onnx_session = onnxruntime.InferenceSession(model_dir, self.get_session_options(args), providers=providers)
 
         # print("providers:", onnxruntime.get_device())
         return onnx_session
@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import math
+import threading
 from PIL import Image
 
 
@@ -11,6 +12,7 @@ class TextRecognizer(PredictBase):
     def __init__(self, args):
         self.rec_image_shape = [int(v) for v in args.rec_image_shape.split(",")]
         self.rec_batch_num = args.rec_batch_num
+        self.rec_bucket_ratio = getattr(args, "rec_bucket_ratio", 1.5)
         self.rec_algorithm = args.rec_algorithm
         self.postprocess_op = CTCLabelDecode(
             character_dict_path=args.rec_char_dict_path,
@@ -18,10 +20,13 @@ class TextRecognizer(PredictBase):
         )
 
         # 初始化模型
-        self.rec_onnx_session = self.get_onnx_session(args.rec_model_dir, args.use_gpu)
+        self.rec_onnx_session = self.get_onnx_session(args.rec_model_dir, args.use_gpu, args)
         self.rec_input_name = self.get_input_name(self.rec_onnx_session)
         self.rec_output_name = self.get_output_name(self.rec_onnx_session)
 
+        # 每个线程复用自己的输入缓冲区
+        self._local = threading.local()
+
     def resize_norm_img(self, img, max_wh_ratio):
         imgC, imgH, imgW = self.rec_image_shape
         if self.rec_algorithm == "NRTR" or self.rec_algorithm == "ViTSTR":
@@ -276,41 +281,96 @@ class TextRecognizer(PredictBase):
 
         return img
 
+    def get_batch_list(self, wh_ratio_list):
+        """
+        按宽高比从小到大排序后分批 相近宽度的文本框放在一起 减少填充
+        每批不超过 rec_batch_num 个 且批内最大宽高比不超过第一个的 rec_bucket_ratio 倍
+        宽高比小于标准宽高比的都会填充到标准宽度 视为相同
+        :param wh_ratio_list: 每张图片的宽高比
+        :return: 每批图片的下标
+        """
+        imgC, imgH, imgW = self.rec_image_shape[:3]
+        base_ratio = imgW / imgH
+        batch_list = []
+        current_batch = []
+        start_ratio = base_ratio
+        for idx in np.argsort(np.array(wh_ratio_list), kind="stable"):
+            ratio = max(wh_ratio_list[idx], base_ratio)
+            if len(current_batch) > 0 and (
+                len(current_batch) >= self.rec_batch_num
+                or ratio > start_ratio * self.rec_bucket_ratio
+            ):
+                batch_list.append(current_batch)
+                current_batch = []
+            if len(current_batch) == 0:
+                start_ratio = ratio
+            current_batch.append(int(idx))
+        if len(current_batch) > 0:
+            batch_list.append(current_batch)
+        return batch_list
+
+    def get_input_buffer(self, shape):
+        """
+        获取当前线程的输入缓冲区 容量不足时扩容
+        取缓冲区的前面一段 保证是连续的数组
+        :param shape: (N, C, H, W)
+        :return:
+        """
+        size = int(np.prod(shape))
+        buffer = getattr(self._local, "input_buffer", None)
+        if buffer is None or buffer.size < size:
+            buffer = np.empty(size, dtype=np.float32)
+            self._local.input_buffer = buffer
+        return buffer[:size].reshape(shape)
+
+    def fill_norm_img(self, dst, img):
+        """
+        与 resize_norm_img 的默认处理一致 缩放并归一化后直接写入缓冲区 右侧填充0
+        :param dst: 缓冲区中的一张图片 形状为 (C, H, W)
+        :param img: 文本框图片
+        :return:
+        """
+        imgC, imgH, imgW = dst.shape
+        assert imgC == img.shape[2]
+        h, w = img.shape[:2]
+        resized_w = min(imgW, int(math.ceil(imgH * w / float(h))))
+        resized_image = cv2.resize(img, (resized_w, imgH))
+        norm_img = dst[:, :, :resized_w]
+        norm_img[:] = resized_image.transpose((2, 0, 1))
+        # (x / 255 - 0.5) / 0.5
+        norm_img *= 2.0 / 255
+        norm_img -= 1.0
+        dst[:, :, resized_w:] = 0
+
     def __call__(self, img_list):
         img_num = len(img_list)
         # Calculate the aspect ratio of all text bars
         width_list = []
         for img in img_list:
             width_list.append(img.shape[1] / float(img.shape[0]))
-        # Sorting can speed up the recognition process
-        indices = np.argsort(np.array(width_list))
         rec_res = [["", 0.0]] * img_num
-        batch_num = self.rec_batch_num
+        # 默认的处理方式 可以直接写入复用的缓冲区
+        use_buffer = self.rec_algorithm not in ("NRTR", "ViTSTR", "RFL", "RARE")
 
-        for beg_img_no in range(0, img_num, batch_num):
-            end_img_no = min(img_num, beg_img_no + batch_num)
-            norm_img_batch = []
+        # Sorting can speed up the recognition process
+        for batch in self.get_batch_list(width_list):
             imgC, imgH, imgW = self.rec_image_shape[:3]
             max_wh_ratio = imgW / imgH
-            # max_wh_ratio = 0
-            for ino in range(beg_img_no, end_img_no):
-                h, w = img_list[indices[ino]].shape[0:2]
-                wh_ratio = w * 1.0 / h
-                max_wh_ratio = max(max_wh_ratio, wh_ratio)
-            for ino in range(beg_img_no, end_img_no):
-                norm_img = self.resize_norm_img(img_list[indices[ino]], max_wh_ratio)
-                norm_img = norm_img[np.newaxis, :]
-                norm_img_batch.append(norm_img)
-
-            norm_img_batch = np.concatenate(norm_img_batch)
-            norm_img_batch = norm_img_batch.copy()
-
-            # img = img[:, :, ::-1].transpose(2, 0, 1)
-            # img = img[:, :, ::-1]
-            # img = img.transpose(2, 0, 1)
-            # img = img.astype(np.float32)
-            # img = np.expand_dims(img, axis=0)
-            # print(img.shape)
+            for idx in batch:
+                max_wh_ratio = max(max_wh_ratio, width_list[idx])
+
+            if use_buffer:
+                norm_img_batch = self.get_input_buffer((len(batch), imgC, imgH, int(imgH * max_wh_ratio)))
+                for bno, idx in enumerate(batch):
+                    self.fill_norm_img(norm_img_batch[bno], img_list[idx])
+            else:
+                norm_img_batch = []
+                for idx in batch:
+                    norm_img = self.resize_norm_img(img_list[idx], max_wh_ratio)
+                    norm_img = norm_img[np.newaxis, :]
+                    norm_img_batch.append(norm_img)
+                norm_img_batch = np.concatenate(norm_img_batch)
+
             input_feed = self.get_input_feed(self.rec_input_name, norm_img_batch)
             outputs = self.rec_onnx_session.run(
                 self.rec_output_name, input_feed=input_feed
@@ -320,6 +380,6 @@ class TextRecognizer(PredictBase):
 
             rec_result = self.postprocess_op(preds)
             for rno in range(len(rec_result)):
-                rec_res[indices[beg_img_no + rno]] = rec_result[rno]
+                rec_res[batch[rno]] = rec_result[rno]
 
         return rec_res
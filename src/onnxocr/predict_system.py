@@ -1,6 +1,5 @@
 import os
 import cv2
-import copy
 import onnxocr.predict_det as predict_det
 import onnxocr.predict_cls as predict_cls
 import onnxocr.predict_rec as predict_rec
@@ -44,9 +43,9 @@ class TextSystem(object):
 
         dt_boxes = sorted_boxes(dt_boxes)
 
-        # 图片裁剪
+        # 图片裁剪 裁剪时不会修改文本框 无需复制
         for bno in range(len(dt_boxes)):
-            tmp_box = copy.deepcopy(dt_boxes[bno])
+            tmp_box = dt_boxes[bno]
             if self.args.det_box_type == "quad":
                 img_crop = get_rotate_crop_image(ori_im, tmp_box)
             else:
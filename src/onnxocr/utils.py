@@ -260,6 +260,11 @@ def infer_args():
     parser.add_argument("--precision", type=str, default="fp32")
     parser.add_argument("--gpu_mem", type=int, default=500)
     parser.add_argument("--gpu_id", type=int, default=0)
+    # onnxruntime 会话参数 线程数为0时使用onnxruntime的默认值
+    parser.add_argument("--intra_op_num_threads", type=int, default=0)
+    parser.add_argument("--inter_op_num_threads", type=int, default=0)
+    parser.add_argument("--graph_optimization_level", type=str, default="all")
+    parser.add_argument("--enable_cpu_mem_arena", type=str2bool, default=True)
 
     # params for text detector
     parser.add_argument("--image_dir", type=str)
@@ -313,6 +318,8 @@ def infer_args():
     parser.add_argument("--rec_image_inverse", type=str2bool, default=True)
     parser.add_argument("--rec_image_shape", type=str, default="3, 48, 320")
     parser.add_argument("--rec_batch_num", type=int, default=6)
+    # 同一批次内 最宽的文本框宽高比不超过第一个的倍数 减少填充
+    parser.add_argument("--rec_bucket_ratio", type=float, default=1.5)
     parser.add_argument("--max_text_length", type=int, default=25)
     parser.add_argument(
         "--rec_char_dict_path",
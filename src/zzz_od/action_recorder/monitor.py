@@ -9,6 +9,7 @@ from typing import Optional, List, Any, Union, Tuple
 
 from pynput import keyboard, mouse
 
+from one_dragon.base.screen.frame_cache import FrameCache
 from one_dragon.base.screen.screen_area import ScreenArea
 from one_dragon.base.conditional_operation.state_recorder import StateRecord
 from one_dragon.utils import cv2_utils, thread_utils, cal_utils, os_utils, yolo_config_utils
@@ -69,7 +70,8 @@ class BattleAgentContext4Recording(AutoBattleAgentContext):
             else:
                 state.should_check_in_battle = True
 
-    def check_agent_related(self, screen: MatLike, screenshot_time: float) -> tuple[Any, Any]:
+    def check_agent_related(self, screen: MatLike, screenshot_time: float,
+                            frame_cache: Optional[FrameCache] = None) -> tuple[Any, Any]:
         """
         判断角色相关内容 并发送事件
         :return:
@@ -83,8 +85,10 @@ class BattleAgentContext4Recording(AutoBattleAgentContext):
                 return None, None
             self._last_check_agent_time = screenshot_time
 
-            screen_agent_list = self._check_agent_in_parallel(screen)
-            all_agent_state_list = self._check_all_agent_state(screen, screenshot_time, screen_agent_list)
+            if frame_cache is None:
+                frame_cache = FrameCache(screen, screenshot_time)
+            screen_agent_list = self._check_agent_in_parallel(frame_cache)
+            all_agent_state_list = self._check_all_agent_state(frame_cache, screen_agent_list)
 
             if screen_agent_list is None or len(screen_agent_list) == 0:
                 energy_state_list = []
@@ -156,7 +160,8 @@ class BattleDodgeContext4Recording(AutoBattleDodgeContext):
                 gh_proxy=self.ctx.env_config.is_gh_proxy,
                 gh_proxy_url=self.ctx.env_config.gh_proxy_url if self.ctx.env_config.is_gh_proxy else None,
                 personal_proxy=self.ctx.env_config.personal_proxy if self.ctx.env_config.is_personal_proxy else None,
-                gpu=use_gpu
+                gpu=use_gpu,
+                session_config=self.ctx.model_config.onnx_session_config
             )
 
         # 识别间隔
@@ -99,7 +99,8 @@ class LostVoidContext:
                 gh_proxy=self.ctx.env_config.is_gh_proxy,
                 gh_proxy_url=self.ctx.env_config.gh_proxy_url if self.ctx.env_config.is_gh_proxy else None,
                 personal_proxy=self.ctx.env_config.personal_proxy if self.ctx.env_config.is_personal_proxy else None,
-                gpu=use_gpu
+                gpu=use_gpu,
+                session_config=self.ctx.model_config.onnx_session_config
             )
 
     def init_auto_op(self) -> None:
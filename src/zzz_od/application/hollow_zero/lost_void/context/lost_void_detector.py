@@ -2,6 +2,7 @@ from typing import Optional, Union, List, Tuple, ClassVar
 
 from one_dragon.utils import yolo_config_utils
 from one_dragon.yolo.detect_utils import DetectFrameResult, DetectObjectResult
+from one_dragon.yolo.onnx_model_loader import OnnxSessionConfig
 from one_dragon.yolo.yolo_utils import ZZZ_MODEL_DOWNLOAD_URL
 from one_dragon.yolo.yolov8_onnx_det import Yolov8Detector
 
@@ -19,7 +20,8 @@ class LostVoidDetector(Yolov8Detector):
                  gh_proxy_url: Optional[str] = None,
                  personal_proxy: Optional[str] = None,
                  gpu: bool = False,
-                 keep_result_seconds: float = 2
+                 keep_result_seconds: float = 2,
+                 session_config: Optional[OnnxSessionConfig] = None
                  ):
         """
         崩铁用的YOLO模型 参考自 https://github.com/ibaiGorordo/ONNX-YOLOv8-Object-Detection
@@ -27,6 +29,7 @@ class LostVoidDetector(Yolov8Detector):
         :param backup_model_name: 放置所有模型的根目录
         :param gpu: 是否启用GPU运算
         :param keep_result_seconds: 保留多长时间的识别结果
+        :param session_config: onnxruntime 会话的配置 不传入时使用默认配置
         """
         Yolov8Detector.__init__(
             self,
@@ -38,7 +41,8 @@ class LostVoidDetector(Yolov8Detector):
             gh_proxy_url=gh_proxy_url,
             personal_proxy=personal_proxy,
             gpu=gpu,
-            keep_result_seconds=keep_result_seconds
+            keep_result_seconds=keep_result_seconds,
+            session_config=session_config
         )
 
     def is_frame_with_all(self, frame_result: Optional[DetectFrameResult] = None) -> Tuple[bool, bool, bool]:
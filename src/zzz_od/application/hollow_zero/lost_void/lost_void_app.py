@@ -45,6 +45,7 @@ class LostVoidApp(ZApplication):
             op_name='迷失之地',
             run_record=ctx.lost_void_record,
             need_notify=True,
+            prewarm_template_sub_dirs=['lost_void'],
         )
 
         self.next_region_type: LostVoidRegionType = LostVoidRegionType.ENTRY  # 下一个区域的类型
@@ -13,6 +13,7 @@ from one_dragon.utils.log_utils import log
 from zzz_od.application.world_patrol.mini_map_wrapper import MiniMapWrapper
 from zzz_od.application.world_patrol.operation.transport_by_3d_map import TransportBy3dMap
 from zzz_od.application.world_patrol.world_patrol_area import WorldPatrolLargeMap
+from zzz_od.application.world_patrol.world_patrol_pos_tracker import WorldPatrolPosTracker
 from zzz_od.application.world_patrol.world_patrol_route import WorldPatrolRoute, WorldPatrolOpType, WorldPatrolOperation
 from zzz_od.context.zzz_context import ZContext
 from zzz_od.operation.back_to_normal_world import BackToNormalWorld
@@ -37,6 +38,9 @@ class WorldPatrolRunRoute(ZOperation):
         self.current_large_map: WorldPatrolLargeMap = self.ctx.world_patrol_service.get_route_large_map(route)
         self.current_idx: int = start_idx
         self.current_pos: Point = Point(0, 0)
+        self.pos_tracker: WorldPatrolPosTracker = WorldPatrolPosTracker(
+            self.ctx.world_patrol_service, self.current_large_map
+        )
 
         self.stuck_move_direction: int = 0  # 脱困使用的方向
         self.route_op_start_time: float = 0  # 某个指令的开始时间
@@ -73,6 +77,7 @@ class WorldPatrolRunRoute(ZOperation):
         self.current_pos = self.ctx.world_patrol_service.get_route_pos_before_op_idx(self.route, self.current_idx)
         if self.current_pos is None:
             return self.round_fail(status='路线或开始下标有误')
+        self.pos_tracker.reset(self.current_pos, self.last_screenshot_time)
         self.ctx.controller.turn_vertical_by_distance(300)
         return self.round_success(wait=1)
 
@@ -121,11 +126,13 @@ class WorldPatrolRunRoute(ZOperation):
             self.current_pos.y + move_distance + mini_map_d,
         )
 
-        next_pos = self.ctx.world_patrol_service.cal_pos(
-            self.current_large_map,
+        pos_fix = self.pos_tracker.cal_pos(
             mini_map,
             possible_rect,
+            self.last_screenshot_time,
+            self.ctx.controller.is_moving,
         )
+        next_pos = pos_fix.pos
         if next_pos is None:
             no_pos_seconds = 0 if self.no_pos_start_time == 0 else self.last_screenshot_time - self.no_pos_start_time
             if self.no_pos_start_time == 0:
@@ -195,7 +202,8 @@ class WorldPatrolRunRoute(ZOperation):
                 self.ctx.controller.stop_moving_forward()
             return self.round_wait(status=f'已到达目标点 {target_pos}')
 
-        return self.round_wait(status=f'当前坐标 {self.current_pos} 角度 {current_angle} 目标点 {target_pos}',
+        return self.round_wait(status=f'当前坐标 {self.current_pos} 角度 {current_angle} 目标点 {target_pos} '
+                                      f'置信度 {pos_fix.confidence:.2f} 耗时 {pos_fix.cost * 1000:.1f}ms',
                                wait_round_time=0.3,  # 这个时间设置太小的话 会出现转向之后方向判断不准
                                )
 
@@ -5,6 +5,7 @@ from cv2.typing import MatLike
 
 from one_dragon.base.geometry.point import Point
 from one_dragon.utils import os_utils
+from zzz_od.application.world_patrol.world_patrol_icon_index import WorldPatrolIconIndex
 
 
 class WorldPatrolEntry:
@@ -81,6 +82,26 @@ class WorldPatrolLargeMap:
         self.road_mask: MatLike = road_mask
         self.icon_list: list[WorldPatrolLargeMapIcon] = icon_list
 
+        self._icon_index: WorldPatrolIconIndex | None = None
+        self._indexed_icon_list: list[WorldPatrolLargeMapIcon] | None = None  # 构建索引时的图标列表
+
+    @property
+    def icon_index(self) -> WorldPatrolIconIndex:
+        """
+        图标的空间索引 图标列表被替换后重新构建
+        原地修改图标列表或图标坐标后 需要调用方自行调用 build_icon_index
+        """
+        if self._icon_index is None or self.icon_list is not self._indexed_icon_list:
+            self.build_icon_index()
+        return self._icon_index
+
+    def build_icon_index(self) -> None:
+        """
+        构建图标的空间索引
+        """
+        self._icon_index = WorldPatrolIconIndex.from_icon_list(self.icon_list)
+        self._indexed_icon_list = self.icon_list
+
     def to_dict(self) -> dict:
         return {
             'area_full_id': self.area_full_id,
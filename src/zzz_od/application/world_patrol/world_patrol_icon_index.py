@@ -0,0 +1,311 @@
+import math
+
+import numpy as np
+
+from one_dragon.base.geometry.point import Point
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.base.matcher.match_result import MatchResult
+from one_dragon.utils import cal_utils
+
+
+class WorldPatrolIconIndex:
+
+    def __init__(
+            self,
+            icon_pos_list: list[Point],
+            template_id_list: list[str],
+            cell_size: int = 100,
+            max_pair_distance: int = 400,
+            pair_quantization: int = 10,
+    ):
+        """
+        大地图图标的空间索引
+
+        - 按均匀网格划分图标坐标 用于快速找到某个范围内的图标
+        - 预先计算距离不超过 max_pair_distance 的图标对 按 (模板, 模板, 量化后的相对位移) 建立哈希表
+          小地图上识别到两个图标时 可以直接查到大地图上相对位置一致的图标对
+
+        Args:
+            icon_pos_list: 图标在大地图上的坐标
+            template_id_list: 图标对应的模板ID 与坐标一一对应
+            cell_size: 网格大小
+            max_pair_distance: 图标对的最大距离 超过时不会同时出现在小地图上 使用小地图直径即可
+            pair_quantization: 相对位移的量化大小
+        """
+        self.cell_size: int = cell_size
+        self.max_pair_distance: int = max_pair_distance
+        self.pair_quantization: int = pair_quantization
+
+        self.template_id_list: list[str] = template_id_list
+        if len(icon_pos_list) > 0:
+            self.pos_array: np.ndarray = np.array([(p.x, p.y) for p in icon_pos_list], dtype=np.int64)
+        else:
+            self.pos_array: np.ndarray = np.zeros((0, 2), dtype=np.int64)
+
+        # key=网格坐标 value=图标下标 升序
+        self._grid: dict[tuple[int, int], list[int]] = {}
+        for idx, (x, y) in enumerate(self.pos_array.tolist()):
+            cell = (x // cell_size, y // cell_size)
+            if cell not in self._grid:
+                self._grid[cell] = []
+            self._grid[cell].append(idx)
+
+        # key=(模板A, 模板B, 量化后dx, 量化后dy) value=[(图标A下标, 图标B下标)]
+        self._pair_hash: dict[tuple[str, str, int, int], list[tuple[int, int]]] = {}
+        # 只遍历范围内的网格 避免构建 n*n 的距离矩阵
+        pos_list = self.pos_array.tolist()
+        max_dis2 = max_pair_distance * max_pair_distance
+        cell_range = int(math.ceil(max_pair_distance / cell_size))
+        for (cx, cy), idx_list in self._grid.items():
+            near_list = [j
+                         for ncx in range(cx - cell_range, cx + cell_range + 1)
+                         for ncy in range(cy - cell_range, cy + cell_range + 1)
+                         for j in self._grid.get((ncx, ncy), [])]
+            for i in idx_list:
+                x1, y1 = pos_list[i]
+                for j in near_list:
+                    if i == j:
+                        continue
+                    dx = pos_list[j][0] - x1
+                    dy = pos_list[j][1] - y1
+                    if dx * dx + dy * dy > max_dis2:
+                        continue
+                    key = (template_id_list[i], template_id_list[j],
+                           self._quantize(dx), self._quantize(dy))
+                    if key not in self._pair_hash:
+                        self._pair_hash[key] = []
+                    self._pair_hash[key].append((i, j))
+
+    @staticmethod
+    def from_icon_list(icon_list: list, **kwargs) -> 'WorldPatrolIconIndex':
+        """
+        Args:
+            icon_list: 大地图图标 WorldPatrolLargeMapIcon
+
+        Returns:
+            WorldPatrolIconIndex: 索引
+        """
+        return WorldPatrolIconIndex(
+            [i.lm_pos for i in icon_list],
+            [i.template_id for i in icon_list],
+            **kwargs
+        )
+
+    def _quantize(self, v: int) -> int:
+        return int(math.floor(v / self.pair_quantization))
+
+    def __len__(self) -> int:
+        return len(self.template_id_list)
+
+    def query_rect(self, rect: Rect) -> list[int]:
+        """
+        找到范围内的图标 包含边界
+
+        Args:
+            rect: 大地图上的范围
+
+        Returns:
+            list[int]: 图标下标 升序
+        """
+        if len(self.pos_array) == 0:
+            return []
+        cx1, cy1 = rect.x1 // self.cell_size, rect.y1 // self.cell_size
+        cx2, cy2 = rect.x2 // self.cell_size, rect.y2 // self.cell_size
+
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > len(self._grid):  # 范围很大时 直接遍历已有的网格
+            candidate_list = [idx
+                              for (cx, cy), idx_list in self._grid.items()
+                              if cx1 <= cx <= cx2 and cy1 <= cy <= cy2
+                              for idx in idx_list]
+        else:
+            candidate_list = [idx
+                              for cx in range(cx1, cx2 + 1)
+                              for cy in range(cy1, cy2 + 1)
+                              for idx in self._grid.get((cx, cy), [])]
+
+        result: list[int] = []
+        for idx in candidate_list:
+            x, y = self.pos_array[idx]
+            if rect.x1 <= x <= rect.x2 and rect.y1 <= y <= rect.y2:
+                result.append(idx)
+        result.sort()
+        return result
+
+    def find_near(self, pos: Point, template_id: str, max_distance: float) -> list[int]:
+        """
+        找到某个坐标附近 指定模板的图标
+
+        Args:
+            pos: 大地图上的坐标
+            template_id: 模板ID
+            max_distance: 距离需要小于这个值
+
+        Returns:
+            list[int]: 图标下标 升序
+        """
+        r = int(math.ceil(max_distance))
+        result: list[int] = []
+        for idx in self.query_rect(Rect(pos.x - r, pos.y - r, pos.x + r, pos.y + r)):
+            if self.template_id_list[idx] != template_id:
+                continue
+            x, y = self.pos_array[idx]
+            if math.hypot(x - pos.x, y - pos.y) < max_distance:
+                result.append(idx)
+        return result
+
+    def lookup_pair(
+            self,
+            template_id_a: str,
+            template_id_b: str,
+            dx: int,
+            dy: int,
+            max_error: float,
+    ) -> list[tuple[int, int]]:
+        """
+        找到大地图上 模板一致且相对位移接近的图标对
+
+        Args:
+            template_id_a: 图标A的模板ID
+            template_id_b: 图标B的模板ID
+            dx: 图标B相对图标A的横向位移
+            dy: 图标B相对图标A的纵向位移
+            max_error: 相对位移的误差需要小于这个值
+
+        Returns:
+            list[tuple[int, int]]: (图标A下标, 图标B下标)
+        """
+        qx1, qx2 = self._quantize(dx - max_error), self._quantize(dx + max_error)
+        qy1, qy2 = self._quantize(dy - max_error), self._quantize(dy + max_error)
+        result: list[tuple[int, int]] = []
+        for qx in range(qx1, qx2 + 1):
+            for qy in range(qy1, qy2 + 1):
+                for i, j in self._pair_hash.get((template_id_a, template_id_b, qx, qy), []):
+                    pair_dx, pair_dy = (self.pos_array[j] - self.pos_array[i]).tolist()
+                    if math.hypot(pair_dx - dx, pair_dy - dy) < max_error:
+                        result.append((i, j))
+        return result
+
+    def match_icons(
+            self,
+            lm_idx_list: list[int],
+            mm_icon_list: list[tuple[str, Point]],
+            mm_w: int,
+            mm_h: int,
+    ) -> list[MatchResult]:
+        """
+        根据小地图上识别到的图标 计算小地图左上角在大地图上的候选位置
+        先使用图标对查找 找不到时逐个图标投票
+
+        Args:
+            lm_idx_list: 大地图范围内的图标下标
+            mm_icon_list: 小地图上识别到的图标 (模板ID, 中心点)
+            mm_w: 小地图宽度
+            mm_h: 小地图高度
+
+        Returns:
+            list[MatchResult]: 候选位置
+        """
+        match_list = self.match_by_pair(set(lm_idx_list), mm_icon_list, mm_w, mm_h)
+        if len(match_list) == 0:
+            match_list = self.match_by_vote(lm_idx_list, mm_icon_list, mm_w, mm_h)
+        return match_list
+
+    def match_by_pair(
+            self,
+            lm_idx_set: set[int],
+            mm_icon_list: list[tuple[str, Point]],
+            mm_w: int,
+            mm_h: int,
+            max_error: float = 10,
+    ) -> list[MatchResult]:
+        """
+        使用小地图上的图标对 在大地图的图标对哈希表中查找位置
+
+        Args:
+            lm_idx_set: 大地图范围内的图标下标
+            mm_icon_list: 小地图上识别到的图标
+            mm_w: 小地图宽度
+            mm_h: 小地图高度
+            max_error: 位置误差
+
+        Returns:
+            list[MatchResult]: 小地图左上角在大地图上的候选位置 置信度=能对上的小地图图标数量 至少2个
+        """
+        match_list: list[MatchResult] = []
+        for a in range(len(mm_icon_list)):
+            template_id_a, point_a = mm_icon_list[a]
+            for b in range(a + 1, len(mm_icon_list)):
+                template_id_b, point_b = mm_icon_list[b]
+                pair_list = self.lookup_pair(template_id_a, template_id_b,
+                                             point_b.x - point_a.x, point_b.y - point_a.y,
+                                             max_error=max_error)
+                for i, j in pair_list:
+                    if i not in lm_idx_set or j not in lm_idx_set:
+                        continue
+                    lm_x, lm_y = self.pos_array[i].tolist()
+                    new_mr = MatchResult(0, lm_x - point_a.x, lm_y - point_a.y, mm_w, mm_h)
+                    if any(cal_utils.distance_between(new_mr.left_top, old_mr.left_top) < max_error
+                           for old_mr in match_list):
+                        continue
+                    match_list.append(new_mr)
+
+        # 置信度=平移后 在大地图对应位置附近有同样图标的小地图图标数量
+        for mr in match_list:
+            for template_id, point in mm_icon_list:
+                near_list = self.find_near(mr.left_top + point, template_id, max_error)
+                if any(i in lm_idx_set for i in near_list):
+                    mr.confidence += 1
+
+        return [mr for mr in match_list if mr.confidence >= 2]
+
+    def match_by_vote(
+            self,
+            lm_idx_list: list[int],
+            mm_icon_list: list[tuple[str, Point]],
+            mm_w: int,
+            mm_h: int,
+            merge_distance: float = 10,
+    ) -> list[MatchResult]:
+        """
+        每个 大地图图标-小地图图标 的组合 对小地图的位置投票 距离相近的位置合并
+
+        Args:
+            lm_idx_list: 大地图范围内的图标下标
+            mm_icon_list: 小地图上识别到的图标
+            mm_w: 小地图宽度
+            mm_h: 小地图高度
+            merge_distance: 小于这个距离的位置合并
+
+        Returns:
+            list[MatchResult]: 小地图左上角在大地图上的候选位置 置信度=票数
+        """
+        cell_size = int(math.ceil(merge_distance))
+
+        match_list: list[MatchResult] = []
+        grid: dict[tuple[int, int], list[int]] = {}  # key=网格坐标 value=落在网格内的候选位置下标
+        for lm_idx in lm_idx_list:
+            lm_template_id = self.template_id_list[lm_idx]
+            lm_x, lm_y = self.pos_array[lm_idx].tolist()
+            for mini_map_icon_name, mini_map_icon_point in mm_icon_list:
+                if mini_map_icon_name != lm_template_id:
+                    continue
+                new_mr = MatchResult(1, lm_x - mini_map_icon_point.x, lm_y - mini_map_icon_point.y, mm_w, mm_h)
+
+                # 合并到最早出现的相近位置
+                cx, cy = new_mr.x // cell_size, new_mr.y // cell_size
+                merge_idx: int | None = None
+                for nx in range(cx - 1, cx + 2):
+                    for ny in range(cy - 1, cy + 2):
+                        for idx in grid.get((nx, ny), []):
+                            if merge_idx is not None and idx >= merge_idx:
+                                continue
+                            if cal_utils.distance_between(new_mr.left_top, match_list[idx].left_top) < merge_distance:
+                                merge_idx = idx
+
+                if merge_idx is not None:
+                    match_list[merge_idx].confidence += 1
+                else:
+                    grid.setdefault((cx, cy), []).append(len(match_list))
+                    match_list.append(new_mr)
+
+        return match_list
@@ -0,0 +1,273 @@
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from one_dragon.base.geometry.point import Point
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.base.matcher.match_result import MatchResult
+from one_dragon.utils.log_utils import log
+from zzz_od.application.world_patrol.mini_map_wrapper import MiniMapWrapper
+from zzz_od.application.world_patrol.world_patrol_area import WorldPatrolLargeMap
+
+if TYPE_CHECKING:
+    from zzz_od.application.world_patrol.world_patrol_service import WorldPatrolService
+
+
+@dataclass
+class WorldPatrolPosFix:
+    """一次坐标计算的结果"""
+    pos: Point | None  # 坐标 计算失败时为None
+    confidence: float  # 置信度 道路匹配时为模板匹配的相似度 图标匹配时为1
+    method: str  # 计算方式 icon=图标 road=道路
+    search_rect: Rect | None  # 最后搜索的大地图范围
+    search_times: int  # 搜索了多少个范围
+    cost: float  # 耗时 秒
+    fix_time: float  # 对应的截图时间
+
+
+class WorldPatrolPosTracker:
+
+    def __init__(
+            self,
+            service: 'WorldPatrolService',
+            large_map: WorldPatrolLargeMap,
+            min_radius: int = 20,
+            default_speed: float = 50,
+            max_speed: float = 150,
+            accept_confidence: float = 0.5,
+            history_size: int = 100,
+    ):
+        """
+        持续跟踪小地图在大地图上的坐标
+
+        根据上一次的坐标、移动速度和小地图朝向 预测当前坐标
+        先在预测坐标附近的小范围内匹配 置信度不足时才逐步扩大范围 最后使用调用方给出的完整范围
+
+        Args:
+            service: 锄大地服务
+            large_map: 大地图
+            min_radius: 预测坐标附近搜索的最小半径
+            default_speed: 还没有速度估计时使用的移动速度 像素/秒
+            max_speed: 速度估计的上限 像素/秒 用于排除错误的坐标
+            accept_confidence: 小范围内道路匹配需要达到的置信度
+            history_size: 保留多少次坐标计算的结果
+        """
+        self.service: 'WorldPatrolService' = service
+        self.large_map: WorldPatrolLargeMap = large_map
+        self.min_radius: int = min_radius
+        self.default_speed: float = default_speed
+        self.max_speed: float = max_speed
+        self.accept_confidence: float = accept_confidence
+
+        self.last_pos: Point | None = None  # 上一次的坐标
+        self.last_pos_time: float = 0  # 上一次坐标对应的截图时间
+        self.speed: float = default_speed  # 移动速度估计 像素/秒
+        self.lost_times: int = 0  # 连续计算失败的次数
+
+        self.fix_history: deque[WorldPatrolPosFix] = deque(maxlen=history_size)
+
+    def reset(self, pos: Point | None, pos_time: float = 0) -> None:
+        """
+        重置跟踪状态 例如传送后
+
+        Args:
+            pos: 当前坐标
+            pos_time: 坐标对应的时间
+        """
+        self.last_pos = pos
+        self.last_pos_time = pos_time
+        self.speed = self.default_speed
+        self.lost_times = 0
+
+    def predict(self, now: float, view_angle: float | None, is_moving: bool) -> Point | None:
+        """
+        预测当前的坐标
+
+        Args:
+            now: 当前截图时间
+            view_angle: 小地图朝向 正右=0 逆时针=加
+            is_moving: 是否正在向前移动
+
+        Returns:
+            Point: 预测坐标 没有上一次坐标时返回None
+        """
+        if self.last_pos is None:
+            return None
+        if not is_moving or view_angle is None:
+            return self.last_pos
+
+        distance = self.speed * max(0.0, now - self.last_pos_time)
+        radians = math.radians(view_angle)
+        return Point(
+            int(self.last_pos.x + distance * math.cos(radians)),
+            int(self.last_pos.y - distance * math.sin(radians)),  # 图片坐标 y轴向下
+        )
+
+    def get_search_radius_list(self, now: float, is_moving: bool) -> list[int]:
+        """
+        预测坐标附近 依次搜索的半径
+
+        Args:
+            now: 当前截图时间
+            is_moving: 是否正在向前移动
+
+        Returns:
+            list[int]: 从小到大的半径
+        """
+        if self.last_pos is None or self.lost_times > 0:
+            return []
+
+        # 不确定的距离 随上一次坐标后经过的时间增长
+        uncertainty = self.speed * max(0.0, now - self.last_pos_time)
+        if not is_moving:
+            uncertainty *= 0.5
+        radius = int(self.min_radius + uncertainty * 0.5)
+        return [radius, radius * 3]
+
+    def cal_pos(
+            self,
+            mini_map: MiniMapWrapper,
+            full_rect: Rect,
+            now: float,
+            is_moving: bool,
+    ) -> WorldPatrolPosFix:
+        """
+        计算当前小地图在大地图上的坐标
+
+        Args:
+            mini_map: 小地图
+            full_rect: 大地图上最大的考虑范围 小范围都失败时使用
+            now: 当前截图时间
+            is_moving: 是否正在向前移动
+
+        Returns:
+            WorldPatrolPosFix: 计算结果
+        """
+        start_time = time.perf_counter()
+        view_angle = mini_map.view_angle if is_moving else None
+        predict_pos = self.predict(now, view_angle, is_moving)
+
+        search_times = 0
+        fix: WorldPatrolPosFix | None = None
+        for radius in self.get_search_radius_list(now, is_moving):
+            search_rect = self._get_search_rect(predict_pos, radius, mini_map)
+            search_times += 1
+            fix = self._cal_pos_in_rect(mini_map, search_rect, search_times, now, strict=True)
+            if fix is not None:
+                break
+
+        if fix is None:
+            search_times += 1
+            fix = self._cal_pos_in_rect(mini_map, full_rect, search_times, now, strict=False)
+
+        if fix is None:
+            fix = WorldPatrolPosFix(pos=None, confidence=0, method='', search_rect=full_rect,
+                                    search_times=search_times, cost=0, fix_time=now)
+
+        fix.cost = time.perf_counter() - start_time
+        self._update_state(fix, is_moving)
+        self.fix_history.append(fix)
+        log.debug(f'计算坐标 {fix.pos} 方式 {fix.method} 置信度 {fix.confidence:.2f} '
+                  f'搜索次数 {fix.search_times} 耗时 {fix.cost * 1000:.1f}ms')
+        return fix
+
+    def _get_search_rect(self, center: Point, radius: int, mini_map: MiniMapWrapper) -> Rect:
+        """
+        小地图中心在 center 附近 radius 范围内移动时 需要的大地图范围
+        """
+        h, w = mini_map.road_mask.shape[:2]
+        return Rect(
+            center.x - radius - w // 2,
+            center.y - radius - h // 2,
+            center.x + radius - w // 2 + w,
+            center.y + radius - h // 2 + h,
+        )
+
+    def _cal_pos_in_rect(
+            self,
+            mini_map: MiniMapWrapper,
+            search_rect: Rect,
+            search_times: int,
+            now: float,
+            strict: bool,
+    ) -> WorldPatrolPosFix | None:
+        """
+        在一个范围内计算坐标
+
+        Args:
+            mini_map: 小地图
+            search_rect: 大地图上的范围
+            search_times: 当前是第几次搜索
+            now: 当前截图时间
+            strict: 是否需要检查结果可信 小范围搜索时使用 不可信时交给更大的范围
+
+        Returns:
+            WorldPatrolPosFix: 计算结果 失败时返回None
+        """
+        icon_pos = self.service.cal_pos_by_icon(self.large_map, mini_map, search_rect)
+        if icon_pos is not None and (not strict or self._is_reachable(icon_pos, now)):
+            return WorldPatrolPosFix(pos=icon_pos, confidence=1, method='icon', search_rect=search_rect,
+                                     search_times=search_times, cost=0, fix_time=now)
+
+        mr = self.service.cal_pos_by_road_result(self.large_map, mini_map, search_rect)
+        if mr is None:
+            return None
+        if strict and (mr.confidence < self.accept_confidence or self._is_on_border(mr, search_rect)):
+            return None
+
+        return WorldPatrolPosFix(pos=mr.center, confidence=mr.confidence, method='road', search_rect=search_rect,
+                                 search_times=search_times, cost=0, fix_time=now)
+
+    def _is_on_border(self, mr: MatchResult, search_rect: Rect) -> bool:
+        """
+        匹配结果是否在搜索范围的边缘 在边缘时真正的位置可能在范围外
+        大地图本身的边缘不算
+        """
+        lm_h, lm_w = self.large_map.road_mask.shape[:2]
+        x1 = max(search_rect.x1, 0)
+        y1 = max(search_rect.y1, 0)
+        x2 = min(search_rect.x2, lm_w) - mr.w
+        y2 = min(search_rect.y2, lm_h) - mr.h
+        return ((mr.x <= x1 and x1 > 0)
+                or (mr.y <= y1 and y1 > 0)
+                or (mr.x >= x2 and x2 < lm_w - mr.w)
+                or (mr.y >= y2 and y2 < lm_h - mr.h))
+
+    def _is_reachable(self, pos: Point, now: float) -> bool:
+        """
+        从上一次的坐标 按最大速度能否移动到这个坐标
+        """
+        if self.last_pos is None:
+            return True
+        max_distance = self.min_radius + self.max_speed * max(0.0, now - self.last_pos_time)
+        return math.hypot(pos.x - self.last_pos.x, pos.y - self.last_pos.y) <= max_distance
+
+    def _update_state(self, fix: WorldPatrolPosFix, is_moving: bool) -> None:
+        """
+        根据计算结果 更新跟踪状态 只在移动时更新速度估计
+        """
+        if fix.pos is None:
+            self.lost_times += 1
+            return
+
+        self.lost_times = 0
+        if is_moving and self.last_pos is not None:
+            dt = fix.fix_time - self.last_pos_time
+            if dt > 0:
+                speed = math.hypot(fix.pos.x - self.last_pos.x, fix.pos.y - self.last_pos.y) / dt
+                if speed <= self.max_speed:
+                    self.speed = self.speed * 0.7 + speed * 0.3
+
+        self.last_pos = fix.pos
+        self.last_pos_time = fix.fix_time
+
+    def get_avg_cost(self) -> float:
+        """
+        Returns:
+            float: 最近的平均耗时 秒
+        """
+        if len(self.fix_history) == 0:
+            return 0
+        return sum(i.cost for i in self.fix_history) / len(self.fix_history)
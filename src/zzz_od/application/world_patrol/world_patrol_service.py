@@ -112,6 +112,7 @@ class WorldPatrolService:
                 ))
 
             lm = WorldPatrolLargeMap(area.full_id, road_mask, icon_list)
+            lm.build_icon_index()
             self.large_map_list.append(lm)
 
     def get_area_list_by_entry(self, entry: WorldPatrolEntry) -> list[WorldPatrolArea]:
@@ -416,6 +417,7 @@ class WorldPatrolService:
     ) -> Point | None:
         """
         根据出现的图标 计算当前小地图在大地图上的坐标
+        小地图上识别到多个图标时 使用大地图预先计算的图标对直接查找位置 否则逐个图标投票
 
         Args:
             large_map: 大地图
@@ -425,29 +427,19 @@ class WorldPatrolService:
         Returns:
             Point: 坐标
         """
-        x1 = lm_rect.x1
-        x2 = lm_rect.x2
-        y1 = lm_rect.y1
-        y2 = lm_rect.y2
-
         # 找到大地图指定范围有哪些图标
-        lm_icon_set: set[str] = set()
-        for large_map_icon in large_map.icon_list:
-            if large_map_icon.lm_pos.x < x1 or large_map_icon.lm_pos.x > x2:
-                continue
-            if large_map_icon.lm_pos.y < y1 or large_map_icon.lm_pos.y > y2:
-                continue
-            lm_icon_set.add(large_map_icon.template_id)
-
-        if len(lm_icon_set) == 0:
+        icon_index = large_map.icon_index
+        lm_idx_list = icon_index.query_rect(lm_rect)
+        if len(lm_idx_list) == 0:
             return None
 
         # 找到小地图能匹配哪些图标
+        lm_template_id_list = list(dict.fromkeys(icon_index.template_id_list[i] for i in lm_idx_list))
         mm_icon_list: list[tuple[str, Point]] = []
-        for icon_template_id in lm_icon_set:
+        for icon_template_id in lm_template_id_list:
             template = self.ctx.template_loader.get_template('map', icon_template_id)
             if template is None:
-                break
+                continue
 
             mrl = cv2_utils.match_template(
                 source=mini_map.rgb,
@@ -463,34 +455,11 @@ class WorldPatrolService:
                 center_y = mr.left_top.y + template.raw.shape[0] // 2
                 mm_icon_list.append((template.template_id, Point(center_x, center_y)))
 
-        # 使用小坐标来匹配
-        match_list: list[MatchResult] = []
-        for large_map_icon in large_map.icon_list:
-            if large_map_icon.lm_pos.x < x1 or large_map_icon.lm_pos.x > x2:
-                continue
-            if large_map_icon.lm_pos.y < y1 or large_map_icon.lm_pos.y > y2:
-                continue
-            for mini_map_icon_name, mini_map_icon_point in mm_icon_list:
-                if mini_map_icon_name != large_map_icon.template_id:
-                    continue
-                new_point = large_map_icon.lm_pos - mini_map_icon_point
-                new_mr = MatchResult(
-                    1,
-                    new_point.x,
-                    new_point.y,
-                    mini_map.road_mask.shape[1],
-                    mini_map.road_mask.shape[0],
-                )
-
-                merged = False
-                for old_mr in match_list:
-                    if cal_utils.distance_between(new_mr.left_top, old_mr.left_top) < 10:
-                        old_mr.confidence += 1
-                        merged = True
-                        break
-                if not merged:
-                    match_list.append(new_mr)
+        if len(mm_icon_list) == 0:
+            return None
 
+        match_list = icon_index.match_icons(lm_idx_list, mm_icon_list,
+                                            mini_map.road_mask.shape[1], mini_map.road_mask.shape[0])
         if len(match_list) == 0:
             return None
 
@@ -506,6 +475,9 @@ class WorldPatrolService:
                           mr.left_top.y:mr.left_top.y + mini_map.road_mask.shape[0],
                           mr.left_top.x:mr.left_top.x + mini_map.road_mask.shape[1]
                           ]
+            if mr.left_top.x < 0 or mr.left_top.y < 0 or source_part.shape != mini_map.road_mask.shape:
+                mr.confidence = 0  # 超出大地图范围
+                continue
             # 置信度=相同的数量
             same = cv2.bitwise_and(source_part, mini_map.road_mask)
             mr.confidence = float(np.sum(np.where(same > 0)))
@@ -530,17 +502,41 @@ class WorldPatrolService:
         Returns:
             Point: 坐标
         """
+        mr = self.cal_pos_by_road_result(large_map, mini_map, lm_rect)
+        return None if mr is None else mr.center
+
+    def cal_pos_by_road_result(
+            self,
+            large_map: WorldPatrolLargeMap,
+            mini_map: MiniMapWrapper,
+            lm_rect: Rect,
+            threshold: float = 0.1,
+    ) -> MatchResult | None:
+        """
+        根据道路掩码 计算当前小地图在大地图上的匹配结果
+
+        Args:
+            large_map: 大地图
+            mini_map: 小地图
+            lm_rect: 大地图上考虑的范围
+            threshold: 匹配阈值
+
+        Returns:
+            MatchResult: 小地图在大地图上的位置 置信度为模板匹配的相似度
+        """
         source, rect = cv2_utils.crop_image(large_map.road_mask, lm_rect)
         template = mini_map.road_mask
+        if source.shape[0] < template.shape[0] or source.shape[1] < template.shape[1]:
+            return None
 
         mrl = cv2_utils.match_template(
             source=source,
             template=template,
-            threshold=0.1,
+            threshold=threshold,
             ignore_inf=True,
         )
 
         if rect is not None:
             mrl.add_offset(rect.left_top)
 
-        return None if mrl.max is None else mrl.max.center
+        return mrl.max
@@ -1,4 +1,4 @@
-from typing import Optional, Callable
+from typing import Optional, Callable, List
 import time
 from one_dragon.base.operation.application_base import Application
 from one_dragon.base.operation.application_run_record import AppRunRecord
@@ -22,7 +22,8 @@ class ZApplication(Application, TelemetryApplicationMixin):
                  run_record: Optional[AppRunRecord] = None,
                  need_ocr: bool = True,
                  retry_in_od: bool = False,
-                 need_notify: bool = False
+                 need_notify: bool = False,
+                 prewarm_template_sub_dirs: Optional[List[str]] = None,
                  ):
         self.ctx: ZContext = ctx
         op_to_enter_game = OpenAndEnterGame(ctx)
@@ -39,7 +40,8 @@ class ZApplication(Application, TelemetryApplicationMixin):
                              run_record=run_record,
                              need_ocr=need_ocr,
                              retry_in_od=retry_in_od,
-                             need_notify=need_notify
+                             need_notify=need_notify,
+                             prewarm_template_sub_dirs=prewarm_template_sub_dirs,
                              )
 
         self._telemetry_start_time = None
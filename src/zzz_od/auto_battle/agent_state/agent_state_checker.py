@@ -1,8 +1,11 @@
 import cv2
 import numpy as np
 from cv2.typing import MatLike
-from typing import Optional
+from typing import Hashable, Optional
 
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.base.screen.frame_cache import FrameCache
+from one_dragon.base.screen.template_info import TemplateInfo
 from one_dragon.utils import cv2_utils
 from zzz_od.context.zzz_context import ZContext
 from zzz_od.game_data.agent import AgentStateDef
@@ -29,12 +32,34 @@ def get_template(ctx: ZContext, state_def: AgentStateDef,
     return template
 
 
+def get_template_key(template: TemplateInfo) -> tuple[str, str]:
+    """
+    模板在单帧缓存中的标识
+    :param template: 模板
+    :return:
+    """
+    return template.sub_dir, template.template_id
+
+
+def get_frame_cache(screen: MatLike, frame_cache: Optional[FrameCache]) -> FrameCache:
+    """
+    获取单帧缓存 没有传入时只在本次判断中使用
+    :param screen: 游戏画面
+    :param frame_cache: 同一帧共享的预处理结果
+    :return:
+    """
+    if frame_cache is None:
+        return FrameCache(screen)
+    return frame_cache
+
+
 def check_cnt_by_color_range(
         ctx: ZContext,
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     """
     在指定区域内，按颜色判断连通块有多少个
@@ -43,15 +68,16 @@ def check_cnt_by_color_range(
     :param state_def: 角色状态定义
     :param total: 总角色数量
     :param pos: 角色位置 从1开始
+    :param frame_cache: 同一帧共享的预处理结果
     :return:
     """
     template = get_template(ctx, state_def, total, pos)
     if template is None:
         return 0
-    part = cv2_utils.crop_image_only(screen, template.get_template_rect_by_point())
-    to_check = cv2.bitwise_and(part, part, mask=template.mask)
-
-    mask = filter_by_color(to_check, state_def)
+    frame_cache = get_frame_cache(screen, frame_cache)
+    rect = template.get_template_rect_by_point()
+    mask = filter_by_color_in_cache(frame_cache, rect, state_def,
+                                    mask=template.mask, mask_key=get_template_key(template))
     mask = cv2_utils.dilate(mask, 2)
     # cv2_utils.show_image(mask, wait=0)
 
@@ -72,7 +98,8 @@ def check_exist_by_color_range(
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     """
     在指定区域内，按颜色判断是否有出现
@@ -81,9 +108,10 @@ def check_exist_by_color_range(
     :param state_def: 角色状态定义
     :param total: 总角色数量
     :param pos: 角色位置 从1开始
+    :param frame_cache: 同一帧共享的预处理结果
     :return 存在返回1 不存在返回0
     """
-    cnt = check_cnt_by_color_range(ctx, screen, state_def, total, pos)
+    cnt = check_cnt_by_color_range(ctx, screen, state_def, total, pos, frame_cache)
     return 1 if cnt > 0 else 0
 
 
@@ -92,7 +120,8 @@ def check_length_by_background_gray(
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     """
     在指定区域内，按背景的灰度色来反推横条的长度
@@ -101,16 +130,15 @@ def check_length_by_background_gray(
     :param state_def: 角色状态定义
     :param total: 总角色数量
     :param pos: 角色位置 从1开始
+    :param frame_cache: 同一帧共享的预处理结果
     :return: 0~100
     """
     template = get_template(ctx, state_def, total, pos)
     if template is None:
         return 0
-    part = cv2_utils.crop_image_only(screen, template.get_template_rect_by_point())
+    frame_cache = get_frame_cache(screen, frame_cache)
     # 模版需要保证高度是1
-    to_check = part
-
-    gray = cv2.cvtColor(to_check, cv2.COLOR_RGB2GRAY).mean(axis=0)
+    gray = frame_cache.gray(template.get_template_rect_by_point()).mean(axis=0)
     mask = (gray >= state_def.lower_color) & (gray <= state_def.upper_color)
     bg_mask_idx = np.where(mask)
     fg_mask_idx = np.where(~mask)
@@ -149,7 +177,8 @@ def check_length_by_foreground_gray(
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     """
     在指定区域内，按背景的灰度色来反推横条的长度
@@ -158,14 +187,15 @@ def check_length_by_foreground_gray(
     :param state_def: 角色状态定义
     :param total: 总角色数量
     :param pos: 角色位置 从1开始
+    :param frame_cache: 同一帧共享的预处理结果
     :return: 0~100
     """
     template = get_template(ctx, state_def, total, pos)
     if template is None:
         return 0
-    part = cv2_utils.crop_image_only(screen, template.get_template_rect_by_point())
+    frame_cache = get_frame_cache(screen, frame_cache)
     # 模版需要保证高度是1
-    gray = cv2.cvtColor(part, cv2.COLOR_RGB2GRAY).mean(axis=0)
+    gray = frame_cache.gray(template.get_template_rect_by_point()).mean(axis=0)
     if state_def.split_color_range is not None:
         split_mask = (gray >= state_def.split_color_range[0]) & (gray <= state_def.split_color_range[1])
         gray = gray[np.where(split_mask == False)]
@@ -191,7 +221,8 @@ def check_length_by_foreground_color(
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     """
     在指定区域内，按前景色(彩色)来计算横条的长度
@@ -200,15 +231,16 @@ def check_length_by_foreground_color(
     :param state_def: 角色状态定义
     :param total: 总角色数量
     :param pos: 角色位置 从1开始
+    :param frame_cache: 同一帧共享的预处理结果
     :return: 0~100
     """
     template = get_template(ctx, state_def, total, pos)
     if template is None:
         return 0
-    part = cv2_utils.crop_image_only(screen, template.get_template_rect_by_point())
-    to_check = part
-
-    mask = filter_by_color(to_check, state_def)
+    frame_cache = get_frame_cache(screen, frame_cache)
+    rect = template.get_template_rect_by_point()
+    part = frame_cache.crop(rect)
+    mask = filter_by_color_in_cache(frame_cache, rect, state_def)
     # 查找所有非零（白色）像素的坐标
     white_pixels_coords = cv2.findNonZero(mask)
 
@@ -237,7 +269,8 @@ def check_template_not_found(
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     """
     在指定区域内，找不到对应模板
@@ -246,12 +279,13 @@ def check_template_not_found(
     :param state_def: 角色状态定义
     :param total: 总角色数量
     :param pos: 角色位置 从1开始
+    :param frame_cache: 同一帧共享的预处理结果
     :return: 找不到对应模板返回1 否则返回0
     """
     template = get_template(ctx, state_def, total, pos)
     if template is None:
         return False
-    to_check = cv2_utils.crop_image_only(screen, template.get_template_rect_by_point())
+    to_check = get_frame_cache(screen, frame_cache).crop(template.get_template_rect_by_point())
     mrl = cv2_utils.match_template(source=to_check, template=template.raw, mask=template.mask,
                                    threshold=state_def.template_threshold)
 
@@ -263,7 +297,8 @@ def check_template_found(
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     """
     在指定区域内，找到对应模板
@@ -272,12 +307,13 @@ def check_template_found(
     :param state_def: 角色状态定义
     :param total: 总角色数量
     :param pos: 角色位置 从1开始
+    :param frame_cache: 同一帧共享的预处理结果
     :return: 找不到对应模板返回1 否则返回0
     """
     template = get_template(ctx, state_def, total, pos)
     if template is None:
         return False
-    to_check = cv2_utils.crop_image_only(screen, template.get_template_rect_by_point())
+    to_check = get_frame_cache(screen, frame_cache).crop(template.get_template_rect_by_point())
     mrl = cv2_utils.match_template(source=to_check, template=template.raw, mask=template.mask,
                                    threshold=state_def.template_threshold)
 
@@ -289,7 +325,8 @@ def check_cnt_by_color_channel_max_range(
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     """
     在指定区域内，按颜色通道的最大值判断连通块有多少个
@@ -298,16 +335,18 @@ def check_cnt_by_color_channel_max_range(
     :param state_def: 角色状态定义
     :param total: 总角色数量
     :param pos: 角色位置 从1开始
+    :param frame_cache: 同一帧共享的预处理结果
     :return:
     """
     template = get_template(ctx, state_def, total, pos)
     if template is None:
         return 0
-    part = cv2_utils.crop_image_only(screen, template.get_template_rect_by_point())
-    to_check = cv2.bitwise_and(part, part, mask=template.mask)
-
-    r, g, b = cv2.split(to_check)
-    max_channel = np.max(np.array([r, g, b]), axis=0)
+    frame_cache = get_frame_cache(screen, frame_cache)
+    rect = template.get_template_rect_by_point()
+    template_key = get_template_key(template)
+    to_check = frame_cache.crop_with_mask(rect, template.mask, template_key)
+    max_channel = frame_cache.get(('channel_max', FrameCache.get_rect_key(rect), template_key),
+                                  lambda: np.max(to_check, axis=2))
     mask = cv2.inRange(max_channel, state_def.lower_color, state_def.upper_color)
     mask = cv2_utils.dilate(mask, 2)
 
@@ -328,7 +367,8 @@ def check_exist_by_color_channel_max_range(
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     """
     在指定区域内，按颜色通道的最大值判断是否有出现
@@ -337,8 +377,9 @@ def check_exist_by_color_channel_max_range(
     :param state_def: 角色状态定义
     :param total: 总角色数量
     :param pos: 角色位置 从1开始
+    :param frame_cache: 同一帧共享的预处理结果
     """
-    cnt = check_cnt_by_color_channel_max_range(ctx, screen, state_def, total, pos)
+    cnt = check_cnt_by_color_channel_max_range(ctx, screen, state_def, total, pos, frame_cache)
     return 1 if cnt > 0 else 0
 
 
@@ -347,14 +388,16 @@ def check_cnt_by_color_channel_equal_range(
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     # 1. 获取模板并裁剪目标区域
     template = get_template(ctx, state_def, total, pos)
     if template is None:
         return 0
-    part = cv2_utils.crop_image_only(screen, template.get_template_rect_by_point())
-    to_check = cv2.bitwise_and(part, part, mask=template.mask)
+    frame_cache = get_frame_cache(screen, frame_cache)
+    to_check = frame_cache.crop_with_mask(template.get_template_rect_by_point(), template.mask,
+                                          get_template_key(template))
 
     # 2. 分离并检查RGB三通道
     r, g, b = cv2.split(to_check)
@@ -373,7 +416,8 @@ def check_exist_by_color_channel_equal_range(
         screen: MatLike,
         state_def: AgentStateDef,
         total: Optional[int] = None,
-        pos: Optional[int] = None
+        pos: Optional[int] = None,
+        frame_cache: Optional[FrameCache] = None
 ) -> int:
     """
     在指定区域内，按颜色通道相等性判断是否有出现
@@ -382,11 +426,12 @@ def check_exist_by_color_channel_equal_range(
     :param state_def: 角色状态定义
     :param total: 总角色数量
     :param pos: 角色位置 从1开始
+    :param frame_cache: 同一帧共享的预处理结果
     :return: 存在返回1 不存在返回0
     """
     # 直接返回check_cnt_by_color_channel_equal_range的结果
     # 因为它已经返回了1或0（当点数量大于等于阈值时返回1，否则返回0）
-    return check_cnt_by_color_channel_equal_range(ctx, screen, state_def, total, pos)
+    return check_cnt_by_color_channel_equal_range(ctx, screen, state_def, total, pos, frame_cache)
 
 
 def filter_by_color(
@@ -432,3 +477,32 @@ def filter_by_color(
     else:
         # 没有任何过滤条件，返回一个全白的mask，表示全部通过
         return np.full((image.shape[0], image.shape[1]), 255, dtype=np.uint8)
+
+
+def filter_by_color_in_cache(
+    frame_cache: FrameCache,
+    rect: Rect,
+    state_def: AgentStateDef,
+    mask: Optional[MatLike] = None,
+    mask_key: Optional[Hashable] = None
+) -> MatLike:
+    """
+    与 filter_by_color 一致 结果在同一帧内共享
+    :param frame_cache: 同一帧共享的预处理结果
+    :param rect: 区域
+    :param state_def: 状态定义
+    :param mask: 先使用掩码保留部分区域
+    :param mask_key: 掩码的标识
+    :return:            二值化的 mask 图像。白色为符合条件，黑色为不符合。
+    """
+    if state_def.hsv_color is not None and state_def.hsv_color_diff is not None:
+        return frame_cache.color_mask(rect, mode='hsv',
+                                      hsv_color=state_def.hsv_color, hsv_diff=state_def.hsv_color_diff,
+                                      mask=mask, mask_key=mask_key)
+    elif state_def.lower_color is not None and state_def.upper_color is not None:
+        return frame_cache.color_mask(rect, mode='rgb',
+                                      lower_rgb=state_def.lower_color, upper_rgb=state_def.upper_color,
+                                      mask=mask, mask_key=mask_key)
+    else:
+        image = frame_cache.crop(rect)
+        return np.full((image.shape[0], image.shape[1]), 255, dtype=np.uint8)
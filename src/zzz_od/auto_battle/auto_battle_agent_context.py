@@ -6,8 +6,9 @@ from typing import Optional, List, Union, Tuple, Callable
 
 from one_dragon.base.conditional_operation.conditional_operator import ConditionalOperator
 from one_dragon.base.conditional_operation.state_recorder import StateRecord, StateRecorder
+from one_dragon.base.screen.frame_cache import FrameCache
 from one_dragon.base.screen.screen_area import ScreenArea
-from one_dragon.utils import cv2_utils, cal_utils
+from one_dragon.utils import cal_utils
 from one_dragon.utils.log_utils import log
 from zzz_od.auto_battle.agent_state import agent_state_checker
 from zzz_od.auto_battle.auto_battle_state import BattleStateEnum
@@ -343,9 +344,13 @@ class AutoBattleAgentContext:
         else:
             return [(i.agent, i.matched_template_id) for i in self.team_info.agent_list if i.agent is not None]
 
-    def check_agent_related(self, screen: MatLike, screenshot_time: float) -> None:
+    def check_agent_related(self, screen: MatLike, screenshot_time: float,
+                            frame_cache: Optional[FrameCache] = None) -> None:
         """
         判断角色相关内容 并发送事件
+        :param screen: 游戏画面
+        :param screenshot_time: 截图时间
+        :param frame_cache: 同一帧共享的预处理结果 不传入时只在本次识别中共享
         :return:
         """
         if not self._check_agent_lock.acquire(blocking=False):
@@ -357,8 +362,10 @@ class AutoBattleAgentContext:
                 return
             self._last_check_agent_time = screenshot_time
 
-            screen_agent_list = self._check_agent_in_parallel(screen)
-            energy_state_list, special_state_list, ultimate_state_list, other_state_list = self._check_all_agent_state(screen, screenshot_time, screen_agent_list)
+            if frame_cache is None:
+                frame_cache = FrameCache(screen, screenshot_time)
+            screen_agent_list = self._check_agent_in_parallel(frame_cache)
+            energy_state_list, special_state_list, ultimate_state_list, other_state_list = self._check_all_agent_state(frame_cache, screen_agent_list)
 
             update_state_record_list = []
             # 尝试更新代理人列表 成功的话 更新状态记录
@@ -382,16 +389,17 @@ class AutoBattleAgentContext:
         finally:
             self._check_agent_lock.release()
 
-    def _check_agent_in_parallel(self, screen: MatLike) -> List[Tuple[Agent, Optional[str]]]:
+    def _check_agent_in_parallel(self, frame_cache: FrameCache) -> List[Tuple[Agent, Optional[str]]]:
         """
         并发识别角色
+        :param frame_cache: 同一帧共享的预处理结果
         :return:
         """
         area_img = [
-            cv2_utils.crop_image_only(screen, self.area_agent_3_1.rect),
-            cv2_utils.crop_image_only(screen, self.area_agent_3_2.rect),
-            cv2_utils.crop_image_only(screen, self.area_agent_3_3.rect),
-            cv2_utils.crop_image_only(screen, self.area_agent_2_2.rect)
+            frame_cache.crop(self.area_agent_3_1.rect),
+            frame_cache.crop(self.area_agent_3_2.rect),
+            frame_cache.crop(self.area_agent_3_3.rect),
+            frame_cache.crop(self.area_agent_2_2.rect)
         ]
 
         possible_agents = self.get_possible_agent_list()
@@ -443,8 +451,9 @@ class AutoBattleAgentContext:
         :return:
         """
         prefix = 'avatar_1_' if is_front else 'avatar_2_'
+        # 构建一个带优先级的待检查模板列表 key=模板名称 value=(角色, 模板ID)
+        template_to_agent: dict[str, Tuple[Agent, str]] = {}
         for agent, specific_template_id in possible_agents:
-            # 构建一个带优先级的待检查模板列表
             # 1. 优先使用上次成功匹配的ID
             # 2. 然后使用该角色所有可用的模板
             templates_to_check = []
@@ -455,20 +464,23 @@ class AutoBattleAgentContext:
                 if t_id not in templates_to_check:
                     templates_to_check.append(t_id)
 
-            # 按优先级顺序进行匹配
             for template_id in templates_to_check:
                 template_name = prefix + template_id
-                mrl = self.ctx.tm.match_template(img, 'battle', template_name, threshold=0.8)
-                if mrl.max is not None:
-                    return agent, template_id  # 匹配成功，返回实际命中的模板ID
+                if template_name not in template_to_agent:
+                    template_to_agent[template_name] = (agent, template_id)
+
+        # 按优先级顺序批量匹配 第一个达到阈值的即为结果
+        mr = self.ctx.tm.match_templates(img, [('battle', i) for i in template_to_agent],
+                                         threshold=0.8, early_exit_threshold=0.8)
+        if mr is not None:
+            return template_to_agent[mr.data[1]]  # 匹配成功，返回实际命中的模板ID
 
         return None, None
 
-    def _check_agent_state_in_parallel(self, screen: MatLike, screenshot_time: float, agent_state_list: List[CheckAgentState]) -> List[StateRecord]:
+    def _check_agent_state_in_parallel(self, frame_cache: FrameCache, agent_state_list: List[CheckAgentState]) -> List[StateRecord]:
         """
         并行识别多个角色状态
-        :param screen: 游戏画面
-        :param screenshot_time: 截图时间
+        :param frame_cache: 同一帧共享的预处理结果
         :param agent_state_list: 需要识别的状态列表
         :return:
         """
@@ -476,7 +488,7 @@ class AutoBattleAgentContext:
         for state in agent_state_list:
             if not state.state.should_check_in_battle:
                 continue
-            future_list.append(_battle_agent_context_executor.submit(self._check_agent_state, screen, screenshot_time, state))
+            future_list.append(_battle_agent_context_executor.submit(self._check_agent_state, frame_cache, state))
 
         result_list: List[Optional[StateRecord]] = []
         for future in future_list:
@@ -489,23 +501,23 @@ class AutoBattleAgentContext:
 
         return result_list
 
-    def _check_agent_state(self, screen: MatLike, screenshot_time: float, to_check: CheckAgentState) -> Optional[StateRecord]:
+    def _check_agent_state(self, frame_cache: FrameCache, to_check: CheckAgentState) -> Optional[StateRecord]:
         """
         识别一个角色状态
-        :param screen:
-        :param screenshot_time:
+        :param frame_cache: 同一帧共享的预处理结果
         :param to_check: 需要识别的状态
         :return:
         """
         value: int = -1
         state = to_check.state
         check_method = _agent_state_check_method[state.check_way]
-        value = check_method(ctx=self.ctx, screen=screen, state_def=state, total=to_check.total, pos=to_check.pos)
+        value = check_method(ctx=self.ctx, screen=frame_cache.screen, state_def=state,
+                             total=to_check.total, pos=to_check.pos, frame_cache=frame_cache)
 
         if value > -1 and value >= state.min_value_trigger_state:
-            return StateRecord(state.state_name, screenshot_time, value)
+            return StateRecord(state.state_name, frame_cache.screenshot_time, value)
 
-    def _check_all_agent_state(self, screen: MatLike, screenshot_time: float,
+    def _check_all_agent_state(self, frame_cache: FrameCache,
                                screen_agent_list: List[Tuple[Agent, Optional[str]]]
                                ) -> Tuple[List[StateRecord], List[StateRecord], List[StateRecord], List[StateRecord]]:
         """
@@ -513,8 +525,7 @@ class AutoBattleAgentContext:
         - 能量条
         - 角色独有状态
         - 血量扣减
-        :param screen: 游戏画面
-        :param screenshot_time: 截图时间
+        :param frame_cache: 同一帧共享的预处理结果
         :param screen_agent_list: 当前截图的角色列表
         :return: 三个状态记录 能量、终结技、角色状态
         """
@@ -589,7 +600,7 @@ class AutoBattleAgentContext:
             state = CommonAgentStateEnum.LIFE_DEDUCTION_21.value
         to_check_list.append(CheckAgentState(state))
 
-        all_state_result_list = self._check_agent_state_in_parallel(screen, screenshot_time, to_check_list)
+        all_state_result_list = self._check_agent_state_in_parallel(frame_cache, to_check_list)
         energy_len = len(energy_state_list)
         special_len = len(special_state_list)
         ultimate_len = len(ultimate_state_list)
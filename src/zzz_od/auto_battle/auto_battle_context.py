@@ -9,6 +9,7 @@ from one_dragon.base.conditional_operation.conditional_operator import Condition
 from one_dragon.base.conditional_operation.state_recorder import StateRecord
 from one_dragon.base.matcher.match_result import MatchResult
 from one_dragon.base.screen import screen_utils
+from one_dragon.base.screen.frame_cache import FrameCache
 from one_dragon.base.screen.screen_area import ScreenArea
 from one_dragon.base.screen.screen_utils import FindAreaResultEnum
 from one_dragon.utils import cv2_utils, thread_utils, cal_utils, str_utils
@@ -16,6 +17,7 @@ from one_dragon.utils.log_utils import log
 from zzz_od.auto_battle.auto_battle_agent_context import AutoBattleAgentContext
 from zzz_od.auto_battle.auto_battle_custom_context import AutoBattleCustomContext
 from zzz_od.auto_battle.auto_battle_dodge_context import AutoBattleDodgeContext
+from zzz_od.auto_battle.auto_battle_simulator import StateRecordTraceWriter
 from zzz_od.auto_battle.auto_battle_target_context import AutoBattleTargetContext
 from zzz_od.auto_battle.auto_battle_state import BattleStateEnum
 from zzz_od.context.zzz_context import ZContext
@@ -61,6 +63,8 @@ class AutoBattleContext:
         self.last_check_distance: float = -1  # 最后一次识别的距离
         self.without_distance_times: int = 0  # 没有显示距离的次数
         self.with_distance_times: int = 0  # 有显示距离的次数
+        self.last_frame_cache: Optional[FrameCache] = None  # 最后一次识别战斗状态使用的单帧缓存 可查看命中次数和耗时
+        self.state_record_trace_path: Optional[str] = None  # 调试用 设置后把发送给自动战斗的状态记录追加写入这个文件 可用 AutoBattleSimulator 回放
 
     def dodge(self, press: bool = False, press_time: Optional[float] = None, release: bool = False):
         if press:
@@ -334,6 +338,10 @@ class AutoBattleContext:
         :return:
         """
         self.auto_op: ConditionalOperator = auto_op
+        if self.state_record_trace_path is not None:
+            auto_op.state_record_listener = StateRecordTraceWriter(self.state_record_trace_path).append
+        # 战斗中识别角色和按键使用的模板 在后台提前加载 避免第一次战斗时卡顿
+        self.ctx.template_loader.prewarm(['battle', 'agent_state'])
         self.agent_context.init_battle_agent_context(
             auto_op,
             agent_names,
@@ -393,9 +401,13 @@ class AutoBattleContext:
     ) -> bool:
         """
         识别战斗状态的总入口
+        同一帧的各项识别共用一个单帧缓存 裁剪、灰度图、颜色过滤等结果只计算一次
         :return: 当前是否在战斗画面
         """
-        in_battle = self.is_normal_attack_btn_available(screen)
+        frame_cache = FrameCache(screen, screenshot_time)
+        self.last_frame_cache = frame_cache
+
+        in_battle = self.is_normal_attack_btn_available(screen, frame_cache)
         self.last_check_in_battle = in_battle
 
         future_list: List[Future] = []
@@ -408,20 +420,20 @@ class AutoBattleContext:
             future_list.append(_battle_state_check_executor.submit(self.dodge_context.check_dodge_flash, screen, screenshot_time, audio_future))
 
             # 角色状态
-            future_list.append(_battle_state_check_executor.submit(self.agent_context.check_agent_related, screen, screenshot_time))
+            future_list.append(_battle_state_check_executor.submit(self.agent_context.check_agent_related, screen, screenshot_time, frame_cache))
 
             # 目标状态
             future_list.append(_battle_state_check_executor.submit(self.target_context.run_all_checks, screen, screenshot_time))
 
             # 快速支援
-            future_list.append(_battle_state_check_executor.submit(self.check_quick_assist, screen, screenshot_time))
+            future_list.append(_battle_state_check_executor.submit(self.check_quick_assist, screen, screenshot_time, frame_cache))
 
             # 距离
             if check_distance:
-                future_list.append(_battle_state_check_executor.submit(self._check_distance_with_lock, screen, screenshot_time))
+                future_list.append(_battle_state_check_executor.submit(self._check_distance_with_lock, screen, screenshot_time, frame_cache))
         else:
             # 连携
-            future_list.append(_battle_state_check_executor.submit(self.check_chain_attack, screen, screenshot_time))
+            future_list.append(_battle_state_check_executor.submit(self.check_chain_attack, screen, screenshot_time, frame_cache))
 
             # 战斗结束
             check_battle_end = check_battle_end_normal_result or check_battle_end_hollow_result or check_battle_end_defense_result
@@ -441,9 +453,13 @@ class AutoBattleContext:
 
         return in_battle
 
-    def check_chain_attack(self, screen: MatLike, screenshot_time: float) -> None:
+    def check_chain_attack(self, screen: MatLike, screenshot_time: float,
+                           frame_cache: Optional[FrameCache] = None) -> None:
         """
         识别连携技
+        :param screen: 游戏画面
+        :param screenshot_time: 截图时间
+        :param frame_cache: 同一帧共享的预处理结果
         """
         if not self._check_chain_lock.acquire(blocking=False):
             return
@@ -454,18 +470,21 @@ class AutoBattleContext:
                 return
             self._last_check_chain_time = screenshot_time
 
-            self._check_chain_attack_in_parallel(screen, screenshot_time)
+            self._check_chain_attack_in_parallel(screen, screenshot_time, frame_cache)
         except Exception:
             log.error('识别连携技出错', exc_info=True)
         finally:
             self._check_chain_lock.release()
 
-    def _check_chain_attack_in_parallel(self, screen: MatLike, screenshot_time: float):
+    def _check_chain_attack_in_parallel(self, screen: MatLike, screenshot_time: float,
+                                        frame_cache: Optional[FrameCache] = None):
         """
         并行识别连携技角色
         """
-        c1 = cv2_utils.crop_image_only(screen, self.area_chain_1.rect)
-        c2 = cv2_utils.crop_image_only(screen, self.area_chain_2.rect)
+        if frame_cache is None:
+            frame_cache = FrameCache(screen, screenshot_time)
+        c1 = frame_cache.crop(self.area_chain_1.rect)
+        c2 = frame_cache.crop(self.area_chain_2.rect)
 
         possible_agents = self.agent_context.get_possible_agent_list()
 
@@ -506,26 +525,32 @@ class AutoBattleContext:
         :return:
         """
         prefix = 'avatar_chain_'
+        # 按优先级排列的待检查模板 key=模板名称 value=角色
+        template_to_agent: dict[str, Agent] = {}
         for agent, specific_template_id in possible_agents:
             # 上次识别过的模板 ID，接着用
             if specific_template_id:
-                template_to_check = prefix + specific_template_id
-                mrl = self.ctx.tm.match_template(img, 'battle', template_to_check, threshold=0.8)
-                if mrl.max is not None:
-                    return agent
+                template_id_list = [specific_template_id]
             # 没有上次识别过的模板 ID，匹配所有可能的模板 ID
             else:
-                for template_id in agent.template_id_list:
-                    template_to_check = prefix + template_id
-                    mrl = self.ctx.tm.match_template(img, 'battle', template_to_check, threshold=0.8)
-                    if mrl.max is not None:
-                        return agent
+                template_id_list = agent.template_id_list
+            for template_id in template_id_list:
+                template_to_agent.setdefault(prefix + template_id, agent)
+
+        mr = self.ctx.tm.match_templates(img, [('battle', i) for i in template_to_agent],
+                                         threshold=0.8, early_exit_threshold=0.8)
+        if mr is not None:
+            return template_to_agent[mr.data[1]]
 
         return None
 
-    def check_quick_assist(self, screen: MatLike, screenshot_time: float) -> None:
+    def check_quick_assist(self, screen: MatLike, screenshot_time: float,
+                           frame_cache: Optional[FrameCache] = None) -> None:
         """
         识别快速支援
+        :param screen: 游戏画面
+        :param screenshot_time: 截图时间
+        :param frame_cache: 同一帧共享的预处理结果
         """
         if not self._check_quick_lock.acquire(blocking=False):
             return
@@ -536,7 +561,9 @@ class AutoBattleContext:
                 return
             self._last_check_quick_time = screenshot_time
 
-            part = cv2_utils.crop_image_only(screen, self.area_btn_switch.rect)
+            if frame_cache is None:
+                frame_cache = FrameCache(screen, screenshot_time)
+            part = frame_cache.crop(self.area_btn_switch.rect)
 
             possible_agents = self.agent_context.get_possible_agent_list()
 
@@ -560,20 +587,22 @@ class AutoBattleContext:
         :return:
         """
         prefix = 'avatar_quick_'
+        # 按优先级排列的待检查模板 key=模板名称 value=角色
+        template_to_agent: dict[str, Agent] = {}
         for agent, specific_template_id in possible_agents:
             # 上次识别过的模板 ID，接着用
             if specific_template_id:
-                template_to_check = prefix + specific_template_id
-                mrl = self.ctx.tm.match_template(img, 'battle', template_to_check, threshold=0.8)
-                if mrl.max is not None:
-                    return agent
+                template_id_list = [specific_template_id]
             # 没有上次识别过的模板 ID，匹配所有可能的模板 ID
             else:
-                for template_id in agent.template_id_list:
-                    template_to_check = prefix + template_id
-                    mrl = self.ctx.tm.match_template(img, 'battle', template_to_check, threshold=0.8)
-                    if mrl.max is not None:
-                        return agent
+                template_id_list = agent.template_id_list
+            for template_id in template_id_list:
+                template_to_agent.setdefault(prefix + template_id, agent)
+
+        mr = self.ctx.tm.match_templates(img, [('battle', i) for i in template_to_agent],
+                                         threshold=0.8, early_exit_threshold=0.8)
+        if mr is not None:
+            return template_to_agent[mr.data[1]]
 
         return None
 
@@ -646,7 +675,8 @@ class AutoBattleContext:
         finally:
             self._check_end_lock.release()
 
-    def _check_distance_with_lock(self, screen: MatLike, screenshot_time: float) -> None:
+    def _check_distance_with_lock(self, screen: MatLike, screenshot_time: float,
+                                  frame_cache: Optional[FrameCache] = None) -> None:
         if not self._check_distance_lock.acquire(blocking=False):
             return
 
@@ -657,21 +687,26 @@ class AutoBattleContext:
 
             self._last_check_distance_time = screenshot_time
 
-            self.check_battle_distance(screen)
+            self.check_battle_distance(screen, frame_cache=frame_cache)
         except Exception:
             log.error('识别距离失败', exc_info=True)
         finally:
             self._check_distance_lock.release()
 
-    def check_battle_distance(self, screen: MatLike, last_distance: Optional[float] = None) -> MatchResult:
+    def check_battle_distance(self, screen: MatLike, last_distance: Optional[float] = None,
+                              frame_cache: Optional[FrameCache] = None) -> MatchResult:
         """
         识别画面上显示的距离
         :param screen:
         :param last_distance: 上一次使用的距离 极少数情况会出现多个距离 这个时候转动画面保持向特定的距离转动
+        :param frame_cache: 同一帧共享的预处理结果
         :return:
         """
         area = self._check_distance_area
-        part = cv2_utils.crop_image_only(screen, area.rect)
+        if frame_cache is None:
+            part = cv2_utils.crop_image_only(screen, area.rect)
+        else:
+            part = frame_cache.crop(area.rect)
         ocr_result_map = self.ctx.ocr.run_ocr(part)
 
         distance: Optional[float] = None
@@ -713,13 +748,17 @@ class AutoBattleContext:
 
         return mr
 
-    def is_normal_attack_btn_available(self, screen: MatLike) -> bool:
+    def is_normal_attack_btn_available(self, screen: MatLike, frame_cache: Optional[FrameCache] = None) -> bool:
         """
         识别普通攻击按钮是否存在 用了粗略判断是否在战斗画面 2~3ms
         :param screen:
+        :param frame_cache: 同一帧共享的预处理结果
         :return:
         """
-        part = cv2_utils.crop_image_only(screen, self.area_btn_normal.rect)
+        if frame_cache is None:
+            part = cv2_utils.crop_image_only(screen, self.area_btn_normal.rect)
+        else:
+            part = frame_cache.crop(self.area_btn_normal.rect)
         mrl = self.ctx.tm.match_template(part, 'battle', 'btn_normal_attack',
                                          threshold=0.9)
         return mrl.max is not None
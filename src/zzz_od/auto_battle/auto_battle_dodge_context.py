@@ -1,23 +1,24 @@
 from concurrent.futures import ThreadPoolExecutor, Future
 
-import librosa
 import numpy as np
 import os
 import threading
 from cv2.typing import MatLike
 from enum import Enum
-from scipy.signal import correlate, butter, filtfilt
-from sklearn.preprocessing import scale
-from typing import Optional, List, Union
+from scipy.fft import next_fast_len
+from scipy.signal import butter, lfilter
+from typing import TYPE_CHECKING, Optional, List, Union
 
 from one_dragon.base.conditional_operation.conditional_operator import ConditionalOperator
 from one_dragon.base.conditional_operation.state_recorder import StateRecord
 from one_dragon.utils import cal_utils, yolo_config_utils
 from one_dragon.utils import thread_utils, os_utils
 from one_dragon.utils.log_utils import log
-from zzz_od.context.zzz_context import ZContext
 from zzz_od.yolo.flash_classifier import FlashClassifier
 
+if TYPE_CHECKING:
+    from zzz_od.context.zzz_context import ZContext
+
 # 创建一个线程池执行器，用于异步执行任务
 _dodge_check_executor = ThreadPoolExecutor(thread_name_prefix='od_dodge_check', max_workers=16)
 
@@ -25,6 +26,7 @@ _dodge_check_executor = ThreadPoolExecutor(thread_name_prefix='od_dodge_check',
 class AudioRecorder:
     """
     音频录制类，用于录制和处理音频数据。
+    录制的音频滤波后写入环形缓冲区 只有录制线程写入 识别时不需要加锁
     """
 
     def __init__(self):
@@ -43,9 +45,14 @@ class AudioRecorder:
 
         self.filter_b, self.filter_a = butter(self._filter_degree, self._cut_off, btype='highpass', output='ba',
                                               fs=self._sample_rate)  # Butterworth高通滤波
+        self._filter_zi = np.zeros(max(len(self.filter_a), len(self.filter_b)) - 1)  # 滤波器状态 分块滤波时延续
 
-        self.latest_audio = np.empty(shape=(0,), dtype=np.float64)  # 存储最新的音频数据
-        self._update_audio_lock = threading.Lock()
+        self.window_len: int = int(self._sample_rate // 2)  # 识别使用的音频长度 0.5秒
+        self._buffer_len: int = self.window_len * 2  # 环形缓冲区长度 留出余量 避免读取时被覆盖
+        # 前后两半写入相同的数据 任意不超过 _buffer_len 的区间都可以取到连续的视图
+        self._buffer: np.ndarray = np.zeros(self._buffer_len * 2, dtype=np.float32)
+        self.write_pos: int = 0  # 已写入的采样数 只增不减
+        self.clear_pos: int = 0  # 清除录音时的写入位置 之前的采样视为0
 
     def start_running_async(self) -> None:
         """
@@ -57,7 +64,8 @@ class AudioRecorder:
 
             self.running = True
 
-        self.latest_audio = np.zeros(int(self._sample_rate // 2))  # 初始化音频数据缓冲区，长度为0.5秒
+        self._filter_zi = np.zeros_like(self._filter_zi)
+        self.clear_audio()
         future = _dodge_check_executor.submit(self._record_loop)
         future.add_done_callback(thread_utils.handle_future_result)
 
@@ -70,6 +78,7 @@ class AudioRecorder:
         from soundcard.mediafoundation import SoundcardRuntimeWarning
         import warnings
         warnings.filterwarnings('ignore', category=SoundcardRuntimeWarning)
+        import librosa  # 导入较慢 用到时再导入
 
         _mic = sc.get_microphone(id=str(sc.default_speaker().name), include_loopback=True)
         _recorder = _mic.recorder(samplerate=self._sample_rate, channels=self._used_channel)
@@ -82,10 +91,58 @@ class AudioRecorder:
                 else:
                     stream_data = stream_data.T
 
-                with self._update_audio_lock:
-                    # 更新 latest_audio
-                    self.latest_audio[:-len(stream_data)] = self.latest_audio[len(stream_data):]
-                    self.latest_audio[-len(stream_data):] = stream_data
+                self.append_audio(stream_data)
+
+    def append_audio(self, stream_data: np.ndarray) -> None:
+        """
+        滤波后写入环形缓冲区 写入完成后才更新写入位置 读取方不会读到写了一半的数据
+        :param stream_data: 单声道的音频数据
+        """
+        filtered, self._filter_zi = lfilter(self.filter_b, self.filter_a, stream_data, zi=self._filter_zi)
+        if len(filtered) > self._buffer_len:
+            self.write_pos += len(filtered) - self._buffer_len
+            filtered = filtered[-self._buffer_len:]
+
+        data_len = len(filtered)
+        start = self.write_pos % self._buffer_len
+        first_len = min(data_len, self._buffer_len - start)
+        for offset in (0, self._buffer_len):
+            self._buffer[offset + start:offset + start + first_len] = filtered[:first_len]
+            self._buffer[offset:offset + data_len - first_len] = filtered[first_len:]
+
+        self.write_pos += data_len
+
+    def get_audio(self, start_pos: int, end_pos: int) -> Optional[np.ndarray]:
+        """
+        获取一段滤波后的音频 返回的是缓冲区的视图 不复制
+        :param start_pos: 开始位置 包含
+        :param end_pos: 结束位置 不包含
+        :return: 已经被覆盖或未写入时返回None
+        """
+        if start_pos > end_pos or end_pos > self.write_pos or not self.is_audio_available(start_pos):
+            return None
+        start = start_pos % self._buffer_len
+        return self._buffer[start:start + end_pos - start_pos]
+
+    def is_audio_available(self, start_pos: int) -> bool:
+        """
+        某个位置之后的音频是否还在缓冲区中 读取视图后可用于确认计算期间没有被覆盖
+        :param start_pos: 开始位置
+        :return:
+        """
+        return start_pos >= 0 and self.write_pos - start_pos <= self._buffer_len
+
+    @property
+    def latest_audio(self) -> np.ndarray:
+        """
+        最新的一段音频 长度为识别使用的长度 不足或清除的部分为0
+        """
+        end_pos = self.write_pos
+        start_pos = max(end_pos - self.window_len, self.clear_pos)
+        audio = np.zeros(self.window_len, dtype=np.float32)
+        if end_pos > start_pos:
+            audio[self.window_len - (end_pos - start_pos):] = self.get_audio(start_pos, end_pos)
+        return audio
 
     def stop_running(self) -> None:
         """
@@ -97,8 +154,101 @@ class AudioRecorder:
         """
         清楚当前录音
         """
-        with self._update_audio_lock:
-            self.latest_audio = np.zeros(int(self._sample_rate // 2))
+        self.clear_pos = self.write_pos
+
+
+class AudioTemplateCorrelator:
+
+    def __init__(self, template: np.ndarray, window_len: int):
+        """
+        流式计算录音与音频模板的相关性
+        每个对齐位置的值 = 已到达的采样与模板对应部分的乘积和 新采样到达时只需要累加它们的贡献
+        因此每次只对新增的采样做一次FFT 模板的FFT按长度缓存
+
+        归一化方式与原来的 correlate(mode='same') 一致
+        除以 模板标准差 * 最近 window_len 采样的标准差 * max(模板长度, window_len)
+        模板至少有一半与录音重叠时才参与判断
+        :param template: 滤波后的模板
+        :param window_len: 计算录音标准差使用的长度
+        """
+        self.template: np.ndarray = template.astype(np.float64)
+        self.template_len: int = len(template)
+        self.window_len: int = window_len
+        self._template_norm: float = float(np.std(self.template)) * max(self.template_len, window_len)
+        self._template_fft: dict[int, np.ndarray] = {}  # key=FFT长度
+
+        # 对齐位置s 表示模板第一个采样对齐录音的位置s 以环形数组保存累加值
+        self._acc_len: int = (self.template_len + window_len) * 2
+        self._acc: np.ndarray = np.zeros(self._acc_len, dtype=np.float64)
+        self.last_pos: int = 0  # 已经处理到的录音位置
+
+    def reset(self, pos: int) -> None:
+        """
+        从某个位置重新开始累加 之前的采样视为0
+        :param pos: 录音位置
+        """
+        self._acc[:] = 0
+        self.last_pos = pos
+
+    def _get_template_fft(self, fft_len: int) -> np.ndarray:
+        template_fft = self._template_fft.get(fft_len)
+        if template_fft is None:
+            template_fft = np.fft.rfft(self.template[::-1], fft_len)
+            self._template_fft[fft_len] = template_fft
+        return template_fft
+
+    def _acc_idx(self, start_pos: int, end_pos: int) -> np.ndarray:
+        return np.arange(start_pos, end_pos) % self._acc_len
+
+    def update(self, recorder: AudioRecorder) -> float:
+        """
+        处理新录制的音频
+        :param recorder: 录音
+        :return: 受新采样影响的对齐位置中 最大的相关性
+        """
+        end_pos = recorder.write_pos
+        start_pos = max(self.last_pos, recorder.clear_pos, end_pos - self.window_len)
+        if start_pos != self.last_pos:  # 录音被清除 或积压太多
+            self.reset(start_pos)
+        if start_pos >= end_pos:
+            return 0
+
+        window_start_pos = max(end_pos - self.window_len, recorder.clear_pos)
+        chunk = recorder.get_audio(start_pos, end_pos)
+        window = recorder.get_audio(window_start_pos, end_pos)
+        if chunk is None or window is None:
+            self.reset(end_pos)
+            return 0
+
+        # 新采样对 [start_pos - 模板长度 + 1, end_pos) 这些对齐位置的贡献
+        chunk_len = end_pos - start_pos
+        full_len = chunk_len + self.template_len - 1
+        fft_len = next_fast_len(full_len, real=True)
+        contribution = np.fft.irfft(np.fft.rfft(chunk, fft_len) * self._get_template_fft(fft_len), fft_len)[:full_len]
+
+        self._acc[self._acc_idx(start_pos, end_pos)] = 0  # 新出现的对齐位置
+        acc_start_pos = start_pos - self.template_len + 1
+        acc_idx = self._acc_idx(acc_start_pos, end_pos)
+        self._acc[acc_idx] += contribution
+
+        # 至少一半模板有录音时才判断
+        eval_end_pos = end_pos - self.template_len // 2
+        window = window.astype(np.float64)
+        if not recorder.is_audio_available(min(start_pos, window_start_pos)):  # 计算期间被覆盖了
+            self.reset(end_pos)
+            return 0
+        self.last_pos = end_pos
+        if eval_end_pos <= acc_start_pos:
+            return 0
+
+        # 不足 window_len 的部分按0计算
+        mean = window.sum() / self.window_len
+        var = np.dot(window, window) / self.window_len - mean * mean
+        if var <= 0 or self._template_norm <= 0:
+            return 0
+
+        max_acc = self._acc[acc_idx[:eval_end_pos - acc_start_pos]].max()
+        return float(max_acc / (self._template_norm * np.sqrt(var)))
 
 
 class YoloStateEventEnum(Enum):
@@ -115,13 +265,14 @@ class AutoBattleDodgeContext:
     战斗闪避上下文类，用于管理和处理闪避识别相关的逻辑。
     """
 
-    def __init__(self, ctx: ZContext):
-        self.ctx: ZContext = ctx  # 上下文对象
+    def __init__(self, ctx: 'ZContext'):
+        self.ctx: 'ZContext' = ctx  # 上下文对象
         self.auto_op: ConditionalOperator = ConditionalOperator('', '', is_mock=True)
 
         self._flash_model: Optional[FlashClassifier] = None  # 闪避分类器
         self._audio_recorder: AudioRecorder = AudioRecorder()  # 音频录制器
         self._audio_template: Optional[np.ndarray] = None  # 音频模板
+        self._audio_correlator: Optional[AudioTemplateCorrelator] = None  # 音频模板的相关性计算
 
         # 识别锁，保证每种类型只有一个实例在进行识别
         self._check_dodge_flash_lock = threading.Lock()
@@ -162,7 +313,8 @@ class AutoBattleDodgeContext:
                 gh_proxy=self.ctx.env_config.is_gh_proxy,
                 gh_proxy_url=self.ctx.env_config.gh_proxy_url if self.ctx.env_config.is_gh_proxy else None,
                 personal_proxy=self.ctx.env_config.personal_proxy if self.ctx.env_config.is_personal_proxy else None,
-                gpu=use_gpu
+                gpu=use_gpu,
+                session_config=self.ctx.model_config.onnx_session_config
             )
 
         # 识别间隔
@@ -183,12 +335,14 @@ class AutoBattleDodgeContext:
         if self._audio_template is not None:
             return
         log.info('加载声音模板中')
+        import librosa  # 导入较慢 用到时再导入
         self._audio_template, _ = librosa.load(os.path.join(
             os_utils.get_path_under_work_dir('assets', 'template', 'dodge_audio'),
             'template_1.wav'
         ), sr=32000)
 
         self._audio_template = self._get_filter_wave(self._audio_template)  # 滤波
+        self._audio_correlator = AudioTemplateCorrelator(self._audio_template, self._audio_recorder.window_len)
 
         log.info('加载声音模板完成')
 
@@ -244,14 +398,15 @@ class AutoBattleDodgeContext:
             if screenshot_time - self._last_check_audio_time < cal_utils.random_in_range(self._check_audio_interval):
                 # 还没有达到识别间隔
                 return False
-            if self._audio_template is None:
+            if self._audio_correlator is None:
                 return False
             self._last_check_audio_time = screenshot_time
 
-            if self._audio_recorder.latest_audio.size == 0:
+            if self._audio_recorder.write_pos == 0:
                 return False
 
-            corr = self.get_max_corr(self._audio_template, self._audio_recorder.latest_audio)
+            # 只计算上次识别后新录制的部分
+            corr = self._audio_correlator.update(self._audio_recorder)
             # log.debug('声音相似度 %.2f' % corr)
 
             # 事件去重逻辑
@@ -266,38 +421,15 @@ class AutoBattleDodgeContext:
         finally:
             self._check_audio_lock.release()
 
-    def get_max_corr(self, x: np.ndarray, y: np.ndarray):
-        """
-        计算两个音频信号的最大相关性。
-        :param x: 音频信号x
-        :param y: 音频信号y
-        :return: 最大相关性系数
-        """
-        y = self._get_filter_wave(y)  # 滤波
-
-        # 标准化
-        wx = scale(x, with_mean=False)
-        wy = scale(y, with_mean=False)
-
-        # 计算NCC
-        if wx.shape[0] > wy.shape[0]:
-            correlation = correlate(wx, wy, mode='same', method='fft') / wx.shape[0]
-        else:
-            correlation = correlate(wy, wx, mode='same', method='fft') / wy.shape[0]
-
-        max_corr = np.max(correlation)
-
-        return max_corr
-
     def _get_filter_wave(self, x: np.ndarray):
         """
-        音频滤波。
+        音频滤波。与录音使用相同的单向滤波 两者相位变化一致
         :param x: 音频信号x
         :return: 滤波后波形
         """
-        wx = filtfilt(self._audio_recorder.filter_b,
-                      self._audio_recorder.filter_a,
-                      x)
+        wx = lfilter(self._audio_recorder.filter_b,
+                     self._audio_recorder.filter_a,
+                     x)
         return wx
 
     def start_context(self) -> None:
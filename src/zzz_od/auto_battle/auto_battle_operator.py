@@ -1,8 +1,8 @@
 import time
 from concurrent.futures import Future, ThreadPoolExecutor
 
-import os
-from typing import List, Optional, Tuple
+from functools import partial
+from typing import Callable, List, Optional, Tuple
 
 from one_dragon.base.conditional_operation.atomic_op import AtomicOp
 from one_dragon.base.conditional_operation.conditional_operator import ConditionalOperator
@@ -10,7 +10,7 @@ from one_dragon.base.conditional_operation.operation_def import OperationDef
 from one_dragon.base.conditional_operation.operation_template import OperationTemplate
 from one_dragon.base.conditional_operation.state_handler_template import StateHandlerTemplate
 from one_dragon.base.conditional_operation.state_recorder import StateRecorder
-from one_dragon.utils import os_utils, thread_utils
+from one_dragon.utils import thread_utils
 from one_dragon.utils.log_utils import log
 from zzz_od.auto_battle.atomic_op.btn_chain_left import AtomicBtnChainLeft
 from zzz_od.auto_battle.atomic_op.btn_chain_right import AtomicBtnChainRight
@@ -31,6 +31,7 @@ from zzz_od.auto_battle.atomic_op.btn_ultimate import AtomicBtnUltimate
 from zzz_od.auto_battle.atomic_op.state_clear import AtomicClearState
 from zzz_od.auto_battle.atomic_op.state_set import AtomicSetState
 from zzz_od.auto_battle.atomic_op.wait import AtomicWait
+from zzz_od.auto_battle import auto_battle_operator_utils
 from zzz_od.auto_battle.auto_battle_context import AutoBattleContext
 from zzz_od.auto_battle.auto_battle_dodge_context import YoloStateEventEnum
 from zzz_od.auto_battle.auto_battle_state import BattleStateEnum
@@ -79,6 +80,7 @@ class AutoBattleOperator(ConditionalOperator):
         # 自动周期
         self.last_lock_time: float = 0  # 上一次锁定的时间
         self.last_turn_time: float = 0  # 上一次转动视角的时间
+        self._lock_op: Optional[AtomicBtnLock] = None
 
     def init_before_running(self) -> Tuple[bool, str]:
         """
@@ -116,47 +118,7 @@ class AutoBattleOperator(ConditionalOperator):
         return self.async_init_future
 
     def _init_operator(self) -> Tuple[bool, str]:
-        self._mutex_list: dict[str, List[str]] = {}
-
-        for agent_enum in AgentEnum:
-            mutex_list: List[str] = []
-            for mutex_agent_enum in AgentEnum:
-                if mutex_agent_enum == agent_enum:
-                    continue
-                mutex_list.append(mutex_agent_enum.value.agent_name)
-
-            agent_name = agent_enum.value.agent_name
-            self._mutex_list[f'前台-{agent_name}'] = [f'前台-{i}' for i in mutex_list] + [f'后台-1-{agent_name}', f'后台-2-{agent_name}', f'后台-{agent_name}']
-            self._mutex_list[f'后台-{agent_name}'] = [f'前台-{agent_name}']
-            self._mutex_list[f'后台-1-{agent_name}'] = [f'后台-1-{i}' for i in mutex_list] + [f'后台-2-{agent_name}', f'前台-{agent_name}']
-            self._mutex_list[f'后台-2-{agent_name}'] = [f'后台-2-{i}' for i in mutex_list] + [f'后台-1-{agent_name}', f'前台-{agent_name}']
-            self._mutex_list[f'连携技-1-{agent_name}'] = [f'连携技-1-{i}' for i in (mutex_list + ['邦布'])]
-            self._mutex_list[f'连携技-2-{agent_name}'] = [f'连携技-2-{i}' for i in (mutex_list + ['邦布'])]
-            self._mutex_list[f'快速支援-{agent_name}'] = [f'快速支援-{i}' for i in mutex_list]
-            self._mutex_list[f'切换角色-{agent_name}'] = [f'切换角色-{i}' for i in mutex_list]
-
-        for agent_type_enum in AgentTypeEnum:
-            if agent_type_enum == AgentTypeEnum.UNKNOWN:
-                continue
-            mutex_list: List[str] = []
-            for mutex_agent_type_enum in AgentTypeEnum:
-                if mutex_agent_type_enum == AgentTypeEnum.UNKNOWN:
-                    continue
-                if mutex_agent_type_enum == agent_type_enum:
-                    continue
-                mutex_list.append(mutex_agent_type_enum.value)
-
-            self._mutex_list['前台-' + agent_type_enum.value] = ['前台-' + i for i in mutex_list]
-            self._mutex_list['后台-1-' + agent_type_enum.value] = ['后台-1-' + i for i in mutex_list]
-            self._mutex_list['后台-2-' + agent_type_enum.value] = ['后台-2-' + i for i in mutex_list]
-            self._mutex_list['连携技-1-' + agent_type_enum.value] = ['连携技-1-' + i for i in mutex_list]
-            self._mutex_list['连携技-2-' + agent_type_enum.value] = ['连携技-2-' + i for i in mutex_list]
-            self._mutex_list['快速支援-' + agent_type_enum.value] = ['快速支援-' + i for i in mutex_list]
-            self._mutex_list['切换角色-' + agent_type_enum.value] = ['切换角色-' + i for i in mutex_list]
-
-        # 特殊处理连携技的互斥
-        for i in range(1, 3):
-            self._mutex_list[f'连携技-{i}-邦布'] = [f'连携技-{i}-{agent_enum.value.agent_name}' for agent_enum in AgentEnum]
+        self._mutex_list: dict[str, List[str]] = auto_battle_operator_utils.get_state_mutex_list()
 
         ConditionalOperator.init(
             self,
@@ -323,23 +285,7 @@ class AutoBattleOperator(ConditionalOperator):
         :param target_template_name: 模板名称
         :return:
         """
-        sub_dir = 'auto_battle_state_handler'
-        template_dir = os_utils.get_path_under_work_dir('config', sub_dir)
-        file_list = os.listdir(template_dir)
-
-        for file_name in file_list:
-            if file_name.endswith('.sample.yml'):
-                template_name = file_name[0:-11]
-            elif file_name.endswith('.yml'):
-                template_name = file_name[0:-4]
-            else:
-                continue
-            if template_name != target_template_name:
-                continue
-
-            return StateHandlerTemplate(sub_dir, template_name)
-
-        return None
+        return auto_battle_operator_utils.get_state_handler_template(target_template_name)
 
     @staticmethod
     def get_operation_template(target_template_name: str) -> Optional[OperationTemplate]:
@@ -348,26 +294,7 @@ class AutoBattleOperator(ConditionalOperator):
         :param target_template_name: 模板名称
         :return: OperationTemplate 对象或 None
         """
-        sub_dir = 'auto_battle_operation'
-        template_dir = os_utils.get_path_under_work_dir('config', sub_dir)
-
-        # 递归查找模板文件
-        for root, dirs, files in os.walk(template_dir):
-            for file_name in files:
-                if file_name.endswith('.sample.yml'):
-                    template_name = file_name[0:-11]
-                elif file_name.endswith('.yml'):
-                    template_name = file_name[0:-4]
-                else:
-                    continue
-
-                if target_template_name == template_name:
-                    # 返回 OperationTemplate，包括子目录的路径信息
-                    relative_sub_dir = os.path.relpath(root, os_utils.get_path_under_work_dir('config'))
-                    return OperationTemplate(relative_sub_dir, template_name)
-
-        # 如果未找到，返回 None
-        return None
+        return auto_battle_operator_utils.get_operation_template(target_template_name)
 
     def dispose(self) -> None:
         """
@@ -396,14 +323,13 @@ class AutoBattleOperator(ConditionalOperator):
         success = ConditionalOperator.start_running_async(self)
         if success:
             self.auto_battle_context.start_context()
-            lock_f = _auto_battle_operator_executor.submit(self.operate_periodically)
-            lock_f.add_done_callback(thread_utils.handle_future_result)
+            self._add_periodic_jobs()
 
         return success
 
-    def operate_periodically(self) -> None:
+    def _add_periodic_jobs(self) -> None:
         """
-        周期性完成动作
+        将周期性的动作加入调度
 
         1. 锁定敌人
         2. 转向 - 有机会找到后方太远的敌人；迷失之地可以转动下层入口
@@ -411,28 +337,50 @@ class AutoBattleOperator(ConditionalOperator):
         """
         auto_lock_interval = self.get('auto_lock_interval', 1)
         auto_turn_interval = self.get('auto_turn_interval', 2)
-        if auto_lock_interval <= 0 and auto_turn_interval <= 0:  # 不开启自动锁定 和 自动转向
-            return
-        op = AtomicBtnLock(self.auto_battle_context)
-        while self.is_running:
-            now = time.time()
-
-            if not self.auto_battle_context.last_check_in_battle:  # 当前画面不是战斗画面 就不运行了
-                time.sleep(0.2)
-                continue
+        now = time.time()
+        if auto_lock_interval > 0:
+            self._lock_op = AtomicBtnLock(self.auto_battle_context)
+            self.scheduler.add_job('自动锁定',
+                                   partial(self._operate_periodically, operation=self._auto_lock, interval=auto_lock_interval),
+                                   now)
+        if auto_turn_interval > 0:
+            self.scheduler.add_job('自动转向',
+                                   partial(self._operate_periodically, operation=self._auto_turn, interval=auto_turn_interval),
+                                   now)
+
+    def _operate_periodically(self, now: float, operation: Callable[[], None], interval: float) -> Optional[float]:
+        """
+        周期性完成动作 由调度器执行
+        动作提交到单独的线程执行 避免按键阻塞调度线程
+        :param now: 当前时间
+        :param operation: 动作
+        :param interval: 间隔
+        :return: 下一次执行的时间
+        """
+        if not self.is_running:
+            return None
+        if not self.auto_battle_context.last_check_in_battle:  # 当前画面不是战斗画面 就不运行了 画面变化没有通知 只能定期检查
+            return now + 0.2
+
+        future = _auto_battle_operator_executor.submit(operation)
+        future.add_done_callback(thread_utils.handle_future_result)
+        return now + interval
+
+    def _auto_lock(self) -> None:
+        """
+        锁定敌人
+        :return:
+        """
+        self._lock_op.execute()
+        self.last_lock_time = time.time()
 
-            any_done: bool = False
-            if auto_lock_interval > 0 and now - self.last_lock_time > auto_lock_interval:
-                op.execute()
-                self.last_lock_time = now
-                any_done = True
-            if auto_turn_interval > 0 and now - self.last_turn_time > auto_turn_interval:
-                self.ctx.controller.turn_by_distance(100)
-                self.last_turn_time = now
-                any_done = True
-
-            if not any_done:
-                time.sleep(0.2)
+    def _auto_turn(self) -> None:
+        """
+        转向
+        :return:
+        """
+        self.ctx.controller.turn_by_distance(100)
+        self.last_turn_time = time.time()
 
     @property
     def team_list(self) -> List[List[str]]:
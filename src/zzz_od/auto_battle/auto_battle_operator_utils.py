@@ -0,0 +1,111 @@
+import os
+from typing import List, Optional
+
+from one_dragon.base.conditional_operation.operation_template import OperationTemplate
+from one_dragon.base.conditional_operation.state_handler_template import StateHandlerTemplate
+from one_dragon.utils import os_utils
+from zzz_od.game_data.agent import AgentEnum, AgentTypeEnum
+
+
+def get_state_mutex_list() -> dict[str, List[str]]:
+    """
+    自动战斗中各状态的互斥状态
+    不依赖游戏画面 自动战斗指令和离线模拟共用
+    :return: key=状态 value=这个状态出现时 需要清除的状态
+    """
+    result: dict[str, List[str]] = {}
+
+    for agent_enum in AgentEnum:
+        mutex_list: List[str] = []
+        for mutex_agent_enum in AgentEnum:
+            if mutex_agent_enum == agent_enum:
+                continue
+            mutex_list.append(mutex_agent_enum.value.agent_name)
+
+        agent_name = agent_enum.value.agent_name
+        result[f'前台-{agent_name}'] = [f'前台-{i}' for i in mutex_list] + [f'后台-1-{agent_name}', f'后台-2-{agent_name}', f'后台-{agent_name}']
+        result[f'后台-{agent_name}'] = [f'前台-{agent_name}']
+        result[f'后台-1-{agent_name}'] = [f'后台-1-{i}' for i in mutex_list] + [f'后台-2-{agent_name}', f'前台-{agent_name}']
+        result[f'后台-2-{agent_name}'] = [f'后台-2-{i}' for i in mutex_list] + [f'后台-1-{agent_name}', f'前台-{agent_name}']
+        result[f'连携技-1-{agent_name}'] = [f'连携技-1-{i}' for i in (mutex_list + ['邦布'])]
+        result[f'连携技-2-{agent_name}'] = [f'连携技-2-{i}' for i in (mutex_list + ['邦布'])]
+        result[f'快速支援-{agent_name}'] = [f'快速支援-{i}' for i in mutex_list]
+        result[f'切换角色-{agent_name}'] = [f'切换角色-{i}' for i in mutex_list]
+
+    for agent_type_enum in AgentTypeEnum:
+        if agent_type_enum == AgentTypeEnum.UNKNOWN:
+            continue
+        mutex_list: List[str] = []
+        for mutex_agent_type_enum in AgentTypeEnum:
+            if mutex_agent_type_enum == AgentTypeEnum.UNKNOWN:
+                continue
+            if mutex_agent_type_enum == agent_type_enum:
+                continue
+            mutex_list.append(mutex_agent_type_enum.value)
+
+        result['前台-' + agent_type_enum.value] = ['前台-' + i for i in mutex_list]
+        result['后台-1-' + agent_type_enum.value] = ['后台-1-' + i for i in mutex_list]
+        result['后台-2-' + agent_type_enum.value] = ['后台-2-' + i for i in mutex_list]
+        result['连携技-1-' + agent_type_enum.value] = ['连携技-1-' + i for i in mutex_list]
+        result['连携技-2-' + agent_type_enum.value] = ['连携技-2-' + i for i in mutex_list]
+        result['快速支援-' + agent_type_enum.value] = ['快速支援-' + i for i in mutex_list]
+        result['切换角色-' + agent_type_enum.value] = ['切换角色-' + i for i in mutex_list]
+
+    # 特殊处理连携技的互斥
+    for i in range(1, 3):
+        result[f'连携技-{i}-邦布'] = [f'连携技-{i}-{agent_enum.value.agent_name}' for agent_enum in AgentEnum]
+
+    return result
+
+
+def get_state_handler_template(target_template_name: str) -> Optional[StateHandlerTemplate]:
+    """
+    获取场景处理器模板
+    :param target_template_name: 模板名称
+    :return:
+    """
+    sub_dir = 'auto_battle_state_handler'
+    template_dir = os_utils.get_path_under_work_dir('config', sub_dir)
+    file_list = os.listdir(template_dir)
+
+    for file_name in file_list:
+        if file_name.endswith('.sample.yml'):
+            template_name = file_name[0:-11]
+        elif file_name.endswith('.yml'):
+            template_name = file_name[0:-4]
+        else:
+            continue
+        if template_name != target_template_name:
+            continue
+
+        return StateHandlerTemplate(sub_dir, template_name)
+
+    return None
+
+
+def get_operation_template(target_template_name: str) -> Optional[OperationTemplate]:
+    """
+    获取操作模板，支持递归查找子目录
+    :param target_template_name: 模板名称
+    :return: OperationTemplate 对象或 None
+    """
+    sub_dir = 'auto_battle_operation'
+    template_dir = os_utils.get_path_under_work_dir('config', sub_dir)
+
+    # 递归查找模板文件
+    for root, dirs, files in os.walk(template_dir):
+        for file_name in files:
+            if file_name.endswith('.sample.yml'):
+                template_name = file_name[0:-11]
+            elif file_name.endswith('.yml'):
+                template_name = file_name[0:-4]
+            else:
+                continue
+
+            if target_template_name == template_name:
+                # 返回 OperationTemplate，包括子目录的路径信息
+                relative_sub_dir = os.path.relpath(root, os_utils.get_path_under_work_dir('config'))
+                return OperationTemplate(relative_sub_dir, template_name)
+
+    # 如果未找到，返回 None
+    return None
@@ -0,0 +1,484 @@
+import json
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, ClassVar, List, Optional, TextIO, Tuple
+
+from one_dragon.base.conditional_operation.atomic_op import AtomicOp
+from one_dragon.base.conditional_operation.conditional_operator import ConditionalOperator
+from one_dragon.base.conditional_operation.operation_def import OperationDef
+from one_dragon.base.conditional_operation.operation_latency import OperationLatency, OperationLatencyRecorder
+from one_dragon.base.conditional_operation.operation_task import OperationTask
+from one_dragon.base.conditional_operation.state_recorder import StateRecorder, StateRecord
+from one_dragon.thread.deadline_scheduler import ScheduledJob, VirtualDeadlineScheduler
+from one_dragon.utils.log_utils import log
+from zzz_od.auto_battle import auto_battle_operator_utils
+from zzz_od.auto_battle.auto_battle_state import BattleStateEnum
+
+# 模拟指令在执行过程中产生的状态 (相对指令开始的时间, 按实际时间生成状态记录)
+SimulatedStateEvent = Tuple[float, Callable[[float], List[StateRecord]]]
+
+
+class SimulatedAtomicOp(AtomicOp):
+
+    def __init__(self, op_name: str, duration: float = 0,
+                 state_event_list: Optional[List[SimulatedStateEvent]] = None):
+        """
+        离线模拟使用的指令 不会操作游戏
+        只记录执行需要的时间 以及执行过程中按键等产生的状态
+        :param op_name: 指令名称
+        :param duration: 执行需要的时间
+        :param state_event_list: 执行过程中产生的状态 按时间升序
+        """
+        AtomicOp.__init__(self, op_name=op_name)
+        self.duration: float = duration
+        self.state_event_list: List[SimulatedStateEvent] = [] if state_event_list is None else state_event_list
+
+    def execute(self):
+        """
+        模拟指令不会真正执行 由模拟器按虚拟时间推进
+        """
+        pass
+
+
+@dataclass
+class SimulatedOpRecord:
+    """模拟过程中执行的一个指令"""
+    scene: str  # 触发的场景 触发状态或主循环
+    expr: str  # 命中的条件
+    op_name: str
+    start_time: float  # 虚拟时间
+    end_time: float
+    interrupted: bool  # 是否被打断
+
+
+@dataclass
+class AutoBattleSimulationResult:
+    """一次离线模拟的结果"""
+    op_list: List[SimulatedOpRecord] = field(default_factory=list)  # 按开始时间排列的指令
+    scene_latency: dict[str, OperationLatency] = field(default_factory=dict)  # 各场景 从状态更新到第一个指令的虚拟延迟
+    decision_cost: dict[str, OperationLatency] = field(default_factory=dict)  # 各场景 每次判断实际花费的时间
+    virtual_seconds: float = 0  # 模拟的时长
+    real_seconds: float = 0  # 实际花费的时间
+
+
+class _SimulatedTaskRunner:
+
+    def __init__(self, simulator: 'AutoBattleSimulator', task: OperationTask, future: Future):
+        """
+        在虚拟时钟上推进一个任务的指令
+        :param simulator: 模拟器
+        :param task: 任务
+        :param future: 任务结束时设置结果 触发自动指令原有的回调
+        """
+        self.simulator: AutoBattleSimulator = simulator
+        self.task: OperationTask = task
+        self.future: Future = future
+        self.job: Optional[ScheduledJob] = None
+
+        self._op_idx: int = 0
+        self._event_idx: int = 0
+        self._op_start_time: Optional[float] = None  # 当前指令的开始时间 None代表还没开始
+
+    @property
+    def is_done(self) -> bool:
+        return self.future.done()
+
+    def run(self, now: float) -> Optional[float]:
+        """
+        由调度器执行
+        :param now: 当前虚拟时间
+        :return: 下一个状态或者指令结束的时间
+        """
+        task = self.task
+        while self._op_idx < len(task.op_list):
+            if not task.running:  # 被打断了
+                self.finish(now, False)
+                return None
+
+            op: SimulatedAtomicOp = task.op_list[self._op_idx]
+            if self._op_start_time is None:
+                self._op_start_time = now
+                if task.first_op_time is None:
+                    task.first_op_time = now
+
+            while self._event_idx < len(op.state_event_list):
+                offset, record_getter = op.state_event_list[self._event_idx]
+                event_time = self._op_start_time + offset
+                if event_time > now:
+                    return event_time
+                self._event_idx += 1
+                self.simulator.batch_update_states(record_getter(event_time))
+                if not task.running:  # 指令产生的状态打断了自己
+                    self.finish(now, False)
+                    return None
+
+            end_time = self._op_start_time + op.duration
+            if end_time > now:
+                return end_time
+
+            self.simulator.add_op_record(task, op, self._op_start_time, end_time, False)
+            self._op_idx += 1
+            self._event_idx = 0
+            self._op_start_time = None
+
+        task.running = False
+        self.finish(now, True)
+        return None
+
+    def finish(self, now: float, result: bool) -> None:
+        """
+        任务结束 正在执行的指令记为被打断
+        :param now: 当前虚拟时间
+        :param result: 是否完成了所有指令
+        :return:
+        """
+        if self.is_done:
+            return
+        if self._op_start_time is not None:
+            self.simulator.add_op_record(self.task, self.task.op_list[self._op_idx],
+                                         self._op_start_time, now, True)
+            self._op_start_time = None
+        self.simulator.scheduler.cancel(self.job)
+        self.future.set_result(result)
+
+
+class AutoBattleSimulator(ConditionalOperator):
+
+    MAIN_SCENE: ClassVar[str] = '主循环'
+
+    def __init__(self, template_name: str, sub_dir: str = 'auto_battle', is_mock: bool = False):
+        """
+        自动战斗离线模拟
+        按时间顺序回放识别得到的状态记录 驱动自动战斗指令的场景判断
+        指令不操作游戏 按配置的按键时间、延迟、等待秒数在虚拟时钟上推进 并产生对应的按键状态
+        不需要游戏和截图 结果是确定的 可以用于测试配置和评估判断的耗时
+        :param template_name: 自动战斗配置名称
+        :param sub_dir: 配置所在目录
+        :param is_mock: 不读取配置文件 由调用方传入配置内容
+        """
+        ConditionalOperator.__init__(self, sub_dir=sub_dir, template_name=template_name, is_mock=is_mock)
+        self.scheduler: VirtualDeadlineScheduler = VirtualDeadlineScheduler(f'od_auto_battle_simulator_{template_name}')
+
+        self._mutex_list: dict[str, List[str]] = auto_battle_operator_utils.get_state_mutex_list()
+        self.state_recorders: dict[str, StateRecorder] = {}
+
+        self._task_runner: Optional[_SimulatedTaskRunner] = None
+        self._op_record_list: List[SimulatedOpRecord] = []
+        self.decision_cost: dict[str, OperationLatencyRecorder] = {}  # 各场景 每次判断实际花费的时间
+
+    def get_state_recorder(self, state_name: str) -> Optional[StateRecorder]:
+        """
+        获取状态记录器
+        离线模拟时不校验状态名称 记录中出现的状态都可以使用
+        :param state_name: 状态名称
+        :return:
+        """
+        if state_name in self.state_recorders:
+            return self.state_recorders[state_name]
+        r = StateRecorder(state_name, mutex_list=self._mutex_list.get(state_name, None))
+        self.state_recorders[state_name] = r
+        return r
+
+    def get_atomic_op(self, op_def: OperationDef) -> AtomicOp:
+        """
+        获取一个模拟指令 与 AutoBattleOperator.get_atomic_op 的指令名称一致
+        :param op_def: 指令定义
+        :return:
+        """
+        op_name = op_def.op_name
+        op_data = op_def.data
+        press: bool = op_name.endswith('-按下')
+        release: bool = op_name.endswith('-松开')
+
+        if op_name == '按键-切换角色' or op_name == '切换角色':
+            # 只模拟切换后的前台角色 不推算整个队伍的顺序
+            agent_name = op_def.agent_name
+            return SimulatedAtomicOp(
+                op_name='按键-切换角色 %s' % agent_name,
+                duration=op_def.pre_delay + op_def.post_delay,
+                state_event_list=[(op_def.pre_delay, lambda t: [
+                    StateRecord(BattleStateEnum.BTN_SWITCH_NEXT.value, t),
+                    StateRecord(f'前台-{agent_name}', t),
+                ])]
+            )
+        elif op_name == '按键-快速支援':
+            return SimulatedAtomicOp(
+                op_name=op_name,
+                state_event_list=[(0, lambda t: [StateRecord(BattleStateEnum.BTN_SWITCH_NEXT.value, t)])]
+            )
+        elif op_name.startswith('按键') and not press and not release:
+            if op_def.btn_way == '按下':
+                state_name = op_name + '-按下'
+            elif op_def.btn_way == '松开':
+                state_name = op_name + '-松开'
+            else:
+                state_name = op_name
+            # 按下并指定时间时 按键会阻塞到松开
+            press_time = op_def.btn_press if (op_def.btn_way == '按下' and op_def.btn_press is not None) else 0
+            round_time = op_def.pre_delay + press_time + op_def.post_delay
+            state_event_list: List[SimulatedStateEvent] = []
+            for i in range(op_def.btn_repeat_times):
+                state_event_list.append((i * round_time + op_def.pre_delay + press_time,
+                                         lambda t: [StateRecord(state_name, t)]))
+            return SimulatedAtomicOp(
+                op_name=op_name,
+                duration=round_time * op_def.btn_repeat_times,
+                state_event_list=state_event_list
+            )
+        elif op_name.startswith('按键'):
+            press_time = float(op_data[0]) if (press and op_data is not None and len(op_data) > 0) else 0
+            return SimulatedAtomicOp(
+                op_name=op_name,
+                duration=press_time,
+                state_event_list=[(press_time, lambda t: [StateRecord(op_name, t)])]
+            )
+        elif op_name == '等待秒数':
+            wait_seconds = op_def.wait_seconds
+            if op_data is not None and len(op_data) > 0:
+                wait_seconds = float(op_data[0])
+            return SimulatedAtomicOp(op_name='等待秒数 %.2f' % wait_seconds, duration=wait_seconds)
+        elif op_name == '设置状态':
+            state_name_list = op_def.state_name_list
+            diff_time = op_def.state_seconds
+            value = op_def.state_value
+            if state_name_list is None:
+                state_name = op_def.state_name
+                if op_data is not None:
+                    if len(op_data) > 0:
+                        state_name = op_data[0]
+                    if len(op_data) > 1:
+                        diff_time = float(op_data[1])
+                    if len(op_data) > 2:
+                        value = int(op_data[2])
+                state_name_list = [state_name]
+            return SimulatedAtomicOp(
+                op_name='设置状态 %s' % ','.join(state_name_list),
+                state_event_list=[(0, lambda t: [
+                    StateRecord(i, trigger_time=t + diff_time, value=value,
+                                value_to_add=op_def.state_value_add, trigger_time_add=op_def.state_seconds_add)
+                    for i in state_name_list
+                ])]
+            )
+        elif op_name == '清除状态':
+            state_name_list = op_def.state_name_list
+            if state_name_list is None:
+                state_name = op_data[0] if (op_data is not None and len(op_data) > 0) else op_def.state_name
+                state_name_list = [state_name]
+            return SimulatedAtomicOp(
+                op_name='清除状态',
+                state_event_list=[(0, lambda t: [StateRecord(i, is_clear=True) for i in state_name_list])]
+            )
+        else:
+            raise ValueError('非法的指令 %s' % op_name)
+
+    def simulate(self, state_records: List[StateRecord],
+                 end_time: Optional[float] = None,
+                 skip_btn_states: bool = True) -> AutoBattleSimulationResult:
+        """
+        回放一段状态记录
+        每次回放都重新初始化 互不影响
+        :param state_records: 识别得到的状态记录 使用 trigger_time 作为发生时间
+        :param end_time: 模拟的结束时间 默认为最后一个状态记录的时间
+        :param skip_btn_states: 忽略记录中的按键状态 按键状态由模拟指令产生
+        :return: 模拟结果
+        """
+        record_list = [
+            i for i in state_records
+            if not (skip_btn_states and i.state_name.startswith('按键-'))
+        ]
+        record_list.sort(key=lambda i: i.trigger_time)  # 稳定排序 同一时间的保持原有顺序
+        start_time = record_list[0].trigger_time if len(record_list) > 0 else 0
+        if end_time is None:
+            end_time = record_list[-1].trigger_time if len(record_list) > 0 else start_time
+
+        self.state_recorders = {}
+        self.decision_cost = {}
+        self._op_record_list = []
+        self._task_runner = None
+        self.scheduler = VirtualDeadlineScheduler(self.scheduler.name, start_time)
+        self.init(
+            op_getter=self.get_atomic_op,
+            scene_handler_getter=auto_battle_operator_utils.get_state_handler_template,
+            operation_template_getter=auto_battle_operator_utils.get_operation_template,
+        )
+
+        real_start_time = time.perf_counter()
+        self.start_running_async()
+        record_idx: int = 0
+
+        def _replay(now: float) -> Optional[float]:
+            nonlocal record_idx
+            batch: List[StateRecord] = []
+            while record_idx < len(record_list) and record_list[record_idx].trigger_time <= now:
+                batch.append(record_list[record_idx])
+                record_idx += 1
+            if len(batch) > 0:
+                self.batch_update_states(batch)
+            return record_list[record_idx].trigger_time if record_idx < len(record_list) else None
+
+        self.scheduler.add_job('回放状态', _replay, start_time)
+        self.scheduler.run_until(end_time)
+
+        # 到达结束时间时还没执行完的指令 记为被打断
+        if self._task_runner is not None:
+            self._task_runner.finish(end_time, False)
+        self.stop_running()
+
+        return AutoBattleSimulationResult(
+            op_list=list(self._op_record_list),
+            scene_latency=self.get_scene_latency(),
+            decision_cost=self.get_decision_cost(),
+            virtual_seconds=end_time - start_time,
+            real_seconds=time.perf_counter() - real_start_time,
+        )
+
+    def _run_normal_scene(self, now: float) -> Optional[float]:
+        start = time.perf_counter()
+        next_run_time = ConditionalOperator._run_normal_scene(self, now)
+        self._record_decision_cost(AutoBattleSimulator.MAIN_SCENE, time.perf_counter() - start)
+        return next_run_time
+
+    def _trigger_scene(self, state_name: str, event_time: Optional[float] = None) -> None:
+        start = time.perf_counter()
+        ConditionalOperator._trigger_scene(self, state_name, event_time)
+        self._record_decision_cost(state_name, time.perf_counter() - start)
+
+    def _run_task(self, task: OperationTask) -> None:
+        """
+        在虚拟时钟上执行任务 替代线程池
+        :param task: 任务
+        :return:
+        """
+        future = Future()
+        future.add_done_callback(self._on_task_done)
+        future.add_done_callback(lambda _: self._record_latency(task))
+        task.running = True
+        runner = _SimulatedTaskRunner(self, task, future)
+        self._task_runner = runner
+        runner.job = self.scheduler.add_job(f'指令 {task.trigger_display}', runner.run, self.scheduler.now())
+
+    def _stop_running_task(self) -> None:
+        ConditionalOperator._stop_running_task(self)
+        if self._task_runner is not None:
+            # 马上让任务记录被打断的指令
+            self.scheduler.wake(self._task_runner.job)
+
+    def add_op_record(self, task: OperationTask, op: AtomicOp,
+                      start_time: float, end_time: float, interrupted: bool) -> None:
+        """
+        记录一个执行过的指令
+        :param task: 所属任务
+        :param op: 指令
+        :param start_time: 开始时间
+        :param end_time: 结束时间
+        :param interrupted: 是否被打断
+        :return:
+        """
+        self._op_record_list.append(SimulatedOpRecord(
+            scene=task.trigger_display,
+            expr=task.expr_display,
+            op_name=op.op_name,
+            start_time=start_time,
+            end_time=end_time,
+            interrupted=interrupted,
+        ))
+
+    def _record_decision_cost(self, scene: str, cost: float) -> None:
+        recorder = self.decision_cost.get(scene)
+        if recorder is None:
+            recorder = OperationLatencyRecorder(max_size=100000)
+            self.decision_cost[scene] = recorder
+        recorder.record(cost)
+
+    def get_decision_cost(self) -> dict[str, OperationLatency]:
+        """
+        获取各场景每次判断实际花费的时间
+        :return: key=场景 触发状态或主循环
+        """
+        result: dict[str, OperationLatency] = {}
+        for scene, recorder in self.decision_cost.items():
+            latency = recorder.get_latency()
+            if latency is not None:
+                result[scene] = latency
+        return result
+
+
+def load_state_record_trace(file_path: str) -> List[StateRecord]:
+    """
+    读取状态记录
+    文件每行一个json 包含 state_name, trigger_time 可选 value, value_add, trigger_time_add, is_clear
+    :param file_path: 文件路径
+    :return: 状态记录
+    """
+    result: List[StateRecord] = []
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            data = json.loads(line)
+            result.append(StateRecord(
+                data['state_name'],
+                trigger_time=data.get('trigger_time', 0),
+                value=data.get('value'),
+                value_to_add=data.get('value_add'),
+                trigger_time_add=data.get('trigger_time_add'),
+                is_clear=data.get('is_clear', False),
+            ))
+    return result
+
+
+def save_state_record_trace(file_path: str, state_records: List[StateRecord]) -> None:
+    """
+    保存状态记录 格式与 load_state_record_trace 一致
+    :param file_path: 文件路径
+    :param state_records: 状态记录
+    :return:
+    """
+    with open(file_path, 'w', encoding='utf-8') as file:
+        _write_state_records(file, state_records)
+
+
+def _write_state_records(file: TextIO, state_records: List[StateRecord]) -> None:
+    for record in state_records:
+        data = {
+            'state_name': record.state_name,
+            'trigger_time': record.trigger_time,
+        }
+        if record.value is not None:
+            data['value'] = record.value
+        if record.value_add is not None:
+            data['value_add'] = record.value_add
+        if record.trigger_time_add is not None:
+            data['trigger_time_add'] = record.trigger_time_add
+        if record.is_clear:
+            data['is_clear'] = True
+        file.write(json.dumps(data, ensure_ascii=False))
+        file.write('\n')
+
+
+class StateRecordTraceWriter:
+
+    def __init__(self, file_path: str):
+        """
+        实际运行时 把收到的状态记录追加写入文件 格式与 load_state_record_trace 一致
+        之后可以用 AutoBattleSimulator 回放
+        :param file_path: 文件路径
+        """
+        self.file_path: str = file_path
+        self._lock = threading.Lock()  # 多个识别线程会同时更新状态
+
+    def append(self, state_records: List[StateRecord]) -> None:
+        """
+        追加一批状态记录 写入失败时只记录日志 不影响自动战斗
+        :param state_records: 状态记录
+        :return:
+        """
+        with self._lock:
+            try:
+                with open(self.file_path, 'a', encoding='utf-8') as file:
+                    _write_state_records(file, state_records)
+            except OSError:
+                log.error(f'写入状态记录失败 {self.file_path}', exc_info=True)
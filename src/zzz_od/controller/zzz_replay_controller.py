@@ -0,0 +1,166 @@
+from typing import Optional
+
+from one_dragon.base.controller.replay_controller import ReplayController
+
+
+class ZReplayController(ReplayController):
+
+    def __init__(
+            self,
+            frame_path: str,
+            real_time: bool = False,
+            frame_interval: float = 0.1,
+            standard_width: int = 1920,
+            standard_height: int = 1080,
+            turn_dx: float = 1,
+    ):
+        """
+        绝区零的回放控制器 游戏内的操作只做记录
+        参数见 ReplayController
+        :param turn_dx: 转向时每度对应的鼠标移动距离
+        """
+        ReplayController.__init__(
+            self,
+            frame_path=frame_path,
+            real_time=real_time,
+            frame_interval=frame_interval,
+            standard_width=standard_width,
+            standard_height=standard_height,
+        )
+        self.is_moving: bool = False  # 是否正在移动
+        self.turn_dx: float = turn_dx
+
+    def dodge(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        闪避
+        """
+        self.record_action('dodge', press=press, press_time=press_time, release=release)
+
+    def switch_next(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        切换角色-下一个
+        """
+        self.record_action('switch_next', press=press, press_time=press_time, release=release)
+
+    def switch_prev(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        切换角色-上一个
+        """
+        self.record_action('switch_prev', press=press, press_time=press_time, release=release)
+
+    def normal_attack(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        普通攻击
+        """
+        self.record_action('normal_attack', press=press, press_time=press_time, release=release)
+
+    def special_attack(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        特殊攻击
+        """
+        self.record_action('special_attack', press=press, press_time=press_time, release=release)
+
+    def ultimate(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        终结技
+        """
+        self.record_action('ultimate', press=press, press_time=press_time, release=release)
+
+    def chain_left(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        连携技-左
+        """
+        self.record_action('chain_left', press=press, press_time=press_time, release=release)
+
+    def chain_right(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        连携技-右
+        """
+        self.record_action('chain_right', press=press, press_time=press_time, release=release)
+
+    def move_w(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        向前移动
+        """
+        self.record_action('move_w', press=press, press_time=press_time, release=release)
+
+    def move_s(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        向后移动
+        """
+        self.record_action('move_s', press=press, press_time=press_time, release=release)
+
+    def move_a(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        向左移动
+        """
+        self.record_action('move_a', press=press, press_time=press_time, release=release)
+
+    def move_d(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        向右移动
+        """
+        self.record_action('move_d', press=press, press_time=press_time, release=release)
+
+    def interact(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        交互
+        """
+        self.record_action('interact', press=press, press_time=press_time, release=release)
+
+    def lock(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        锁定敌人
+        """
+        self.record_action('lock', press=press, press_time=press_time, release=release)
+
+    def chain_cancel(self, press: bool = False, press_time: Optional[float] = None, release: bool = False) -> None:
+        """
+        取消连携
+        """
+        self.record_action('chain_cancel', press=press, press_time=press_time, release=release)
+
+    def turn_by_distance(self, d: float):
+        """
+        横向转向 按距离转
+        :param d: 正数往右转 负数往左转
+        """
+        self.record_action('turn_by_distance', d=d)
+
+    def turn_by_angle_diff(self, angle_diff: float) -> None:
+        """
+        按照给定角度偏移进行转向
+        :param angle_diff: 角度偏移 逆时针为正
+        """
+        self.turn_by_distance(self.turn_dx * angle_diff)
+
+    def turn_vertical_by_distance(self, d: float):
+        """
+        纵向转向 按距离转
+        :param d: 正数往下转 负数往上转
+        """
+        self.record_action('turn_vertical_by_distance', d=d)
+
+    def move_mouse_relative(self, dx: float, dy: float):
+        """
+        相对移动鼠标
+        """
+        if dx == 0 and dy == 0:
+            return
+        self.record_action('move_mouse_relative', dx=dx, dy=dy)
+
+    def start_moving_forward(self) -> None:
+        """
+        开始向前移动
+        """
+        if self.is_moving:
+            return
+        self.is_moving = True
+        self.move_w(press=True)
+
+    def stop_moving_forward(self) -> None:
+        """
+        停止向前移动
+        """
+        self.is_moving = False
+        self.move_w(release=True)
@@ -1,15 +1,19 @@
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
 
 from one_dragon.base.geometry.rectangle import Rect
 from one_dragon.utils import cal_utils
 from one_dragon.yolo.detect_utils import DetectFrameResult
-from zzz_od.context.zzz_context import ZContext
 from zzz_od.hollow_zero.game_data.hollow_zero_event import HollowZeroEntry
 from zzz_od.hollow_zero.hollow_map.hollow_zero_map import HollowZeroMap, HollowZeroMapNode
 
+if TYPE_CHECKING:
+    from zzz_od.context.zzz_context import ZContext
+
 
 def construct_map_from_yolo_result(
-        ctx: ZContext,
+        ctx: 'ZContext',
         detect_result: DetectFrameResult,
         name_2_entry: dict[str, HollowZeroEntry]
 ) -> Optional[HollowZeroMap]:
@@ -17,6 +21,7 @@ def construct_map_from_yolo_result(
     根据识别结果构造地图
     """
     nodes: List[HollowZeroMapNode] = []
+    node_pos = _NodePosArray(len(detect_result.results))
     unknown = name_2_entry['未知']
 
     for result in detect_result.results:
@@ -34,14 +39,10 @@ def construct_map_from_yolo_result(
             pos = Rect(result.x1, result.y1, result.x2, result.y2 + height // 3)
 
         # 判断与已有的节点是否重复
-        to_merge: Optional[HollowZeroMapNode] = None
-        for existed in nodes:
-            min_dis = min(pos.height, pos.width, existed.pos.height, existed.pos.width) // 2
-            if cal_utils.distance_between(pos.center, existed.pos.center) < min_dis:
-                to_merge = existed
-                break
-
-        if to_merge is not None:
+        merge_idx = node_pos.find_same_pos(pos)
+
+        if merge_idx is not None:
+            to_merge = nodes[merge_idx]
             if to_merge.entry.is_base and not entry.is_base:  # 旧的是底座 那么将新的类型赋值上去
                 to_merge.entry = entry
                 to_merge.pos.y1 = pos.y1  # 使用具体类型的坐标
@@ -51,11 +52,13 @@ def construct_map_from_yolo_result(
                 to_merge.pos.y2 = pos.y2
             else:
                 pass
+            node_pos.update(merge_idx, to_merge.pos)
         else:
             node = HollowZeroMapNode(pos, entry,
                                      check_time=detect_result.run_time,
                                      confidence=result.score)
             nodes.append(node)
+            node_pos.append(pos)
 
     for node in nodes:
         if node.entry.is_base:  # 只识别到底座的 赋值为未知
@@ -68,7 +71,7 @@ def construct_map_from_yolo_result(
 
 
 def construct_map_from_nodes(
-        ctx: ZContext,
+        ctx: 'ZContext',
         nodes: List[HollowZeroMapNode],
         check_time: float
 ) -> HollowZeroMap:
@@ -86,129 +89,135 @@ def construct_map_from_nodes(
             else:
                 current_idx = i
 
-    edges: dict[int, List[int]] = {}
-
-    for i in range(len(nodes)):
-        node_1 = nodes[i]
-        if (node_1.pos.x1 < 0
-                or node_1.pos.y1 < 0
-                or node_1.pos.x2 >= ctx.project_config.screen_standard_width
-                or node_1.pos.y2 >= ctx.project_config.screen_standard_height
-        ):
-            continue
-
-        for j in range(len(nodes)):
-            node_2 = nodes[j]
-            if (node_2.pos.x1 < 0
-                    or node_2.pos.y1 < 0
-                    or node_2.pos.x2 >= ctx.project_config.screen_standard_width
-                    or node_2.pos.y2 >= ctx.project_config.screen_standard_height
-            ):
-                continue
-
-            if not node_1.entry.can_go or not node_2.entry.can_go:
-                continue
-
-            if _at_left(node_1, node_2):  # 1在2左边
-                if node_2.entry.entry_name in ['轨道-左']:
-                    pass
-                elif node_1.entry.entry_name in ['轨道-上', '轨道-下', '轨道-左']:
-                    pass
-                else:
-                    _add_directed_edge(edges, i, j)
-            elif _at_right(node_1, node_2):  # 1在2右边
-                if node_2.entry.entry_name in ['轨道-右']:
-                    pass
-                elif node_1.entry.entry_name in ['轨道-上', '轨道-下', '轨道-右']:
-                    pass
-                else:
-                    _add_directed_edge(edges, i, j)
-            elif _above(node_1, node_2):  # 1在2上边
-                if node_2.entry.entry_name in ['轨道-上']:
-                    pass
-                elif node_1.entry.entry_name in ['轨道-左', '轨道-右', '轨道-上']:
-                    pass
-                else:
-                    _add_directed_edge(edges, i, j)
-            elif _under(node_1, node_2):  # 1在2下边
-                if node_2.entry.entry_name in ['轨道-下']:
-                    pass
-                elif node_1.entry.entry_name in ['轨道-左', '轨道-右', '轨道-下']:
-                    pass
-                else:
-                    _add_directed_edge(edges, i, j)
+    edges: dict[int, List[int]] = _cal_edges(ctx, nodes)
 
     return HollowZeroMap(nodes, current_idx, edges, check_time=check_time)
 
 
-def _at_left(node_1: HollowZeroMapNode, node_2: HollowZeroMapNode) -> bool:
-    """
-    1在2左边
-    :param node_1:
-    :param node_2:
-    :return:
-    """
-    min_width = min(node_1.pos.width,  node_2.pos.width) // 4
-    return abs(node_1.pos.x2 - node_2.pos.x1) <= min_width and _is_same_row(node_1, node_2)
+# 向某个方向连接时 不能连接的格子
+# key=方向 value=(目标格子是这些类型时不能连接, 出发格子是这些类型时不能连接)
+_DIRECTION_BLOCK_ENTRY: dict[str, tuple[List[str], List[str]]] = {
+    'left': (['轨道-左'], ['轨道-上', '轨道-下', '轨道-左']),  # 1在2左边
+    'right': (['轨道-右'], ['轨道-上', '轨道-下', '轨道-右']),  # 1在2右边
+    'above': (['轨道-上'], ['轨道-左', '轨道-右', '轨道-上']),  # 1在2上边
+    'under': (['轨道-下'], ['轨道-左', '轨道-右', '轨道-下']),  # 1在2下边
+}
 
 
-def _at_right(node_1: HollowZeroMapNode, node_2: HollowZeroMapNode) -> bool:
+def _get_pos_array(nodes: List[HollowZeroMapNode]) -> np.ndarray:
     """
-    1在2右边
-    :param node_1:
-    :param node_2:
-    :return:
+    节点坐标
+    :param nodes: 节点列表
+    :return: (n, 4) 的 x1 y1 x2 y2
     """
-    min_width = min(node_1.pos.width,  node_2.pos.width) // 4
-    return abs(node_1.pos.x1 - node_2.pos.x2) <= min_width and _is_same_row(node_1, node_2)
+    if len(nodes) == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+    return np.array([(node.pos.x1, node.pos.y1, node.pos.x2, node.pos.y2) for node in nodes], dtype=np.int64)
 
 
-def _above(node_1: HollowZeroMapNode, node_2: HollowZeroMapNode) -> bool:
+def _cal_edges(ctx: 'ZContext', nodes: List[HollowZeroMapNode]) -> dict[int, List[int]]:
     """
-    1在2上边
-    :param node_1:
-    :param node_2:
-    :return:
+    计算节点之间的连接 所有节点两两之间的位置关系一次性计算
+    :param ctx: 上下文
+    :param nodes: 节点列表
+    :return: key=节点下标 value=可以前往的节点下标 升序
     """
-    min_height = min(node_1.pos.height,  node_2.pos.height) // 4
-    return abs(node_1.pos.y2 - node_2.pos.y1) <= min_height and _is_same_col(node_1, node_2)
+    pos = _get_pos_array(nodes)
+    x1, y1, x2, y2 = pos[:, 0], pos[:, 1], pos[:, 2], pos[:, 3]
+    width = x2 - x1
+    height = y2 - y1
+
+    # 在画面内 且可以前往的节点 才能连接
+    valid = ((x1 >= 0) & (y1 >= 0)
+             & (x2 < ctx.project_config.screen_standard_width)
+             & (y2 < ctx.project_config.screen_standard_height)
+             & np.array([node.entry.can_go for node in nodes], dtype=bool))
+    valid_pair = valid[:, np.newaxis] & valid[np.newaxis, :]
+
+    # 下标[i, j] 为节点i与节点j的关系
+    min_width = np.minimum(width[:, np.newaxis], width[np.newaxis, :])
+    min_height = np.minimum(height[:, np.newaxis], height[np.newaxis, :])
+
+    same_row = ((np.abs(y1[:, np.newaxis] - y1[np.newaxis, :]) <= min_height // 3)
+                | (np.abs(y2[:, np.newaxis] - y2[np.newaxis, :]) <= min_height // 3))
+    same_col = ((np.abs(x1[:, np.newaxis] - x1[np.newaxis, :]) <= min_width // 3)
+                | (np.abs(x2[:, np.newaxis] - x2[np.newaxis, :]) <= min_width // 3))
+
+    at_left = (np.abs(x2[:, np.newaxis] - x1[np.newaxis, :]) <= min_width // 4) & same_row
+    at_right = (np.abs(x1[:, np.newaxis] - x2[np.newaxis, :]) <= min_width // 4) & same_row
+    above = (np.abs(y2[:, np.newaxis] - y1[np.newaxis, :]) <= min_height // 4) & same_col
+    under = (np.abs(y1[:, np.newaxis] - y2[np.newaxis, :]) <= min_height // 4) & same_col
+
+    # 按 左 右 上 下 的顺序 只使用第一个满足的方向
+    at_right &= ~at_left
+    above &= ~(at_left | at_right)
+    under &= ~(at_left | at_right | above)
+
+    entry_names = np.array([node.entry.entry_name for node in nodes], dtype=object)
+    connected = np.zeros_like(valid_pair)
+    for direction, relation in (('left', at_left), ('right', at_right), ('above', above), ('under', under)):
+        to_block, from_block = _DIRECTION_BLOCK_ENTRY[direction]
+        to_ok = ~np.isin(entry_names, to_block)
+        from_ok = ~np.isin(entry_names, from_block)
+        connected |= relation & from_ok[:, np.newaxis] & to_ok[np.newaxis, :]
+
+    connected &= valid_pair
+
+    edges: dict[int, List[int]] = {}
+    for i in np.flatnonzero(connected.any(axis=1)):
+        edges[int(i)] = np.flatnonzero(connected[i]).tolist()
+    return edges
 
 
-def _under(node_1: HollowZeroMapNode, node_2: HollowZeroMapNode) -> bool:
+def _cal_same_pos_matrix(pos_1: np.ndarray, pos_2: np.ndarray) -> np.ndarray:
     """
-    1在2上边
-    :param node_1:
-    :param node_2:
-    :return:
+    计算两组节点之间 坐标是否一致 与 is_same_node_pos 一致
+    :param pos_1: (n, 4) 的 x1 y1 x2 y2
+    :param pos_2: (m, 4) 的 x1 y1 x2 y2
+    :return: (n, m) 的结果
     """
-    min_height = min(node_1.pos.height,  node_2.pos.height) // 4
-    return abs(node_1.pos.y1 - node_2.pos.y2) <= min_height and _is_same_col(node_1, node_2)
-
-
-def _is_same_row(node_1: HollowZeroMapNode, node_2: HollowZeroMapNode) -> bool:
-    min_height = min(node_1.pos.height,  node_2.pos.height) // 3
-    y1_close = abs(node_1.pos.y1 - node_2.pos.y1) <= min_height
-    y2_close = abs(node_1.pos.y2 - node_2.pos.y2) <= min_height
-    return y1_close or y2_close
-
-
-def _is_same_col(node_1: HollowZeroMapNode, node_2: HollowZeroMapNode) -> bool:
-    min_width = min(node_1.pos.width,  node_2.pos.width) // 3
-    x1_close = abs(node_1.pos.x1 - node_2.pos.x1) <= min_width
-    x2_close = abs(node_1.pos.x2 - node_2.pos.x2) <= min_width
-    return x1_close or x2_close
-
-
-def _add_edge(edges: dict[int, List[int]], x: int, y: int) -> None:
-    _add_directed_edge(edges, x, y)
-    _add_directed_edge(edges, y, x)
-
-
-def _add_directed_edge(edges: dict[int, List[int]], x: int, y: int) -> None:
-    if x not in edges:
-        edges[x] = [y]
-    else:
-        edges[x].append(y)
+    size_1 = np.minimum(pos_1[:, 2] - pos_1[:, 0], pos_1[:, 3] - pos_1[:, 1])
+    size_2 = np.minimum(pos_2[:, 2] - pos_2[:, 0], pos_2[:, 3] - pos_2[:, 1])
+    min_dis = np.minimum(size_1[:, np.newaxis], size_2[np.newaxis, :]) // 2
+
+    center_1 = (pos_1[:, :2] + pos_1[:, 2:]) // 2
+    center_2 = (pos_2[:, :2] + pos_2[:, 2:]) // 2
+    diff = center_1[:, np.newaxis, :] - center_2[np.newaxis, :, :]
+    dis2 = (diff * diff).sum(axis=2)
+
+    return (min_dis > 0) & (dis2 < min_dis * min_dis)
+
+
+class _NodePosArray:
+
+    def __init__(self, capacity: int):
+        """
+        逐个加入节点时 用于查找坐标一致的已有节点
+        :param capacity: 最多的节点数量
+        """
+        self._pos: np.ndarray = np.zeros((max(capacity, 1), 4), dtype=np.int64)
+        self._size: int = 0
+
+    def find_same_pos(self, pos: Rect) -> Optional[int]:
+        """
+        :param pos: 坐标
+        :return: 第一个坐标一致的节点下标 没有时返回None
+        """
+        if self._size == 0:
+            return None
+        target = np.array([[pos.x1, pos.y1, pos.x2, pos.y2]], dtype=np.int64)
+        same = _cal_same_pos_matrix(target, self._pos[:self._size])[0]
+        idx = int(np.argmax(same))
+        return idx if same[idx] else None
+
+    def append(self, pos: Rect) -> None:
+        if self._size == len(self._pos):
+            self._pos = np.concatenate([self._pos, np.zeros_like(self._pos)])
+        self.update(self._size, pos)
+        self._size += 1
+
+    def update(self, idx: int, pos: Rect) -> None:
+        self._pos[idx] = (pos.x1, pos.y1, pos.x2, pos.y2)
 
 
 def is_same_map(map_1: HollowZeroMap, map_2: HollowZeroMap) -> bool:
@@ -228,12 +237,11 @@ def is_same_map(map_1: HollowZeroMap, map_2: HollowZeroMap) -> bool:
     elif node_cnt_1 == 0 or node_cnt_2 == 0:
         return False
 
-    same_node_cnt = 0
-    for node_1 in map_1.nodes:
-        for node_2 in map_2.nodes:
-            if is_same_node(node_1, node_2):
-                same_node_cnt += 1
-                break
+    same_pos = _cal_same_pos_matrix(_get_pos_array(map_1.nodes), _get_pos_array(map_2.nodes))
+    names_1 = np.array([node.entry.entry_name for node in map_1.nodes], dtype=object)
+    names_2 = np.array([node.entry.entry_name for node in map_2.nodes], dtype=object)
+    same_node = same_pos & (names_1[:, np.newaxis] == names_2[np.newaxis, :])
+    same_node_cnt = int(np.count_nonzero(same_node.any(axis=1)))
 
     # 极端情况下 是在3个格子的情况下移动 剩下2个格子
     # 如果移动后有在内存将格子更新为当前 则本次识别的2个格子的应该跟之前的一样 因此至少有50%格子一致
@@ -241,27 +249,26 @@ def is_same_map(map_1: HollowZeroMap, map_2: HollowZeroMap) -> bool:
     return same_node_cnt >= node_cnt_1 * 0.5 and same_node_cnt >= node_cnt_2 * 0.5
 
 
-def merge_map(ctx: ZContext, map_list: List[HollowZeroMap]):
+def merge_map(ctx: 'ZContext', map_list: List[HollowZeroMap]):
     """
     将多个地图合并成一个
     """
     nodes: List[HollowZeroMapNode] = []
+    node_pos = _NodePosArray(sum(len(m.nodes) for m in map_list))
     max_check_time: Optional[float] = None
 
     # 每个地图的节点取出来后去重合并
     for m in map_list:
         for node in m.nodes:
-            to_merge: Optional[HollowZeroMapNode] = None
-            for existed in nodes:
-                if is_same_node_pos(node, existed):
-                    to_merge = existed
-                    break
+            merge_idx = node_pos.find_same_pos(node.pos)
 
-            if to_merge is not None:
+            if merge_idx is not None:
+                to_merge = nodes[merge_idx]
                 if to_merge.entry.is_base:  # 旧的是底座 那么将新的类型赋值上去
                     to_merge.entry = node.entry
                 elif node.entry.is_base:  # 旧的是格子类型 新的是底座 将底座范围赋值上去
                     to_merge.pos = node.pos
+                    node_pos.update(merge_idx, node.pos)
                 elif to_merge.entry.entry_name == '未知' and node.entry.entry_name != '未知':  # 新旧都是格子类型 旧的是未知 将新的类型赋值上去
                     to_merge.entry = node.entry
                 elif to_merge.entry.entry_name != '未知' and node.entry.entry_name == '未知':  # 新旧都是格子类型 新的是未知 保持不变
@@ -275,6 +282,7 @@ def merge_map(ctx: ZContext, map_list: List[HollowZeroMap]):
                     to_merge.entry = node.entry
             else:
                 nodes.append(node)
+                node_pos.append(node.pos)
 
         if max_check_time is None or m.check_time > max_check_time:
             max_check_time = m.check_time
@@ -93,6 +93,9 @@ class TelemetryConfigLoader:
                 performance = telemetry_config.get('performance', {})
                 config.flush_interval = performance.get('flush_interval', config.flush_interval)
                 config.max_queue_size = performance.get('max_queue_size', config.max_queue_size)
+                config.batch_size = performance.get('batch_size', config.batch_size)
+                config.gzip_enabled = performance.get('gzip', config.gzip_enabled)
+                config.max_spool_bytes = performance.get('max_spool_bytes', config.max_spool_bytes)
 
                 # 调试设置
                 debug = telemetry_config.get('debug', {})
@@ -1,8 +1,9 @@
 """
 Loki客户端包装器
-提供与Loki服务的通信接口，包括本地队列、批量发送和重试机制
+提供与Loki服务的通信接口，包括本地队列、批量发送、磁盘缓存和重试机制
 """
 import os
+import gzip
 import time
 import json
 import logging
@@ -10,16 +11,22 @@ import threading
 import requests
 import platform
 import uuid
-from queue import Queue, Empty
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
-from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+from collections import defaultdict, deque
+
+from requests.adapters import HTTPAdapter
 
 from .models import TelemetryConfig
 
 
 logger = logging.getLogger(__name__)
 
+# 发送内容的编码
+_ENCODING_GZIP = 'gzip'
+_ENCODING_IDENTITY = 'identity'
+_GZIP_MAGIC = b'\x1f\x8b'
+
 
 class LokiClient:
     """Loki客户端包装器"""
@@ -40,14 +47,29 @@ class LokiClient:
             # 使用Grafana Cloud的认证格式: Bearer {USER_ID}:{API_KEY}
             self.headers['Authorization'] = f'Bearer {config.loki_tenant_id}:{config.loki_auth_token}'
 
-        # 本地队列
-        self._event_queue = Queue(maxsize=config.max_queue_size)
+        # 本地队列 有新事件或需要刷新时通过条件变量唤醒刷新线程
+        self._event_queue: deque = deque()
+        self._queue_condition = threading.Condition()
+        self._flush_requested = False
         self._flush_thread: Optional[threading.Thread] = None
         self._last_flush_time = datetime.now()
 
+        # 发送相关 同一时间只有一个线程在发送
+        self._send_lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._retry_count = 0  # 连续发送失败的次数
+        self._next_retry_time = 0.0  # 发送失败后 下次重试的时间
+        self._last_error: Optional[str] = None
+
+        # 磁盘缓存 发送失败的批次写入这里 重启或网络恢复后继续发送
+        self._spool_dir = config.spool_dir
+        self._spool_seq = 0
+
         # 统计信息
         self.events_sent = 0
         self.events_failed = 0
+        self.events_spooled = 0  # 磁盘缓存中待发送的事件数量
+        self.events_dropped = 0
         self.queue_size = 0
 
         # 基础标签
@@ -67,6 +89,11 @@ class LokiClient:
 
             logger.debug(f"Initializing Loki client with URL: {self.config.loki_url}")
 
+            self._session = self._create_session()
+            if self._spool_dir:
+                os.makedirs(self._spool_dir, exist_ok=True)
+                self.events_spooled = sum(cnt for _, cnt in self._list_spool_files())
+
             # 发送应用启动事件
             logger.debug("Sending app startup event...")
             try:
@@ -88,10 +115,10 @@ class LokiClient:
             except Exception as e:
                 logger.warning(f"Failed to send app startup event: {e}")
 
-            # 启动后台刷新线程
-            self._start_flush_thread()
-
             self._initialized = True
+
+            # 启动后台刷新线程 上次未发送成功的批次也会一并发送
+            self._start_flush_thread()
             logger.debug(f"Loki client initialized successfully with URL: {self.config.loki_url}")
             return True
 
@@ -101,6 +128,15 @@ class LokiClient:
             logger.error(traceback.format_exc())
             return False
 
+    def _create_session(self) -> requests.Session:
+        """创建复用连接的会话"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(self.headers)
+        return session
+
     def _start_flush_thread(self) -> None:
         """启动后台刷新线程"""
         if self._flush_thread is None or not self._flush_thread.is_alive():
@@ -111,132 +147,318 @@ class LokiClient:
             )
             self._flush_thread.start()
 
+    def _get_wait_seconds(self) -> Optional[float]:
+        """
+        刷新线程需要等待多久 调用时需要持有条件变量
+        返回None时一直等待 直到有新事件
+        """
+        now = time.time()
+        wait_list: List[float] = []
+        if len(self._event_queue) > 0:
+            since_last_flush = (datetime.now() - self._last_flush_time).total_seconds()
+            wait_list.append(self.config.flush_interval - since_last_flush)
+        if self.events_spooled > 0:
+            wait_list.append(self._next_retry_time - now)
+        if len(wait_list) == 0:
+            return None
+        return max(0.0, min(wait_list))
+
+    def _should_flush(self) -> bool:
+        """是否需要刷新 调用时需要持有条件变量"""
+        if self._shutdown or self._flush_requested:
+            return True
+        if len(self._event_queue) >= self.config.max_queue_size * 0.8:
+            return True
+        wait_seconds = self._get_wait_seconds()
+        return wait_seconds is not None and wait_seconds <= 0
+
     def _flush_worker(self) -> None:
-        """后台刷新工作线程"""
+        """后台刷新工作线程 没有待发送的数据时不会被唤醒"""
         while not self._shutdown:
             try:
-                # 等待刷新间隔或队列满
-                time.sleep(1)  # 每秒检查一次
-
-                current_time = datetime.now()
-                time_since_last_flush = (current_time - self._last_flush_time).total_seconds()
+                with self._queue_condition:
+                    while not self._should_flush():
+                        self._queue_condition.wait(timeout=self._get_wait_seconds())
+                    self._flush_requested = False
 
-                # 检查是否需要刷新
-                should_flush = (
-                    time_since_last_flush >= self.config.flush_interval or
-                    self._event_queue.qsize() >= self.config.max_queue_size * 0.8
-                )
+                if self._shutdown:
+                    break
 
-                if should_flush:
-                    self._flush_queue()
+                self._flush_queue()
 
             except Exception as e:
                 logger.error(f"Error in flush worker: {e}")
-                time.sleep(5)  # 错误后等待5秒
-
-    def _flush_queue(self) -> None:
-        """刷新事件队列"""
-        if self._event_queue.empty():
-            return
-
-        events_to_send = []
-
-        # 从队列中取出事件
-        while not self._event_queue.empty() and len(events_to_send) < 100:  # 批量大小限制
-            try:
-                event = self._event_queue.get_nowait()
-                events_to_send.append(event)
-            except Empty:
-                break
-
-        if not events_to_send:
-            return
-
-        # 批量发送到Loki
-        try:
-            success = self._send_batch_to_loki(events_to_send)
-            if success:
-                self.events_sent += len(events_to_send)
-                logger.debug(f"Successfully sent {len(events_to_send)} events to Loki")
-            else:
-                self.events_failed += len(events_to_send)
-                logger.debug(f"Failed to send {len(events_to_send)} events to Loki")
-        except Exception as e:
-            # 静默失败，不影响应用运行
-            logger.debug(f"Error sending batch to Loki: {e}")
-            self.events_failed += len(events_to_send)
-
-        self._last_flush_time = datetime.now()
+                with self._queue_condition:
+                    self._queue_condition.wait(timeout=5)  # 错误后等待5秒
+
+    def _flush_queue(self, force: bool = False) -> None:
+        """
+        刷新事件队列 先发送磁盘缓存中的批次 再发送内存中的事件
+        发送失败时 内存中的事件写入磁盘缓存 等待之后重试
+
+        Args:
+            force: 是否忽略重试的等待时间
+        """
+        with self._send_lock:
+            can_send = force or time.time() >= self._next_retry_time
+            if can_send:
+                can_send = self._send_spool()
+
+            while True:
+                events_to_send = self._take_events(self.config.batch_size)
+                if not events_to_send:
+                    break
+
+                payload, encoding = self._build_payload(events_to_send)
+                if not can_send:
+                    # 还在等待重试 直接写入磁盘缓存 排在之前的批次后面
+                    self._save_to_spool(payload, encoding, len(events_to_send))
+                    continue
+
+                result = self._post_payload(payload, encoding)
+                if result == 'success':
+                    self.events_sent += len(events_to_send)
+                    logger.debug(f"Successfully sent {len(events_to_send)} events to Loki")
+                elif result == 'retry':
+                    self._save_to_spool(payload, encoding, len(events_to_send))
+                    can_send = False
+                else:
+                    self.events_failed += len(events_to_send)
+                    logger.debug(f"Failed to send {len(events_to_send)} events to Loki")
+
+            self._last_flush_time = datetime.now()
+
+    def _take_events(self, max_size: int) -> list:
+        """从队列中取出事件"""
+        with self._queue_condition:
+            events = []
+            while self._event_queue and len(events) < max_size:
+                events.append(self._event_queue.popleft())
+            self.queue_size = len(self._event_queue)
+            return events
+
+    def _build_payload(self, events: list) -> Tuple[bytes, str]:
+        """
+        构建发送的内容 开启压缩时使用gzip
+
+        Returns:
+            Tuple[bytes, str]: (发送的内容, 内容编码 gzip 或 identity)
+        """
+        body = json.dumps(self._build_loki_payload(events), ensure_ascii=False).encode('utf-8')
+        if self.config.gzip_enabled:
+            return gzip.compress(body, compresslevel=6), _ENCODING_GZIP
+        return body, _ENCODING_IDENTITY
+
+    def _build_loki_payload(self, events: list) -> Dict[str, Any]:
+        """按标签分组事件 构建Loki的payload"""
+        # 按标签分组事件（优化Loki存储）
+        streams = defaultdict(list)
+
+        for event in events:
+            # 使用捕获事件时的时间戳
+            ts = event.get('timestamp_ns') or self._get_timestamp_ns()
+
+            # 格式化日志行
+            line = self._format_log_line_from_event(event)
+
+            # 生成标签
+            labels = self._generate_labels(event)
+            labels_tuple = tuple(sorted(labels.items()))
+
+            streams[labels_tuple].append([ts, line])
+
+        return {
+            "streams": [
+                {"stream": dict(labels), "values": values}
+                for labels, values in streams.items()
+            ]
+        }
 
     def _send_batch_to_loki(self, events: list) -> bool:
-        """批量发送事件到Loki（集成pushtoloki.py逻辑）"""
+        """批量发送事件到Loki"""
         try:
-            # 按标签分组事件（优化Loki存储）
-            streams = defaultdict(list)
-
-            for event in events:
-                # 生成时间戳
-                ts = self._get_timestamp_ns()
-
-                # 格式化日志行
-                line = self._format_log_line_from_event(event)
-
-                # 生成标签
-                labels = self._generate_labels(event)
-                labels_tuple = tuple(sorted(labels.items()))
-
-                streams[labels_tuple].append([ts, line])
-
-            # 构建Loki payload
-            payload = {
-                "streams": [
-                    {"stream": dict(labels), "values": values}
-                    for labels, values in streams.items()
-                ]
-            }
-
-            # 使用重试机制发送到Loki
-            return self._send_with_retry(payload)
-
+            return self._post_payload(*self._build_payload(events)) == 'success'
         except Exception as e:
             # 静默失败，不影响应用运行
             logger.debug(f"Error in _send_batch_to_loki: {e}")
             return False
 
-    def _send_with_retry(self, payload: Dict[str, Any], max_retries: int = 3) -> bool:
-        """带重试机制的发送方法"""
-        for attempt in range(max_retries):
+    def _post_payload(self, payload: bytes, encoding: str) -> str:
+        """
+        发送一个批次 不在这里等待重试
+
+        Args:
+            payload: 发送的内容
+            encoding: 内容编码 gzip 或 identity
+
+        Returns:
+            str: success=成功 retry=网络问题或服务端暂时不可用 之后重试 drop=请求本身有问题 重试也不会成功
+        """
+        try:
+            headers = {'Content-Encoding': _ENCODING_GZIP} if encoding == _ENCODING_GZIP else None
+            response = self._session.post(self.loki_url, data=payload, headers=headers, timeout=10)
+            status_code = response.status_code
+            response.close()
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"Network error sending to Loki: {e}")
+            self._last_error = str(e)
+            self._on_send_failed()
+            return 'retry'
+        except Exception as e:
+            logger.debug(f"Unexpected error sending to Loki: {e}")
+            self._last_error = str(e)
+            self._on_send_failed()
+            return 'retry'
+
+        if 200 <= status_code < 300:
+            self._retry_count = 0
+            self._next_retry_time = 0
+            return 'success'
+
+        self._last_error = f'status {status_code}'
+        logger.debug(f"Loki returned status {status_code}")
+        if status_code == 429 or status_code >= 500:
+            self._on_send_failed()
+            return 'retry'
+        return 'drop'
+
+    def _on_send_failed(self) -> None:
+        """发送失败后 按指数退避设置下次重试的时间"""
+        self._retry_count += 1
+        wait_time = min(2 ** (self._retry_count - 1), self.config.max_retry_interval)
+        self._next_retry_time = time.time() + wait_time
+
+    def _list_spool_files(self) -> List[Tuple[str, int]]:
+        """
+        磁盘缓存中的批次 按写入顺序排列
+
+        Returns:
+            List[Tuple[str, int]]: (文件路径, 事件数量)
+        """
+        if not self._spool_dir or not os.path.isdir(self._spool_dir):
+            return []
+        result = []
+        for file_name in sorted(os.listdir(self._spool_dir)):
+            if not file_name.endswith('.batch'):
+                continue
             try:
-                response = requests.post(
-                    self.loki_url,
-                    json=payload,
-                    headers=self.headers,
-                    timeout=10
-                )
+                cnt = int(file_name[:-len('.batch')].split('-')[-1])
+            except ValueError:
+                continue
+            result.append((os.path.join(self._spool_dir, file_name), cnt))
+        return result
+
+    def _save_to_spool(self, payload: bytes, encoding: str, event_cnt: int) -> None:
+        """
+        将发送失败的批次写入磁盘缓存 超出大小限制时丢弃最早的批次
+        内容编码记录在文件名中 之后修改压缩设置也能按原来的编码发送
+        """
+        if not self._spool_dir:
+            self.events_failed += event_cnt
+            return
 
-                if response.status_code == 204:
-                    return True
-                else:
-                    logger.debug(f"Loki returned status {response.status_code}, attempt {attempt + 1}/{max_retries}")
+        try:
+            os.makedirs(self._spool_dir, exist_ok=True)
+            self._spool_seq += 1
+            file_name = f'{time.time_ns():020d}-{self._spool_seq:06d}-{encoding}-{event_cnt}.batch'
+            file_path = os.path.join(self._spool_dir, file_name)
+            temp_path = file_path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, file_path)
+            self.events_spooled += event_cnt
+        except Exception as e:
+            logger.debug(f"Failed to write spool file: {e}")
+            self.events_failed += event_cnt
+            return
 
-            except requests.exceptions.RequestException as e:
-                logger.debug(f"Network error sending to Loki, attempt {attempt + 1}/{max_retries}: {e}")
+        self._trim_spool()
 
-            except Exception as e:
-                logger.debug(f"Unexpected error sending to Loki, attempt {attempt + 1}/{max_retries}: {e}")
+    def _trim_spool(self) -> None:
+        """磁盘缓存超出大小限制时 丢弃最早的批次"""
+        spool_files = self._list_spool_files()
+        total_size = 0
+        size_list = []
+        for file_path, cnt in spool_files:
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                size = 0
+            size_list.append(size)
+            total_size += size
+
+        for (file_path, cnt), size in zip(spool_files, size_list):
+            if total_size <= self.config.max_spool_bytes:
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            total_size -= size
+            self.events_dropped += cnt
+            self.events_spooled = max(0, self.events_spooled - cnt)
+            logger.debug(f"Spool is full, dropped {cnt} events")
+
+    @staticmethod
+    def _get_spool_encoding(file_path: str, payload: bytes) -> str:
+        """
+        磁盘缓存批次的内容编码 文件名中没有记录时 按内容是否gzip判断
+
+        Returns:
+            str: gzip 或 identity
+        """
+        parts = os.path.basename(file_path)[:-len('.batch')].split('-')
+        if len(parts) >= 4 and parts[-2] in (_ENCODING_GZIP, _ENCODING_IDENTITY):
+            return parts[-2]
+        return _ENCODING_GZIP if payload[:2] == _GZIP_MAGIC else _ENCODING_IDENTITY
+
+    def _send_spool(self) -> bool:
+        """
+        按顺序发送磁盘缓存中的批次 遇到可重试的失败时停止
+
+        Returns:
+            bool: 是否全部发送完毕
+        """
+        if self.events_spooled == 0:
+            return True
 
-            # 指数退避
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt
-                time.sleep(wait_time)
+        for file_path, cnt in self._list_spool_files():
+            try:
+                with open(file_path, 'rb') as f:
+                    payload = f.read()
+            except OSError as e:
+                logger.debug(f"Failed to read spool file: {e}")
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # 无法读取也无法删除 按可重试的失败处理 等待之后再试
+                    self._on_send_failed()
+                    return False
+                self.events_failed += cnt
+                self.events_spooled = max(0, self.events_spooled - cnt)
+                continue
+
+            result = self._post_payload(payload, self._get_spool_encoding(file_path, payload))
+            if result == 'retry':
+                return False
+
+            if result == 'success':
+                self.events_sent += cnt
+            else:
+                self.events_failed += cnt
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            self.events_spooled = max(0, self.events_spooled - cnt)
 
-        # 所有重试都失败，静默失败
-        logger.debug(f"Failed to send to Loki after {max_retries} attempts, silently failing")
-        return False
+        return True
 
     def _get_timestamp_ns(self) -> str:
         """获取纳秒时间戳"""
-        return str(int(datetime.now().timestamp() * 1e9))
+        return str(time.time_ns())
 
     def _format_log_line(self, message: str, metadata: Optional[Dict[str, str]] = None) -> str:
         """将消息和元数据格式化为单个日志行字符串"""
@@ -347,13 +569,19 @@ class LokiClient:
         self.identify(distinct_id, properties)
 
     def _enqueue_event(self, event_data: Dict[str, Any]) -> None:
-        """将事件加入队列"""
-        try:
-            self._event_queue.put_nowait(event_data)
-            self.queue_size = self._event_queue.qsize()
-        except Exception as e:
-            logger.error(f"Failed to enqueue event: {e}")
-            self.events_failed += 1
+        """将事件加入队列 记录捕获时的时间戳"""
+        event_data['timestamp_ns'] = self._get_timestamp_ns()
+        with self._queue_condition:
+            if len(self._event_queue) >= self.config.max_queue_size:
+                logger.error("Failed to enqueue event: queue is full")
+                self.events_failed += 1
+                return
+
+            self._event_queue.append(event_data)
+            self.queue_size = len(self._event_queue)
+            # 队列从空变为非空时 刷新线程需要开始计时 快满时需要立即刷新
+            if self.queue_size == 1 or self.queue_size >= self.config.max_queue_size * 0.8:
+                self._queue_condition.notify()
 
     def flush(self) -> None:
         """立即刷新队列"""
@@ -365,17 +593,22 @@ class LokiClient:
         logger.debug("Shutting down Loki client...")
 
         try:
-            self._shutdown = True
+            with self._queue_condition:
+                self._shutdown = True
+                self._queue_condition.notify_all()
 
             # 停止刷新线程
             if self._flush_thread and self._flush_thread.is_alive():
                 self._flush_thread.join(timeout=5)
 
-            # 强制刷新所有剩余事件
+            # 强制刷新所有剩余事件 发送失败的会留在磁盘缓存中 下次启动后发送
             logger.debug("Flushing all remaining events...")
-            self._flush_queue()
+            if self._session is not None:
+                self._flush_queue(force=True)
+                self._session.close()
 
-            logger.debug(f"Loki client shutdown complete. Events sent: {self.events_sent}, failed: {self.events_failed}")
+            logger.debug(f"Loki client shutdown complete. Events sent: {self.events_sent}, failed: {self.events_failed}, "
+                         f"spooled: {self.events_spooled}")
 
         except Exception as e:
             logger.debug(f"Error during Loki client shutdown: {e}")
@@ -387,6 +620,8 @@ class LokiClient:
             'events_sent': self.events_sent,
             'events_failed': self.events_failed,
             'queue_size': self.queue_size,
+            'events_spooled': self.events_spooled,
+            'events_dropped': self.events_dropped,
             'last_flush': self._last_flush_time.isoformat() if self._last_flush_time else None,
             'health': 'healthy' if self.events_failed < 10 else 'degraded'
         }
@@ -397,7 +632,7 @@ class LokiClient:
                 'connected': self.events_sent > 0 or self.events_failed == 0,
                 'loki_url_configured': bool(self.config.loki_url),
                 'loki_url': self.config.loki_url,
-                'last_error': getattr(self, '_last_error', None)
+                'last_error': self._last_error
             })
         else:
             status.update({
@@ -50,6 +50,13 @@ class TelemetryConfig:
 
     flush_interval: int = 5  # 秒
     max_queue_size: int = 1000
+    batch_size: int = 500  # 每次发送的最大事件数量
+    gzip_enabled: bool = True  # 是否压缩发送的内容
+    max_retry_interval: int = 300  # 发送失败后 重试的最大间隔 秒
+
+    # 磁盘缓存 发送失败的事件保存在这里 重启后继续发送
+    spool_dir: str = ""  # 为空时不使用磁盘缓存
+    max_spool_bytes: int = 10 * 1024 * 1024
     debug_mode: bool = False
 
     # 后端配置（现在只支持Loki）
@@ -80,6 +80,8 @@ class TelemetryManager:
 
             # 初始化Loki客户端
             logger.debug("Initializing Loki client...")
+            if not self.config.spool_dir:
+                self.config.spool_dir = str(Path(os_utils.get_work_dir()) / ".cache" / "telemetry")
             self.loki_client = LokiClient(self.config)
             if not self.loki_client.initialize():
                 logger.warning("Failed to initialize Loki client")
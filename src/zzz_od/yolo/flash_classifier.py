@@ -1,6 +1,7 @@
 import os
 from typing import Optional
 
+from one_dragon.yolo.onnx_model_loader import OnnxSessionConfig
 from one_dragon.yolo.yolo_utils import ZZZ_MODEL_DOWNLOAD_URL
 from one_dragon.yolo.yolov8_onnx_cls import Yolov8Classifier
 
@@ -16,13 +17,15 @@ class FlashClassifier(Yolov8Classifier):
             gh_proxy_url: Optional[str] = None,
             personal_proxy: Optional[str] = None,
             gpu: bool = False,
-            keep_result_seconds: float = 2
+            keep_result_seconds: float = 2,
+            session_config: Optional[OnnxSessionConfig] = None
     ):
         """
         :param model_name: 模型名称 在根目录下会有一个以模型名称创建的子文件夹
         :param model_parent_dir_path: 放置所有模型的根目录
         :param gpu: 是否启用GPU加速
         :param keep_result_seconds: 保留多长时间的识别结果
+        :param session_config: onnxruntime 会话的配置 不传入时使用默认配置
         """
         Yolov8Classifier.__init__(
             self,
@@ -34,7 +37,8 @@ class FlashClassifier(Yolov8Classifier):
             gh_proxy_url=gh_proxy_url,
             personal_proxy=personal_proxy,
             gpu=gpu,
-            keep_result_seconds=keep_result_seconds
+            keep_result_seconds=keep_result_seconds,
+            session_config=session_config
         )
 
 
@@ -398,4 +398,42 @@ class TestConditionalOperator:
         
         # 停止运行
         conditional_operator.stop_running()
-        assert conditional_operator.is_running is False
\ No newline at end of file
+        assert conditional_operator.is_running is False
+
+    def test_trigger_scene_latency(self, conditional_operator, mock_op_getter,
+                                   mock_scene_handler_getter, mock_operation_template_getter):
+        """测试状态更新后 由调度线程触发场景 并记录延迟"""
+        conditional_operator.update('scenes', [
+            {
+                'triggers': ['trigger_state'],
+                'interval': 0.1,
+                'handlers': [
+                    {
+                        'states': '[trigger_state, 0, 1]',
+                        'operations': [
+                            {'op_name': 'test_op'}
+                        ]
+                    }
+                ]
+            }
+        ])
+
+        recorder = StateRecorder('trigger_state')
+        conditional_operator.get_state_recorder = Mock(return_value=recorder)
+        conditional_operator.init(
+            mock_op_getter,
+            mock_scene_handler_getter,
+            mock_operation_template_getter
+        )
+        assert conditional_operator.start_running_async()
+        try:
+            conditional_operator.update_state(StateRecord('trigger_state', time.time()))
+            end_time = time.time() + 2
+            while 'trigger_state' not in conditional_operator.get_scene_latency() and time.time() < end_time:
+                time.sleep(0.01)
+
+            latency = conditional_operator.get_scene_latency()['trigger_state']
+            assert latency.times == 1
+            assert 0 <= latency.max < 1000
+        finally:
+            conditional_operator.stop_running()
@@ -5,6 +5,8 @@ from unittest.mock import Mock
 from one_dragon.base.conditional_operation.scene_handler import SceneHandler
 from one_dragon.base.conditional_operation.state_handler import StateHandler
 from one_dragon.base.conditional_operation.operation_task import OperationTask
+from one_dragon.base.conditional_operation.state_cal_tree import construct_state_cal_tree
+from one_dragon.base.conditional_operation.state_recorder import StateRecord, StateRecorder
 
 
 class TestSceneHandler:
@@ -126,4 +128,32 @@ class TestSceneHandler:
         
         # 验证所有状态处理器的dispose方法被调用
         mock_state_handler.dispose.assert_called_once()
-        mock_handler2.dispose.assert_called_once()
\ No newline at end of file
+        mock_handler2.dispose.assert_called_once()
+
+    def test_get_operations_with_state_index(self):
+        """测试使用状态依赖索引时 不满足的处理器只在状态更新或到期后重新计算"""
+        recorder_a = StateRecorder('a')
+        recorder_b = StateRecorder('b')
+        recorders = {'a': recorder_a, 'b': recorder_b}
+        handler_a = StateHandler('[a, 0, 1]', construct_state_cal_tree('[a, 0, 1]', recorders.get), operations=[])
+        handler_b = StateHandler('[b, 1, 2]', construct_state_cal_tree('[b, 1, 2]', recorders.get), operations=[])
+        handler = SceneHandler(interval_seconds=0.1, state_handlers=[handler_a, handler_b])
+        handler.init_state_index()
+
+        recorder_b.update_state_record(StateRecord('b', 100.0))
+        handler.on_state_updated(recorder_b)
+        assert handler.get_operations(100.0) is None
+
+        # 状态更新了 但没有通知 仍然使用缓存的结果
+        recorder_a.update_state_record(StateRecord('a', 100.0))
+        assert handler.get_operations(100.5) is None
+
+        handler.on_state_updated(recorder_a)
+        task = handler.get_operations(100.5)
+        assert task is not None
+        assert task.expr_list == ['[a, 0, 1]']
+
+        # 没有状态更新 超过 a 的区间 到达 b 的有效期后重新计算
+        task = handler.get_operations(101.5)
+        assert task is not None
+        assert task.expr_list == ['[b, 1, 2]']
@@ -279,4 +279,52 @@ class TestStateCalTree:
         )
         
         states = and_node.get_usage_states()
-        assert mock_state_recorder.state_name in states
\ No newline at end of file
+        assert mock_state_recorder.state_name in states
+
+    def test_in_time_range_flatten_chain(self):
+        """测试连续同类运算符展开后 计算结果和短路不变"""
+        recorders = {}
+        for name in ['a', 'b', 'c']:
+            recorder = StateRecorder(name)
+            recorder.last_record_time = 100.0
+            recorders[name] = recorder
+
+        node = construct_state_cal_tree('[a, 0, 1] & [b, 0, 1] & ![c, 0, 1]', recorders.get)
+        assert node.in_time_range(100.5) is False  # c 在范围内
+
+        recorders['c'].last_record_time = 50.0
+        assert node.in_time_range(100.5) is True
+
+        node = construct_state_cal_tree('[a, 2, 3] | [b, 2, 3] | [c, 0, 1]{1, 2}', recorders.get)
+        assert node.in_time_range(100.5) is False  # c 的值为空
+        recorders['c'].last_record_time = 100.0
+        recorders['c'].last_value = 2
+        assert node.in_time_range(100.5) is True
+
+    def test_in_time_range_with_expire(self, mock_state_recorder):
+        """测试带有效期的判断"""
+        node = construct_state_cal_tree('[test_state, 1, 2]', lambda state_name: mock_state_recorder)
+        mock_state_recorder.last_record_time = 100.0
+
+        result, expire = node.in_time_range_with_expire(100.5)  # 还没到区间
+        assert result is False
+        assert expire == pytest.approx(101.0, abs=0.01)
+
+        result, expire = node.in_time_range_with_expire(101.5)  # 在区间内
+        assert result is True
+        assert expire == pytest.approx(102.0, abs=0.01)
+
+        result, expire = node.in_time_range_with_expire(103.0)  # 已经超过区间
+        assert result is False
+        assert expire == float('inf')
+
+        not_node = construct_state_cal_tree('![test_state, 1, 2]', lambda state_name: mock_state_recorder)
+        result, expire = not_node.in_time_range_with_expire(101.5)
+        assert result is False
+        assert expire == pytest.approx(102.0, abs=0.01)
+
+    def test_get_usage_state_recorders(self, mock_state_recorder):
+        """测试获取使用的状态记录器 不重复"""
+        node = construct_state_cal_tree('[test_state, 0, 1] & ![test_state, 0, 1]',
+                                        lambda state_name: mock_state_recorder)
+        assert node.get_usage_state_recorders() == [mock_state_recorder]
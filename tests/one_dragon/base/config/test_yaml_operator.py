@@ -0,0 +1,124 @@
+"""yml读写测试"""
+import os
+import time
+
+import pytest
+
+from one_dragon.base.config import yaml_operator
+from one_dragon.base.config.yaml_operator import YamlOperator
+
+
+@pytest.fixture
+def disk_cache_dir(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    yaml_operator.enable_disk_cache(cache_dir)
+    yield cache_dir
+    yaml_operator.enable_disk_cache(None)
+
+
+def _write(file_path: str, text: str, mtime_ns: int) -> None:
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+
+class TestYamlOperator:
+
+    def test_save_and_load(self, tmp_path):
+        """测试保存后能读取到相同的内容"""
+        file_path = str(tmp_path / 'a.yml')
+        op = YamlOperator(file_path)
+        op.update('名称', '一条龙')
+        op.update('list', [1, 2, {'k': 'v'}])
+
+        yaml_operator.cached_yaml_data.clear()
+        op2 = YamlOperator(file_path)
+        assert op2.data == {'名称': '一条龙', 'list': [1, 2, {'k': 'v'}]}
+
+    def test_disk_cache(self, tmp_path, disk_cache_dir):
+        """测试文件没有变化时使用磁盘缓存 变化后重新解析"""
+        file_path = str(tmp_path / 'b.yml')
+        _write(file_path, 'a: 1\n', 1_000_000_000)
+        assert yaml_operator.read_cache_or_load(file_path) == {'a': 1}
+        assert len(os.listdir(disk_cache_dir)) == 1
+
+        # 模拟重新启动 内存缓存为空 读取磁盘缓存
+        yaml_operator.cached_yaml_data.clear()
+        cache_path = os.path.join(disk_cache_dir, os.listdir(disk_cache_dir)[0])
+        yaml_operator._write_disk_cache(file_path, (1_000_000_000, 5), {'a': 'from cache'})
+        assert os.path.exists(cache_path)
+        assert yaml_operator.read_cache_or_load(file_path) == {'a': 'from cache'}
+
+        # 文件修改后重新解析
+        yaml_operator.cached_yaml_data.clear()
+        _write(file_path, 'a: 2\n', 2_000_000_000)
+        assert yaml_operator.read_cache_or_load(file_path) == {'a': 2}
+
+    def test_broken_disk_cache(self, tmp_path, disk_cache_dir):
+        """测试缓存文件损坏时重新解析"""
+        file_path = str(tmp_path / 'c.yml')
+        _write(file_path, 'a: 1\n', 1_000_000_000)
+        yaml_operator.read_cache_or_load(file_path)
+
+        for name in os.listdir(disk_cache_dir):
+            with open(os.path.join(disk_cache_dir, name), 'wb') as file:
+                file.write(b'broken')
+
+        yaml_operator.cached_yaml_data.clear()
+        assert yaml_operator.read_cache_or_load(file_path) == {'a': 1}
+
+
+class TestWriteBehind:
+
+    @pytest.fixture(autouse=True)
+    def write_behind(self):
+        yaml_operator.enable_write_behind(60)
+        yield
+        yaml_operator.enable_write_behind(None)
+
+    def test_coalesce_update(self, tmp_path):
+        """测试多次修改合并 flush_all 时才写入文件"""
+        file_path = str(tmp_path / 'd.yml')
+        op = YamlOperator(file_path)
+        op.update('a', 1)
+        op.update('b', 2)
+        assert not os.path.exists(file_path)
+
+        yaml_operator.flush_all()
+        yaml_operator.cached_yaml_data.clear()
+        assert YamlOperator(file_path).data == {'a': 1, 'b': 2}
+        assert os.listdir(tmp_path) == ['d.yml']  # 没有遗留临时文件
+
+    def test_flush_by_timer(self, tmp_path):
+        """测试等待时间到后自动写入"""
+        yaml_operator.enable_write_behind(0.01)
+        file_path = str(tmp_path / 'e.yml')
+        op = YamlOperator(file_path)
+        op.update('a', 1)
+
+        for _ in range(100):
+            if os.path.exists(file_path):
+                break
+            time.sleep(0.01)
+        assert os.path.exists(file_path)
+
+    def test_save_directly(self, tmp_path):
+        """测试直接调用保存时立刻写入 不再等待"""
+        file_path = str(tmp_path / 'f.yml')
+        op = YamlOperator(file_path)
+        op.update('a', 1)
+        op.save()
+        assert os.path.exists(file_path)
+        assert len(yaml_operator._dirty_operator_map) == 0
+
+    def test_same_file_before_exists(self, tmp_path):
+        """测试文件不存在时 两个配置对象先后修改同一个文件 不丢失等待中的修改"""
+        file_path = str(tmp_path / 'g.yml')
+        a = YamlOperator(file_path)
+        a.update('a', 1)
+        b = YamlOperator(file_path)
+        b.update('b', 2)
+
+        yaml_operator.flush_all()
+        yaml_operator.cached_yaml_data.clear()
+        assert YamlOperator(file_path).data == {'a': 1, 'b': 2}
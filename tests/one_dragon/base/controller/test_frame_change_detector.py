@@ -0,0 +1,64 @@
+"""截图变化检测测试"""
+import numpy as np
+import pytest
+
+from one_dragon.base.controller.frame_change_detector import FrameChangeDetector
+from one_dragon.base.geometry.rectangle import Rect
+
+
+class TestFrameChangeDetector:
+
+    @pytest.fixture
+    def detector(self):
+        """创建 4x4 分块的检测器"""
+        return FrameChangeDetector(tile_rows=4, tile_cols=4)
+
+    @pytest.fixture
+    def frame(self):
+        return np.zeros((100, 100, 3), dtype=np.uint8)
+
+    def test_first_frame_changed(self, detector, frame):
+        """测试第一张截图认为全部变化"""
+        assert detector.update(frame)
+        assert detector.dirty_mask.all()
+
+    def test_same_frame_unchanged(self, detector, frame):
+        """测试内容一致的截图没有变化 版本号不变"""
+        detector.update(frame)
+        v1 = detector.get_version(frame)
+        frame2 = frame.copy()
+        assert not detector.update(frame2)
+        assert not detector.dirty_mask.any()
+        assert detector.get_version(frame2) == v1
+
+    def test_dirty_tile(self, detector, frame):
+        """测试只有变化的块被标记 包括不能整除的边缘部分"""
+        detector.update(frame)
+        frame2 = frame.copy()
+        frame2[30, 60, 2] = 1
+        frame2[99, 99, 0] = 1
+        assert detector.update(frame2)
+        assert np.argwhere(detector.dirty_mask).tolist() == [[1, 2], [3, 3]]
+
+    def test_rect_unchanged(self, detector, frame):
+        """测试区域从某个版本之后是否有变化"""
+        detector.update(frame)
+        v1 = detector.last_version
+        frame2 = frame.copy()
+        frame2[10, 10] = 255
+        detector.update(frame2)
+
+        assert detector.is_rect_unchanged(Rect(50, 50, 100, 100), v1)
+        assert not detector.is_rect_unchanged(Rect(0, 0, 30, 30), v1)
+        assert not detector.is_rect_unchanged(None, v1)
+        assert detector.is_rect_unchanged(None, detector.last_version)
+
+    def test_unknown_frame_version(self, detector, frame):
+        """测试只能获取最近两张截图的版本"""
+        frame2 = frame.copy()
+        frame3 = frame.copy()
+        detector.update(frame)
+        detector.update(frame2)
+        detector.update(frame3)
+        assert detector.get_version(frame) is None
+        assert detector.get_version(frame2) is not None
@@ -0,0 +1,81 @@
+"""回放控制器测试"""
+import os
+import zipfile
+
+import cv2
+import numpy as np
+import pytest
+
+from one_dragon.base.controller.replay_controller import ReplayController
+from one_dragon.base.geometry.point import Point
+
+
+def _write_frames(dir_path: str) -> list[str]:
+    """写入3帧截图 文件名带毫秒时间戳 每帧颜色不同"""
+    name_list = []
+    for idx, ms in enumerate([1700000000000, 1700000000500, 1700000001500]):
+        name = f'switch_{ms}.png'
+        image = np.full((54, 96, 3), idx * 50, dtype=np.uint8)
+        cv2.imwrite(os.path.join(dir_path, name), image)
+        name_list.append(name)
+    return name_list
+
+
+class TestReplayController:
+
+    @pytest.fixture
+    def frame_dir(self, tmp_path):
+        _write_frames(str(tmp_path))
+        return str(tmp_path)
+
+    def test_max_speed(self, frame_dir):
+        """测试极速模式每次截图取下一帧 保持录制时的时间间隔"""
+        controller = ReplayController(frame_dir, standard_width=96, standard_height=54)
+        assert controller.init_before_context_run()
+
+        t1, s1 = controller.screenshot()
+        t2, s2 = controller.screenshot()
+        t3, s3 = controller.screenshot()
+        assert (s1[0, 0, 0], s2[0, 0, 0], s3[0, 0, 0]) == (0, 50, 100)
+        assert t2 - t1 == pytest.approx(0.5)
+        assert t3 - t1 == pytest.approx(1.5)
+        assert controller.is_finished
+
+        # 播放完毕后一直返回最后一帧
+        _, s4 = controller.screenshot()
+        assert s4[0, 0, 0] == 100
+        assert not controller.frame_changed
+
+    def test_resize(self, frame_dir):
+        """测试缩放到标准分辨率"""
+        controller = ReplayController(frame_dir, standard_width=192, standard_height=108)
+        _, screen = controller.screenshot()
+        assert screen.shape == (108, 192, 3)
+
+    def test_record_action(self, frame_dir):
+        """测试点击和按键只做记录"""
+        controller = ReplayController(frame_dir, standard_width=96, standard_height=54)
+        controller.screenshot()
+        assert controller.click(Point(10, 20))
+        controller.btn_controller.tap('space')
+
+        assert [i.action_name for i in controller.action_list] == ['click', 'tap']
+        assert controller.action_list[0].params['pos'].x == 10
+        assert controller.action_list[1].params['key'] == 'space'
+        assert controller.action_list[1].frame_idx == 0
+
+    def test_zip(self, tmp_path):
+        """测试从压缩包读取截图"""
+        frame_dir = tmp_path / 'frames'
+        frame_dir.mkdir()
+        name_list = _write_frames(str(frame_dir))
+        zip_path = str(tmp_path / 'frames.zip')
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            for name in name_list:
+                zf.write(str(frame_dir / name), arcname=name)
+
+        controller = ReplayController(zip_path, standard_width=96, standard_height=54)
+        assert len(controller.frame_list) == 3
+        _, screen = controller.screenshot()
+        assert screen[0, 0, 0] == 0
+        controller.close()
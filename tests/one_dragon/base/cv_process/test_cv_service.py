@@ -0,0 +1,67 @@
+"""CV流水线服务测试 流水线和模板保存在临时目录"""
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from one_dragon.base.cv_process.cv_pipeline import CvPipeline
+from one_dragon.base.cv_process.cv_service import CvService
+from one_dragon.base.cv_process.steps import CvDilateStep, CvStepGrayscale
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch) -> CvService:
+    monkeypatch.setattr(CvService, 'PIPELINE_DIR', str(tmp_path / 'pipelines'))
+    monkeypatch.setattr(CvService, 'TEMPLATE_DIR', str(tmp_path / 'templates'))
+    return CvService(SimpleNamespace(ocr=None, template_loader=None))
+
+
+def _new_pipeline(*step_list) -> CvPipeline:
+    pipeline = CvPipeline()
+    pipeline.steps = list(step_list)
+    return pipeline
+
+
+def _touch(file_path: str, offset_ns: int) -> None:
+    """修改文件时间 避免同一时刻内写入两次 文件版本不变"""
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + offset_ns))
+
+
+class TestCvService:
+
+    def test_pipeline_cache(self, service):
+        """测试文件没有修改时复用流水线 修改后重新加载"""
+        service.save_pipeline('test', _new_pipeline(CvStepGrayscale()))
+        pipeline = service.get_pipeline('test')
+        assert [type(i) for i in pipeline.steps] == [CvStepGrayscale]
+        assert service.get_pipeline('test') is pipeline
+        assert service.load_pipeline('test') is not pipeline  # 编辑用的流水线是新的
+
+        service.save_pipeline('test', _new_pipeline(CvStepGrayscale(), CvDilateStep()))
+        _touch(os.path.join(service.PIPELINE_DIR, 'test.yml'), 1_000_000_000)
+        reloaded = service.get_pipeline('test')
+        assert reloaded is not pipeline
+        assert [type(i) for i in reloaded.steps] == [CvStepGrayscale, CvDilateStep]
+        assert service.get_pipeline('test') is reloaded
+
+        service.delete_pipeline('test')
+        assert service.get_pipeline('test') is None
+
+    def test_template_contour_cache(self, service):
+        """测试文件没有修改时复用模板轮廓 修改后重新加载"""
+        contour = np.array([[[0, 0]], [[0, 10]], [[10, 10]]], dtype=np.int32)
+        service.save_template_contour('test', contour)
+        loaded = service.load_template_contour('test')
+        np.testing.assert_array_equal(loaded, contour)
+        assert service.load_template_contour('test') is loaded
+
+        service.save_template_contour('test', contour * 2)
+        _touch(os.path.join(service.TEMPLATE_DIR, 'test.npy'), 1_000_000_000)
+        reloaded = service.load_template_contour('test')
+        np.testing.assert_array_equal(reloaded, contour * 2)
+
+        service.clear_cache()
+        assert service.load_template_contour('test') is not reloaded
+        assert service.load_template_contour('not_existed') is None
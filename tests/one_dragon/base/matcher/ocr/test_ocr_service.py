@@ -0,0 +1,142 @@
+"""OCR服务缓存测试"""
+import numpy as np
+import pytest
+from unittest.mock import Mock
+
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.base.matcher.ocr.ocr_match_result import OcrMatchResult
+from one_dragon.base.matcher.ocr.ocr_matcher import OcrMatcher
+from one_dragon.base.matcher.ocr.ocr_service import OcrService
+
+
+class TestOcrService:
+
+    @pytest.fixture
+    def ocr_matcher(self):
+        """创建模拟OCR匹配器 每次识别返回一个结果"""
+        matcher = Mock(spec=OcrMatcher)
+        matcher.ocr = Mock(side_effect=lambda *args, **kwargs: [OcrMatchResult(1, 10, 10, 20, 20, data='测试')])
+        return matcher
+
+    @pytest.fixture
+    def ocr_service(self, ocr_matcher):
+        """创建OCR服务"""
+        return OcrService(ocr_matcher=ocr_matcher, max_cache_size=2)
+
+    def test_same_content_hit(self, ocr_service, ocr_matcher):
+        """测试内容一致的不同图片对象命中缓存"""
+        image1 = np.zeros((50, 50, 3), dtype=np.uint8)
+        image2 = image1.copy()
+
+        r1 = ocr_service.get_ocr_result_list(image1)
+        r2 = ocr_service.get_ocr_result_list(image2)
+
+        assert ocr_matcher.ocr.call_count == 1
+        assert r1 is r2
+        stats = ocr_service.get_cache_stats()
+        assert stats.hit_count == 1
+        assert stats.miss_count == 1
+        assert stats.hit_rate == 0.5
+
+    def test_different_content_miss(self, ocr_service, ocr_matcher):
+        """测试内容不同的图片不命中缓存"""
+        image1 = np.zeros((50, 50, 3), dtype=np.uint8)
+        image2 = image1.copy()
+        image2[0, 0, 0] = 1
+
+        ocr_service.get_ocr_result_list(image1)
+        ocr_service.get_ocr_result_list(image2)
+
+        assert ocr_matcher.ocr.call_count == 2
+
+    def test_color_range_in_key(self, ocr_service, ocr_matcher):
+        """测试颜色范围不同时分别缓存"""
+        image = np.zeros((50, 50, 3), dtype=np.uint8)
+
+        ocr_service.get_ocr_result_list(image)
+        ocr_service.get_ocr_result_list(image, color_range=[[0, 0, 0], [255, 255, 255]])
+        ocr_service.get_ocr_result_list(image, color_range=[[0, 0, 0], [255, 255, 255]])
+
+        assert ocr_matcher.ocr.call_count == 2
+
+    def test_rect_filter_share_cache(self, ocr_service, ocr_matcher):
+        """测试不同区域共享同一张图的识别结果"""
+        image = np.zeros((50, 50, 3), dtype=np.uint8)
+
+        in_area = ocr_service.get_ocr_result_list(image, rect=Rect(0, 0, 40, 40))
+        out_area = ocr_service.get_ocr_result_list(image, rect=Rect(40, 40, 50, 50))
+
+        assert ocr_matcher.ocr.call_count == 1
+        assert len(in_area) == 1
+        assert len(out_area) == 0
+
+    def test_lru_evict_by_size(self, ocr_service, ocr_matcher):
+        """测试按条目数淘汰最久未使用的缓存"""
+        images = [np.full((10, 10, 3), i, dtype=np.uint8) for i in range(3)]
+
+        ocr_service.get_ocr_result_list(images[0])
+        ocr_service.get_ocr_result_list(images[1])
+        ocr_service.get_ocr_result_list(images[0])  # 更新为最近使用
+        ocr_service.get_ocr_result_list(images[2])  # 淘汰 images[1]
+
+        assert ocr_service.get_cache_stats().entry_count == 2
+        ocr_service.get_ocr_result_list(images[0])
+        assert ocr_matcher.ocr.call_count == 3
+        ocr_service.get_ocr_result_list(images[1])
+        assert ocr_matcher.ocr.call_count == 4
+
+    def test_evict_by_memory(self, ocr_matcher):
+        """测试按内存淘汰缓存"""
+        ocr_service = OcrService(ocr_matcher=ocr_matcher, max_cache_size=10, max_cache_memory=1)
+
+        ocr_service.get_ocr_result_list(np.zeros((10, 10, 3), dtype=np.uint8))
+
+        stats = ocr_service.get_cache_stats()
+        assert stats.entry_count == 0
+        assert stats.memory_size == 0
+
+    def test_clear_cache(self, ocr_service, ocr_matcher):
+        """测试清空缓存"""
+        image = np.zeros((50, 50, 3), dtype=np.uint8)
+        ocr_service.get_ocr_result_list(image)
+        ocr_service.clear_cache()
+        ocr_service.get_ocr_result_list(image)
+
+        assert ocr_matcher.ocr.call_count == 2
+
+    def test_area_mode_offset(self, ocr_service, ocr_matcher):
+        """测试区域模式只识别区域 结果为全图坐标"""
+        image = np.zeros((100, 100, 3), dtype=np.uint8)
+
+        result_list = ocr_service.get_ocr_result_list(image, rect=Rect(30, 40, 80, 90), crop_first=True)
+
+        called_image = ocr_matcher.ocr.call_args[0][0]
+        assert called_image.shape == (50, 50, 3)
+        assert result_list[0].x == 40
+        assert result_list[0].y == 50
+
+    def test_area_mode_ignore_outside_change(self, ocr_service, ocr_matcher):
+        """测试区域模式下 区域外的画面变化不影响缓存命中"""
+        image1 = np.zeros((100, 100, 3), dtype=np.uint8)
+        image2 = image1.copy()
+        image2[0:10, 0:10] = 255
+        rect = Rect(30, 40, 80, 90)
+
+        ocr_service.get_area_ocr_result_list(image1, rect)
+        ocr_service.get_area_ocr_result_list(image2, rect)
+
+        assert ocr_matcher.ocr.call_count == 1
+
+    def test_prefetch_merge_rects(self, ocr_matcher):
+        """测试预先识别时 相交区域只识别一次"""
+        ocr_service = OcrService(ocr_matcher=ocr_matcher)
+        image = np.zeros((100, 100, 3), dtype=np.uint8)
+        rect_list = [Rect(0, 0, 40, 40), Rect(20, 20, 60, 60), Rect(80, 80, 100, 100)]
+
+        ocr_service.prefetch_area_ocr_result(image, rect_list)
+        assert ocr_matcher.ocr.call_count == 2
+
+        for rect in rect_list:
+            ocr_service.get_area_ocr_result_list(image, rect)
+        assert ocr_matcher.ocr.call_count == 2
+        assert ocr_service.get_cache_stats().hit_count == 3
@@ -0,0 +1,49 @@
+"""批量模板匹配测试"""
+import cv2
+import numpy as np
+import pytest
+
+from one_dragon.base.matcher.batch_template_matcher import SourceSpectrum, TemplateGroup
+
+
+class TestBatchTemplateMatcher:
+
+    @pytest.fixture
+    def rng(self):
+        return np.random.default_rng(0)
+
+    @pytest.mark.parametrize('channel', [1, 3])
+    @pytest.mark.parametrize('use_mask', [False, True])
+    def test_same_as_cv2(self, rng, channel, use_mask):
+        """测试结果与 cv2.matchTemplate 的 TM_CCOEFF_NORMED 一致"""
+        shape = (20, 30) if channel == 1 else (20, 30, channel)
+        template_list = [rng.integers(0, 255, shape, dtype=np.uint8) for _ in range(4)]
+        mask = None
+        if use_mask:
+            mask = np.zeros((20, 30), dtype=np.uint8)
+            mask[3:17, 5:25] = 255
+
+        source_shape = (45, 60) if channel == 1 else (45, 60, channel)
+        source = rng.integers(0, 255, source_shape, dtype=np.uint8)
+        source[10:30, 20:50] = template_list[2]
+
+        spectrum = SourceSpectrum(source)
+        group = TemplateGroup(list(range(4)), template_list, mask, spectrum.fft_shape)
+        result = group.match(spectrum)
+
+        for idx, template in enumerate(template_list):
+            expected = cv2.matchTemplate(source, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+            np.testing.assert_allclose(result[idx], expected, atol=1e-4)
+
+        best_idx, y, x = np.unravel_index(np.nanargmax(result), result.shape)
+        assert (best_idx, y, x) == (2, 10, 20)
+
+    def test_flat_source(self):
+        """测试纯色原图无法计算时返回nan"""
+        template_list = [np.full((5, 5), i * 10, dtype=np.uint8) + np.eye(5, dtype=np.uint8) for i in range(2)]
+        source = np.zeros((10, 10), dtype=np.uint8)
+
+        spectrum = SourceSpectrum(source)
+        group = TemplateGroup([0, 1], template_list, None, spectrum.fft_shape)
+
+        assert np.all(np.isnan(group.match(spectrum)))
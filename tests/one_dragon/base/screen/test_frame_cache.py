@@ -0,0 +1,98 @@
+"""单帧缓存测试"""
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.base.screen.frame_cache import FrameCache
+from one_dragon.utils import cv2_utils
+
+
+def _new_screen() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(108, 192, 3), dtype=np.uint8)
+
+
+class TestFrameCache:
+
+    def test_compute_once(self):
+        """测试相同的key只计算一次"""
+        frame_cache = FrameCache(_new_screen())
+        rect = Rect(10, 10, 50, 30)
+
+        gray1 = frame_cache.gray(rect)
+        gray2 = frame_cache.gray(rect)
+        assert gray1 is gray2
+        np.testing.assert_array_equal(
+            gray1, cv2.cvtColor(cv2_utils.crop_image_only(frame_cache.screen, rect), cv2.COLOR_RGB2GRAY))
+
+        stats = frame_cache.get_stats()
+        assert stats.hit_count == 1
+        assert stats.miss_count == 2  # 裁剪 + 灰度图
+
+    def test_result_read_only(self):
+        """测试共享的结果不能修改"""
+        frame_cache = FrameCache(_new_screen())
+        hsv = frame_cache.hsv(Rect(0, 0, 20, 20))
+        with pytest.raises(ValueError):
+            hsv[0, 0, 0] = 0
+
+    def test_color_mask(self):
+        """测试颜色过滤结果与直接计算一致 并复用HSV图"""
+        screen = _new_screen()
+        frame_cache = FrameCache(screen)
+        rect = Rect(20, 20, 100, 60)
+        part = cv2_utils.crop_image_only(screen, rect)
+
+        hsv_mask = frame_cache.color_mask(rect, 'hsv', hsv_color=(170, 100, 100), hsv_diff=(20, 100, 100))
+        np.testing.assert_array_equal(
+            hsv_mask, cv2_utils.filter_by_color(part, 'hsv', hsv_color=(170, 100, 100), hsv_diff=(20, 100, 100)))
+        assert frame_cache.hsv(rect) is frame_cache.hsv(rect)
+
+        rgb_mask = frame_cache.color_mask(rect, 'rgb', lower_rgb=[0, 0, 0], upper_rgb=[128, 128, 128])
+        np.testing.assert_array_equal(
+            rgb_mask, cv2_utils.filter_by_color(part, 'rgb', lower_rgb=[0, 0, 0], upper_rgb=[128, 128, 128]))
+
+        mask = np.zeros((40, 80), dtype=np.uint8)
+        mask[10:30, 10:70] = 255
+        masked = frame_cache.color_mask(rect, 'rgb', lower_rgb=[0, 0, 0], upper_rgb=[128, 128, 128],
+                                        mask=mask, mask_key='m')
+        to_check = cv2.bitwise_and(part, part, mask=mask)
+        np.testing.assert_array_equal(
+            masked, cv2_utils.filter_by_color(to_check, 'rgb', lower_rgb=[0, 0, 0], upper_rgb=[128, 128, 128]))
+
+    def test_concurrent(self):
+        """测试多线程同时获取时只计算一次"""
+        frame_cache = FrameCache(_new_screen())
+        compute_cnt = [0]
+        start = threading.Event()
+
+        def _compute():
+            compute_cnt[0] += 1
+            start.wait(1)
+            return 1
+
+        result_list = []
+        thread_list = [threading.Thread(target=lambda: result_list.append(frame_cache.get('k', _compute)))
+                       for _ in range(4)]
+        for t in thread_list:
+            t.start()
+        start.set()
+        for t in thread_list:
+            t.join()
+
+        assert compute_cnt[0] == 1
+        assert result_list == [1, 1, 1, 1]
+
+    def test_error_not_cached(self):
+        """测试计算出错时不缓存"""
+        frame_cache = FrameCache(_new_screen())
+
+        def _error():
+            raise RuntimeError('error')
+
+        with pytest.raises(RuntimeError):
+            frame_cache.get('k', _error)
+        assert frame_cache.get('k', lambda: 2) == 2
@@ -0,0 +1,130 @@
+"""画面识别索引测试"""
+import numpy as np
+
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.base.screen.screen_area import ScreenArea
+from one_dragon.base.screen.screen_info import ScreenInfo
+from one_dragon.base.screen.screen_match_index import (
+    ScreenMatchIndex,
+    ScreenAreaResultMemo,
+    get_area_match_key,
+)
+
+
+def _new_screen(screen_name: str, area_list: list[ScreenArea]) -> ScreenInfo:
+    screen_info = ScreenInfo(create_new=True)
+    screen_info.screen_name = screen_name
+    screen_info.area_list = area_list
+    return screen_info
+
+
+class TestScreenMatchIndex:
+
+    def test_template_area_first(self):
+        """测试标识区域按耗时排序 模板在前 OCR按面积从小到大"""
+        big_text = ScreenArea(area_name='大文本', pc_rect=Rect(0, 0, 500, 100), text='大', id_mark=True)
+        small_text = ScreenArea(area_name='小文本', pc_rect=Rect(0, 0, 50, 50), text='小', id_mark=True)
+        template = ScreenArea(area_name='模板', pc_rect=Rect(0, 0, 500, 500), text='',
+                              template_sub_dir='menu', template_id='back', id_mark=True)
+        not_mark = ScreenArea(area_name='按钮', pc_rect=Rect(0, 0, 10, 10), text='按钮')
+        screen_info = _new_screen('菜单', [big_text, small_text, template, not_mark])
+
+        index = ScreenMatchIndex([screen_info])
+        area_list = [area for _, area in index.get_id_mark_area_list(screen_info)]
+        assert area_list == [template, small_text, big_text]
+
+    def test_shared_area(self):
+        """测试不同画面中配置相同的区域 使用同一个标识"""
+        area_1 = ScreenArea(area_name='返回', pc_rect=Rect(0, 0, 50, 50), text='返回', id_mark=True)
+        area_2 = ScreenArea(area_name='返回按钮', pc_rect=Rect(0, 0, 50, 50), text='返回', id_mark=True)
+        area_3 = ScreenArea(area_name='返回', pc_rect=Rect(0, 0, 50, 50), text='确认', id_mark=True)
+        screen_1 = _new_screen('画面1', [area_1])
+        screen_2 = _new_screen('画面2', [area_2, area_3])
+
+        index = ScreenMatchIndex([screen_1, screen_2])
+        key = get_area_match_key(area_1)
+        assert key == get_area_match_key(area_2)
+        assert key != get_area_match_key(area_3)
+        assert [i for i, _ in index.get_id_mark_area_list(screen_1)] == [key]
+        assert key in [i for i, _ in index.get_id_mark_area_list(screen_2)]
+
+    def test_screen_not_in_index(self):
+        """测试不在索引中的画面 会重新整理标识区域"""
+        area = ScreenArea(area_name='标题', pc_rect=Rect(0, 0, 50, 50), text='标题', id_mark=True)
+        index = ScreenMatchIndex([_new_screen('画面', [])])
+        edited = _new_screen('画面', [area])
+        assert [i for _, i in index.get_id_mark_area_list(edited)] == [area]
+
+    def test_match_screen_same_as_sequential(self):
+        """测试跨画面识别的结果 与按顺序逐个判断一致 并且识别的区域更少"""
+        text_list = ['返回', '确认', '菜单', '商店', '背包', '任务']
+        area_list = [ScreenArea(area_name=t, pc_rect=Rect(0, 0, 50, 50), text=t, id_mark=True) for t in text_list]
+        screen_list = [
+            _new_screen('画面%d' % i, [area_list[i % 6], area_list[(i * 7 + 1) % 6]])
+            for i in range(12)
+        ] + [_new_screen('没有标识', [])]
+        index = ScreenMatchIndex(screen_list)
+
+        for mask in range(1 << len(text_list)):
+            found_text = {t for i, t in enumerate(text_list) if mask & (1 << i)}
+
+            expected = None
+            for screen_info in screen_list:
+                id_mark_area_list = index.get_id_mark_area_list(screen_info)
+                if len(id_mark_area_list) > 0 and all(area.text in found_text for _, area in id_mark_area_list):
+                    expected = screen_info
+                    break
+
+            find_list = []
+
+            def find_area(area: ScreenArea) -> bool:
+                find_list.append(area.text)
+                return area.text in found_text
+
+            assert index.match_screen(screen_list, {}, find_area) is expected
+            assert len(find_list) == len(set(find_list))  # 每个区域只识别一次
+            assert len(find_list) <= len(text_list)
+
+    def test_match_screen_split(self):
+        """测试优先识别模板区域 同类区域中优先识别能把候选画面对半分的区域"""
+        common = ScreenArea(area_name='共用', pc_rect=Rect(0, 0, 50, 50), text='共用', id_mark=True)
+        half = ScreenArea(area_name='一半', pc_rect=Rect(0, 0, 50, 50), text='一半', id_mark=True)
+        template = ScreenArea(area_name='模板', pc_rect=Rect(0, 0, 500, 500), text='',
+                              template_sub_dir='menu', template_id='back', id_mark=True)
+        screen_list = [
+            _new_screen('画面1', [common, half]),
+            _new_screen('画面2', [common, half]),
+            _new_screen('画面3', [common, template]),
+            _new_screen('画面4', [common]),
+        ]
+        index = ScreenMatchIndex(screen_list)
+
+        find_list = []
+
+        def find_area(area: ScreenArea) -> bool:
+            find_list.append(area.area_name)
+            return area.area_name != '一半'
+
+        area_result_map = {}
+        assert index.match_screen(screen_list, area_result_map, find_area) is screen_list[2]
+        assert find_list == ['模板', '一半', '共用']
+        assert area_result_map[get_area_match_key(half)] is False
+
+        # 已有的识别结果直接使用
+        find_list.clear()
+        assert index.match_screen(screen_list, area_result_map, find_area) is screen_list[2]
+        assert find_list == []
+
+
+class TestScreenAreaResultMemo:
+
+    def test_reset_on_new_screen(self):
+        """测试截图更换后 识别结果清空"""
+        memo = ScreenAreaResultMemo()
+        screen_1 = np.zeros((10, 10, 3), dtype=np.uint8)
+        screen_2 = screen_1.copy()
+
+        memo.get_result_map(screen_1)['a'] = True
+        assert memo.get_result_map(screen_1) == {'a': True}
+        assert memo.get_result_map(screen_2) == {}
+        assert memo.get_result_map(screen_1) == {}
@@ -0,0 +1,80 @@
+"""画面路径测试"""
+import pytest
+
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.base.screen.screen_area import ScreenArea
+from one_dragon.base.screen.screen_info import ScreenInfo
+from one_dragon.base.screen.screen_loader import ScreenContext
+
+
+def _new_screen(screen_name: str, goto_map: dict[str, list[str]]) -> ScreenInfo:
+    """
+    :param screen_name: 画面名称
+    :param goto_map: key=区域名称 value=跳转的画面
+    """
+    screen_info = ScreenInfo(create_new=True)
+    screen_info.screen_name = screen_name
+    screen_info.area_list = [
+        ScreenArea(area_name=area_name, pc_rect=Rect(0, 0, 10, 10), text=area_name, goto_list=goto_list)
+        for area_name, goto_list in goto_map.items()
+    ]
+    return screen_info
+
+
+def _load(ctx: ScreenContext, screen_list: list[ScreenInfo]) -> None:
+    ctx.screen_info_list = screen_list
+    ctx.screen_info_map = {i.screen_name: i for i in screen_list}
+    ctx.init_screen_route()
+
+
+class TestScreenRoute:
+
+    @pytest.fixture
+    def ctx(self, monkeypatch):
+        """不读取画面文件 由测试自行设置画面"""
+        monkeypatch.setattr(ScreenContext, 'load_all', lambda self: None)
+        ctx = ScreenContext()
+        _load(ctx, [
+            _new_screen('A', {'去B': ['B'], '去C': ['C']}),
+            _new_screen('B', {'去D': ['D']}),
+            _new_screen('C', {'去D': ['D']}),
+            _new_screen('D', {'返回': ['A']}),
+            _new_screen('E', {}),
+        ])
+        return ctx
+
+    def test_shortest_route(self, ctx):
+        """测试最短路径 步数相同时使用靠前的区域"""
+        route = ctx.get_screen_route('A', 'D')
+        assert route.can_go
+        assert [(i.from_screen, i.from_area, i.to_screen) for i in route.node_list] == [
+            ('A', '去B', 'B'), ('B', '去D', 'D')
+        ]
+        assert [i.to_screen for i in ctx.get_screen_route('B', 'C').node_list] == ['D', 'A', 'C']
+
+    def test_cannot_go(self, ctx):
+        """测试无法到达和画面不存在"""
+        assert not ctx.get_screen_route('A', 'E').can_go
+        assert not ctx.get_screen_route('A', 'A').can_go
+        assert ctx.get_screen_route('A', '不存在') is None
+        assert ctx.get_screen_route('不存在', 'A') is None
+
+    def test_edge_weight(self, ctx):
+        """测试设置跳转耗时后 选择总耗时最少的路径"""
+        ctx.get_screen_route('A', 'D')
+        ctx.set_screen_route_weight('A', '去B', 'B', 5)
+        assert [i.from_area for i in ctx.get_screen_route('A', 'D').node_list] == ['去C', '去D']
+        ctx.set_screen_route_weight('A', '去B', 'B', None)
+        assert [i.from_area for i in ctx.get_screen_route('A', 'D').node_list] == ['去B', '去D']
+
+    def test_invalidate_changed_screen(self, ctx):
+        """测试只有跳转关系变化的画面会清除相关缓存"""
+        ctx.get_screen_route('A', 'D')
+        ctx.get_screen_route('E', 'A')
+        screen_list = list(ctx.screen_info_list)
+        screen_list[1] = _new_screen('B', {'去E': ['E']})
+        _load(ctx, screen_list)
+
+        assert 'A' not in ctx._screen_route_cache
+        assert 'E' in ctx._screen_route_cache
+        assert [i.to_screen for i in ctx.get_screen_route('A', 'E').node_list] == ['B', 'E']
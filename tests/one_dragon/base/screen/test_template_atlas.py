@@ -0,0 +1,77 @@
+"""模板图集测试 使用仓库中的模板"""
+import os
+
+import numpy as np
+import pytest
+
+from one_dragon.base.screen import template_atlas
+from one_dragon.base.screen.template_atlas import TemplateAtlas, build_template_atlas
+from one_dragon.base.screen.template_info import TemplateInfo, get_template_raw_path, get_template_sub_dir_path
+from one_dragon.base.screen.template_loader import TemplateLoader
+
+_SUB_DIR = 'menu'
+
+
+def _template_id_list() -> list[str]:
+    sub_dir_path = get_template_sub_dir_path(_SUB_DIR)
+    return sorted(i for i in os.listdir(sub_dir_path) if os.path.isdir(os.path.join(sub_dir_path, i)))
+
+
+@pytest.fixture
+def atlas_path(tmp_path) -> str:
+    file_path = str(tmp_path / 'template_atlas.bin')
+    assert build_template_atlas(file_path, sub_dirs=[_SUB_DIR]) == len(_template_id_list())
+    return file_path
+
+
+class TestTemplateAtlas:
+
+    def test_same_as_disk(self, atlas_path):
+        """测试图集中的模板与从硬盘读取的一致"""
+        atlas = TemplateAtlas.load(atlas_path)
+        assert atlas is not None
+        for template_id in _template_id_list():
+            expected = TemplateInfo(_SUB_DIR, template_id)
+            actual = atlas.get_template(_SUB_DIR, template_id)
+            assert actual is not None
+            assert actual.data == expected.data
+            assert [(p.x, p.y) for p in actual.point_list] == [(p.x, p.y) for p in expected.point_list]
+            for image_type in ['raw', 'mask', 'gray']:
+                expected_image = expected.get_image(image_type)
+                actual_image = actual.get_image(image_type)
+                if expected_image is None:
+                    assert actual_image is None
+                else:
+                    np.testing.assert_array_equal(actual_image, expected_image)
+
+    def test_source_changed(self, atlas_path, monkeypatch):
+        """测试源文件改变后 不再从图集读取"""
+        template_id = _template_id_list()[0]
+        raw_path = get_template_raw_path(_SUB_DIR, template_id)
+        get_file_version = template_atlas._get_file_version
+        monkeypatch.setattr(template_atlas, '_get_file_version',
+                            lambda file_path: (0, 0) if file_path == raw_path else get_file_version(file_path))
+
+        atlas = TemplateAtlas.load(atlas_path)
+        assert atlas.get_template(_SUB_DIR, template_id) is None
+        assert atlas.get_template(_SUB_DIR, _template_id_list()[1]) is not None
+
+    def test_invalid_file(self, tmp_path):
+        """测试图集文件不存在或格式不对时 不使用图集"""
+        assert TemplateAtlas.load(str(tmp_path / 'not_existed.bin')) is None
+        file_path = tmp_path / 'broken.bin'
+        file_path.write_bytes(b'broken')
+        assert TemplateAtlas.load(str(file_path)) is None
+
+
+class TestTemplateLoader:
+
+    def test_prewarm(self, atlas_path):
+        """测试后台预热后 模板已经在内存中 并且来自图集"""
+        loader = TemplateLoader(atlas_path=atlas_path)
+        assert loader.prewarm([_SUB_DIR]).result(10) == len(_template_id_list())
+        for template_id in _template_id_list():
+            template = loader.template['%s:%s' % (_SUB_DIR, template_id)]
+            assert loader.get_template(_SUB_DIR, template_id) is template
+            if template.raw is not None:
+                assert isinstance(template.raw.base, np.memmap) or isinstance(template.raw, np.memmap)
@@ -0,0 +1,134 @@
+"""调度器测试"""
+import threading
+import time
+
+import pytest
+
+from one_dragon.thread.deadline_scheduler import DeadlineScheduler, VirtualDeadlineScheduler
+
+
+class TestDeadlineScheduler:
+
+    @pytest.fixture
+    def scheduler(self):
+        scheduler = DeadlineScheduler('test_scheduler')
+        scheduler.start()
+        yield scheduler
+        scheduler.stop()
+
+    def test_run_by_deadline(self, scheduler):
+        """测试按执行时间的先后执行 返回值安排下一次执行"""
+        run_list = []
+        done = threading.Event()
+
+        def _callback(name: str, times: int):
+            def _run(now: float):
+                run_list.append(name)
+                if len(run_list) >= times:
+                    done.set()
+                    return None
+                return now + 0.01 if name == 'a' else None
+            return _run
+
+        now = time.time()
+        scheduler.add_job('b', _callback('b', 3), now + 0.05)
+        scheduler.add_job('a', _callback('a', 3), now + 0.02)
+
+        assert done.wait(1)
+        assert run_list[:3] == ['a', 'a', 'a']
+
+    def test_wake(self, scheduler):
+        """测试等待中的任务 被唤醒后马上执行"""
+        event = threading.Event()
+        run_times = []
+
+        def _run(now: float):
+            run_times.append(now)
+            event.set()
+            return None
+
+        job = scheduler.add_job('wait', _run)
+        time.sleep(0.05)
+        assert len(run_times) == 0
+
+        wake_time = time.time()
+        scheduler.wake(job)
+        assert event.wait(1)
+        assert run_times[0] - wake_time < 0.05
+
+    def test_wake_during_run(self, scheduler):
+        """测试执行期间被唤醒 执行完之后会再执行一次"""
+        first_started = threading.Event()
+        release = threading.Event()
+        second_done = threading.Event()
+        run_cnt = []
+
+        def _run(now: float):
+            run_cnt.append(now)
+            if len(run_cnt) == 1:
+                first_started.set()
+                release.wait(1)
+            else:
+                second_done.set()
+            return None
+
+        job = scheduler.add_job('wait', _run, time.time())
+        assert first_started.wait(1)
+        scheduler.wake(job)
+        release.set()
+        assert second_done.wait(1)
+
+    def test_stop(self):
+        """测试停止后不再执行 可以重新启动"""
+        scheduler = DeadlineScheduler('test_scheduler')
+        assert scheduler.start()
+        assert not scheduler.start()
+
+        run_cnt = []
+        job = scheduler.add_job('job', lambda now: run_cnt.append(now), time.time() + 0.05)
+        scheduler.stop()
+        scheduler.wake(job)
+        time.sleep(0.1)
+        assert run_cnt == []
+
+        assert scheduler.start()
+        event = threading.Event()
+        scheduler.add_job('job', lambda now: event.set(), time.time())
+        assert event.wait(1)
+        scheduler.stop()
+
+
+class TestVirtualDeadlineScheduler:
+
+    def test_run_until(self):
+        """测试虚拟时钟按执行时间跳转 唤醒在当前虚拟时间执行"""
+        scheduler = VirtualDeadlineScheduler('test_virtual', start_time=100)
+        assert scheduler.start()
+        run_list = []
+
+        def _run_a(now: float):
+            run_list.append(('a', now))
+            if now == 100.5:
+                scheduler.wake(job_b)
+            return now + 0.5 if now <= 101 else None
+
+        def _run_b(now: float):
+            run_list.append(('b', now))
+            return None
+
+        scheduler.add_job('a', _run_a, 100)
+        job_b = scheduler.add_job('b', _run_b)
+        scheduler.run_until(102)
+
+        assert run_list == [('a', 100), ('a', 100.5), ('b', 100.5), ('a', 101), ('a', 101.5)]
+        assert scheduler.now() == 102
+        scheduler.stop()
+
+    def test_too_many_jobs_in_instant(self):
+        """测试任务在同一时刻互相唤醒时 报错而不是死循环"""
+        scheduler = VirtualDeadlineScheduler('test_virtual', max_jobs_per_instant=10)
+        scheduler.start()
+        scheduler.add_job('a', lambda now: now, 0)
+        with pytest.raises(RuntimeError):
+            scheduler.run_until(1)
+        scheduler.stop()
@@ -0,0 +1,48 @@
+"""cv2工具测试"""
+import cv2
+import numpy as np
+import pytest
+
+from one_dragon.utils import cv2_utils
+
+
+class TestMatchTemplate:
+
+    @pytest.fixture
+    def source(self):
+        """创建平滑的随机原图 并在两个位置放入相同的图案"""
+        rng = np.random.default_rng(0)
+        img = cv2.GaussianBlur(rng.integers(0, 255, (300, 400, 3), dtype=np.uint8), (5, 5), 0)
+        img[200:240, 300:350] = img[50:90, 60:110]
+        return img
+
+    @pytest.fixture
+    def template(self, source):
+        return source[50:90, 60:110].copy()
+
+    def test_only_best(self, source, template):
+        """测试只返回最好的结果"""
+        mrl = cv2_utils.match_template(source, template, 0.9)
+        assert len(mrl) == 1
+        assert (mrl.max.x, mrl.max.y) == (60, 50)
+
+    def test_multi_result_merged(self, source, template):
+        """测试多个结果时 相邻位置被合并 按从上到下排序"""
+        mrl = cv2_utils.match_template(source, template, 0.5, only_best=False)
+        assert [(mr.x, mr.y) for mr in mrl] == [(60, 50), (300, 200)]
+        assert mrl.max.confidence == pytest.approx(1, abs=1e-4)
+
+    def test_no_result(self, source):
+        """测试没有达到阈值的结果"""
+        template = np.zeros((20, 20, 3), dtype=np.uint8)
+        template[5:15, 5:15] = 255
+        mrl = cv2_utils.match_template(source, template, 0.99, only_best=False, ignore_inf=True)
+        assert len(mrl) == 0
+        assert mrl.max is None
+
+    @pytest.mark.parametrize('only_best', [True, False])
+    def test_pyramid_same_as_full(self, source, template, only_best):
+        """测试金字塔匹配与全尺寸匹配结果一致"""
+        full = cv2_utils.match_template(source, template, 0.9, only_best=only_best)
+        pyramid = cv2_utils.match_template(source, template, 0.9, only_best=only_best, pyramid_level=1)
+        assert [(mr.x, mr.y) for mr in pyramid] == [(mr.x, mr.y) for mr in full]
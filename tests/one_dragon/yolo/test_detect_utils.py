@@ -0,0 +1,56 @@
+"""检测结果后处理测试"""
+import numpy as np
+
+from one_dragon.yolo.detect_utils import compute_iou, multiclass_nms, nms
+
+
+def _nms_by_loop(boxes, scores, iou_threshold):
+    """逐个框计算IoU的实现 作为对照"""
+    sorted_indices = np.argsort(scores)[::-1]
+    keep_boxes = []
+    while sorted_indices.size > 0:
+        box_id = sorted_indices[0]
+        keep_boxes.append(int(box_id))
+        ious = compute_iou(boxes[box_id, :], boxes[sorted_indices[1:], :])
+        sorted_indices = sorted_indices[np.where(ious < iou_threshold)[0] + 1]
+    return keep_boxes
+
+
+def _random_boxes(rng, n: int):
+    xy = rng.uniform(0, 1900, (n, 2)).astype(np.float32)
+    wh = rng.uniform(5, 300, (n, 2)).astype(np.float32)
+    boxes = np.hstack([xy, xy + wh])
+    scores = rng.uniform(0.5, 1, n).astype(np.float32)
+    class_ids = rng.integers(0, 5, n)
+    return boxes, scores, class_ids
+
+
+class TestNms:
+
+    def test_nms(self):
+        """测试与逐个框计算的结果一致"""
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            boxes, scores, _ = _random_boxes(rng, int(rng.integers(0, 80)))
+            assert [int(i) for i in nms(boxes, scores, 0.5)] == _nms_by_loop(boxes, scores, 0.5)
+
+    def test_multiclass_nms(self):
+        """测试与逐个类别处理的结果一致 包括顺序"""
+        rng = np.random.default_rng(1)
+        for _ in range(50):
+            boxes, scores, class_ids = _random_boxes(rng, int(rng.integers(0, 80)))
+
+            expected = []
+            for class_id in np.unique(class_ids):
+                class_indices = np.where(class_ids == class_id)[0]
+                class_keep = _nms_by_loop(boxes[class_indices], scores[class_indices], 0.5)
+                expected.extend(int(i) for i in class_indices[class_keep])
+
+            assert multiclass_nms(boxes, scores, class_ids, 0.5) == expected
+
+    def test_overlap_between_class(self):
+        """测试不同类别的框重叠时不会互相抑制"""
+        boxes = np.array([[0, 0, 10, 10], [0, 0, 10, 10], [1, 1, 10, 10]], dtype=np.float32)
+        scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+        class_ids = np.array([0, 1, 0])
+        assert multiclass_nms(boxes, scores, class_ids, 0.5) == [0, 1]
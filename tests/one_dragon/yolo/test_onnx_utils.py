@@ -0,0 +1,29 @@
+"""模型输入预处理测试"""
+import numpy as np
+
+from one_dragon.yolo.onnx_utils import InputImageBuffer, scale_input_image_u
+
+
+class TestInputImageBuffer:
+
+    def test_same_as_scale_input_image(self):
+        """测试写入缓冲区的结果与原来的预处理一致 包括缩放尺寸变化后的填充"""
+        rng = np.random.default_rng(0)
+        input_buffer = InputImageBuffer(640, 640)
+        for shape in [(1080, 1920, 3), (640, 640, 3), (300, 200, 3), (1080, 1920, 3)]:
+            image = rng.integers(0, 256, size=shape, dtype=np.uint8)
+            expected, expected_height, expected_width = scale_input_image_u(image, 640, 640)
+            tensor, scale_height, scale_width = input_buffer.fill(image)
+
+            assert (scale_height, scale_width) == (expected_height, expected_width)
+            assert tensor.dtype == np.float32
+            np.testing.assert_allclose(tensor, expected, rtol=0, atol=1e-7)
+
+    def test_reuse_buffer(self):
+        """测试每次返回同一个张量"""
+        input_buffer = InputImageBuffer(64, 32)
+        image = np.zeros((100, 100, 3), dtype=np.uint8)
+        tensor1, _, _ = input_buffer.fill(image)
+        tensor2, _, _ = input_buffer.fill(image)
+        assert tensor1 is tensor2
+        assert tensor1.shape == (1, 3, 32, 64)
@@ -0,0 +1,51 @@
+"""识别结果历史记录测试"""
+from one_dragon.yolo.detect_utils import DetectFrameResult
+from one_dragon.yolo.run_result_history import RunResultHistory
+from one_dragon.yolo.yolov8_onnx_cls import ClassificationResult
+
+
+def _new_result(run_time: float) -> DetectFrameResult:
+    return DetectFrameResult(raw_image=None, results=[], run_time=run_time)
+
+
+class TestRunResultHistory:
+
+    def test_keep_seconds(self):
+        """测试只保留时间范围内的结果"""
+        history = RunResultHistory(keep_seconds=2)
+        for i in range(10):
+            history.append(_new_result(i * 0.5))
+
+        assert [i.run_time for i in history] == [2.5, 3, 3.5, 4, 4.5]
+        assert history.last.run_time == 4.5
+
+    def test_max_size(self):
+        """测试超出数量后丢弃最早的结果"""
+        history = RunResultHistory(keep_seconds=100, max_size=3)
+        for i in range(10):
+            history.append(_new_result(i))
+
+        assert len(history) == 3
+        assert [i.run_time for i in history] == [7, 8, 9]
+
+    def test_window(self):
+        """测试按时间范围查询"""
+        history = RunResultHistory(keep_seconds=10)
+        assert history.last is None
+        assert history.get_in_window(1) == []
+
+        for i in range(10):
+            history.append(_new_result(i))
+
+        assert [i.run_time for i in history.get_in_window(2)] == [7, 8, 9]
+        assert [i.run_time for i in history.get_in_window(2, now=5)] == [3, 4, 5]
+        assert [i.run_time for i in history.get_since(8.5)] == [9]
+
+    def test_without_image(self):
+        """测试历史记录不保留图片"""
+        result = ClassificationResult(raw_image=object(), class_idx=1, run_time=1, score=0.95)
+        compact = result.without_image()
+        assert compact.raw_image is None
+        assert compact.class_idx == 1
+        assert compact.score == 0.95
+        assert compact.run_time == 1
@@ -0,0 +1,107 @@
+"""文本识别分批测试 不加载模型"""
+import threading
+
+import numpy as np
+import pytest
+
+from onnxocr.predict_rec import TextRecognizer
+
+_IMG_H, _IMG_W = 48, 320
+_BASE_RATIO = _IMG_W / _IMG_H
+
+
+class _RecordSession:
+    """记录每批输入形状的模型"""
+
+    def __init__(self):
+        self.input_list: list[np.ndarray] = []
+
+    def run(self, output_names, input_feed):
+        self.input_list.append(next(iter(input_feed.values())).copy())
+        return [np.zeros(len(self.input_list[-1]))]
+
+
+def _new_recognizer(rec_batch_num: int = 6, rec_bucket_ratio: float = 1.5) -> TextRecognizer:
+    """只设置分批和预处理需要的属性"""
+    recognizer = TextRecognizer.__new__(TextRecognizer)
+    recognizer.rec_image_shape = [3, _IMG_H, _IMG_W]
+    recognizer.rec_batch_num = rec_batch_num
+    recognizer.rec_bucket_ratio = rec_bucket_ratio
+    recognizer.rec_algorithm = 'SVTR_LCNet'
+    recognizer.rec_onnx_session = _RecordSession()
+    recognizer.rec_input_name = ['x']
+    recognizer.rec_output_name = ['y']
+    recognizer.postprocess_op = lambda preds: [('', 0.0)] * len(preds)
+    recognizer._local = threading.local()
+    return recognizer
+
+
+def _new_img(w: int, h: int = 32, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+
+class TestTextRecognizer:
+
+    def test_batch_by_ratio(self):
+        """测试按宽高比分批 不足标准宽度的视为相同 到达倍数边界时仍在同一批"""
+        recognizer = _new_recognizer()
+        max_ratio = _BASE_RATIO * 1.5
+        ratio_list = [max_ratio + 0.01, 1, max_ratio, 3, _BASE_RATIO, 30]
+        assert recognizer.get_batch_list(ratio_list) == [[1, 3, 4, 2], [0], [5]]
+
+    def test_batch_size_limit(self):
+        """测试每批数量不超过 rec_batch_num 相同宽高比按原顺序"""
+        recognizer = _new_recognizer(rec_batch_num=2)
+        assert recognizer.get_batch_list([1, 1, 1, 1, 1]) == [[0, 1], [2, 3], [4]]
+        assert recognizer.get_batch_list([]) == []
+
+    def test_new_bucket_start(self):
+        """测试新的一批以第一个的宽高比作为基准"""
+        recognizer = _new_recognizer(rec_bucket_ratio=1.5)
+        ratio_list = [10, 14, 15, 22, 23]
+        # 10 开始的一批最大到 15 22 开始新的一批 以 22 为基准 23 仍在同一批
+        assert recognizer.get_batch_list(ratio_list) == [[0, 1, 2], [3, 4]]
+
+    @pytest.mark.parametrize('w', [10, 64, 213, 214, 400])
+    def test_fill_same_as_resize(self, w: int):
+        """测试直接写入缓冲区的结果 与原来的缩放归一化一致 右侧填充0"""
+        recognizer = _new_recognizer()
+        img = _new_img(w)
+        max_wh_ratio = max(_BASE_RATIO, 10)  # 批内有更宽的图片
+        dst_w = int(_IMG_H * max_wh_ratio)
+
+        dst = np.full((3, _IMG_H, dst_w), 7, dtype=np.float32)  # 填入旧数据 确认被覆盖
+        recognizer.fill_norm_img(dst, img)
+        expected = recognizer.resize_norm_img(img, max_wh_ratio)
+        np.testing.assert_allclose(dst, expected, atol=1e-6)
+
+        resized_w = min(dst_w, int(np.ceil(_IMG_H * w / 32)))
+        assert not dst[:, :, resized_w:].any()
+
+    def test_input_buffer_reuse(self):
+        """测试输入缓冲区在同一线程内复用 容量不足时扩容"""
+        recognizer = _new_recognizer()
+        small = recognizer.get_input_buffer((2, 3, _IMG_H, _IMG_W))
+        again = recognizer.get_input_buffer((1, 3, _IMG_H, 400))
+        assert np.shares_memory(small, again)
+        assert again.flags['C_CONTIGUOUS']
+        large = recognizer.get_input_buffer((6, 3, _IMG_H, 800))
+        assert not np.shares_memory(small, large)
+
+    def test_batch_input_width(self):
+        """测试每批输入的宽度 按批内最大的宽高比填充"""
+        recognizer = _new_recognizer()
+        img_list = [_new_img(w, seed=i) for i, w in enumerate([600, 50, 320, 470, 2000])]
+        assert len(recognizer(img_list)) == len(img_list)
+
+        input_list = recognizer.rec_onnx_session.input_list
+        # [50, 320] 320 刚好是标准宽高比的1.5倍 [470, 600] 不超过 470 的1.5倍 [2000] 单独一批
+        assert [i.shape for i in input_list] == [
+            (2, 3, _IMG_H, int(_IMG_H * 320 / 32)),
+            (2, 3, _IMG_H, int(_IMG_H * 600 / 32)),
+            (1, 3, _IMG_H, int(_IMG_H * 2000 / 32)),
+        ]
+        for batch, idx_list in zip(input_list, [[1, 2], [3, 0], [4]]):
+            max_wh_ratio = batch.shape[3] / _IMG_H
+            for norm_img, idx in zip(batch, idx_list):
+                np.testing.assert_allclose(norm_img, recognizer.resize_norm_img(img_list[idx], max_wh_ratio), atol=1e-6)
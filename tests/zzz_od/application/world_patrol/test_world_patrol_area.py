@@ -0,0 +1,28 @@
+"""大地图图标索引缓存测试"""
+import numpy as np
+
+from zzz_od.application.world_patrol.world_patrol_area import WorldPatrolLargeMap, WorldPatrolLargeMapIcon
+
+
+def _new_icon(x: int, y: int) -> WorldPatrolLargeMapIcon:
+    return WorldPatrolLargeMapIcon(icon_name='传送点', template_id='tp', lm_pos=[x, y], tp_pos=None)
+
+
+class TestWorldPatrolLargeMap:
+
+    def test_icon_index_cache(self):
+        """测试图标列表被替换后重新构建索引 原地修改后需要手动重新构建"""
+        large_map = WorldPatrolLargeMap('area', np.zeros((10, 10), dtype=np.uint8), [_new_icon(10, 10)])
+        index = large_map.icon_index
+        assert len(index) == 1
+        assert large_map.icon_index is index
+
+        large_map.icon_list = [_new_icon(10, 10), _new_icon(20, 20)]
+        assert len(large_map.icon_index) == 2
+
+        large_map.icon_list[0].lm_pos.x = 30
+        index = large_map.icon_index
+        assert large_map.icon_index is index
+        large_map.build_icon_index()
+        assert large_map.icon_index is not index
+        assert large_map.icon_index.pos_array[0].tolist() == [30, 10]
@@ -0,0 +1,134 @@
+"""大地图图标索引测试 使用固定的图标分布"""
+import random
+
+from one_dragon.base.geometry.point import Point
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.base.matcher.match_result import MatchResult
+from one_dragon.utils import cal_utils
+from zzz_od.application.world_patrol.world_patrol_icon_index import WorldPatrolIconIndex
+
+_MM_W, _MM_H = 200, 200  # 小地图大小 真实左上角在 (1000, 500)
+
+
+def _new_index() -> WorldPatrolIconIndex:
+    return WorldPatrolIconIndex(
+        [Point(1050, 560), Point(1120, 620), Point(1180, 540), Point(1400, 900), Point(300, 300), Point(370, 360)],
+        ['tp', 'shop', 'tp', 'shop', 'tp', 'shop'],
+    )
+
+
+def _mm_icon_list() -> list[tuple[str, Point]]:
+    return [('tp', Point(50, 60)), ('shop', Point(120, 120)), ('tp', Point(180, 40))]
+
+
+def _old_vote(index: WorldPatrolIconIndex, lm_rect: Rect, mm_icon_list: list[tuple[str, Point]]) -> list[MatchResult]:
+    """原来逐个图标投票的实现"""
+    match_list: list[MatchResult] = []
+    for lm_idx in range(len(index)):
+        lm_pos = Point(*index.pos_array[lm_idx].tolist())
+        if lm_pos.x < lm_rect.x1 or lm_pos.x > lm_rect.x2 or lm_pos.y < lm_rect.y1 or lm_pos.y > lm_rect.y2:
+            continue
+        for template_id, point in mm_icon_list:
+            if template_id != index.template_id_list[lm_idx]:
+                continue
+            new_point = lm_pos - point
+            new_mr = MatchResult(1, new_point.x, new_point.y, _MM_W, _MM_H)
+            merged = False
+            for old_mr in match_list:
+                if cal_utils.distance_between(new_mr.left_top, old_mr.left_top) < 10:
+                    old_mr.confidence += 1
+                    merged = True
+                    break
+            if not merged:
+                match_list.append(new_mr)
+    return match_list
+
+
+def _best_center_set(match_list: list[MatchResult]) -> set[tuple[int, int]]:
+    """置信度最高的位置 有多个时之后再用道路比较"""
+    if len(match_list) == 0:
+        return set()
+    max_confidence = max(mr.confidence for mr in match_list)
+    return {(mr.center.x, mr.center.y) for mr in match_list if mr.confidence == max_confidence}
+
+
+class TestWorldPatrolIconIndex:
+
+    def test_query_rect(self):
+        """测试范围查询 包含边界 结果升序"""
+        index = _new_index()
+        assert index.query_rect(Rect(1050, 540, 1180, 620)) == [0, 1, 2]
+        assert index.query_rect(Rect(1051, 540, 1180, 619)) == [2]
+        assert index.query_rect(Rect(0, 0, 5000, 5000)) == [0, 1, 2, 3, 4, 5]  # 遍历已有网格的分支
+        assert index.query_rect(Rect(2000, 2000, 2100, 2100)) == []
+        assert WorldPatrolIconIndex([], []).query_rect(Rect(0, 0, 100, 100)) == []
+
+    def test_lookup_pair(self):
+        """测试图标对查找 允许误差 跨量化边界也能找到"""
+        index = _new_index()
+        assert sorted(index.lookup_pair('tp', 'shop', 70, 60, max_error=10)) == [(0, 1), (4, 5)]
+        assert sorted(index.lookup_pair('tp', 'shop', 65, 57, max_error=10)) == [(0, 1), (4, 5)]
+        assert index.lookup_pair('tp', 'tp', 130, -20, max_error=10) == [(0, 2)]
+        assert index.lookup_pair('tp', 'tp', -130, 20, max_error=10) == [(2, 0)]
+        assert index.lookup_pair('shop', 'tp', 70, 60, max_error=10) == []
+        assert index.lookup_pair('tp', 'shop', 90, 60, max_error=10) == []
+        assert index.lookup_pair('tp', 'shop', 1050, 600, max_error=10) == []  # 距离过远的图标对不建立索引
+
+    def test_pair_hash_same_as_brute_force(self):
+        """测试按网格建立的图标对 与逐对计算的结果一致 包含负坐标和网格边界上的距离"""
+        rng = random.Random(0)
+        pos_list = [Point(rng.randint(-500, 1500), rng.randint(-500, 1500)) for _ in range(300)]
+        pos_list += [Point(0, 0), Point(400, 0), Point(0, -400), Point(283, 283)]
+        template_id_list = [rng.choice(['tp', 'shop', 'door']) for _ in pos_list]
+        index = WorldPatrolIconIndex(pos_list, template_id_list, cell_size=70, max_pair_distance=400)
+
+        expected: dict[tuple[str, str, int, int], list[tuple[int, int]]] = {}
+        for i, a in enumerate(pos_list):
+            for j, b in enumerate(pos_list):
+                dx, dy = b.x - a.x, b.y - a.y
+                if i == j or dx * dx + dy * dy > 400 * 400:
+                    continue
+                key = (template_id_list[i], template_id_list[j], index._quantize(dx), index._quantize(dy))
+                expected.setdefault(key, []).append((i, j))
+
+        assert {k: sorted(v) for k, v in index._pair_hash.items()} == {k: sorted(v) for k, v in expected.items()}
+
+    def test_match_by_pair(self):
+        """测试图标对查找的候选位置和置信度 限制范围时排除范围外的图标对"""
+        index = _new_index()
+        match_list = index.match_by_pair(set(range(len(index))), _mm_icon_list(), _MM_W, _MM_H)
+        assert sorted((mr.x, mr.y, mr.confidence) for mr in match_list) == [(250, 240, 2), (1000, 500, 3)]
+
+        lm_idx_set = set(index.query_rect(Rect(800, 300, 1500, 1000)))
+        match_list = index.match_by_pair(lm_idx_set, _mm_icon_list(), _MM_W, _MM_H)
+        assert [(mr.x, mr.y, mr.confidence) for mr in match_list] == [(1000, 500, 3)]
+
+    def test_fallback_to_vote(self):
+        """测试图标对找不到时 使用投票"""
+        index = _new_index()
+        lm_idx_list = list(range(len(index)))
+
+        mm_icon_list = [('shop', Point(120, 120))]  # 只有一个图标 没有图标对
+        assert index.match_by_pair(set(lm_idx_list), mm_icon_list, _MM_W, _MM_H) == []
+        match_list = index.match_icons(lm_idx_list, mm_icon_list, _MM_W, _MM_H)
+        assert sorted((mr.x, mr.y, mr.confidence) for mr in match_list) == [
+            (250, 240, 1), (1000, 500, 1), (1280, 780, 1)
+        ]
+
+        mm_icon_list = [('tp', Point(50, 60)), ('shop', Point(10, 10))]  # 大地图上没有这样的图标对
+        match_list = index.match_icons(lm_idx_list, mm_icon_list, _MM_W, _MM_H)
+        assert all(mr.confidence == 1 for mr in match_list)
+        assert len(match_list) == len(index)
+
+    def test_same_as_old_vote(self):
+        """测试图标对查找得到的位置 与原来逐个投票的位置一致"""
+        index = _new_index()
+        for lm_rect in [Rect(0, 0, 2000, 2000), Rect(800, 300, 1500, 1000)]:
+            for mm_icon_list in [_mm_icon_list(), _mm_icon_list()[:2], _mm_icon_list()[1:]]:
+                lm_idx_list = index.query_rect(lm_rect)
+                pair_list = index.match_by_pair(set(lm_idx_list), mm_icon_list, _MM_W, _MM_H)
+                assert len(pair_list) > 0
+                expected = _best_center_set(_old_vote(index, lm_rect, mm_icon_list))
+                assert (1100, 600) in expected
+                assert _best_center_set(pair_list) == expected
+                assert _best_center_set(index.match_by_vote(lm_idx_list, mm_icon_list, _MM_W, _MM_H)) == expected
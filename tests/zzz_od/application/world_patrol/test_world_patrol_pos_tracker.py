@@ -0,0 +1,186 @@
+"""小地图坐标跟踪测试 使用固定的坐标和匹配结果"""
+import numpy as np
+import pytest
+
+from one_dragon.base.geometry.point import Point
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.base.matcher.match_result import MatchResult
+from zzz_od.application.world_patrol.mini_map_wrapper import MiniMapWrapper
+from zzz_od.application.world_patrol.world_patrol_area import WorldPatrolLargeMap
+from zzz_od.application.world_patrol.world_patrol_pos_tracker import WorldPatrolPosFix, WorldPatrolPosTracker
+
+_MM_SIZE = 100  # 小地图道路掩码的大小
+
+
+class _FixedService:
+    """按调用顺序返回固定匹配结果的锄大地服务 并记录每次搜索的范围"""
+
+    def __init__(self, road_result_list: list[MatchResult | None], icon_pos: Point | None = None):
+        self.road_result_list: list[MatchResult | None] = road_result_list
+        self.icon_pos: Point | None = icon_pos
+        self.search_rect_list: list[Rect] = []
+
+    def cal_pos_by_icon(self, large_map, mini_map, lm_rect: Rect) -> Point | None:
+        self.search_rect_list.append(lm_rect)
+        return self.icon_pos
+
+    def cal_pos_by_road_result(self, large_map, mini_map, lm_rect: Rect) -> MatchResult | None:
+        return self.road_result_list.pop(0) if len(self.road_result_list) > 0 else None
+
+
+def _new_tracker(service: _FixedService) -> WorldPatrolPosTracker:
+    large_map = WorldPatrolLargeMap('test', np.zeros((1000, 1000), dtype=np.uint8), [])
+    return WorldPatrolPosTracker(service, large_map, min_radius=20, default_speed=50, max_speed=150)
+
+
+def _new_mini_map(view_angle: float = 0) -> MiniMapWrapper:
+    mini_map = MiniMapWrapper(np.zeros((_MM_SIZE, _MM_SIZE, 3), dtype=np.uint8))
+    mini_map.road_mask = np.zeros((_MM_SIZE, _MM_SIZE), dtype=np.uint8)
+    mini_map.view_angle = view_angle
+    return mini_map
+
+
+def _road_result(center: Point, confidence: float) -> MatchResult:
+    return MatchResult(confidence, center.x - _MM_SIZE // 2, center.y - _MM_SIZE // 2, _MM_SIZE, _MM_SIZE)
+
+
+def _rect_size(rect: Rect) -> tuple[int, int]:
+    return rect.x2 - rect.x1, rect.y2 - rect.y1
+
+
+def _new_fix(pos: Point | None, fix_time: float) -> WorldPatrolPosFix:
+    return WorldPatrolPosFix(pos=pos, confidence=1, method='road', search_rect=None,
+                             search_times=1, cost=0, fix_time=fix_time)
+
+
+class TestWorldPatrolPosTracker:
+
+    def test_predict(self):
+        """测试按速度和朝向预测坐标"""
+        tracker = _new_tracker(_FixedService([]))
+        assert tracker.predict(1, 0, True) is None
+
+        tracker.reset(Point(500, 500), pos_time=10)
+        pos = tracker.predict(12, 0, False)
+        assert (pos.x, pos.y) == (500, 500)  # 没有移动
+        pos = tracker.predict(12, None, True)
+        assert (pos.x, pos.y) == (500, 500)  # 没有朝向
+        pos = tracker.predict(12, 0, True)
+        assert (pos.x, pos.y) == (600, 500)  # 正右 50像素/秒 * 2秒
+        pos = tracker.predict(12, 90, True)
+        assert (pos.x, pos.y) == (500, 400)  # 正上 图片坐标y轴向下
+        pos = tracker.predict(9, 0, True)
+        assert (pos.x, pos.y) == (500, 500)  # 时间倒退时不移动
+
+    def test_search_radius(self):
+        """测试搜索半径随时间增长 计算失败后不再使用小范围"""
+        tracker = _new_tracker(_FixedService([]))
+        assert tracker.get_search_radius_list(1, True) == []
+
+        tracker.reset(Point(500, 500), pos_time=10)
+        assert tracker.get_search_radius_list(10, True) == [20, 60]
+        assert tracker.get_search_radius_list(12, True) == [70, 210]
+        assert tracker.get_search_radius_list(12, False) == [45, 135]
+
+        tracker.lost_times = 1
+        assert tracker.get_search_radius_list(12, True) == []
+
+    def test_first_window_accepted(self):
+        """测试预测范围内匹配可信时 只搜索一次"""
+        service = _FixedService([_road_result(Point(600, 500), 0.9)])
+        tracker = _new_tracker(service)
+        tracker.reset(Point(500, 500), pos_time=10)
+        full_rect = Rect(0, 0, 1000, 1000)
+
+        fix = tracker.cal_pos(_new_mini_map(0), full_rect, now=12, is_moving=True)
+        assert (fix.pos.x, fix.pos.y) == (600, 500)
+        assert (fix.method, fix.search_times) == ('road', 1)
+        # 以预测坐标 (600, 500) 为中心 半径70
+        assert service.search_rect_list == [fix.search_rect]
+        assert (fix.search_rect.x1, fix.search_rect.y1) == (600 - 70 - 50, 500 - 70 - 50)
+        assert _rect_size(fix.search_rect) == (70 * 2 + _MM_SIZE, 70 * 2 + _MM_SIZE)
+
+    def test_escalate_search_window(self):
+        """测试小范围置信度不足时 逐步扩大范围 最后使用完整范围"""
+        service = _FixedService([
+            _road_result(Point(600, 500), 0.3),  # 置信度不足
+            _road_result(Point(600, 500), 0.4),  # 置信度不足
+            _road_result(Point(620, 500), 0.3),  # 完整范围不检查置信度
+        ])
+        tracker = _new_tracker(service)
+        tracker.reset(Point(500, 500), pos_time=10)
+        full_rect = Rect(0, 0, 1000, 1000)
+
+        fix = tracker.cal_pos(_new_mini_map(0), full_rect, now=12, is_moving=True)
+        assert (fix.pos.x, fix.pos.y) == (620, 500)
+        assert fix.search_times == 3
+        assert fix.search_rect is full_rect
+        assert [_rect_size(i) for i in service.search_rect_list] == [(240, 240), (520, 520), (1000, 1000)]
+
+    def test_unreachable_icon(self):
+        """测试小范围内图标坐标超出最大移动距离时 不使用"""
+        service = _FixedService([None, None, None], icon_pos=Point(900, 900))
+        tracker = _new_tracker(service)
+        tracker.reset(Point(500, 500), pos_time=10)
+
+        fix = tracker.cal_pos(_new_mini_map(0), Rect(0, 0, 1000, 1000), now=11, is_moving=True)
+        assert fix.search_times == 3
+        assert (fix.method, fix.pos.x, fix.pos.y) == ('icon', 900, 900)
+
+    def test_lost(self):
+        """测试完全失败时 记录失败次数 下次直接使用完整范围"""
+        service = _FixedService([])
+        tracker = _new_tracker(service)
+        tracker.reset(Point(500, 500), pos_time=10)
+
+        fix = tracker.cal_pos(_new_mini_map(0), Rect(0, 0, 1000, 1000), now=11, is_moving=True)
+        assert fix.pos is None
+        assert fix.search_times == 3
+        assert tracker.lost_times == 1
+        assert (tracker.last_pos.x, tracker.last_pos.y) == (500, 500)
+
+        service.search_rect_list.clear()
+        fix = tracker.cal_pos(_new_mini_map(0), Rect(0, 0, 1000, 1000), now=12, is_moving=True)
+        assert fix.search_times == 1
+        assert len(tracker.fix_history) == 2
+
+    @pytest.mark.parametrize('search_rect, x, y, expected', [
+        (Rect(100, 100, 300, 300), 100, 150, True),  # 左边缘
+        (Rect(100, 100, 300, 300), 150, 100, True),  # 上边缘
+        (Rect(100, 100, 300, 300), 250, 150, True),  # 右边缘 需要减去结果的宽度
+        (Rect(100, 100, 300, 300), 150, 250, True),  # 下边缘
+        (Rect(100, 100, 300, 300), 150, 150, False),
+        (Rect(-50, -50, 200, 200), 0, 0, False),  # 大地图的左上边缘
+        (Rect(900, 900, 1100, 1100), 950, 950, False),  # 大地图的右下边缘
+        (Rect(900, 900, 1100, 1100), 900, 950, True),
+    ])
+    def test_is_on_border(self, search_rect: Rect, x: int, y: int, expected: bool):
+        """测试匹配结果是否在搜索范围的边缘"""
+        tracker = _new_tracker(_FixedService([]))
+        assert tracker._is_on_border(MatchResult(1, x, y, 50, 50), search_rect) == expected
+
+    def test_update_speed(self):
+        """测试移动时按两次坐标更新速度估计 超过上限的不使用"""
+        tracker = _new_tracker(_FixedService([]))
+        tracker.reset(Point(0, 0), pos_time=0)
+
+        tracker._update_state(_new_fix(Point(100, 0), 1), is_moving=True)
+        assert tracker.speed == pytest.approx(50 * 0.7 + 100 * 0.3)
+        assert (tracker.last_pos.x, tracker.last_pos.y, tracker.last_pos_time) == (100, 0, 1)
+
+        tracker._update_state(_new_fix(Point(100, 400), 2), is_moving=True)  # 400像素/秒 超过上限
+        assert tracker.speed == pytest.approx(65)
+        assert (tracker.last_pos.x, tracker.last_pos.y) == (100, 400)
+
+        tracker._update_state(_new_fix(Point(100, 500), 3), is_moving=False)  # 不移动时不更新速度
+        assert tracker.speed == pytest.approx(65)
+
+        tracker._update_state(_new_fix(Point(200, 500), 3), is_moving=True)  # 时间相同 不更新速度
+        assert tracker.speed == pytest.approx(65)
+
+        tracker._update_state(_new_fix(None, 4), is_moving=True)
+        assert tracker.lost_times == 1
+        assert tracker.last_pos_time == 3
+
+        tracker.reset(Point(0, 0))
+        assert (tracker.speed, tracker.lost_times) == (50, 0)
@@ -0,0 +1,122 @@
+"""闪避声音识别测试 不录音 直接写入合成的音频"""
+import numpy as np
+import pytest
+
+from zzz_od.auto_battle.auto_battle_dodge_context import AudioRecorder, AudioTemplateCorrelator
+
+
+def _new_recorder() -> AudioRecorder:
+    """不滤波的录音 写入的值就是读取的值"""
+    recorder = AudioRecorder()
+    recorder.filter_b = np.array([1.0])
+    recorder.filter_a = np.array([1.0])
+    recorder._filter_zi = np.zeros(0)
+    return recorder
+
+
+def _append_in_chunks(recorder: AudioRecorder, audio: np.ndarray, chunk_size: int = 320) -> None:
+    for i in range(0, len(audio), chunk_size):
+        recorder.append_audio(audio[i:i + chunk_size])
+
+
+class TestAudioRecorder:
+
+    def test_wrap_around(self):
+        """测试写入超过缓冲区长度后 仍能读到最新的连续音频"""
+        recorder = _new_recorder()
+        buffer_len = recorder._buffer_len
+        audio = np.arange(buffer_len * 2 + 123, dtype=np.float32)
+        _append_in_chunks(recorder, audio, chunk_size=777)  # 与缓冲区长度不整除 会跨过边界
+        assert recorder.write_pos == len(audio)
+
+        for n in [1, 777, recorder.window_len, buffer_len]:
+            data = recorder.get_audio(recorder.write_pos - n, recorder.write_pos)
+            np.testing.assert_array_equal(data, audio[-n:])
+            assert np.shares_memory(data, recorder._buffer)  # 视图 不复制
+
+        np.testing.assert_array_equal(recorder.latest_audio, audio[-recorder.window_len:])
+
+    def test_unavailable(self):
+        """测试已经被覆盖或还没写入的位置 返回None"""
+        recorder = _new_recorder()
+        audio = np.arange(recorder._buffer_len + 100, dtype=np.float32)
+        _append_in_chunks(recorder, audio)
+
+        assert recorder.get_audio(99, 200) is None  # 已被覆盖
+        np.testing.assert_array_equal(recorder.get_audio(100, 200), audio[100:200])
+        assert recorder.get_audio(len(audio) - 10, len(audio) + 1) is None  # 还没写入
+        assert recorder.get_audio(200, 100) is None
+        assert not recorder.is_audio_available(-1)
+
+    def test_long_chunk(self):
+        """测试一次写入超过缓冲区长度时 只保留最后的部分"""
+        recorder = _new_recorder()
+        audio = np.arange(recorder._buffer_len * 3 + 5, dtype=np.float32)
+        recorder.append_audio(audio)
+        assert recorder.write_pos == len(audio)
+        np.testing.assert_array_equal(recorder.get_audio(recorder.write_pos - recorder._buffer_len, recorder.write_pos),
+                                      audio[-recorder._buffer_len:])
+
+    def test_clear_audio(self):
+        """测试清除后 之前的录音按0计算"""
+        recorder = _new_recorder()
+        _append_in_chunks(recorder, np.ones(recorder.window_len, dtype=np.float32))
+        recorder.clear_audio()
+        assert not recorder.latest_audio.any()
+
+        recorder.append_audio(np.full(100, 2, dtype=np.float32))
+        latest = recorder.latest_audio
+        assert not latest[:-100].any()
+        np.testing.assert_array_equal(latest[-100:], 2)
+
+
+class TestAudioTemplateCorrelator:
+
+    @pytest.fixture
+    def template(self) -> np.ndarray:
+        return np.random.default_rng(0).normal(0, 1, 1600)
+
+    def _feed(self, recorder: AudioRecorder, correlator: AudioTemplateCorrelator,
+              audio: np.ndarray, chunk_size: int = 320) -> list[float]:
+        score_list: list[float] = []
+        for i in range(0, len(audio), chunk_size):
+            recorder.append_audio(audio[i:i + chunk_size])
+            score_list.append(correlator.update(recorder))
+        return score_list
+
+    def test_peak_at_offset(self, template):
+        """测试分块累加的相关性 与一次性计算的一致 并且在模板出现的位置最大"""
+        recorder = _new_recorder()
+        correlator = AudioTemplateCorrelator(template, recorder.window_len)
+
+        offset = 36000 + 123  # 不与分块对齐 且在缓冲区绕回之后
+        audio = np.random.default_rng(1).normal(0, 0.1, 40000)
+        audio[offset:offset + len(template)] += template
+        audio = audio.astype(np.float32)
+        score_list = self._feed(recorder, correlator, audio)
+
+        # 已经有完整录音的对齐位置 与直接计算的乘积和一致
+        start_pos = recorder.write_pos - correlator.window_len
+        expected = np.correlate(audio[start_pos:].astype(np.float64), template, mode='valid')
+        acc = correlator._acc[np.arange(start_pos, start_pos + len(expected)) % correlator._acc_len]
+        np.testing.assert_allclose(acc, expected, rtol=1e-6, atol=1e-6)
+        assert start_pos + int(np.argmax(acc)) == offset
+
+        # 模板到达一半之后才会有明显的相关性
+        half_idx = (offset + len(template) // 2) // 320
+        assert max(score_list[:half_idx - 1]) < 0.1
+        assert max(score_list[half_idx:]) > 0.3
+
+    def test_reset_after_clear(self, template):
+        """测试清除录音后 之前的累加值不再参与判断"""
+        recorder = _new_recorder()
+        correlator = AudioTemplateCorrelator(template, recorder.window_len)
+
+        audio = np.zeros(8000, dtype=np.float32)
+        audio[4000:4000 + len(template)] = template
+        assert max(self._feed(recorder, correlator, audio)) > 0.3
+
+        recorder.clear_audio()
+        score_list = self._feed(recorder, correlator, np.random.default_rng(2).normal(0, 0.1, 3200).astype(np.float32))
+        assert correlator.last_pos == recorder.write_pos
+        assert max(score_list) < 0.1
@@ -0,0 +1,112 @@
+"""自动战斗离线模拟测试 使用内联的配置 不依赖游戏"""
+import pytest
+
+from one_dragon.base.conditional_operation.state_recorder import StateRecord
+from zzz_od.auto_battle.auto_battle_simulator import (
+    AutoBattleSimulator,
+    StateRecordTraceWriter,
+    load_state_record_trace,
+    save_state_record_trace,
+)
+
+
+@pytest.fixture
+def simulator():
+    simulator = AutoBattleSimulator('test_simulator', is_mock=True)
+    simulator.update('scenes', [
+        {
+            'triggers': ['闪避识别-黄光'],
+            'priority': 99,
+            'interval': 0.5,
+            'handlers': [
+                {
+                    'states': '[闪避识别-黄光, 0, 1]',
+                    'operations': [
+                        {'op_name': '按键-闪避', 'post_delay': 0.2},
+                        {'op_name': '设置状态', 'state': '自定义-闪避后'},
+                    ]
+                }
+            ]
+        },
+        {
+            'handlers': [
+                {
+                    'states': '[自定义-闪避后, 0, 1]',
+                    'operations': [
+                        {'op_name': '按键-特殊攻击', 'post_delay': 0.3},
+                        {'op_name': '清除状态', 'state': '自定义-闪避后'},
+                    ]
+                },
+                {
+                    'states': '[前台-艾莲, 0, 10]',
+                    'operations': [
+                        {'op_name': '按键-普通攻击', 'post_delay': 0.5, 'repeat': 2},
+                    ]
+                },
+            ]
+        },
+    ])
+    yield simulator
+    simulator.dispose()
+
+
+def _trace() -> list[StateRecord]:
+    return [
+        StateRecord('前台-艾莲', 10),
+        StateRecord('闪避识别-黄光', 10.6),
+        StateRecord('闪避识别-黄光', 10.7),  # 冷却中 不触发
+        StateRecord('按键-普通攻击', 10.8),  # 按键状态由模拟指令产生 回放时忽略
+    ]
+
+
+class TestAutoBattleSimulator:
+
+    def test_simulate(self, simulator):
+        """测试触发场景打断主循环 指令按配置的延迟在虚拟时钟上推进"""
+        result = simulator.simulate(_trace(), end_time=12)
+
+        timeline = [(i.scene, i.op_name, round(i.start_time, 3), round(i.end_time, 3), i.interrupted)
+                    for i in result.op_list]
+        assert timeline == [
+            ('主循环', '按键-普通攻击', 10, 10.6, True),
+            ('闪避识别-黄光', '按键-闪避', 10.6, 10.8, False),
+            ('闪避识别-黄光', '设置状态 自定义-闪避后', 10.8, 10.8, False),
+            ('主循环', '按键-特殊攻击', 10.8, 11.1, False),
+            ('主循环', '清除状态', 11.1, 11.1, False),
+            ('主循环', '按键-普通攻击', 11.3, 12, True),  # 主循环的触发间隔
+        ]
+        assert result.virtual_seconds == 2
+        assert result.scene_latency['闪避识别-黄光'].times == 1
+        assert result.decision_cost['闪避识别-黄光'].times == 2
+
+    def test_deterministic(self, simulator):
+        """测试多次模拟的结果一致"""
+        first = simulator.simulate(_trace(), end_time=12)
+        second = simulator.simulate(_trace(), end_time=12)
+        assert first.op_list == second.op_list
+
+    def test_trace_file(self, tmp_path):
+        """测试状态记录的保存和读取"""
+        file_path = str(tmp_path / 'trace.jsonl')
+        save_state_record_trace(file_path, [
+            StateRecord('艾莲-能量', 1.5, value=60),
+            StateRecord('自定义-闪避后', is_clear=True),
+        ])
+        records = load_state_record_trace(file_path)
+        assert [(i.state_name, i.trigger_time, i.value, i.is_clear) for i in records] == [
+            ('艾莲-能量', 1.5, 60, False),
+            ('自定义-闪避后', 0, None, True),
+        ]
+
+    def test_trace_writer(self, simulator, tmp_path):
+        """测试运行时收到的状态记录 追加写入文件后可以回放"""
+        file_path = str(tmp_path / 'trace.jsonl')
+        simulator.state_record_listener = StateRecordTraceWriter(file_path).append
+        simulator.batch_update_states([StateRecord('闪避识别-黄光', 1), StateRecord('按键-闪避', 1.1)])
+        simulator.update_state(StateRecord('闪避识别-黄光', 3))
+
+        records = load_state_record_trace(file_path)
+        assert [(i.state_name, i.trigger_time) for i in records] == [
+            ('闪避识别-黄光', 1), ('按键-闪避', 1.1), ('闪避识别-黄光', 3),
+        ]
+        assert len(simulator.simulate(records, end_time=12).op_list) > 0
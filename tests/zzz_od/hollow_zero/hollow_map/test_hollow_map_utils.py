@@ -0,0 +1,165 @@
+"""零号空洞地图计算测试 与原来逐个节点比较的实现对比"""
+import random
+from types import SimpleNamespace
+from typing import List, Optional
+
+import pytest
+
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.utils import cal_utils
+from zzz_od.hollow_zero.game_data.hollow_zero_event import HollowZeroEntry
+from zzz_od.hollow_zero.hollow_map import hollow_map_utils
+from zzz_od.hollow_zero.hollow_map.hollow_zero_map import HollowZeroMapNode
+
+_SCREEN_WIDTH, _SCREEN_HEIGHT = 1920, 1080
+_ENTRY_NAME_LIST = ['未知', '当前', '轨道-左', '轨道-右', '轨道-上', '轨道-下', '商人']
+
+
+def _new_ctx() -> SimpleNamespace:
+    return SimpleNamespace(project_config=SimpleNamespace(screen_standard_width=_SCREEN_WIDTH,
+                                                          screen_standard_height=_SCREEN_HEIGHT))
+
+
+def _new_node(x: int, y: int, entry_name: str = '未知', w: int = 100, h: int = 100,
+              can_go: bool = True) -> HollowZeroMapNode:
+    entry = HollowZeroEntry(f'0000 {entry_name}', can_go=can_go)
+    return HollowZeroMapNode(Rect(x, y, x + w, y + h), entry, check_time=0)
+
+
+def _old_edges(nodes: List[HollowZeroMapNode]) -> dict[int, List[int]]:
+    """原来逐对节点判断的实现"""
+
+    def in_screen(node: HollowZeroMapNode) -> bool:
+        return not (node.pos.x1 < 0 or node.pos.y1 < 0
+                    or node.pos.x2 >= _SCREEN_WIDTH or node.pos.y2 >= _SCREEN_HEIGHT)
+
+    def is_same_row(n1: HollowZeroMapNode, n2: HollowZeroMapNode) -> bool:
+        min_height = min(n1.pos.height, n2.pos.height) // 3
+        return abs(n1.pos.y1 - n2.pos.y1) <= min_height or abs(n1.pos.y2 - n2.pos.y2) <= min_height
+
+    def is_same_col(n1: HollowZeroMapNode, n2: HollowZeroMapNode) -> bool:
+        min_width = min(n1.pos.width, n2.pos.width) // 3
+        return abs(n1.pos.x1 - n2.pos.x1) <= min_width or abs(n1.pos.x2 - n2.pos.x2) <= min_width
+
+    def at_left(n1: HollowZeroMapNode, n2: HollowZeroMapNode) -> bool:
+        return abs(n1.pos.x2 - n2.pos.x1) <= min(n1.pos.width, n2.pos.width) // 4 and is_same_row(n1, n2)
+
+    def at_right(n1: HollowZeroMapNode, n2: HollowZeroMapNode) -> bool:
+        return abs(n1.pos.x1 - n2.pos.x2) <= min(n1.pos.width, n2.pos.width) // 4 and is_same_row(n1, n2)
+
+    def above(n1: HollowZeroMapNode, n2: HollowZeroMapNode) -> bool:
+        return abs(n1.pos.y2 - n2.pos.y1) <= min(n1.pos.height, n2.pos.height) // 4 and is_same_col(n1, n2)
+
+    def under(n1: HollowZeroMapNode, n2: HollowZeroMapNode) -> bool:
+        return abs(n1.pos.y1 - n2.pos.y2) <= min(n1.pos.height, n2.pos.height) // 4 and is_same_col(n1, n2)
+
+    edges: dict[int, List[int]] = {}
+    for i, node_1 in enumerate(nodes):
+        if not in_screen(node_1):
+            continue
+        for j, node_2 in enumerate(nodes):
+            if not in_screen(node_2):
+                continue
+            if not node_1.entry.can_go or not node_2.entry.can_go:
+                continue
+            name_1, name_2 = node_1.entry.entry_name, node_2.entry.entry_name
+            if at_left(node_1, node_2):
+                connected = name_2 not in ['轨道-左'] and name_1 not in ['轨道-上', '轨道-下', '轨道-左']
+            elif at_right(node_1, node_2):
+                connected = name_2 not in ['轨道-右'] and name_1 not in ['轨道-上', '轨道-下', '轨道-右']
+            elif above(node_1, node_2):
+                connected = name_2 not in ['轨道-上'] and name_1 not in ['轨道-左', '轨道-右', '轨道-上']
+            elif under(node_1, node_2):
+                connected = name_2 not in ['轨道-下'] and name_1 not in ['轨道-左', '轨道-右', '轨道-下']
+            else:
+                connected = False
+            if connected:
+                edges.setdefault(i, []).append(j)
+    return edges
+
+
+def _old_find_same_pos(existed_list: List[HollowZeroMapNode], node: HollowZeroMapNode) -> Optional[int]:
+    """原来逐个节点判断坐标是否一致的实现"""
+    for idx, existed in enumerate(existed_list):
+        min_dis = min(node.pos.height, node.pos.width, existed.pos.height, existed.pos.width) // 2
+        if cal_utils.distance_between(node.pos.center, existed.pos.center) < min_dis:
+            return idx
+    return None
+
+
+def _grid_layout() -> List[HollowZeroMapNode]:
+    """3x3 的格子 包含各方向的轨道和不可通行的格子"""
+    return [
+        _new_node(100, 100, '当前'), _new_node(200, 100, '轨道-右'), _new_node(300, 100),
+        _new_node(100, 200, '轨道-下'), _new_node(200, 200, '商人'), _new_node(300, 200, '轨道-左'),
+        _new_node(100, 300), _new_node(200, 300, '轨道-上'), _new_node(300, 300, '未知', can_go=False),
+    ]
+
+
+def _uneven_layout() -> List[HollowZeroMapNode]:
+    """大小不一 有偏移 部分超出画面"""
+    return [
+        _new_node(500, 500, w=120, h=90),
+        _new_node(618, 530, w=80, h=60),  # 与上一个同一行 y2接近
+        _new_node(523, 588, w=100, h=100),  # 在第一个下方 x1接近
+        _new_node(700, 600, w=100, h=100),
+        _new_node(1850, 500, w=100, h=100),  # 超出画面右侧
+        _new_node(1750, 500, w=100, h=100),
+        _new_node(-20, 0, w=100, h=100),  # 超出画面左侧
+        _new_node(80, 0, w=100, h=100),
+        _new_node(620, 500, w=100, h=100),  # 与第二个重叠
+    ]
+
+
+def _random_layout(seed: int) -> List[HollowZeroMapNode]:
+    """在格子附近随机抖动"""
+    rng = random.Random(seed)
+    nodes: List[HollowZeroMapNode] = []
+    for row in range(6):
+        for col in range(8):
+            if rng.random() < 0.3:
+                continue
+            size = rng.randint(80, 120)
+            nodes.append(_new_node(col * 100 + rng.randint(-15, 15) + 50,
+                                   row * 100 + rng.randint(-15, 15) + 50,
+                                   rng.choice(_ENTRY_NAME_LIST),
+                                   w=size, h=size + rng.randint(-20, 20),
+                                   can_go=rng.random() > 0.1))
+    return nodes
+
+
+_LAYOUT_LIST = [_grid_layout(), _uneven_layout()] + [_random_layout(seed) for seed in range(5)]
+
+
+class TestHollowMapUtils:
+
+    @pytest.mark.parametrize('nodes', _LAYOUT_LIST)
+    def test_edges_same_as_loop(self, nodes: List[HollowZeroMapNode]):
+        """测试矩阵计算的连接 与逐对判断的结果完全一致 包括顺序"""
+        expected = _old_edges(nodes)
+        assert len(expected) > 0
+        assert hollow_map_utils._cal_edges(_new_ctx(), nodes) == expected
+
+    def test_grid_edges(self):
+        """测试轨道格子只能沿轨道方向离开"""
+        edges = hollow_map_utils._cal_edges(_new_ctx(), _grid_layout())
+        assert edges[1] == [2]  # 轨道-右 只能往右 不能回到左边
+        assert edges[3] == [6]  # 轨道-下 只能往下
+        assert 8 not in edges  # 不可通行
+        assert 5 not in edges[4]  # 轨道-左 不能从左边进入
+
+    def test_empty(self):
+        assert hollow_map_utils._cal_edges(_new_ctx(), []) == {}
+
+    @pytest.mark.parametrize('nodes', _LAYOUT_LIST)
+    def test_find_same_pos_same_as_loop(self, nodes: List[HollowZeroMapNode]):
+        """测试逐个加入节点时 找到的重复节点与逐个比较的结果一致"""
+        node_pos = hollow_map_utils._NodePosArray(1)  # 容量不足时扩容
+        existed_list: List[HollowZeroMapNode] = []
+        for node in nodes:
+            for shifted in [node, _new_node(node.pos.x1 + 20, node.pos.y1 + 10, w=node.pos.width, h=node.pos.height)]:
+                expected = _old_find_same_pos(existed_list, shifted)
+                assert node_pos.find_same_pos(shifted.pos) == expected
+                if expected is None:
+                    existed_list.append(shifted)
+                    node_pos.append(shifted.pos)
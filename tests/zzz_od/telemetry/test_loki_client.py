@@ -0,0 +1,217 @@
+"""Loki客户端测试 使用本地的HTTP服务代替Loki"""
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+from zzz_od.telemetry.loki_client import LokiClient
+from zzz_od.telemetry.models import TelemetryConfig
+
+
+class _LokiStub:
+
+    def __init__(self):
+        self.status_code: int = 204
+        self.requests: list[tuple[dict, dict]] = []  # (请求头, 内容)
+        self.connections: set[tuple] = set()
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                stub.connections.add(self.client_address)
+                if stub.status_code == 204:
+                    stub.requests.append((dict(self.headers), json.loads(body)))
+                self.send_response(stub.status_code)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), _Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def event_names(self) -> list[str]:
+        names = []
+        for _, payload in self.requests:
+            for stream in payload['streams']:
+                for _, line in stream['values']:
+                    names.append(json.loads(line)['properties']['event_name'])
+        return names
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def loki_stub():
+    stub = _LokiStub()
+    yield stub
+    stub.close()
+
+
+def _new_client(url: str, spool_dir: str, flush_interval: int = 60) -> LokiClient:
+    config = TelemetryConfig(
+        loki_url=url,
+        loki_tenant_id='test',
+        flush_interval=flush_interval,
+        spool_dir=spool_dir,
+        max_retry_interval=1,
+    )
+    client = LokiClient(config)
+    assert client.initialize()
+    return client
+
+
+def _wait_until(condition, timeout: float = 5) -> bool:
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+class TestLokiClient:
+
+    def test_send_compressed_with_capture_time(self, loki_stub, tmp_path):
+        """测试压缩发送 时间戳使用捕获事件的时间 并复用连接"""
+        client = _new_client(loki_stub.url, str(tmp_path / 'spool'))
+        before = time.time_ns()
+        client.capture('u', 'e1')
+        client.capture('u', 'e2')
+        after = time.time_ns()
+        time.sleep(0.05)
+        client.flush()
+        client.capture('u', 'e3')
+        client.flush()
+
+        assert loki_stub.event_names() == ['e1', 'e2', 'e3']
+        headers, payload = loki_stub.requests[0]
+        assert headers['Content-Encoding'] == 'gzip'
+        for _, values in [(s['stream'], s['values']) for s in payload['streams']]:
+            for ts, _ in values:
+                assert before <= int(ts) <= after
+        assert len(loki_stub.connections) == 1
+        client.shutdown()
+
+    def test_flush_worker_wakeup(self, loki_stub, tmp_path):
+        """测试刷新线程在刷新间隔后发送 不需要主动刷新"""
+        client = _new_client(loki_stub.url, str(tmp_path / 'spool'), flush_interval=0)
+        client.capture('u', 'e1')
+        assert _wait_until(lambda: loki_stub.event_names() == ['e1'])
+        client.shutdown()
+
+    def test_spool_on_outage(self, loki_stub, tmp_path):
+        """测试服务不可用时写入磁盘缓存 恢复后按顺序发送"""
+        client = _new_client(loki_stub.url, str(tmp_path / 'spool'))
+        loki_stub.status_code = 503
+        client.capture('u', 'e1')
+        client.flush()
+        client.capture('u', 'e2')
+        client.flush()
+        assert client.events_spooled == 2
+        assert loki_stub.event_names() == []
+
+        loki_stub.status_code = 204
+        client.capture('u', 'e3')
+        assert _wait_until(lambda: loki_stub.event_names() == ['e1', 'e2', 'e3'])
+        assert client.events_spooled == 0
+        assert client.events_failed == 0
+        client.shutdown()
+
+    def test_spool_survive_restart(self, loki_stub, tmp_path):
+        """测试关闭时未发送的事件 在下次启动后发送"""
+        spool_dir = str(tmp_path / 'spool')
+        client = _new_client('http://127.0.0.1:1', spool_dir)
+        client.capture('u', 'e1')
+        client.capture('u', 'e2')
+        client.shutdown()
+        assert client.events_spooled == 2
+
+        client = _new_client(loki_stub.url, spool_dir)
+        assert client.events_spooled == 2
+        assert _wait_until(lambda: loki_stub.event_names() == ['e1', 'e2'])
+        client.shutdown()
+
+    def test_spool_size_limit(self, loki_stub, tmp_path):
+        """测试磁盘缓存超出大小时丢弃最早的批次"""
+        client = _new_client(loki_stub.url, str(tmp_path / 'spool'))
+        client.config.max_spool_bytes = 1
+        loki_stub.status_code = 503
+        client.capture('u', 'e1')
+        client.flush()
+        client.capture('u', 'e2')
+        client.flush()
+        assert client.events_dropped >= 1
+        assert client.events_spooled <= 1
+        client.shutdown()
+
+    def test_spool_keep_encoding(self, loki_stub, tmp_path):
+        """测试修改压缩设置后 磁盘缓存的批次仍按写入时的编码发送"""
+        spool_dir = tmp_path / 'spool'
+        client = _new_client('http://127.0.0.1:1', str(spool_dir))
+        client.capture('u', 'e1')
+        client.shutdown()
+        assert client.events_spooled == 1
+
+        # 旧版本写入的文件名中没有编码 按内容判断
+        (spool_dir / f'{time.time_ns():020d}-000001-1.batch').write_bytes(json.dumps({'streams': [{
+            'stream': {'app': 'test'},
+            'values': [[str(time.time_ns()), json.dumps({'properties': {'event_name': 'e2'}})]],
+        }]}).encode('utf-8'))
+
+        config = TelemetryConfig(loki_url=loki_stub.url, loki_tenant_id='test', flush_interval=60,
+                                 spool_dir=str(spool_dir), max_retry_interval=1, gzip_enabled=False)
+        client = LokiClient(config)
+        assert client.initialize()
+        client.capture('u', 'e3')
+        assert _wait_until(lambda: loki_stub.event_names() == ['e1', 'e2', 'e3'])
+        assert [headers.get('Content-Encoding') for headers, _ in loki_stub.requests] == ['gzip', None, None]
+        assert client.events_failed == 0
+        client.shutdown()
+
+    def test_spool_unreadable_dropped(self, loki_stub, tmp_path, monkeypatch):
+        """测试无法读取的磁盘缓存批次 删除后计为失败 不会反复重试"""
+        spool_dir = str(tmp_path / 'spool')
+        client = _new_client('http://127.0.0.1:1', spool_dir)
+        client.capture('u', 'e1')
+        client.shutdown()
+        assert client.events_spooled == 1
+
+        def _open_failed(*args, **kwargs):
+            raise OSError('unreadable')
+
+        monkeypatch.setattr('zzz_od.telemetry.loki_client.open', _open_failed, raising=False)
+        client = _new_client(loki_stub.url, spool_dir)
+        assert _wait_until(lambda: client.events_spooled == 0)
+        assert client.events_failed == 1
+        assert client._list_spool_files() == []
+        assert loki_stub.requests == []
+        client.shutdown()
+
+    def test_spool_undeletable_backoff(self, loki_stub, tmp_path):
+        """测试无法读取也无法删除的批次 按重试等待 不会一直占用刷新线程"""
+        spool_dir = tmp_path / 'spool'
+        (spool_dir / f'{time.time_ns():020d}-000001-gzip-1.batch').mkdir(parents=True)
+        client = _new_client(loki_stub.url, str(spool_dir))
+        assert client.events_spooled == 1
+        assert _wait_until(lambda: client._retry_count >= 1)
+        time.sleep(0.3)
+        assert client._retry_count == 1
+        assert client._next_retry_time > time.time()
+        assert client.events_spooled == 1
+        client.shutdown()